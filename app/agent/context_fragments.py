@@ -0,0 +1,98 @@
+# agent/context_fragments.py
+"""
+context_generator_node が組み立てるシステムプロンプトの断片（セクション）のキャッシュ
+
+これまでは毎ターン、SystemPrompt.txt・コアメモリ・メモ帳・研究ノート・ワーキングメモリ・
+ワールド設定（utils.parse_world_file）・ルーム設定をディスクから読み直し、
+DreamingManager / EpisodicMemoryManager / GoalManager を作り直してセクションの文字列を組み立てていた。
+これらはターンの頻度に比べてほとんど変わらない。ここでは
+
+- セクションごとに、元にしたファイル（ディレクトリ）の (mtime, サイズ) と追加のキー（日付・設定値など）を覚えておき、
+  どれも変わっていなければ前回組み立てた文字列をそのまま返す
+- どのセクションを組み立て直し、それぞれ何秒かかったかを FragmentReport に記録する
+
+依存するファイルは組み立ての前に調べるため、組み立て中に書き換えられた場合は次のターンで組み立て直される。
+現在時刻に依存するもの（内的状態のドライブなど）や、読むと消費されるもの（ペンディングメッセージ・通知）は対象外。
+"""
+
+import os
+import glob
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_lock = threading.Lock()
+# (ルーム名, セクション名) -> (追加のキー, 依存ファイルの署名, 値)
+_fragments: Dict[Tuple[str, str], Tuple[Any, tuple, Any]] = {}
+_stats = {"hits": 0, "misses": 0, "build_sec": 0.0}
+
+
+class FragmentReport:
+    """1ターン分の、組み立て直したセクションと使い回したセクションの記録（[PERF] 表示用）。"""
+
+    def __init__(self):
+        self.recomputed: List[Tuple[str, float]] = []
+        self.reused: List[str] = []
+
+    def summary(self) -> str:
+        recomputed = ", ".join(f"{name}({sec:.4f}s)" for name, sec in self.recomputed) or "なし"
+        # 1ターンの中で同じセクションを何度も参照することがあるため、名前の重複は除く
+        recomputed_names = {name for name, _ in self.recomputed}
+        reused = sorted(set(self.reused) - recomputed_names)
+        return f"recomputed: {recomputed} / reused: {len(reused)} ({', '.join(reused) or 'なし'})"
+
+
+def dir_files(directory: str, pattern: str = "*.json") -> List[str]:
+    """ディレクトリとその中の pattern に一致するファイルを依存先として返す（追加・削除はディレクトリの mtime で検知する）。"""
+    return [directory] + sorted(glob.glob(os.path.join(directory, pattern)))
+
+
+def _signature(paths: Iterable[str]) -> tuple:
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except (OSError, TypeError, ValueError):
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def get(
+    room_name: str,
+    section: str,
+    deps: Iterable[str],
+    build: Callable[[], Any],
+    key: Any = (),
+    report: Optional[FragmentReport] = None,
+) -> Any:
+    """
+    セクションの値を返す。deps（依存するファイル・ディレクトリのパス）の署名と key が前回と同じなら
+    前回の値を使い回し、そうでなければ build() を呼んで組み立て直す。
+    build() が例外を送出した場合はキャッシュせず、そのまま呼び出し側に伝える。
+    """
+    signature = _signature(deps)
+    cache_key = (room_name, section)
+    with _lock:
+        entry = _fragments.get(cache_key)
+        if entry is not None and entry[0] == key and entry[1] == signature:
+            _stats["hits"] += 1
+            if report is not None:
+                report.reused.append(section)
+            return entry[2]
+
+    started = time.time()
+    value = build()
+    elapsed = time.time() - started
+    with _lock:
+        _fragments[cache_key] = (key, signature, value)
+        _stats["misses"] += 1
+        _stats["build_sec"] += elapsed
+    if report is not None:
+        report.recomputed.append((section, elapsed))
+    return value
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats, build_sec=round(_stats["build_sec"], 4), fragments=len(_fragments))
@@ -7,8 +7,9 @@ import traceback
 import json
 import time
 import glob
+import threading
 from datetime import datetime
-from typing import TypedDict, Annotated, List, Literal, Tuple, Optional
+from typing import TypedDict, Annotated, List, Literal, Tuple, Optional, Dict
 
 from langchain_core.messages import SystemMessage, BaseMessage, ToolMessage, AIMessage, HumanMessage
 from google.api_core import exceptions as google_exceptions
@@ -129,6 +130,12 @@ side_effect_tools = [
     "schedule_next_action"
 ]
 
+def _merge_stage_timings(current: Optional[dict], update: Optional[dict]) -> dict:
+    """並列ブランチから同時に返される stage_timings を統合するリデューサー。"""
+    merged = dict(current or {})
+    merged.update(update or {})
+    return merged
+
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     room_name: str
@@ -162,6 +169,7 @@ class AgentState(TypedDict):
     custom_system_prompt: Optional[str] # システムプロンプトの上書き用
     is_roblox_active: bool # Robloxとの接続状態
     actual_token_usage: Optional[dict] = None # 【2026-01-10 NEW】実送信トークン数記録用
+    stage_timings: Annotated[dict, _merge_stage_timings] # 並列ステージ(context_generator / retrieval_node)の所要時間
 
 def get_location_list(room_name: str) -> List[str]:
     if not room_name: return []
@@ -192,97 +200,20 @@ def _keyword_search_for_retrieval(
     時間帯別枠取り: 新2 + 古2 + 中間ランダム1 = 計5件
     """
     import random
-    from pathlib import Path
+    import log_search_index
 
     if not keywords or not room_name:
         return []
 
-    base_path = Path(constants.ROOMS_DIR) / room_name
-    search_paths = [str(base_path / "log.txt")]
-    search_paths.extend(glob.glob(str(base_path / "log_archives" / "*.txt")))
-    search_paths.extend(glob.glob(str(base_path / "log_import_source" / "*.txt")))
-
-    found_blocks = []
-    date_patterns = [
-        re.compile(r'(\d{4}-\d{2}-\d{2}) \(...\) \d{2}:\d{2}:\d{2}'),
-        re.compile(r'###\s*(\d{4}-\d{2}-\d{2})')
+    # USER/AGENT のメッセージのみを対象（SYSTEMは除外）。現行ログの最新N件は除外（送信ログ除外）
+    found_blocks = [
+        b for b in log_search_index.search(
+            room_name, keywords, exclude_recent_count=exclude_recent_count, roles=("USER", "AGENT")
+        )
+        # 短すぎるブロックを除外
+        if len(b["content"]) >= 30
     ]
 
-    search_keywords = [k.lower() for k in keywords]
-
-    for file_path_str in search_paths:
-        file_path = Path(file_path_str)
-        if not file_path.exists() or file_path.stat().st_size == 0:
-            continue
-
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-        except Exception:
-            continue
-
-        # USER/AGENT のヘッダーのみを対象（SYSTEMは除外）
-        header_indices = [
-            i for i, line in enumerate(lines)
-            if re.match(r"^(## (?:USER|AGENT):.*)$", line.strip())
-        ]
-        if not header_indices:
-            continue
-
-        search_end_line = len(lines)
-
-        # log.txt の場合、最新N件を除外（送信ログ除外）
-        if file_path.name == "log.txt" and exclude_recent_count > 0:
-            msg_count = len(header_indices)
-            if msg_count <= exclude_recent_count:
-                continue
-            else:
-                cutoff_header_index = header_indices[-exclude_recent_count]
-                search_end_line = cutoff_header_index
-
-        processed_blocks_content = set()
-
-        for i, line in enumerate(lines[:search_end_line]):
-            if any(k in line.lower() for k in search_keywords):
-                # ヘッダーを探す
-                start_index = 0
-                for h_idx in reversed(header_indices):
-                    if h_idx <= i:
-                        start_index = h_idx
-                        break
-
-                # 次のヘッダーまでをブロックとする
-                end_index = len(lines)
-                for h_idx in header_indices:
-                    if h_idx > start_index:
-                        end_index = h_idx
-                        break
-
-                block_content = "".join(lines[start_index:end_index]).strip()
-
-                # 重複チェック
-                if block_content in processed_blocks_content:
-                    continue
-                processed_blocks_content.add(block_content)
-
-                # 短すぎるブロックを除外
-                if len(block_content) < 30:
-                    continue
-
-                # 日付を抽出
-                block_date = None
-                for pattern in date_patterns:
-                    matches = list(pattern.finditer(block_content))
-                    if matches:
-                        block_date = matches[-1].group(1)
-                        break
-
-                found_blocks.append({
-                    "content": block_content,
-                    "date": block_date,
-                    "source": file_path.name
-                })
-
     if not found_blocks:
         return []
 
@@ -703,6 +634,10 @@ def context_generator_node(state: AgentState):
     perf_start = time.time()
     # ...
     room_name = state['room_name']
+    room_dir = os.path.join(constants.ROOMS_DIR, room_name)
+    # ファイルから組み立てるセクションは、元のファイルが変わるまで前回の文字列を使い回す
+    from agent import context_fragments
+    fragment_report = context_fragments.FragmentReport()
 
     # 状況プロンプト
     situation_prompt_parts = []
@@ -762,21 +697,34 @@ def context_generator_node(state: AgentState):
             print(f"  - [TempLocation] 一時的現在地モードでプロンプトを構築しました")
         else:
             # === 仮想現在地モード（既存ロジック） ===
-            current_location_name = utils.get_current_location(soul_vessel_room)
+            current_location_name = context_fragments.get(
+                soul_vessel_room, "current_location",
+                [os.path.join("characters", soul_vessel_room, "current_location.txt")],
+                lambda: utils.get_current_location(soul_vessel_room),
+                report=fragment_report,
+            )
             location_display_name = current_location_name or state.get("location_name", "（不明な場所）")
 
             scenery_text = state.get("scenery_text", "（情景描写を取得できませんでした）")
             space_def = "（場所の定義を取得できませんでした）"
-            current_location_name = utils.get_current_location(soul_vessel_room)
             if current_location_name:
-                world_settings_path = get_world_settings_path(soul_vessel_room)
-                world_data = utils.parse_world_file(world_settings_path)
-                if isinstance(world_data, dict):
-                    for area, places in world_data.items():
-                        if isinstance(places, dict) and current_location_name in places:
-                            space_def = places[current_location_name]
-                            if isinstance(space_def, str) and len(space_def) > 2000: space_def = space_def[:2000] + "\n...（長すぎるため省略）"
-                            break
+                def _build_space_def():
+                    result = "（場所の定義を取得できませんでした）"
+                    world_settings_path = get_world_settings_path(soul_vessel_room)
+                    world_data = utils.parse_world_file(world_settings_path)
+                    if isinstance(world_data, dict):
+                        for area, places in world_data.items():
+                            if isinstance(places, dict) and current_location_name in places:
+                                result = places[current_location_name]
+                                if isinstance(result, str) and len(result) > 2000: result = result[:2000] + "\n...（長すぎるため省略）"
+                                break
+                    return result
+
+                space_def = context_fragments.get(
+                    soul_vessel_room, "space_def",
+                    [os.path.join(constants.ROOMS_DIR, soul_vessel_room, "spaces", "world_settings.txt")],
+                    _build_space_def, key=current_location_name, report=fragment_report,
+                )
             situation_prompt_parts.extend([
                 "【現在の状況】", f"- 現在時刻: {current_datetime_str}", f"- 季節: {season_ja}", f"- 時間帯: {time_of_day_ja}\n",
                 "【現在の場所と情景】", f"- 場所: {location_display_name}", f"- 今の情景: {scenery_text}",
@@ -784,16 +732,25 @@ def context_generator_node(state: AgentState):
             ])
     situation_prompt = "\n".join(situation_prompt_parts)
 
-    char_prompt_path = os.path.join(constants.ROOMS_DIR, room_name, "SystemPrompt.txt")
-    core_memory_path = os.path.join(constants.ROOMS_DIR, room_name, "core_memory.txt")
-    character_prompt = ""; core_memory = ""; notepad_section = ""
-    if os.path.exists(char_prompt_path):
-        with open(char_prompt_path, 'r', encoding='utf-8') as f: character_prompt = f.read().strip()
+    char_prompt_path = os.path.join(room_dir, "SystemPrompt.txt")
+    core_memory_path = os.path.join(room_dir, "core_memory.txt")
+    notes_dir = os.path.join(room_dir, constants.NOTES_DIR_NAME)
+    room_config_path = os.path.join(room_dir, "room_config.json")
+
+    def _read_stripped(path):
+        if not os.path.exists(path): return ""
+        with open(path, 'r', encoding='utf-8') as f: return f.read().strip()
+
+    core_memory = ""; notepad_section = ""
+    character_prompt = context_fragments.get(
+        room_name, "character_prompt", [char_prompt_path], lambda: _read_stripped(char_prompt_path), report=fragment_report
+    )
     if state.get("send_core_memory", True):
-        if os.path.exists(core_memory_path):
-            with open(core_memory_path, 'r', encoding='utf-8') as f: core_memory = f.read().strip()
+        core_memory = context_fragments.get(
+            room_name, "core_memory", [core_memory_path], lambda: _read_stripped(core_memory_path), report=fragment_report
+        )
     if state.get("send_notepad", True):
-        try:
+        def _build_notepad_section():
             from room_manager import get_room_files_paths
             _, _, _, _, _, notepad_path, _ = get_room_files_paths(room_name)
             if notepad_path and os.path.exists(notepad_path):
@@ -801,13 +758,18 @@ def context_generator_node(state: AgentState):
                     content = f.read().strip()
                     notepad_content = content if content else "（メモ帳は空です）"
             else: notepad_content = "（メモ帳ファイルが見つかりません）"
-            notepad_section = f"\n### 短期記憶（メモ帳）\n{notepad_content}\n"
+            return f"\n### 短期記憶（メモ帳）\n{notepad_content}\n"
+
+        try:
+            notepad_section = context_fragments.get(
+                room_name, "notepad", [os.path.join(notes_dir, constants.NOTEPAD_FILENAME)],
+                _build_notepad_section, report=fragment_report,
+            )
         except Exception as e:
             print(f"--- 警告: メモ帳の読み込み中にエラー: {e}")
             notepad_section = "\n### 短期記憶（メモ帳）\n（メモ帳の読み込み中にエラーが発生しました）\n"
 
-    research_notes_section = ""
-    try:
+    def _build_research_notes_section():
         from room_manager import get_room_files_paths
         _, _, _, _, _, _, research_notes_path = get_room_files_paths(room_name)
         if research_notes_path and os.path.exists(research_notes_path):
@@ -829,7 +791,14 @@ def context_generator_node(state: AgentState):
             else:
                 research_notes_content = "（研究ノートにトピックが定義されていません）"
         else: research_notes_content = "（研究ノートファイルが見つかりません）"
-        research_notes_section = f"\n### 研究・分析ノート（目次）\n{research_notes_content}\n"
+        return f"\n### 研究・分析ノート（目次）\n{research_notes_content}\n"
+
+    research_notes_section = ""
+    try:
+        research_notes_section = context_fragments.get(
+            room_name, "research_notes", [os.path.join(notes_dir, constants.RESEARCH_NOTES_FILENAME)],
+            _build_research_notes_section, report=fragment_report,
+        )
     except Exception as e:
         print(f"--- 警告: 研究ノートの読み込み中にエラー: {e}")
         research_notes_section = "\n### 研究・分析ノート\n（研究ノートの読み込み中にエラーが発生しました）\n"
@@ -837,27 +806,44 @@ def context_generator_node(state: AgentState):
     # --- ワーキングメモリ（アクティブスロット）の注入 ---
     working_memory_section = ""
     try:
-        from tools.working_memory_tools import _get_wm_path
-        active_slot = room_manager.get_active_working_memory_slot(room_name)
-        wm_path = _get_wm_path(room_name, active_slot)
-        if os.path.exists(wm_path):
-            with open(wm_path, 'r', encoding='utf-8') as f:
-                wm_content = f.read().strip()
-            if wm_content:
-                working_memory_section = (
-                    f"\n### ワーキングメモリ（スロット: {active_slot}）\n"
-                    f"{wm_content}\n"
-                )
-                print(f"  - [Working Memory] スロット '{active_slot}' の内容を注入しました。")
+        from tools.working_memory_tools import _get_wm_dir, _get_wm_path
+
+        def _build_working_memory_section():
+            active_slot = room_manager.get_active_working_memory_slot(room_name)
+            wm_path = _get_wm_path(room_name, active_slot)
+            if os.path.exists(wm_path):
+                with open(wm_path, 'r', encoding='utf-8') as f:
+                    wm_content = f.read().strip()
+                if wm_content:
+                    print(f"  - [Working Memory] スロット '{active_slot}' の内容を注入しました。")
+                    return (
+                        f"\n### ワーキングメモリ（スロット: {active_slot}）\n"
+                        f"{wm_content}\n"
+                    )
+            return ""
+
+        # アクティブスロットは room_config.json にあるため、スロットの切り替えも設定ファイルの更新で検知する
+        working_memory_section = context_fragments.get(
+            room_name, "working_memory",
+            [room_config_path] + context_fragments.dir_files(_get_wm_dir(room_name), "*" + constants.WORKING_MEMORY_EXTENSION),
+            _build_working_memory_section, report=fragment_report,
+        )
     except Exception as e:
         print(f"  - [Working Memory] 読み込みエラー: {e}")
 
+    def _get_room_overrides():
+        # 返り値はキャッシュ本体なので、呼び出し側で変更しないこと
+        return context_fragments.get(
+            room_name, "room_overrides", [room_config_path],
+            lambda: (room_manager.get_room_config(room_name) or {}).get("override_settings", {}),
+            report=fragment_report,
+        )
+
     # --- [Phase 2] Twitter設定の共通取得とマニュアル調整 ---
     twitter_mode_manual_text = ""
     is_twitter_enabled = False
     try:
-        room_config = room_manager.get_room_config(room_name) or {}
-        overrides = room_config.get("override_settings", {})
+        overrides = _get_room_overrides()
         twitter_settings = overrides.get("twitter_settings", {})
         is_twitter_enabled = twitter_settings.get("enabled", False)
 
@@ -979,18 +965,26 @@ def context_generator_node(state: AgentState):
             today_str = datetime.now().strftime('%Y-%m-%d')
 
             # 3. エピソード記憶マネージャーから要約を取得
-            manager = EpisodicMemoryManager(room_name)
-            episodic_text = manager.get_episodic_context(today_str, lookback_days)
-
-            if episodic_text:
-                episodic_memory_section = (
-                    f"\n### エピソード記憶（中期記憶: 過去{lookback_days}日間）\n"
-                    f"以下は、現在の会話ログより前の出来事の要約です。文脈として参照してください。\n"
-                    f"{episodic_text}\n"
-                )
-                print(f"  - [Episodic Memory] 過去{lookback_days}日間の記憶を注入しました。")
-            else:
+            def _build_episodic_memory_section():
+                manager = EpisodicMemoryManager(room_name)
+                episodic_text = manager.get_episodic_context(today_str, lookback_days)
+
+                if episodic_text:
+                    print(f"  - [Episodic Memory] 過去{lookback_days}日間の記憶を注入しました。")
+                    return (
+                        f"\n### エピソード記憶（中期記憶: 過去{lookback_days}日間）\n"
+                        f"以下は、現在の会話ログより前の出来事の要約です。文脈として参照してください。\n"
+                        f"{episodic_text}\n"
+                    )
                 print(f"  - [Episodic Memory] 注入対象の期間に記憶がありませんでした。")
+                return ""
+
+            memory_dir = os.path.join(room_dir, "memory")
+            episodic_memory_section = context_fragments.get(
+                room_name, "episodic_memory",
+                [os.path.join(memory_dir, "episodic_memory.json")] + context_fragments.dir_files(os.path.join(memory_dir, "episodic")),
+                _build_episodic_memory_section, key=(today_str, lookback_days), report=fragment_report,
+            )
 
         except Exception as e:
             print(f"  - [Episodic Memory Error] 注入処理中にエラー: {e}")
@@ -1002,17 +996,26 @@ def context_generator_node(state: AgentState):
     dream_insights_text = ""
 
     if enable_self_awareness:
-        try:
+        def _build_dream_insights_text():
             # APIキーが必要だが、context_generator_nodeにはstate['api_key']がある
             dm = DreamingManager(room_name, state['api_key'])
             # 最新1件の「指針」のみを取得（コスト最適化）
             recent_insights = dm.get_recent_insights_text(limit=1)
 
             if recent_insights:
-                dream_insights_text = (
+                return (
                     f"\n### 深層意識（今日の指針）\n"
                     f"{recent_insights}\n"
                 )
+            return ""
+
+        try:
+            memory_dir = os.path.join(room_dir, "memory")
+            dream_insights_text = context_fragments.get(
+                room_name, "dream_insights",
+                [os.path.join(memory_dir, "insights.json")] + context_fragments.dir_files(os.path.join(memory_dir, "dreaming")),
+                _build_dream_insights_text, report=fragment_report,
+            )
         except Exception as e:
             print(f"  - [Context] 夢想データの読み込みエラー: {e}")
             dream_insights_text = ""
@@ -1020,8 +1023,10 @@ def context_generator_node(state: AgentState):
         # --- [Goal Memory] 目標の注入 ---
         goals_text = ""
         try:
-            gm = GoalManager(room_name)
-            goals_text = gm.get_goals_for_prompt()
+            goals_text = context_fragments.get(
+                room_name, "goals", [os.path.join(room_dir, "goals.json")],
+                lambda: GoalManager(room_name).get_goals_for_prompt(), report=fragment_report,
+            )
             if goals_text:
                 dream_insights_text += f"\n\n{goals_text}\n"
         except Exception as e:
@@ -1111,8 +1116,8 @@ def context_generator_node(state: AgentState):
 
     custom_tool_catalog_text = "現在有効な拡張ツールはありません。"
     try:
-        from agent.tool_registry import ToolRegistry
-        registry = ToolRegistry(all_tools)
+        from agent import tool_catalog
+        registry = tool_catalog.get_registry(all_tools)
         custom_tool_catalog_text = registry.get_custom_tool_catalog()
         current_tools = registry.select_tools_for_turn(
             room_name=room_name,
@@ -1153,8 +1158,7 @@ def context_generator_node(state: AgentState):
 
     # 自律行動ツールフィルタリング
     try:
-        _cfg = room_manager.get_room_config(room_name) or {}
-        _auto_settings = _cfg.get("override_settings", {}).get("autonomous_settings", {})
+        _auto_settings = _get_room_overrides().get("autonomous_settings", {})
         if not _auto_settings.get("allow_schedule_tool", True):
             auto_tools = ["schedule_next_action", "cancel_action_plan"]
             current_tools = [t for t in current_tools if t.name not in auto_tools]
@@ -1277,8 +1281,7 @@ def context_generator_node(state: AgentState):
     twitter_posting_guidelines = ""
     autonomous_guidelines = ""
     try:
-        _cfg = room_manager.get_room_config(room_name) or {}
-        _overrides = _cfg.get("override_settings", {})
+        _overrides = _get_room_overrides()
         _tw_settings = _overrides.get("twitter_settings", {})
         _auto_settings = _overrides.get("autonomous_settings", {})
 
@@ -1429,6 +1432,7 @@ def context_generator_node(state: AgentState):
     print(f"  - [Size Log] dreams: {len(dream_insights_text)} chars")
     print(f"  - [Size Log] tools_list: {len(tools_list_str)} chars")
 
+    print(f"--- [PERF] context fragments: {fragment_report.summary()} ---")
     print(f"--- [PERF] context_generator_node total: {time.time() - perf_start:.4f}s ---")
     return {
         "system_prompt": SystemMessage(content=final_system_prompt_text),
@@ -1447,6 +1451,12 @@ def agent_node(state: AgentState):
     loop_count = state.get("loop_count", 0)
     print(f"  - 現在の再思考ループカウント: {loop_count}")
 
+    # 並列ステージ（コンテキスト生成 / 事前検索）の所要時間を報告（初回ループのみ）
+    stage_timings = state.get("stage_timings") or {}
+    if loop_count == 0 and stage_timings:
+        timing_str = ", ".join(f"{name}={sec:.4f}s" for name, sec in stage_timings.items())
+        print(f"--- [PERF] parallel stages: {timing_str} (wall≈{max(stage_timings.values()):.4f}s) ---")
+
     # 1. プロンプト準備
     base_system_prompt_text = state['system_prompt'].content
 
@@ -1666,8 +1676,8 @@ def agent_node(state: AgentState):
     # --- ツール動的制限の適用 (ToolRegistry) ---
     if state.get('tool_use_enabled', True):
         try:
-            from agent.tool_registry import ToolRegistry
-            registry = ToolRegistry(all_tools)
+            from agent import tool_catalog
+            registry = tool_catalog.get_registry(all_tools)
             is_roblox_active = state.get('is_roblox_active', False)
 
             # ToolRegistry は内部で is_room_active を呼ぶが、
@@ -1722,11 +1732,13 @@ def agent_node(state: AgentState):
                 if state.get("debug_mode", False):
                     print("  - [Tool Limit] Roblox tools filtered due to disconnection.")
 
+            # 同じモデル・同じツール集合ならスキーマの生成と bind をやり直さない
+            llm_or_llm_with_tools, bind_info = tool_catalog.get_bound_model(llm, current_tools)
+            bind_detail = "reused" if bind_info["reused"] else f"schemas built: {bind_info['schemas_built']}/{len(current_tools)}"
+            print(f"--- [PERF] agent_node bind_tools: {bind_info['sec']:.4f}s ({bind_detail}) ---")
             if "zhipu" in state.get('model_name', "").lower():
-                llm_or_llm_with_tools = llm.bind_tools(current_tools)
                 print("  - ツール使用モード: 有効 (Zhipu: Parallel Tools Disabled) [Dynamic]")
             else:
-                llm_or_llm_with_tools = llm.bind_tools(current_tools)
                 print(f"  - ツール使用モード: 有効 [Dynamic: {len(current_tools)} tools]")
         except Exception as e:
             print(f"  - [ToolRegistry Error] ツール登録エラー: {e}")
@@ -2608,8 +2620,8 @@ def _execute_single_tool_inner(state: AgentState, tool_call: dict, current_signa
             except Exception: api_key_name = None
             tool_args['api_key_name'] = api_key_name
 
-        from agent.tool_registry import ToolRegistry
-        registry = ToolRegistry(all_tools)
+        from agent import tool_catalog
+        registry = tool_catalog.get_registry(all_tools)
         # 登録されている全ツール（カスタムツール含む）のマップから検索
         selected_tool = registry._all_tools_map.get(tool_name)
 
@@ -2898,12 +2910,66 @@ def _execute_single_tool_inner(state: AgentState, tool_call: dict, current_signa
 
     return tool_msg
 
+# 同一ターン内で並列実行する読み取り専用ツールの最大同時実行数
+TOOL_PARALLEL_MAX_WORKERS = 4
+
+# 状態を変更するツールをルーム単位で直列化するためのロック
+_room_tool_locks: Dict[str, threading.Lock] = {}
+_room_tool_locks_guard = threading.Lock()
+
+def _get_room_tool_lock(room_name: str) -> threading.Lock:
+    with _room_tool_locks_guard:
+        if room_name not in _room_tool_locks:
+            _room_tool_locks[room_name] = threading.Lock()
+        return _room_tool_locks[room_name]
+
+def _execute_tool_call(state: AgentState, last_message: AIMessage, tool_call: dict, current_signature: str) -> ToolMessage:
+    """単一のツールコールを実行し、例外も含めて必ず ToolMessage を返す。"""
+    tool_name = tool_call["name"]
+    try:
+        # Roblox Build の場合はサブエージェントに横流し
+        if tool_name == "roblox_build":
+            from agent.sub_agent_node import sub_agent_executor
+            import copy
+            fake_last_message = copy.deepcopy(last_message)
+            fake_last_message.tool_calls = [tool_call]
+            fake_state = {
+                "messages": [fake_last_message],
+                "room_name": state.get('room_name'),
+                "model_name": state.get('model_name'),
+                "api_key": state.get('api_key')
+            }
+
+            tool_msg_dict = sub_agent_executor(fake_state)
+            tool_msg_list = tool_msg_dict.get("messages", [])
+
+            if tool_msg_list:
+                tool_msg = tool_msg_list[0]
+                tool_msg.tool_call_id = tool_call["id"]
+                return tool_msg
+            return ToolMessage(content="サブエージェント委譲に失敗しました。", tool_call_id=tool_call["id"], name=tool_name)
+
+        return _execute_single_tool_inner(state, tool_call, current_signature)
+    except Exception as e:
+        print(f"  - ツール実行全体エラー ({tool_name}): {e}")
+        import traceback
+        traceback.print_exc()
+        return ToolMessage(content=f"Error processing tool_call {tool_name}: {e}", tool_call_id=tool_call["id"], name=tool_name)
+
 def safe_tool_executor(state: AgentState):
     """
     AIのツール呼び出しを仲介し、計画されたファイル編集タスクを実行する。
-    LLMが1ターンに複数のツールを要請した場合、ここでループ処理して一括で応答を返す。
+    LLMが1ターンに複数のツールを要請した場合、ここでまとめて処理して一括で応答を返す。
+
+    【並列実行】
+    連続する読み取り専用ツール（ToolRegistry.is_parallel_safe）はスレッドプールで同時に実行する。
+    状態を変更するツールはその位置で区切りとなり、ルーム単位のロックの下で1つずつ実行する
+    （「編集してから読む」といった順序依存を崩さないため）。
+    ToolMessage は常に元の tool_calls の順序で返す。
     """
     import signature_manager
+    import concurrent.futures
+    from agent.tool_registry import ToolRegistry
 
     print("--- ツール実行ノード (safe_tool_executor) 実行 ---")
     last_message = state['messages'][-1]
@@ -2912,42 +2978,34 @@ def safe_tool_executor(state: AgentState):
 
     # --- [Dual-State] 最新の署名を取得 ---
     current_signature = signature_manager.get_thought_signature(state.get('room_name', ''))
-
-    tool_messages = []
-
-    for tool_call in last_message.tool_calls:
-        tool_name = tool_call["name"]
-        try:
-            # Roblox Build の場合はサブエージェントに横流し
-            if tool_name == "roblox_build":
-                from agent.sub_agent_node import sub_agent_executor
-                import copy
-                fake_last_message = copy.deepcopy(last_message)
-                fake_last_message.tool_calls = [tool_call]
-                fake_state = {
-                    "messages": [fake_last_message],
-                    "room_name": state.get('room_name'),
-                    "model_name": state.get('model_name'),
-                    "api_key": state.get('api_key')
-                }
-
-                tool_msg_dict = sub_agent_executor(fake_state)
-                tool_msg_list = tool_msg_dict.get("messages", [])
-
-                if tool_msg_list:
-                    tool_msg = tool_msg_list[0]
-                    tool_msg.tool_call_id = tool_call["id"]
-                    tool_messages.append(tool_msg)
-                else:
-                    tool_messages.append(ToolMessage(content="サブエージェント委譲に失敗しました。", tool_call_id=tool_call["id"], name=tool_name))
-            else:
-                msg = _execute_single_tool_inner(state, tool_call, current_signature)
-                tool_messages.append(msg)
-        except Exception as e:
-            print(f"  - ツール実行全体エラー ({tool_name}): {e}")
-            import traceback
-            traceback.print_exc()
-            tool_messages.append(ToolMessage(content=f"Error processing tool_call {tool_name}: {e}", tool_call_id=tool_call["id"], name=tool_name))
+    room_lock = _get_room_tool_lock(state.get('room_name', ''))
+
+    tool_calls = last_message.tool_calls
+    tool_messages: List[Optional[ToolMessage]] = [None] * len(tool_calls)
+
+    def _run_parallel_batch(batch: List[int]):
+        if len(batch) == 1:
+            tool_messages[batch[0]] = _execute_tool_call(state, last_message, tool_calls[batch[0]], current_signature)
+            return
+        print(f"  - [Tool Parallel] 読み取り専用ツール {len(batch)} 件を並列実行: {[tool_calls[i]['name'] for i in batch]}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(TOOL_PARALLEL_MAX_WORKERS, len(batch))) as executor:
+            futures = {executor.submit(_execute_tool_call, state, last_message, tool_calls[i], current_signature): i for i in batch}
+            for future in concurrent.futures.as_completed(futures):
+                tool_messages[futures[future]] = future.result()
+
+    parallel_batch: List[int] = []
+    for i, tool_call in enumerate(tool_calls):
+        if ToolRegistry.is_parallel_safe(tool_call["name"]):
+            parallel_batch.append(i)
+            continue
+        # 状態を変更するツール: 手前の読み取りバッチを完了させてから、ルーム単位で直列に実行
+        if parallel_batch:
+            _run_parallel_batch(parallel_batch)
+            parallel_batch = []
+        with room_lock:
+            tool_messages[i] = _execute_tool_call(state, last_message, tool_call, current_signature)
+    if parallel_batch:
+        _run_parallel_batch(parallel_batch)
 
     return {"messages": tool_messages, "loop_count": state.get("loop_count", 0)}
 
@@ -3134,10 +3192,19 @@ def route_after_agent(state: AgentState) -> Literal["__end__", "safe_tool_node",
     print(f"  - ツール呼び出しなし。Supervisorに制御を戻します。")
     return "supervisor"
 
+def _timed_stage(stage_name: str, node_func):
+    """ノードの所要時間を stage_timings に記録するラッパー（並列ステージの計測用）。"""
+    def wrapper(state: AgentState):
+        stage_start = time.time()
+        result = node_func(state) or {}
+        result["stage_timings"] = {stage_name: time.time() - stage_start}
+        return result
+    return wrapper
+
 workflow = StateGraph(AgentState)
 workflow.add_node("supervisor", supervisor_node)
-workflow.add_node("context_generator", context_generator_node)
-workflow.add_node("retrieval_node", retrieval_node)
+workflow.add_node("context_generator", _timed_stage("context_generator", context_generator_node))
+workflow.add_node("retrieval_node", _timed_stage("retrieval_node", retrieval_node))
 workflow.add_node("agent", agent_node)
 workflow.add_node("safe_tool_node", safe_tool_executor)
 
@@ -3145,16 +3212,17 @@ workflow.add_node("safe_tool_node", safe_tool_executor)
 workflow.set_entry_point("supervisor")
 
 # FINISH -> 終了
-# それ以外 -> そのキャラのコンテキスト生成へ
+# それ以外 -> そのキャラのコンテキスト生成と事前検索を並列に実行
+# (互いの出力に依存しないため、最初のトークンまでの時間は両者の和ではなく max になる)
 def route_supervisor(state):
     if state["next"] == "FINISH":
         return END
-    return "context_generator"
+    return ["context_generator", "retrieval_node"]
 
 workflow.add_conditional_edges("supervisor", route_supervisor)
 
-workflow.add_edge("context_generator", "retrieval_node")
-workflow.add_edge("retrieval_node", "agent")
+# 両ブランチが揃ってから agent へ合流する
+workflow.add_edge(["context_generator", "retrieval_node"], "agent")
 
 # Agent後の分岐: ツール使用 -> ToolNode, 会話終了 -> Supervisorへ戻る
 workflow.add_conditional_edges("agent", route_after_agent, {"safe_tool_node": "safe_tool_node", "supervisor": "supervisor", "__end__": END})
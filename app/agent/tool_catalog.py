@@ -0,0 +1,148 @@
+# agent/tool_catalog.py
+"""
+ツールカタログ（ToolRegistry・ツールスキーマ・ツール付きモデル）のキャッシュ
+
+これまでは1ターンの中で context_generator_node / agent_node / safe_tool_executor がそれぞれ
+ToolRegistry(all_tools) を作り（そのたびにローカルプラグインを読み直し）、agent_node はツール呼び出しの
+ループのたびに llm.bind_tools() で全ツールの JSON スキーマを @tool のシグネチャから作り直していた。
+ここでは
+
+- ToolRegistry: 組み込みツール・config.json の世代・custom_tools/ のファイル・MCPツールのキャッシュが
+  変わらない限り、同じインスタンスを使い回す
+- ツールスキーマ: プロバイダーの形式（OpenAI 互換 / Anthropic）ごとに、ツール1つにつき1度だけ作る
+- ツール付きモデル: (モデルインスタンス, バインド引数, プロバイダー, ツール集合) が同じなら bind 済みのものを返す
+
+モデルインスタンス自体は LLMFactory のクライアントプールで再利用されているため、
+同じ設定・同じツール集合の2回目以降は bind_tools を呼ばずに済む。
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+import config_manager
+
+BOUND_MODEL_CACHE_MAX_ENTRIES = 32
+
+_lock = threading.Lock()
+_registry = None
+_registry_signature = None
+# (プロバイダー形式, ツール名, id(ツール)) -> (ツール, スキーマ)  ※ツールを保持して id の再利用を防ぐ
+_schemas: Dict[Tuple[str, str, int], Tuple[Any, dict]] = {}
+# キー -> (元のモデル, ツール付きモデル)
+_bound_models: "OrderedDict[tuple, Tuple[Any, Any]]" = OrderedDict()
+_stats = {"registry_builds": 0, "schema_builds": 0, "schema_build_sec": 0.0, "bound_hits": 0, "bound_misses": 0}
+
+
+def _custom_tools_signature() -> tuple:
+    """カスタムツールの構成が変わったかを判定する値（config の世代・プラグインファイル・MCPツールのキャッシュ）。"""
+    import custom_tool_manager
+    generation = config_manager.load_config_if_changed()
+    plugin_dir = "custom_tools"
+    plugin_files = []
+    try:
+        for name in sorted(os.listdir(plugin_dir)):
+            if name.endswith(".py"):
+                stat = os.stat(os.path.join(plugin_dir, name))
+                plugin_files.append((name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        pass
+    return generation, tuple(plugin_files), id(custom_tool_manager._MCP_TOOLS_CACHE)
+
+
+def get_registry(all_tools: List[Callable]):
+    """ToolRegistry を返す。ツール構成が前回から変わっていなければ同じインスタンスを使い回す。"""
+    global _registry, _registry_signature
+    from agent.tool_registry import ToolRegistry
+
+    builtin = tuple((t.name, id(t)) for t in all_tools)
+    signature = (builtin, _custom_tools_signature())
+    with _lock:
+        if _registry is not None and _registry_signature == signature:
+            return _registry
+
+    registry = ToolRegistry(all_tools)
+    # 構築中に MCP ツールが読み込まれるとキャッシュの id が変わるため、署名は構築後に取る
+    with _lock:
+        _registry = registry
+        _registry_signature = (builtin, _custom_tools_signature())
+        _stats["registry_builds"] += 1
+        # 読み直しで置き換わったツール（プラグインの更新・MCPの再接続）のスキーマは捨てる
+        live_ids = {id(t) for t in registry.get_all_tools()}
+        for key in [k for k in _schemas if k[2] not in live_ids]:
+            del _schemas[key]
+    return registry
+
+
+def _schema_format(llm: Any) -> str:
+    """モデルの bind_tools が受け付けるスキーマ形式。"""
+    base = getattr(llm, "bound", llm)
+    class_name = type(base).__name__.lower()
+    return "anthropic" if "anthropic" in class_name else "openai"
+
+
+def _build_schema(tool: Any, schema_format: str) -> dict:
+    if schema_format == "anthropic":
+        try:
+            from langchain_anthropic.chat_models import convert_to_anthropic_tool
+            return dict(convert_to_anthropic_tool(tool))
+        except ImportError:
+            pass
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    return convert_to_openai_tool(tool)
+
+
+def get_tool_schemas(tools: List[Any], schema_format: str = "openai") -> Tuple[List[dict], int]:
+    """ツールのスキーマ（bind_tools にそのまま渡せる dict）の一覧と、今回新たに作った数を返す。"""
+    schemas = []
+    built = 0
+    for tool in tools:
+        key = (schema_format, tool.name, id(tool))
+        with _lock:
+            entry = _schemas.get(key)
+        if entry is None:
+            started = time.time()
+            entry = (tool, _build_schema(tool, schema_format))
+            with _lock:
+                _schemas[key] = entry
+                _stats["schema_builds"] += 1
+                _stats["schema_build_sec"] += time.time() - started
+            built += 1
+        schemas.append(entry[1])
+    return schemas, built
+
+
+def get_bound_model(llm: Any, tools: List[Any]) -> Tuple[Any, dict]:
+    """
+    llm.bind_tools(tools) と同じモデルを返す。同じモデル・同じツール集合なら前回のものを使い回す。
+    2つ目の戻り値は [PERF] 表示用の情報 {"sec", "schemas_built", "reused"}。
+    """
+    started = time.time()
+    schema_format = _schema_format(llm)
+    base = getattr(llm, "bound", llm)
+    # llm.bind(...) で包まれている場合（Gemini 3 Flash の AFC 無効化など）は、その引数もキーに含める
+    bind_kwargs = repr(sorted(getattr(llm, "kwargs", {}).items())) if base is not llm else ""
+    key = (config_manager.CONFIG_GENERATION, id(base), bind_kwargs, schema_format, tuple((t.name, id(t)) for t in tools))
+    with _lock:
+        entry = _bound_models.get(key)
+        if entry is not None:
+            _bound_models.move_to_end(key)
+            _stats["bound_hits"] += 1
+            return entry[1], {"sec": time.time() - started, "schemas_built": 0, "reused": True}
+
+    schemas, built = get_tool_schemas(tools, schema_format)
+    bound = llm.bind_tools(schemas)
+    with _lock:
+        _bound_models[key] = (llm, bound)
+        while len(_bound_models) > BOUND_MODEL_CACHE_MAX_ENTRIES:
+            _bound_models.popitem(last=False)
+        _stats["bound_misses"] += 1
+    return bound, {"sec": time.time() - started, "schemas_built": built, "reused": False}
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats, schema_build_sec=round(_stats["schema_build_sec"], 4),
+                    schemas=len(_schemas), bound_models=len(_bound_models))
@@ -1,6 +1,9 @@
+import os
 import json
 import re
+import threading
 import config_manager
+import constants
 from typing import List, Callable, Dict, Optional, Set
 import tools.roblox_webhook as roblox_webhook
 import room_manager
@@ -10,9 +13,34 @@ class ToolRegistry:
     ツールの動的登録・カテゴリ管理を行うクラス。
     ルーム設定やシステム状態に応じて、最適なツールセットをAIに提供します。
     """
-    
+
+    # 読み取り専用で、同一ターン内の他のツールと並列実行しても安全なツール。
+    # ここに無いツール（plan_* 系の編集、アラーム設定、アイテム操作、カスタム/MCPツール等）は
+    # 状態を変更しうるものとして扱い、ルーム単位で直列に実行する。
+    # Twitter の取得系ツールは確認履歴のログを書き換え、ブラウザのセッションも1つしか持てないため含めない。
+    PARALLEL_SAFE_TOOL_NAMES = frozenset([
+        "list_available_locations", "read_world_settings",
+        "recall_memories", "search_past_conversations", "read_memory_context",
+        "read_identity_memory", "read_diary_memory", "read_secret_diary",
+        "read_full_notepad", "read_working_memory", "list_working_memories",
+        "read_creative_notes", "read_research_notes",
+        "web_search_tool", "read_url_tool",
+        "view_past_image",
+        "search_knowledge_base",
+        "read_entity_memory", "list_entity_memories", "search_entity_memory",
+        "read_current_plan",
+        "get_watchlist",
+        "list_my_items", "list_location_items", "examine_item",
+        "read_board_state", "get_legal_moves",
+        "list_project_files", "read_project_file",
+    ])
+
     def __init__(self, all_tools_list: List[Callable]):
         self._all_tools_map = {t.name: t for t in all_tools_list}
+        # get_active_tools の結果 {(ルーム名, room_config.json の mtime, Roblox接続状態): ツール名のリスト}
+        # （インスタンスは agent.tool_catalog で使い回されるため、ルーム設定の変更はキーで検知する）
+        self._active_names_cache: Dict[tuple, List[str]] = {}
+        self._active_names_lock = threading.Lock()
         
         # 基本ツール（常時有効）
         self.CORE_TOOL_NAMES = [
@@ -109,6 +137,12 @@ class ToolRegistry:
         """
         if not tool_use_enabled:
             return []
+
+        cache_key = self._active_names_cache_key(room_name)
+        with self._active_names_lock:
+            cached_names = self._active_names_cache.get(cache_key)
+        if cached_names is not None:
+            return [self._all_tools_map[name] for name in cached_names]
             
         active_names = list(self.CORE_TOOL_NAMES)
         
@@ -133,7 +167,17 @@ class ToolRegistry:
                 active_names.append(t.name)
         
         # 存在するツールのみを抽出
-        return [self._all_tools_map[name] for name in active_names if name in self._all_tools_map]
+        active_names = [name for name in active_names if name in self._all_tools_map]
+        with self._active_names_lock:
+            self._active_names_cache[cache_key] = active_names
+        return [self._all_tools_map[name] for name in active_names]
+
+    def _active_names_cache_key(self, room_name: str) -> tuple:
+        try:
+            config_mtime = os.stat(os.path.join(constants.ROOMS_DIR, room_name or "", "room_config.json")).st_mtime_ns
+        except OSError:
+            config_mtime = None
+        return room_name, config_mtime, roblox_webhook.is_room_active(room_name)
 
     def select_tools_for_turn(
         self,
@@ -302,5 +346,10 @@ class ToolRegistry:
             lines.append(f"- 他 {remaining} 件の拡張ツールがあります。必要なら `custom` を要求してください。")
         return "\n".join(lines)
 
+    @classmethod
+    def is_parallel_safe(cls, tool_name: str) -> bool:
+        """同一ターン内で他のツールと並列実行してよい（読み取り専用の）ツールか判定する。"""
+        return tool_name in cls.PARALLEL_SAFE_TOOL_NAMES
+
     def is_custom_tool(self, tool_name: str) -> bool:
         return tool_name in self.CUSTOM_TOOL_NAMES
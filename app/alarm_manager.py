@@ -4,8 +4,8 @@ import os
 import json
 import uuid
 import threading
-import schedule
 import time
+import functools
 import datetime
 import traceback
 import requests
@@ -16,6 +16,8 @@ import gemini_api
 import utils
 import re
 import dreaming_manager
+import job_scheduler
+import sleep_consolidation
 from typing import Any, List, Dict
 
 import sys
@@ -99,6 +101,8 @@ def save_data_to_file():
             json.dump(alarms_data_global, f, indent=2, ensure_ascii=False)
     except Exception as e:
         print(f"アラーム・タイマー保存エラー: {e}")
+        return
+    job_scheduler.notify("alarms_changed")
 
 def save_alarms():
     """アラームリストの変更を保存する（互換性用ラッパー）"""
@@ -1019,198 +1023,128 @@ def check_alarms():
 
 def check_autonomous_actions():
     """全ルームの動機モデルをチェックし、必要なら自律行動または夢想をトリガーする"""
-    from motivation_manager import MotivationManager
-
     all_rooms = room_manager.get_room_list_for_ui()
     now = datetime.datetime.now()
 
     for _, room_folder in all_rooms:
-        try:
-            effective_settings = config_manager.get_effective_settings(room_folder)
-            auto_settings = effective_settings.get("autonomous_settings", {})
-            
-            is_enabled = auto_settings.get("enabled", False)
-            if not is_enabled:
-                continue 
+        _check_autonomous_action_for_room(room_folder, now)
+
+def _check_autonomous_action_for_room(room_folder: str, now: datetime.datetime):
+    """1ルーム分の自律行動チェック（check_autonomous_actions とスケジューラのルーム別ジョブから呼ばれる）"""
+    from motivation_manager import MotivationManager
+
+    try:
+        effective_settings = config_manager.get_effective_settings(room_folder)
+        auto_settings = effective_settings.get("autonomous_settings", {})
+        
+        is_enabled = auto_settings.get("enabled", False)
+        if not is_enabled:
+            return 
 
-            # --- 動機モデルによる判定 ---
-            mm = MotivationManager(room_folder)
-            should_contact, motivation_log = mm.should_initiate_contact()
+        # --- 動機モデルによる判定 ---
+        mm = MotivationManager(room_folder)
+        should_contact, motivation_log = mm.should_initiate_contact()
+        
+        # 既存の「無操作時間」判定も併用（夢想トリガー用）
+        last_active = utils.get_last_log_timestamp(room_folder)
+        inactivity_limit = auto_settings.get("inactivity_minutes", 120)
+        elapsed_minutes = (now - last_active).total_seconds() / 60
+        
+        # 動機モデルまたは無操作時間のいずれかで発火
+        should_trigger = should_contact or elapsed_minutes >= inactivity_limit
+        
+        if should_trigger:
+            # 重複発火防止チェック: 最低でも MIN_AUTONOMOUS_INTERVAL_MINUTES 分は間隔を空ける
+            # auto_settings 内に個別の inactivity_minutes があればそれを使用、なければ定数を使用
+            cooldown_minutes = auto_settings.get("inactivity_minutes", constants.MIN_AUTONOMOUS_INTERVAL_MINUTES)
             
-            # 既存の「無操作時間」判定も併用（夢想トリガー用）
-            last_active = utils.get_last_log_timestamp(room_folder)
-            inactivity_limit = auto_settings.get("inactivity_minutes", 120)
-            elapsed_minutes = (now - last_active).total_seconds() / 60
+            # 【修正】常に永続化データから最新の値を読む（ui_handlers.pyでのリセットを反映するため）
+            last_trigger = mm.get_last_autonomous_trigger()
             
-            # 動機モデルまたは無操作時間のいずれかで発火
-            should_trigger = should_contact or elapsed_minutes >= inactivity_limit
+            if last_trigger:
+                minutes_since_trigger = (now - last_trigger).total_seconds() / 60
+                if minutes_since_trigger < cooldown_minutes:
+                    # クールダウン中のスキップはログ出力（想定外の頻繁発火の兆候を検知）
+                    print(f"  ⏳ {room_folder}: クールダウン中 ({minutes_since_trigger:.0f}分/{cooldown_minutes}分) - スキップ")
+                    return  # まだ間隔が空いていないのでスキップ
             
-            if should_trigger:
-                # 重複発火防止チェック: 最低でも MIN_AUTONOMOUS_INTERVAL_MINUTES 分は間隔を空ける
-                # auto_settings 内に個別の inactivity_minutes があればそれを使用、なければ定数を使用
-                cooldown_minutes = auto_settings.get("inactivity_minutes", constants.MIN_AUTONOMOUS_INTERVAL_MINUTES)
-                
-                # 【修正】常に永続化データから最新の値を読む（ui_handlers.pyでのリセットを反映するため）
-                last_trigger = mm.get_last_autonomous_trigger()
+            quiet_start = auto_settings.get("quiet_hours_start", "00:00")
+            quiet_end = auto_settings.get("quiet_hours_end", "07:00")
+            is_quiet = utils.is_in_quiet_hours(quiet_start, quiet_end)
+
+            
+            if is_quiet:
+                # --- [Project Morpheus] 夢想モード ---
+                # 通知禁止時間帯は「睡眠時間」とみなし、夢を見るか、静観するかを判断する
                 
-                if last_trigger:
-                    minutes_since_trigger = (now - last_trigger).total_seconds() / 60
-                    if minutes_since_trigger < cooldown_minutes:
-                        # クールダウン中のスキップはログ出力（想定外の頻繁発火の兆候を検知）
-                        print(f"  ⏳ {room_folder}: クールダウン中 ({minutes_since_trigger:.0f}分/{cooldown_minutes}分) - スキップ")
-                        continue  # まだ間隔が空いていないのでスキップ
+                # ルームごとの処理開始時に、最新の有効なAPIキー（名称）を再取得する
+                current_api_key = config_manager.get_active_gemini_api_key_name(room_folder)
                 
-                quiet_start = auto_settings.get("quiet_hours_start", "00:00")
-                quiet_end = auto_settings.get("quiet_hours_end", "07:00")
-                is_quiet = utils.is_in_quiet_hours(quiet_start, quiet_end)
+                # APIキーの実体を取得
+                api_key_val = config_manager.GEMINI_API_KEYS.get(current_api_key)
+                if not api_key_val: return
 
+                dm = dreaming_manager.DreamingManager(room_folder, api_key_val)
                 
-                if is_quiet:
-                    # --- [Project Morpheus] 夢想モード ---
-                    # 通知禁止時間帯は「睡眠時間」とみなし、夢を見るか、静観するかを判断する
-                    
-                    # ルームごとの処理開始時に、最新の有効なAPIキー（名称）を再取得する
-                    current_api_key = config_manager.get_active_gemini_api_key_name(room_folder)
-                    
-                    # APIキーの実体を取得
-                    api_key_val = config_manager.GEMINI_API_KEYS.get(current_api_key)
-                    if not api_key_val: continue
-
-                    dm = dreaming_manager.DreamingManager(room_folder, api_key_val)
-                    
-                    # 今日（日付変更後）すでに夢を見たかチェック
-                    # _load_insights はリストの先頭が最新であることを前提とする
-                    insights = dm._load_insights()
-                    has_dreamed_today = False
-                    
-                    if insights:
-                        last_dream_str = insights[0].get("created_at", "")
-                        if last_dream_str:
-                            try:
-                                last_dream_date = datetime.datetime.strptime(last_dream_str, '%Y-%m-%d %H:%M:%S').date()
-                                if last_dream_date == now.date():
-                                    has_dreamed_today = True
-                            except ValueError:
-                                pass
-                    
-                    if not has_dreamed_today:
-                        print(f"💤 {room_folder}: 深い眠りにつきました（夢想プロセス開始）...")
+                # 今日（日付変更後）すでに夢を見たかチェック
+                # _load_insights はリストの先頭が最新であることを前提とする
+                insights = dm._load_insights()
+                has_dreamed_today = False
+                
+                if insights:
+                    last_dream_str = insights[0].get("created_at", "")
+                    if last_dream_str:
                         try:
-                            # 自動レベル判定: 週次/月次省察が必要か自動判定
-                            result = dm.dream_with_auto_level()
-                            if result and ("エラー" in result or "失敗" in result):
-                                print(f"  ❌ {room_folder}: 夢想プロセスがエラーで終了しました: {result}")
-                                has_dreamed_now = False
-                            else:
-                                print(f"  ✅ {room_folder}: 夢の中での省察が完了しました。")
-                                has_dreamed_now = True
-                        except Exception as e:
-                            print(f"  ❌ {room_folder}: 夢想プロセス中に致命的なエラーが発生しました: {e}")
-                            traceback.print_exc()
-                            has_dreamed_now = False # 失敗したが、睡眠 consolidation 自体は続行
-                        
-                        # --- 睡眠時記憶整理 ---
-                        sleep_consolidation = effective_settings.get("sleep_consolidation", {})
-                        
-                        if sleep_consolidation.get("update_episodic_memory", True):
-                            print(f"  🌙 {room_folder}: エピソード記憶を更新中...")
-                            try:
-                                from episodic_memory_manager import EpisodicMemoryManager
-                                em = EpisodicMemoryManager(room_folder)
-                                # 日次要約でエピソード記憶を生成
-                                em_result = em.update_memory(api_key_val)
-                                print(f"  ✅ {room_folder}: {em_result}")
-                                # 更新日時をroom_config.jsonに保存
-                                status_text = f"最終更新: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                                room_manager.update_room_config(room_folder, {"last_episodic_update": status_text})
-                            except Exception as e:
-                                print(f"  ❌ {room_folder}: エピソード記憶更新エラー - {e}")
-                        
-                        if sleep_consolidation.get("update_memory_index", True):
-                            print(f"  🌙 {room_folder}: 記憶索引を更新中...")
-                            try:
-                                import rag_manager
-                                rm = rag_manager.RAGManager(room_folder, api_key_val)
-                                rm_result = rm.update_memory_index()
-                                print(f"  ✅ {room_folder}: {rm_result}")
-                            except Exception as e:
-                                print(f"  ❌ {room_folder}: 記憶索引更新エラー - {e}")
-                        
-                        if sleep_consolidation.get("update_current_log_index", True):
-                            print(f"  🌙 {room_folder}: 現行ログ索引を更新中...")
-                            try:
-                                import rag_manager
-                                from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-                                
-                                def run_current_log_index_update():
-                                    rm = rag_manager.RAGManager(room_folder, api_key_val)
-                                    result = None
-                                    for batch_num, total_batches, status in rm.update_current_log_index_with_progress():
-                                        if batch_num == total_batches:
-                                            result = status
-                                    return result
-                                
-                                # タイムアウト付きで実行（最大10分）
-                                with ThreadPoolExecutor(max_workers=1) as executor:
-                                    future = executor.submit(run_current_log_index_update)
-                                    try:
-                                        result = future.result(timeout=600)  # 10分
-                                        if result:
-                                            print(f"  ✅ {room_folder}: {result}")
-                                    except FuturesTimeoutError:
-                                        print(f"  ⚠️ {room_folder}: 現行ログ索引更新がタイムアウトしました（10分経過）。次回に再試行します。")
-                            except Exception as e:
-                                print(f"  ❌ {room_folder}: 現行ログ索引更新エラー - {e}")
-
-                        
-
-                        
-                        if sleep_consolidation.get("compress_old_episodes", True):
-                            print(f"  🌙 {room_folder}: 古いエピソード記憶を圧縮中...")
-                            try:
-                                from episodic_memory_manager import EpisodicMemoryManager
-                                emm = EpisodicMemoryManager(room_folder)
-                                # 週次圧縮
-                                compress_result = emm.compress_old_episodes(api_key_val)
-                                print(f"  ✅ {room_folder}: {compress_result}")
-                                # 月次圧縮
-                                monthly_result = emm.compress_weekly_to_monthly(api_key_val)
-                                print(f"  ✅ {room_folder}: {monthly_result}")
-                                # 圧縮結果をroom_config.jsonに保存
-                                room_manager.update_room_config(room_folder, {
-                                    "last_compression_result": f"{compress_result} / {monthly_result}"
-                                })
-                            except Exception as e:
-                                print(f"  ❌ {room_folder}: エピソード圧縮エラー - {e}")
-                        
-                        print(f"🛌 {room_folder}: 睡眠時記憶整理プロセスの呼び出しを完了しました。")
-                        
+                            last_dream_date = datetime.datetime.strptime(last_dream_str, '%Y-%m-%d %H:%M:%S').date()
+                            if last_dream_date == now.date():
+                                has_dreamed_today = True
+                        except ValueError:
+                            pass
+                
+                if sleep_consolidation.is_running(room_folder):
+                    # 記憶整理の完了時に静かな活動をトリガーするため、ここでは何もしない
+                    print(f"  💤 {room_folder}: 睡眠時記憶整理の実行中 - スキップ")
+                elif not has_dreamed_today or sleep_consolidation.has_pending_stages(room_folder, now.date()):
+                    def _after_consolidation(report, room_folder=room_folder, current_api_key=current_api_key,
+                                             has_dreamed_today=has_dreamed_today, motivation_log=motivation_log):
                         # 記憶整理後、静かに自律行動もトリガー（動機ログ付き）
                         # 夢想に成功、あるいは今日すでに見ていれば実行
-                        if has_dreamed_today or has_dreamed_now:
+                        if has_dreamed_today or sleep_consolidation.is_stage_done(report, "dream"):
                             print(f"🌙 {room_folder}: 記憶整理後の静かな活動を開始...")
                             trigger_autonomous_action(room_folder, current_api_key, quiet_mode=True, motivation_log=motivation_log)
-                    else:
-                        # 既に夢を見ている日でも、自律行動はトリガー（通知なし、動機ログ付き）
-                        trigger_autonomous_action(room_folder, current_api_key, quiet_mode=True, motivation_log=motivation_log)
 
+                    # --- 睡眠時記憶整理 ---
+                    # 夢想・エピソード記憶・索引の更新はワーカープールで進め、スケジューラスレッドは待たない
+                    # 失敗した段階の再試行待ち、またはその日の再試行の上限に達している場合は投入されない
+                    submitted = sleep_consolidation.submit(
+                        room_folder, api_key_val, effective_settings.get("sleep_consolidation", {}), now.date(),
+                        on_complete=_after_consolidation, already_done=["dream"] if has_dreamed_today else [],
+                    )
+                    if submitted and has_dreamed_today:
+                        print(f"💤 {room_folder}: 途中で止まった睡眠時記憶整理を再開します...")
+                    elif submitted:
+                        print(f"💤 {room_folder}: 深い眠りにつきました（夢想プロセス開始）...")
                 else:
-                    # --- 通常の自律行動モード（起きている時） ---
-                    if motivation_log:
-                        print(f"🤖 {room_folder}: 動機「{motivation_log.get('dominant_drive_label', '不明')}」-> 自律行動トリガー！")
-                    else:
-                        print(f"🤖 {room_folder}: 無操作{int(elapsed_minutes)}分 -> 自律行動トリガー！")
-                    
-                    # 【新規追加】最新のAPIキーを取得して実行
-                    current_api_key = config_manager.get_active_gemini_api_key_name(room_folder)
-                    
-                    # 【Phase 3】通常の自律行動に加え、一定確率または条件で「分析」も検討
-                    # ここでは単純に trigger_autonomous_action を呼ぶが、AIはプロンプトで分析ツールを使える
-                    trigger_autonomous_action(room_folder, current_api_key, quiet_mode=False, motivation_log=motivation_log)
+                    # 既に夢を見ている日でも、自律行動はトリガー（通知なし、動機ログ付き）
+                    trigger_autonomous_action(room_folder, current_api_key, quiet_mode=True, motivation_log=motivation_log)
 
-        except Exception as e:
-            print(f"  - 自律行動チェックエラー ({room_folder}): {e}")
-            traceback.print_exc()
+            else:
+                # --- 通常の自律行動モード（起きている時） ---
+                if motivation_log:
+                    print(f"🤖 {room_folder}: 動機「{motivation_log.get('dominant_drive_label', '不明')}」-> 自律行動トリガー！")
+                else:
+                    print(f"🤖 {room_folder}: 無操作{int(elapsed_minutes)}分 -> 自律行動トリガー！")
+                
+                # 【新規追加】最新のAPIキーを取得して実行
+                current_api_key = config_manager.get_active_gemini_api_key_name(room_folder)
+                
+                # 【Phase 3】通常の自律行動に加え、一定確率または条件で「分析」も検討
+                # ここでは単純に trigger_autonomous_action を呼ぶが、AIはプロンプトで分析ツールを使える
+                trigger_autonomous_action(room_folder, current_api_key, quiet_mode=False, motivation_log=motivation_log)
+
+    except Exception as e:
+        print(f"  - 自律行動チェックエラー ({room_folder}): {e}")
+        traceback.print_exc()
 
 def check_watchlist_scheduled():
     """
@@ -1219,19 +1153,28 @@ def check_watchlist_scheduled():
     """
     try:
         from watchlist_manager import WatchlistManager
-        from tools.watchlist_tools import _fetch_url_content
+        from tools.watchlist_tools import _fetch_url_contents
         
         all_rooms = room_manager.get_room_list_for_ui()
         now = datetime.datetime.now()
         
+        # 全ルームのチェック対象を先に集め、URLの取得だけをまとめて並列に行う
+        due_by_room = []
         for _, room_folder in all_rooms:
             try:
                 manager = WatchlistManager(room_folder)
                 due_entries = manager.get_due_entries()
-                
-                if not due_entries:
-                    continue
-                
+                if due_entries:
+                    due_by_room.append((room_folder, manager, due_entries))
+            except Exception as e:
+                print(f"  - ウォッチリストチェックエラー ({room_folder}): {e}")
+        
+        if not due_by_room:
+            return
+        fetched = _fetch_url_contents([entry["url"] for _, _, entries in due_by_room for entry in entries])
+        
+        for room_folder, manager, due_entries in due_by_room:
+            try:
                 print(f"📋 {room_folder}: {len(due_entries)}件のウォッチリストエントリをチェック中...")
                 
                 changes_found = []
@@ -1240,7 +1183,7 @@ def check_watchlist_scheduled():
                     name = entry.get("name", url)
                     
                     # コンテンツ取得
-                    success, content = _fetch_url_content(url)
+                    success, content = fetched[url]
                     
                     if not success:
                         print(f"  ❌ {name}: 取得失敗")
@@ -1282,25 +1225,196 @@ def check_watchlist_scheduled():
         traceback.print_exc()
 
 
+# --- 期限ベースのスケジューリング ---
+# 各ジョブは次に実行すべき時刻を計算して返し、スケジューラはそれまで眠る（job_scheduler.py）。
+# - アラーム: 次に鳴るアラームの時刻（アラーム保存時に再計算）
+# - 自律行動: ルームごとのジョブ。無効なルームは登録せず、クールダウンの終了と、
+#   無操作時間（最後のログ + inactivity_minutes）・動機が条件を満たす時刻のうち遅い方まで眠る
+# - ウォッチリスト: 毎時15分
+# 計算の前提が変わるイベント（アラーム・設定の保存、ログの追記、対話によるクールダウン開始）で再計画する。
+# イベントを経由しない変更（ファイルの直接編集など）は、定期的な再同期で拾う。
+ALARM_RESYNC_SECONDS = 600
+# 条件を満たしているのに発火しなかった（睡眠時記憶整理の実行中など）場合や、計算に失敗した場合の再チェック間隔
+AUTONOMOUS_RETRY_SECONDS = 300
+ROOM_RESYNC_SECONDS = 1800
+SETTINGS_CHANGE_DEBOUNCE_SECONDS = 2
+SCHEDULER_STATS_LOG_SECONDS = 3600
+
+_scheduler = job_scheduler.JobScheduler("alarm")
+# 同じ分に check_alarms を二重に実行しないための記録（"%Y-%m-%d %H:%M"）
+_last_alarm_check_minute = None
+
+def _next_alarm_time(now_dt: datetime.datetime) -> datetime.datetime | None:
+    """有効なアラームのうち、まだチェックしていない分で最も早く鳴るものの時刻を返す。"""
+    minute_start = now_dt.replace(second=0, microsecond=0)
+    earliest = None
+    for a in load_alarms():
+        if not a.get("enabled", True):
+            continue
+        try:
+            hour, minute = map(int, str(a.get("time", "")).split(":"))
+        except ValueError:
+            continue
+        alarm_days = [d.lower() for d in a.get("days", [])]
+        for offset in range(8):
+            candidate = (minute_start + datetime.timedelta(days=offset)).replace(hour=hour, minute=minute)
+            if candidate < minute_start:
+                continue
+            if _last_alarm_check_minute and candidate.strftime("%Y-%m-%d %H:%M") <= _last_alarm_check_minute:
+                continue
+            if a.get("date"):
+                try:
+                    if datetime.datetime.strptime(a["date"], "%Y-%m-%d").date() != candidate.date():
+                        continue
+                except (ValueError, TypeError):
+                    break
+            elif alarm_days and candidate.strftime('%a').lower() not in alarm_days:
+                continue
+            if earliest is None or candidate < earliest:
+                earliest = candidate
+            break
+    return earliest
+
+def _plan_alarm_due() -> float:
+    now = time.time()
+    next_alarm = _next_alarm_time(datetime.datetime.fromtimestamp(now))
+    if next_alarm is None:
+        return now + ALARM_RESYNC_SECONDS
+    # 分の境目の直後に起きる（check_alarms は "HH:MM" の一致で判定するため）
+    return max(now, min(next_alarm.timestamp() + 0.5, now + ALARM_RESYNC_SECONDS))
+
+def _run_alarm_job() -> float:
+    global _last_alarm_check_minute
+    current_minute = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    if current_minute != _last_alarm_check_minute:
+        _last_alarm_check_minute = current_minute
+        check_alarms()
+    return _plan_alarm_due()
+
+def _plan_autonomous_room(room_folder: str, after_run: bool = False) -> float | None:
+    """
+    ルームの自律行動チェックを次に行う時刻。無効なら None（ジョブを登録しない）。
+    _check_autonomous_action_for_room と同じ条件（無操作時間・動機・クールダウン）が満たされる時刻を計算する。
+    """
+    from motivation_manager import MotivationManager
+
+    auto_settings = config_manager.get_effective_settings(room_folder).get("autonomous_settings", {})
+    if not auto_settings.get("enabled", False):
+        return None
+    now = time.time()
+    mm = MotivationManager(room_folder)
+    # クールダウン中は何もトリガーされないため、終わるまでチェックしない
+    cooldown_minutes = auto_settings.get("inactivity_minutes", constants.MIN_AUTONOMOUS_INTERVAL_MINUTES)
+    last_trigger = mm.get_last_autonomous_trigger()
+    if last_trigger:
+        cooldown_end = last_trigger.timestamp() + cooldown_minutes * 60
+        if cooldown_end > now:
+            return cooldown_end
+
+    inactivity_limit = auto_settings.get("inactivity_minutes", 120)
+    due = utils.get_last_log_timestamp(room_folder).timestamp() + inactivity_limit * 60
+    contact_due = mm.get_contact_due_time()
+    if contact_due is not None:
+        due = min(due, contact_due.timestamp())
+    if due > now:
+        return due
+    if after_run:
+        # 条件を満たしていたのに発火しなかった（睡眠時記憶整理の実行中・APIキー未設定など）
+        return now + AUTONOMOUS_RETRY_SECONDS
+    return now
+
+def _run_autonomous_room_job(room_folder: str) -> float | None:
+    try:
+        # 登録後に設定や対話でクールダウンが変わっていれば、チェックせずに計画し直す
+        due = _plan_autonomous_room(room_folder)
+        if due is None or due > time.time():
+            return due
+        _check_autonomous_action_for_room(room_folder, datetime.datetime.now())
+        return _plan_autonomous_room(room_folder, after_run=True)
+    except Exception as e:
+        print(f"  - 自律行動スケジュール計算エラー ({room_folder}): {e}")
+        return time.time() + AUTONOMOUS_RETRY_SECONDS
+
+def _plan_autonomous_jobs() -> float:
+    """ルーム一覧と設定から、ルームごとの自律行動ジョブを登録し直す。"""
+    rooms = [room_folder for _, room_folder in room_manager.get_room_list_for_ui()]
+    job_keys = {f"autonomous:{room_folder}": room_folder for room_folder in rooms}
+    for key in _scheduler.keys():
+        if key.startswith("autonomous:") and key != "autonomous:plan" and key not in job_keys:
+            _scheduler.remove(key)
+    for key, room_folder in job_keys.items():
+        try:
+            due = _plan_autonomous_room(room_folder)
+        except Exception as e:
+            print(f"  - 自律行動スケジュール計算エラー ({room_folder}): {e}")
+            due = time.time() + AUTONOMOUS_RETRY_SECONDS
+        if due is None:
+            _scheduler.remove(key)
+        elif _scheduler.get_due_at(key) != due:
+            _scheduler.add(key, functools.partial(_run_autonomous_room_job, room_folder), due)
+    return time.time() + ROOM_RESYNC_SECONDS
+
+def _next_watchlist_due() -> float:
+    now_dt = datetime.datetime.now()
+    due = now_dt.replace(minute=15, second=0, microsecond=0)
+    if due <= now_dt:
+        due += datetime.timedelta(hours=1)
+    return due.timestamp()
+
+def _run_watchlist_job() -> float:
+    check_watchlist_scheduled()
+    return _next_watchlist_due()
+
+def _on_alarms_changed(**_):
+    _scheduler.add("alarms", _run_alarm_job, _plan_alarm_due())
+
+def _on_settings_changed(**_):
+    # 保存が連続することが多いため、少し待ってからまとめて再計画する
+    _scheduler.add("autonomous:plan", _plan_autonomous_jobs, time.time() + SETTINGS_CHANGE_DEBOUNCE_SECONDS)
+
+def _on_room_activity(room_name: str = None, **_):
+    # 対話でクールダウンが始まった・ログが追記された（無操作時間の起点が変わった）。
+    # ジョブは起きた時点で計画し直すため、少し後に起こせばよい（連続する追記をまとめる）
+    key = f"autonomous:{room_name}"
+    if room_name and key in _scheduler.keys():
+        _scheduler.add(key, functools.partial(_run_autonomous_room_job, room_name), time.time() + SETTINGS_CHANGE_DEBOUNCE_SECONDS)
+
+job_scheduler.subscribe("alarms_changed", _on_alarms_changed)
+job_scheduler.subscribe("settings_changed", _on_settings_changed)
+job_scheduler.subscribe("room_activity", _on_room_activity)
+job_scheduler.subscribe("log_appended", _on_room_activity)
+
+def get_scheduler_stats() -> Dict[str, dict]:
+    """スケジューラのジョブごとの実行回数・実行時間・遅れ・次回予定時刻。"""
+    return _scheduler.get_stats()
+
+def _log_scheduler_stats_job() -> float:
+    """ジョブごとの実行時間と遅れ（起動後の累計）を定期的にログに出す。"""
+    lines = []
+    for key, stats in sorted(get_scheduler_stats().items()):
+        if not stats.get("runs"):
+            continue
+        lines.append(
+            f"  - {key}: {stats['runs']}回 / 実行 平均{stats['avg_run_sec']:.2f}s 最大{stats['max_run_sec']:.2f}s"
+            f" / 遅れ 直近{stats['last_lag_sec']:.2f}s 最大{stats['max_lag_sec']:.2f}s / 次回 {stats.get('next_due', '-')}"
+        )
+    if lines:
+        print("--- [Scheduler] ジョブの実行状況（起動後の累計） ---\n" + "\n".join(lines))
+    return time.time() + SCHEDULER_STATS_LOG_SECONDS
+
 def schedule_thread_function():
     global alarm_thread_stop_event
     print("--- アラームスケジューラスレッドを開始しました ---") # <--- 強調
-    
-    # 既存: 毎分00秒にアラームチェック
-    schedule.every().minute.at(":00").do(check_alarms)
-    
-    # 追加: 毎分30秒に自律行動チェック
-    schedule.every().minute.at(":30").do(check_autonomous_actions)
-    
-    # 追加: 毎時15分にウォッチリスト定期チェック
-    schedule.every().hour.at(":15").do(check_watchlist_scheduled)
-    
-    while not alarm_thread_stop_event.is_set():
-        try:
-            schedule.run_pending()
-        except Exception as e:
-            print(f"!!! スケジューラ実行エラー: {e}") # <--- エラーで落ちていないか確認
-        time.sleep(1)
+
+    _scheduler.add("alarms", _run_alarm_job, _plan_alarm_due())
+    _scheduler.add("autonomous:plan", _plan_autonomous_jobs, time.time())
+    _scheduler.add("watchlist", _run_watchlist_job, _next_watchlist_due())
+    _scheduler.add("scheduler:stats", _log_scheduler_stats_job, time.time() + SCHEDULER_STATS_LOG_SECONDS)
+
+    try:
+        _scheduler.run(alarm_thread_stop_event)
+    except Exception as e:
+        print(f"!!! スケジューラ実行エラー: {e}") # <--- エラーで落ちていないか確認
     print("アラームスケジューラスレッドが停止しました.")
 
 def start_alarm_scheduler_thread():
@@ -1317,5 +1431,6 @@ def stop_alarm_scheduler_thread():
     global alarm_thread_stop_event
     if hasattr(start_alarm_scheduler_thread, "scheduler_thread") and start_alarm_scheduler_thread.scheduler_thread.is_alive():
         alarm_thread_stop_event.set()
+        _scheduler.wake()
         start_alarm_scheduler_thread.scheduler_thread.join()
         print("アラームスケジューラスレッドの停止を要求しました.")
@@ -0,0 +1,119 @@
+# avatar_assets.py
+"""
+アバター・表情素材の配信用キャッシュ
+
+これまでアバターは表示のたびにファイルを読み、base64 の data URI として HTML に埋め込んでいた。
+状態が変わるたび（待機→思考中→発話）やルーム切り替えのたびに、動画アバターでは数MBの HTML が送られていた。
+ここでは
+
+- 素材を内容のハッシュを名前にしたファイルとして temp/avatar_assets/ にコピーし、
+  Gradio の静的ファイル配信の URL で参照する。内容が変われば URL も変わるので、ブラウザのキャッシュが使える
+- 元ファイルのハッシュは (mtime, サイズ) が変わるまで再計算しない
+
+静的配信を有効にする前（enable_static_route() を呼んでいない起動経路）や、
+キャッシュへの配置に失敗した場合は、従来どおり data URI を返す。
+"""
+
+import os
+import base64
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+from urllib.parse import quote
+
+ASSET_CACHE_DIR = os.path.join("temp", "avatar_assets")
+# data URI（フォールバック）のメモリキャッシュの上限（合計バイト数）
+MAX_DATA_URI_CACHE_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+_static_route_enabled = False
+# 元ファイルのパス -> ((mtime_ns, size), キャッシュ内のファイルパス)
+_assets: Dict[str, Tuple[Tuple[int, int], str]] = {}
+# (元ファイルのパス, mtime_ns, size, MIMEタイプ) -> data URI
+_data_uris: "OrderedDict[tuple, str]" = OrderedDict()
+_data_uri_bytes = 0
+
+
+def enable_static_route():
+    """キャッシュディレクトリを Gradio の静的パスとして登録する（launch より前に呼ぶ）。"""
+    global _static_route_enabled
+    import gradio as gr
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    gr.set_static_paths(paths=[os.path.abspath(ASSET_CACHE_DIR)])
+    _static_route_enabled = True
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _place_asset(path: str, signature: Tuple[int, int]) -> str:
+    """素材を内容ハッシュ名でキャッシュに置き、そのパスを返す。"""
+    ext = os.path.splitext(path)[1].lower()
+    cached_path = os.path.abspath(os.path.join(ASSET_CACHE_DIR, _file_digest(path)[:32] + ext))
+    if not os.path.exists(cached_path):
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_path}.{threading.get_ident()}.tmp"
+        # ハードリンクにすると、元ファイルがその場で上書きされたときにキャッシュ側の内容も変わってしまう
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, cached_path)
+
+    with _lock:
+        previous = _assets.get(path)
+        _assets[path] = (signature, cached_path)
+        # 元ファイルが差し替えられた場合、古い版はどこからも参照されていなければ消す
+        if previous and previous[1] != cached_path and all(p != previous[1] for _, p in _assets.values()):
+            try:
+                os.remove(previous[1])
+            except OSError:
+                pass
+    return cached_path
+
+
+def _data_uri(path: str, signature: Tuple[int, int], mime_type: str) -> str:
+    global _data_uri_bytes
+    key = (path, signature[0], signature[1], mime_type)
+    with _lock:
+        cached = _data_uris.get(key)
+        if cached is not None:
+            _data_uris.move_to_end(key)
+            return cached
+    with open(path, "rb") as f:
+        uri = f"data:{mime_type};base64,{base64.b64encode(f.read()).decode('utf-8')}"
+    with _lock:
+        _data_uris[key] = uri
+        _data_uri_bytes += len(uri)
+        while _data_uri_bytes > MAX_DATA_URI_CACHE_BYTES and len(_data_uris) > 1:
+            _, evicted = _data_uris.popitem(last=False)
+            _data_uri_bytes -= len(evicted)
+    return uri
+
+
+def get_asset_src(path: str, mime_type: str) -> str:
+    """
+    img / video タグの src に使う値を返す。
+    静的配信が有効なら内容ハッシュ付きの URL、そうでなければ data URI。読み込めなければ OSError を送出する。
+    """
+    signature = _signature(path)
+    if _static_route_enabled:
+        with _lock:
+            entry = _assets.get(path)
+        cached_path = entry[1] if entry and entry[0] == signature and os.path.exists(entry[1]) else None
+        try:
+            if cached_path is None:
+                cached_path = _place_asset(path, signature)
+            return "/gradio_api/file=" + quote(cached_path.replace(os.sep, "/"))
+        except OSError as e:
+            print(f"--- [AvatarAssets] キャッシュへの配置に失敗したため埋め込みで表示します ({os.path.basename(path)}): {e} ---")
+    return _data_uri(path, signature, mime_type)
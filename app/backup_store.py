@@ -0,0 +1,227 @@
+# backup_store.py
+"""
+会話ログ用のコンテンツアドレス型バックアップストア
+
+これまでログのバックアップは、変更があるたびに当月のログ全体を .bak としてコピーしていたため、
+大きな月次ログでは同じ内容を何度も書き込んでいた。ここでは
+
+- ログを内容に応じた境界（行単位のローリングハッシュ）でチャンクに分け、
+  チャンクは SHA-256 をファイル名として1度だけ保存する（zlib 圧縮）
+- 各世代は「チャンクのハッシュ列 + 全体のハッシュ」を持つ小さなマニフェストとして保存する
+
+ことで、新しい世代では変更されたチャンクだけが増える。ログは末尾への追記が大半なので、
+通常は最後の1〜2チャンクだけが新しく書かれる。変更の有無は全体ハッシュの比較で判定する。
+
+配置（backups/logs/ の下）:
+    .store/objects/ab/<sha256>               チャンク本体
+    .store/manifests/<YYYYmmdd_HHMMSS>_log.txt.json   世代ごとのマニフェスト
+
+マニフェストのパスは従来の .bak ファイルのパスと同じように扱える
+（list_log_backups の選択肢や restore_log_from_backup の引数として使われる）。
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import datetime
+import threading
+from typing import List, Optional
+
+STORE_DIR_NAME = ".store"
+MANIFEST_SUFFIX = ".json"
+# チャンク境界: 行ごとのハッシュの下位ビットがすべて0の行の直後で区切る（平均 512 行に1回）
+CHUNK_BOUNDARY_MASK = 0x1FF
+CHUNK_MIN_BYTES = 16 * 1024
+CHUNK_MAX_BYTES = 256 * 1024
+COMPRESSION_LEVEL = 6
+
+_store_lock = threading.Lock()
+
+
+def get_store_dir(backup_dir: str) -> str:
+    return os.path.join(backup_dir, STORE_DIR_NAME)
+
+
+def _objects_dir(backup_dir: str) -> str:
+    return os.path.join(get_store_dir(backup_dir), "objects")
+
+
+def _manifests_dir(backup_dir: str) -> str:
+    return os.path.join(get_store_dir(backup_dir), "manifests")
+
+
+def _object_path(backup_dir: str, digest: str) -> str:
+    return os.path.join(_objects_dir(backup_dir), digest[:2], digest)
+
+
+def is_manifest(path: str) -> bool:
+    """パスがこのストアの世代マニフェストかどうか。"""
+    return bool(path) and path.endswith(MANIFEST_SUFFIX) and os.path.basename(os.path.dirname(path)) == "manifests" \
+        and os.path.basename(os.path.dirname(os.path.dirname(path))) == STORE_DIR_NAME
+
+
+def _backup_dir_of_manifest(manifest_path: str) -> str:
+    return os.path.dirname(os.path.dirname(os.path.dirname(manifest_path)))
+
+
+def split_chunks(data: bytes) -> List[bytes]:
+    """
+    内容に応じた境界でデータを分割する。
+    境界は行の内容だけで決まるため、途中に挿入・削除があっても、その前後以外のチャンクは変わらない。
+    """
+    chunks = []
+    start = 0
+    pos = 0
+    for line in data.splitlines(keepends=True):
+        pos += len(line)
+        size = pos - start
+        if size >= CHUNK_MAX_BYTES or (size >= CHUNK_MIN_BYTES and (zlib.crc32(line) & CHUNK_BOUNDARY_MASK) == 0):
+            chunks.append(data[start:pos])
+            start = pos
+    if start < len(data):
+        chunks.append(data[start:])
+    return chunks
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _load_manifest(manifest_path: str) -> Optional[dict]:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def list_generations(backup_dir: str) -> List[str]:
+    """世代マニフェストのパスを古い順に返す。"""
+    manifests_dir = _manifests_dir(backup_dir)
+    if not os.path.isdir(manifests_dir):
+        return []
+    names = sorted(f for f in os.listdir(manifests_dir) if f.endswith(MANIFEST_SUFFIX))
+    return [os.path.join(manifests_dir, f) for f in names]
+
+
+def get_source_name(manifest_path: str) -> Optional[str]:
+    """世代の元ファイル名（例: 2026-02.txt）。"""
+    manifest = _load_manifest(manifest_path)
+    return manifest.get("source_name") if manifest else None
+
+
+def _file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def save_generation(backup_dir: str, source_path: str, backup_name: str) -> Optional[str]:
+    """
+    source_path を新しい世代として保存し、マニフェストのパスを返す。
+    最新の世代と内容が同じ場合は何もせず None を返す。
+    backup_name は従来の .bak と同じ「<タイムスタンプ>_<元ファイル名>」形式の名前。
+    """
+    with open(source_path, "rb") as f:
+        data = f.read()
+    digest = _file_digest(data)
+
+    with _store_lock:
+        generations = list_generations(backup_dir)
+        if generations:
+            latest = _load_manifest(generations[-1])
+            if latest and latest.get("sha256") == digest and latest.get("size") == len(data):
+                return None
+
+        chunk_digests = []
+        new_chunks = 0
+        new_bytes = 0
+        for chunk in split_chunks(data):
+            chunk_digest = _file_digest(chunk)
+            chunk_digests.append(chunk_digest)
+            object_path = _object_path(backup_dir, chunk_digest)
+            if not os.path.exists(object_path):
+                _write_atomic(object_path, zlib.compress(chunk, COMPRESSION_LEVEL))
+                new_chunks += 1
+                new_bytes += len(chunk)
+
+        manifest = {
+            "version": 1,
+            "created_at": datetime.datetime.now().isoformat(),
+            "source_name": os.path.basename(source_path),
+            "size": len(data),
+            "sha256": digest,
+            "chunks": chunk_digests,
+        }
+        manifest_path = os.path.join(_manifests_dir(backup_dir), backup_name + MANIFEST_SUFFIX)
+        _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+
+    print(f"--- [BackupStore] 世代を保存: {os.path.basename(manifest_path)} "
+          f"(チャンク {len(chunk_digests)}件中 新規 {new_chunks}件, {new_bytes / 1024:.1f}KB) ---")
+    return manifest_path
+
+
+def read_generation(manifest_path: str) -> bytes:
+    """世代の内容を組み立てて返す。チャンクの欠損や全体ハッシュの不一致は IOError とする。"""
+    manifest = _load_manifest(manifest_path)
+    if not manifest:
+        raise IOError(f"バックアップのマニフェストを読み込めません: {manifest_path}")
+    backup_dir = _backup_dir_of_manifest(manifest_path)
+    parts = []
+    for chunk_digest in manifest.get("chunks", []):
+        try:
+            with open(_object_path(backup_dir, chunk_digest), "rb") as f:
+                parts.append(zlib.decompress(f.read()))
+        except (OSError, zlib.error) as e:
+            raise IOError(f"バックアップのチャンクが欠損しています: {chunk_digest} ({e})") from e
+    data = b"".join(parts)
+    if _file_digest(data) != manifest.get("sha256"):
+        raise IOError(f"バックアップの内容がマニフェストと一致しません: {manifest_path}")
+    return data
+
+
+def restore_generation(manifest_path: str, target_path: str):
+    """世代の内容を target_path に書き出す（一時ファイル経由で置き換える）。"""
+    _write_atomic(target_path, read_generation(manifest_path))
+
+
+def delete_generations(manifest_paths: List[str]):
+    """指定した世代を削除し、どの世代からも参照されなくなったチャンクを削除する。"""
+    if not manifest_paths:
+        return
+    backup_dir = _backup_dir_of_manifest(manifest_paths[0])
+    with _store_lock:
+        for path in manifest_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        referenced = set()
+        for path in list_generations(backup_dir):
+            manifest = _load_manifest(path)
+            if manifest is None:
+                # 読めないマニフェストがある間は、参照の判定ができないためチャンクを消さない
+                return
+            referenced.update(manifest.get("chunks", []))
+
+        objects_dir = _objects_dir(backup_dir)
+        if not os.path.isdir(objects_dir):
+            return
+        removed = 0
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name not in referenced and not name.endswith(".tmp"):
+                    try:
+                        os.remove(os.path.join(prefix_dir, name))
+                        removed += 1
+                    except OSError:
+                        pass
+        if removed:
+            print(f"--- [BackupStore] 参照されなくなったチャンクを {removed}件 削除しました ---")
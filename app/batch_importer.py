@@ -43,6 +43,10 @@ except OSError:
     sys.exit(1)
 
 
+# spaCy に一度に渡すチャンク数（nlp.pipe のバッチ）
+NLP_BATCH_SIZE = 32
+
+
 def chunk_log(log_content: str) -> List[str]:
     """
     Splits a clean log file content into meaningful conversation chunks.
@@ -56,12 +60,16 @@ def chunk_log(log_content: str) -> List[str]:
     return chunks
 
 
-def main(room_name: str):
+def main(room_name: str, resume: bool = False, workers: int = 1):
     G = nx.Graph()
     pending_analysis_tasks = []
     rag_data_path = Path("characters") / room_name / "rag_data"
     graph_path = rag_data_path / "knowledge_graph.graphml"
     analysis_file_path = rag_data_path / "pending_analysis.json"
+    # 中断時に、処理済みのチャンク数を記録する（--resume で続きから再開する）
+    progress_file_path = rag_data_path / "batch_import_progress.json"
+    processed_chunks = 0
+    completed = False
 
     try:
         # --- Setup ---
@@ -69,18 +77,28 @@ def main(room_name: str):
         log_source_path.mkdir(parents=True, exist_ok=True)
         rag_data_path.mkdir(parents=True, exist_ok=True)
 
-        if graph_path.exists():
-            os.remove(graph_path)
-            logger.info("Removed existing knowledge graph to rebuild.")
-        if analysis_file_path.exists():
-            os.remove(analysis_file_path)
-            logger.info("Removed existing analysis file.")
+        resume_from = 0
+        if resume and progress_file_path.exists() and graph_path.exists() and analysis_file_path.exists():
+            with open(progress_file_path, 'r', encoding='utf-8') as f:
+                resume_from = json.load(f).get("processed_chunks", 0)
+            G = nx.read_graphml(graph_path)
+            with open(analysis_file_path, 'r', encoding='utf-8') as f:
+                pending_analysis_tasks = json.load(f)
+            logger.info(f"Resuming from chunk {resume_from + 1} with the saved skeleton graph.")
+        else:
+            if graph_path.exists():
+                os.remove(graph_path)
+                logger.info("Removed existing knowledge graph to rebuild.")
+            if analysis_file_path.exists():
+                os.remove(analysis_file_path)
+                logger.info("Removed existing analysis file.")
 
-        G = nx.Graph()
-        logger.info("Created a new, empty knowledge graph.")
+            G = nx.Graph()
+            logger.info("Created a new, empty knowledge graph.")
 
         # --- Entity & Initial Edge Extraction ---
-        log_files = [f for f in log_source_path.glob("*.txt")]
+        # 再開時にチャンクの並びが変わらないよう、ファイル名順に読む
+        log_files = sorted(log_source_path.glob("*.txt"))
         logger.info(f"Found {len(log_files)} log files.")
 
         all_chunks = []
@@ -91,10 +109,16 @@ def main(room_name: str):
             full_conversation_text = "\n\n".join([entry["content"] for entry in log_entries if "content" in entry])
             all_chunks.extend(chunk_log(full_conversation_text))
 
-        for i, chunk in enumerate(all_chunks):
+        processed_chunks = min(resume_from, len(all_chunks))
+        started = time.time()
+        # nlp.pipe でバッチ処理する（workers > 1 ならプロセスを分けて並列に解析する）
+        docs = nlp.pipe(all_chunks[processed_chunks:], batch_size=NLP_BATCH_SIZE, n_process=max(1, workers))
+        for i, (chunk, doc) in enumerate(zip(all_chunks[processed_chunks:], docs), start=processed_chunks):
             if shutdown_flag: break
-            logger.info(f"Processing chunk {i+1}/{len(all_chunks)} for skeleton creation.")
-            doc = nlp(chunk)
+            if (i + 1) % NLP_BATCH_SIZE == 0 or i + 1 == len(all_chunks):
+                elapsed = max(time.time() - started, 1e-6)
+                logger.info(f"Processed chunk {i+1}/{len(all_chunks)} for skeleton creation "
+                            f"({(i + 1 - resume_from) / elapsed:.1f} chunks/sec).")
             entities = list(set([ent.text for ent in doc.ents if ent.label_ in ["PERSON", "ORG", "GPE", "FAC", "LOC"]]))
 
             if len(entities) >= 2:
@@ -107,9 +131,12 @@ def main(room_name: str):
                             G.add_edge(u, v, relation="related_to")
                             task = {"entity1": u, "entity2": v, "chunk": chunk}
                             pending_analysis_tasks.append(task)
+            processed_chunks = i + 1
 
         if shutdown_flag:
              logger.warning("Shutdown signal received during chunk processing.")
+        else:
+            completed = True
 
     finally:
         # --- Save Skeleton Graph and Analysis "To-Do" List ---
@@ -122,6 +149,14 @@ def main(room_name: str):
             json.dump(pending_analysis_tasks, f, indent=2, ensure_ascii=False)
         logger.info(f"Pending analysis tasks saved to {analysis_file_path}")
 
+        if completed:
+            if progress_file_path.exists():
+                os.remove(progress_file_path)
+        else:
+            with open(progress_file_path, 'w', encoding='utf-8') as f:
+                json.dump({"processed_chunks": processed_chunks}, f)
+            logger.info(f"Progress saved ({processed_chunks} chunks). Run again with --resume to continue.")
+
         if shutdown_flag:
             logger.warning("Importer stopped due to shutdown signal. Partial files were saved.")
         else:
@@ -131,5 +166,7 @@ def main(room_name: str):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Nexus Ark Knowledge Graph Skeleton Creator")
     parser.add_argument("room_name", help="The name of the room to process.")
+    parser.add_argument("--resume", action="store_true", help="Continue from the progress saved by an interrupted run.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes for spaCy analysis.")
     args = parser.parse_args()
-    main(args.room_name)
+    main(args.room_name, resume=args.resume, workers=args.workers)
@@ -0,0 +1,370 @@
+# chat_log_index.py
+"""
+月次チャットログ (logs/YYYY-MM.txt) のバイトオフセット索引
+
+絶対インデックスによるメッセージ取得・末尾読み込み・切り詰めのたびに
+月のファイル全体を正規表現で解析しないよう、ログ1ファイルにつき1つの
+サイドカー索引 (logs/.index/YYYY-MM.json) を保持する。
+
+索引の内容:
+- count: メッセージ数
+- entries: [ヘッダー行のバイトオフセット, ロール, 応答者, 日付(YYYY-MM-DD or None)] のリスト
+- size / mtime_ns: 索引作成時のログファイルの状態。一致しなければ自動で再構築する
+
+追記のたびにサイドカー全体を書き直すとログの長さに比例した時間がかかるため、追記分は
+ジャーナル (logs/.index/YYYY-MM.journal, JSONL) に1行足すだけにし、JOURNAL_COMPACT_THRESHOLD 行ごとに
+サイドカーへ畳み込む。読み込み時はサイドカーにジャーナルを順に適用してから size/mtime_ns を照合する。
+"""
+
+import os
+import re
+import json
+import threading
+from typing import Dict, List, Optional, Tuple, Any, Iterator
+
+INDEX_VERSION = 1
+INDEX_DIR_NAME = ".index"
+# iter_messages_reverse が末尾から1回に読むバイト数
+REVERSE_READ_BLOCK_SIZE = 64 * 1024
+# ジャーナルがこの行数に達したらサイドカーへ畳み込む
+JOURNAL_COMPACT_THRESHOLD = 200
+
+# load_chat_log のヘッダーパターン (^## (USER|AGENT|SYSTEM):(.+?)$) のバイト列版
+HEADER_PATTERN = re.compile(rb'^## (USER|AGENT|SYSTEM):(.+?)\r?$')
+_HEADER_LINE_PATTERN = re.compile(rb'^## (?:USER|AGENT|SYSTEM):.+?\r?$', re.MULTILINE)
+_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+# プロセス内キャッシュ: キー = ログファイルの絶対パス
+_index_cache: Dict[str, Dict[str, Any]] = {}
+# ログファイルの絶対パス -> サイドカーに畳み込まれていないジャーナルの行数
+_journal_lengths: Dict[str, int] = {}
+_lock = threading.RLock()
+
+
+def _norm(file_path: str) -> str:
+    return os.path.abspath(file_path)
+
+
+def _get_sidecar_path(file_path: str) -> str:
+    log_dir, name = os.path.split(_norm(file_path))
+    return os.path.join(log_dir, INDEX_DIR_NAME, os.path.splitext(name)[0] + ".json")
+
+
+def _get_journal_path(file_path: str) -> str:
+    return _get_sidecar_path(file_path)[:-len(".json")] + ".journal"
+
+
+def _file_signature(file_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _parse_header(line: bytes) -> Optional[Tuple[str, str]]:
+    m = HEADER_PATTERN.match(line)
+    if not m:
+        return None
+    role = m.group(1).decode("ascii")
+    responder = m.group(2).decode("utf-8", errors="replace").strip()
+    if role == "USER":
+        responder = "user"
+    return role, responder
+
+
+def _extract_date(content: str) -> Optional[str]:
+    # lazy 読み込みの cutoff_date 判定と同じく、本文中の最後の日付を採用する
+    matches = _DATE_PATTERN.findall(content)
+    return matches[-1] if matches else None
+
+
+def scan_headers(data: bytes) -> List[Tuple[int, str, str]]:
+    """ログのバイト列を1回走査し、[(ヘッダーのオフセット, ロール, 応答者), ...] を返す。"""
+    headers = []
+    pos = 0
+    for line in data.splitlines(keepends=True):
+        if line.startswith(b"## "):
+            parsed = _parse_header(line)
+            if parsed:
+                headers.append((pos, parsed[0], parsed[1]))
+        pos += len(line)
+    return headers
+
+
+def _decode_content(raw: bytes) -> str:
+    """ヘッダー行を除いた本文をテキストモード読み込みと同じ形 (改行 \\n, 前後空白除去) で返す。"""
+    newline = raw.find(b"\n")
+    body = raw[newline + 1:] if newline >= 0 else b""
+    return body.decode("utf-8", errors="replace").replace("\r\n", "\n").strip()
+
+
+def _build_index(file_path: str) -> Optional[Dict[str, Any]]:
+    signature = _file_signature(file_path)
+    if signature is None:
+        return None
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except Exception as e:
+        print(f"警告: [ChatLogIndex] 読み込みエラー ({os.path.basename(file_path)}): {e}")
+        return None
+
+    headers = scan_headers(data)
+    entries = []
+    for i, (offset, role, responder) in enumerate(headers):
+        end = headers[i + 1][0] if i + 1 < len(headers) else len(data)
+        entries.append([offset, role, responder, _extract_date(_decode_content(data[offset:end]))])
+    return {
+        "version": INDEX_VERSION,
+        "size": signature[0],
+        "mtime_ns": signature[1],
+        "count": len(entries),
+        "entries": entries,
+    }
+
+
+def _save_sidecar(file_path: str, index: Dict[str, Any]):
+    """索引全体をサイドカーに書き、畳み込んだジャーナルを消す。"""
+    sidecar = _get_sidecar_path(file_path)
+    try:
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        tmp_path = sidecar + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, sidecar)
+        journal_path = _get_journal_path(file_path)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        _journal_lengths[_norm(file_path)] = 0
+    except Exception as e:
+        print(f"警告: [ChatLogIndex] 索引の保存に失敗 ({os.path.basename(sidecar)}): {e}")
+
+
+def _replay_journal(file_path: str, index: Dict[str, Any]) -> Tuple[bool, int]:
+    """
+    ジャーナルを索引に適用する。各行の prev_size が直前のサイズと連続していなければ
+    整合性なしとして False を返す。
+    """
+    journal_path = _get_journal_path(file_path)
+    if not os.path.exists(journal_path):
+        return True, 0
+    applied = 0
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("prev_size") != index["size"]:
+                return False, applied
+            index["entries"].append(record["entry"])
+            index["size"], index["mtime_ns"] = record["size"], record["mtime_ns"]
+            applied += 1
+    index["count"] = len(index["entries"])
+    return True, applied
+
+
+def get_index(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    ログファイルの索引を返す。
+    プロセス内キャッシュ → サイドカー → 再構築 の順に試し、size/mtime が一致するものだけを使う。
+    """
+    key = _norm(file_path)
+    signature = _file_signature(key)
+    if signature is None:
+        return None
+
+    with _lock:
+        cached = _index_cache.get(key)
+        if cached and (cached["size"], cached["mtime_ns"]) == signature:
+            return cached
+
+        index = None
+        sidecar = _get_sidecar_path(key)
+        if os.path.exists(sidecar):
+            try:
+                with open(sidecar, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("version") != INDEX_VERSION:
+                    index = None
+                else:
+                    ok, applied = _replay_journal(key, index)
+                    if not ok or (index.get("size"), index.get("mtime_ns")) != signature:
+                        index = None
+                    elif applied >= JOURNAL_COMPACT_THRESHOLD:
+                        _save_sidecar(key, index)
+                    else:
+                        _journal_lengths[key] = applied
+            except Exception:
+                index = None
+
+        if index is None:
+            index = _build_index(key)
+            if index is None:
+                return None
+            _save_sidecar(key, index)
+
+        _index_cache[key] = index
+        return index
+
+
+def get_message_count(file_path: str) -> int:
+    index = get_index(file_path)
+    return index["count"] if index else 0
+
+
+def read_messages(file_path: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    索引を使って [start, end) 番目のメッセージだけを読み出す。
+    戻り値の形式は load_chat_log と同じ ({"role", "responder", "content", "_source_file_"})。
+    """
+    index = get_index(file_path)
+    if not index:
+        return []
+    entries = index["entries"]
+    count = len(entries)
+    end = count if end is None else min(end, count)
+    start = max(0, start)
+    if start >= end:
+        return []
+
+    begin_offset = entries[start][0]
+    end_offset = entries[end][0] if end < count else index["size"]
+    with open(file_path, "rb") as f:
+        f.seek(begin_offset)
+        data = f.read(end_offset - begin_offset)
+
+    messages = []
+    for i in range(start, end):
+        rel_start = entries[i][0] - begin_offset
+        rel_end = (entries[i + 1][0] - begin_offset) if i + 1 < end else len(data)
+        messages.append({
+            "role": entries[i][1],
+            "responder": entries[i][2],
+            "content": _decode_content(data[rel_start:rel_end]),
+            "_source_file_": file_path,
+        })
+    return messages
+
+
+def iter_messages_reverse(file_path: str, block_size: int = REVERSE_READ_BLOCK_SIZE) -> Iterator[Dict[str, str]]:
+    """
+    ログファイルを末尾からブロック単位で逆方向に読み、メッセージを新しい順に yield する。
+    必要な件数だけ取り出して打ち切れば、巨大な月次ファイルでも読み込み量は末尾の数件分で済む。
+    (索引を必要としないため、索引が古い場合でも再構築の全走査を伴わない)
+    """
+    try:
+        f = open(file_path, "rb")
+    except OSError:
+        return
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        # 直前のブロックで確定できなかった先頭部分 (〜まだ yield していないメッセージの末尾)
+        tail = b""
+        while pos > 0:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            buf = f.read(read_size) + tail
+
+            # バッファ先頭の行は途中から始まっている可能性があるため、ファイル先頭以外では採用しない
+            headers = [m.start() for m in _HEADER_LINE_PATTERN.finditer(buf) if m.start() > 0 or pos == 0]
+            if not headers:
+                tail = buf
+                continue
+
+            ends = headers[1:] + [len(buf)]
+            for start, end in reversed(list(zip(headers, ends))):
+                raw = buf[start:end]
+                role, responder = _parse_header(raw.split(b"\n", 1)[0])
+                yield {
+                    "role": role,
+                    "responder": responder,
+                    "content": _decode_content(raw),
+                    "_source_file_": file_path,
+                }
+            tail = buf[:headers[0]]
+
+
+def read_message(file_path: str, position: int) -> Optional[Dict[str, str]]:
+    messages = read_messages(file_path, position, position + 1)
+    return messages[0] if messages else None
+
+
+def get_message_span(file_path: str, position: int) -> Optional[Tuple[int, int]]:
+    """position 番目のメッセージのバイト範囲 (開始, 終了) を返す。"""
+    index = get_index(file_path)
+    if not index or not (0 <= position < index["count"]):
+        return None
+    entries = index["entries"]
+    end = entries[position + 1][0] if position + 1 < index["count"] else index["size"]
+    return entries[position][0], end
+
+
+def locate(file_paths: List[str], target_index: int) -> Optional[Tuple[str, int]]:
+    """
+    古い順に並んだログファイル群の中で、絶対インデックス target_index が
+    どのファイルの何番目にあたるかを、ファイルを解析せずに件数だけで求める。
+    """
+    if target_index < 0:
+        return None
+    base = 0
+    for f_path in file_paths:
+        count = get_message_count(f_path)
+        if base <= target_index < base + count:
+            return f_path, target_index - base
+        base += count
+    return None
+
+
+def notify_message_appended(file_path: str, offset: int, header: str, text_content: str):
+    """
+    save_message_to_log の追記を索引へ反映する（全体の再解析を避ける）。
+    offset は追記前のファイルサイズ。索引が追記前の状態と一致しない場合は破棄して次回再構築させる。
+    サイドカーは書き直さず、ジャーナルに1行追記する（一定行数ごとに畳み込む）。
+    """
+    key = _norm(file_path)
+    try:
+        signature = _file_signature(key)
+        if signature is None:
+            return
+        with _lock:
+            index = _index_cache.get(key)
+            if index is None or index["size"] != offset:
+                _index_cache.pop(key, None)
+                return
+            parsed = _parse_header(header.strip().encode("utf-8"))
+            if not parsed:
+                _index_cache.pop(key, None)
+                return
+            entry = [offset, parsed[0], parsed[1], _extract_date(text_content.strip())]
+            index["entries"].append(entry)
+            index["count"] = len(index["entries"])
+            index["size"], index["mtime_ns"] = signature
+
+            journal_length = _journal_lengths.get(key, 0)
+            if journal_length + 1 >= JOURNAL_COMPACT_THRESHOLD or not os.path.exists(_get_sidecar_path(key)):
+                _save_sidecar(key, index)
+                return
+            record = {"entry": entry, "prev_size": offset, "size": signature[0], "mtime_ns": signature[1]}
+            with open(_get_journal_path(key), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            _journal_lengths[key] = journal_length + 1
+    except Exception as e:
+        print(f"警告: [ChatLogIndex] 追記の反映に失敗: {e}")
+
+
+def invalidate(file_path: str):
+    """ログが書き換えられた場合に索引を破棄する（次回アクセス時に再構築）。"""
+    key = _norm(file_path)
+    with _lock:
+        _index_cache.pop(key, None)
+        _journal_lengths.pop(key, None)
+        for path in (_get_sidecar_path(key), _get_journal_path(key)):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
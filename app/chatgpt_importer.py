@@ -9,6 +9,7 @@ from typing import Optional, Dict, Any, List, Union
 
 import room_manager
 import constants
+import import_pipeline
 
 def resolve_conversations_file_path(file_path: str) -> str:
     """
@@ -52,23 +53,6 @@ def resolve_conversations_file_path(file_path: str) -> str:
         print(f"[ChatGPT Importer] Error extracting ZIP: {e}")
         return file_path
 
-def _find_conversation_data(file_path: str, conversation_id: str) -> Optional[Dict[str, Any]]:
-    """
-    指定されたJSONファイルから、特定のconversation_idに一致する会話データをストリーミングで検索して返す。
-    """
-    try:
-        with open(file_path, 'rb') as f:
-            for conversation in ijson.items(f, 'item'):
-                if conversation and 'mapping' in conversation:
-                    # mappingの最初のキーがIDであるという仕様
-                    first_key = next(iter(conversation['mapping']), None)
-                    if first_key == conversation_id:
-                        return conversation
-    except (ijson.JSONError, IOError, StopIteration) as e:
-        print(f"[ChatGPT Importer] Error reading or parsing JSON file: {e}")
-        traceback.print_exc()
-    return None
-
 def _reconstruct_thread(mapping: Dict[str, Any], start_node_id: str) -> List[Dict[str, Any]]:
     """
     mappingデータと開始ノードIDから、会話のメインスレッドを再構築する。
@@ -93,15 +77,59 @@ def _reconstruct_thread(mapping: Dict[str, Any], start_node_id: str) -> List[Dic
             break # スレッドの終わり
     return thread
 
-def import_from_chatgpt_export(file_path: str, conversation_id: Any, room_name: str, user_display_name: str) -> Optional[str]:
+def _iter_target_conversations(file_path: str, target_ids: List[str], stats: Optional[import_pipeline.ImportStats]):
+    """対象IDの会話だけをストリーミングで返す。すべて見つかった時点で読むのをやめる。"""
+    remaining = set(target_ids)
+    if not remaining:
+        return
+    try:
+        for conversation in import_pipeline.iter_json_items(file_path, 'item', stats):
+            if conversation and 'mapping' in conversation:
+                # mappingの最初のキーがIDであるという仕様
+                first_key = next(iter(conversation['mapping']), None)
+                if first_key in remaining:
+                    remaining.discard(first_key)
+                    yield first_key, conversation
+                    if not remaining:
+                        break
+    except (ijson.JSONError, IOError) as e:
+        # 壊れたファイルでも、それまでに見つかった会話はインポートする
+        print(f"[ChatGPT Importer] Error reading or parsing JSON file: {e}")
+        traceback.print_exc()
+
+def _convert_conversation(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    会話1件をメインスレッドの [create_time, role, text] のリストに変換する（ワーカー上で実行される）。
+    text が空のメッセージも、SystemPrompt の判定（最初のメッセージの話者）のために残す。
+    """
+    mapping = conversation.get("mapping", {})
+    cid = next(iter(mapping), None)
+    messages = []
+    for message in _reconstruct_thread(mapping, cid):
+        content_parts = message.get("content", {}).get("parts", [])
+        text_content = ""
+        # content.partsが空、またはNoneの場合は本文なしとして扱う
+        if content_parts and isinstance(content_parts, list):
+            # content.parts の中身が文字列でない場合も考慮
+            text_content = "".join(str(p) for p in content_parts if isinstance(p, str) and p.strip()).strip()
+        # ijsonは数値をDecimalで返すことがあるため、floatに変換
+        create_time = message.get("create_time", 0.0)
+        messages.append([float(create_time) if create_time else None, message.get("author", {}).get("role"), text_content])
+    return {"title": conversation.get('title', 'N/A'), "messages": messages}
+
+def import_from_chatgpt_export(file_path: str, conversation_id: Any, room_name: str, user_display_name: str,
+                               stats: Optional[import_pipeline.ImportStats] = None) -> Optional[str]:
     """
     ChatGPTのエクスポートファイルから指定された会話をインポートし、新しいルームを作成する。
+    ファイルは1回だけストリーミングで読み、会話ごとの変換はワーカーで行う（import_pipeline）。
+    途中で止まった場合、同じ条件で再実行すると変換済みの会話と作成済みのルームを再利用する。
 
     Args:
         file_path: conversations.json のパス
         conversation_id: インポートする会話のID（単一文字列 または 文字列のリスト）
         room_name: 新しいルームの表示名
         user_display_name: ユーザーの表示名
+        stats: 処理量とスループットの記録先（UI表示用、省略可）
 
     Returns:
         成功した場合は新しいルームのフォルダ名、失敗した場合はNone
@@ -120,28 +148,33 @@ def import_from_chatgpt_export(file_path: str, conversation_id: Any, room_name:
     print(f"--- [ChatGPT Importer] Starting import for conversation_ids: {target_ids} ---")
     
     try:
-        # 0. ファイルパスの解決 (ZIP対応)
-        resolved_file_path = resolve_conversations_file_path(file_path)
-        
+        checkpoint = import_pipeline.ImportCheckpoint("chatgpt", [file_path], target_ids, room_name)
+
+        # 1. 未変換の会話だけを1回のストリーミングで集め、ワーカーで変換する
+        remaining_ids = import_pipeline.count_resumed(checkpoint, list(dict.fromkeys(target_ids)), stats)
+        if remaining_ids:
+            # ファイルパスの解決 (ZIP対応)
+            resolved_file_path = resolve_conversations_file_path(file_path)
+            import_pipeline.run_conversion(
+                checkpoint, _iter_target_conversations(resolved_file_path, remaining_ids, stats), _convert_conversation, stats
+            )
+
         all_thread_messages = []
         original_title = "N/A"
 
-        # 1. 指定された各IDについて、データを検索して収集
+        # 2. 指定された順に変換結果を集める
         for cid in target_ids:
-            conversation_data = _find_conversation_data(resolved_file_path, cid)
-            if not conversation_data:
+            converted = checkpoint.load_unit(cid)
+            if converted is None:
                 print(f"[ChatGPT Importer] WARNING: Conversation with ID '{cid}' not found in '{file_path}'. Skipping.")
                 continue
             
             # タイトルは（複数ある場合）最初に見つかったものをベースにする（あるいは結合する手もあるが今回は最初優先）
             if original_title == "N/A":
-                original_title = conversation_data.get('title', 'N/A')
+                original_title = converted.get('title', 'N/A')
 
-            # 2. 会話スレッドを再構築
-            mapping = conversation_data.get("mapping", {})
-            thread_messages = _reconstruct_thread(mapping, cid)
-            if thread_messages:
-                all_thread_messages.extend(thread_messages)
+            if converted["messages"]:
+                all_thread_messages.extend(converted["messages"])
             else:
                  print(f"[ChatGPT Importer] WARNING: No valid messages found in conversation '{cid}'.")
 
@@ -151,65 +184,51 @@ def import_from_chatgpt_export(file_path: str, conversation_id: Any, room_name:
 
         # 3. メッセージを create_time でソート (古い順)
         # create_time がない場合(None)は 0.0 として扱い先頭にする
-        all_thread_messages.sort(key=lambda x: x.get("create_time") or 0.0)
+        all_thread_messages.sort(key=lambda x: x[0] or 0.0)
 
-        # 4. ルームのフォルダ名と基本ファイルを作成
-        safe_folder_name = room_manager.generate_safe_folder_name(room_name)
-        if not room_manager.ensure_room_files(safe_folder_name):
-            print(f"[ChatGPT Importer] ERROR: Failed to create room files for '{safe_folder_name}'.")
-            return None
-        print(f"--- [ChatGPT Importer] Created room skeleton: {safe_folder_name} ---")
+        # 4. ルームのフォルダ名と基本ファイルを作成（前回の途中で作成済みならそれを使う）
+        safe_folder_name = checkpoint.get_room_folder()
+        if safe_folder_name is None:
+            safe_folder_name = room_manager.generate_safe_folder_name(room_name)
+            if not room_manager.ensure_room_files(safe_folder_name):
+                print(f"[ChatGPT Importer] ERROR: Failed to create room files for '{safe_folder_name}'.")
+                return None
+            checkpoint.set_room_folder(safe_folder_name)
+            print(f"--- [ChatGPT Importer] Created room skeleton: {safe_folder_name} ---")
 
-        # 5. ログ形式への変換とSystemPromptの準備
-        log_entries = []
+        # 5. ログ形式への変換と書き込み
+        # 6a. log.txt（エントリを順に書き出す。各エントリの後に空行を入れて次の追記に備える）
+        log_file_path = os.path.join(constants.ROOMS_DIR, safe_folder_name, "log.txt")
         first_user_prompt = None
+        entry_count = 0
 
-        for message in all_thread_messages:
-            author_role = message.get("author", {}).get("role")
-            content_parts = message.get("content", {}).get("parts", [])
-
-            # content.partsが空、またはNoneの場合をスキップ
-            if not content_parts or not isinstance(content_parts, list):
-                continue
-
-            # content.parts の中身が文字列でない場合も考慮
-            text_content = "".join(str(p) for p in content_parts if isinstance(p, str) and p.strip()).strip()
+        with open(log_file_path, "w", encoding="utf-8") as f:
+            for create_time, author_role, text_content in all_thread_messages:
+                if not text_content:
+                    continue
 
-            if not text_content:
-                continue
+                # 日付情報を付与 (ログの月次分割などで必要になるため)
+                if create_time:
+                    # タイムゾーンは考慮せず、単純な変換とする (またはJST変換など)
+                    dt = datetime.datetime.fromtimestamp(create_time)
+                    timestamp_str = dt.strftime("%Y-%m-%d %H:%M:%S")
+                    # Nexus Arkの標準的なタイムスタンプ付きフォーマットに合わせる
+                    # メッセージの先頭に付与することで、マイグレーションロジックが日付を認識できるようにする
+                    text_content = f"{timestamp_str}\n{text_content}"
 
-            # 日付情報を付与 (ログの月次分割などで必要になるため)
-            create_time = message.get("create_time", 0.0)
-            if create_time:
-                # タイムゾーンは考慮せず、単純な変換とする (またはJST変換など)
-                # ijsonは数値をDecimalで返すことがあるため、floatに変換
-                dt = datetime.datetime.fromtimestamp(float(create_time))
-                timestamp_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-                # Nexus Arkの標準的なタイムスタンプ付きフォーマットに合わせる
-                # メッセージの先頭に付与することで、マイグレーションロジックが日付を認識できるようにする
-                text_content = f"{timestamp_str}\n{text_content}"
-
-            if author_role == "user":
-                log_entries.append(f"## USER:user\n{text_content}")
-                if first_user_prompt is None:
-                    first_user_prompt = text_content
-            elif author_role == "assistant":
-                log_entries.append(f"## AGENT:{safe_folder_name}\n{text_content}")
-
-        # 6. ファイルへの書き込み
-        # 6a. log.txt
-        log_file_path = os.path.join(constants.ROOMS_DIR, safe_folder_name, "log.txt")
-        full_log_content = "\n\n".join(log_entries)
-        # コンテンツがある場合のみ、末尾に改行を追加して次の追記に備える
-        if full_log_content:
-            full_log_content += "\n\n"
-        with open(log_file_path, "w", encoding="utf-8") as f:
-            f.write(full_log_content)
-        print(f"--- [ChatGPT Importer] Wrote {len(log_entries)} entries to log.txt ---")
+                if author_role == "user":
+                    f.write(f"## USER:user\n{text_content}\n\n")
+                    entry_count += 1
+                    if first_user_prompt is None:
+                        first_user_prompt = text_content
+                elif author_role == "assistant":
+                    f.write(f"## AGENT:{safe_folder_name}\n{text_content}\n\n")
+                    entry_count += 1
+        print(f"--- [ChatGPT Importer] Wrote {entry_count} entries to log.txt ---")
 
         # 6b. SystemPrompt.txt
         # 仕様: ソート後の最初のメッセージがユーザー発言であった場合のみ書き込む
-        if all_thread_messages and all_thread_messages[0].get("author", {}).get("role") == "user":
+        if all_thread_messages and all_thread_messages[0][1] == "user":
              # 念のため first_user_prompt が設定されているか確認（ループ内で設定されるはずだが）
             system_prompt_path = os.path.join(constants.ROOMS_DIR, safe_folder_name, "SystemPrompt.txt")
             with open(system_prompt_path, "w", encoding="utf-8") as f:
@@ -230,6 +249,9 @@ def import_from_chatgpt_export(file_path: str, conversation_id: Any, room_name:
             f.truncate()
         print(f"--- [ChatGPT Importer] Updated room_config.json ---")
 
+        checkpoint.discard()
+        if stats:
+            print(f"--- [ChatGPT Importer] {stats.summary()} ---")
         print(f"--- [ChatGPT Importer] Successfully imported conversation to room: {safe_folder_name} ---")
         return safe_folder_name
 
@@ -10,6 +10,7 @@ import zipfile
 import tempfile
 import room_manager
 import constants
+import import_pipeline
 
 def resolve_conversations_file_path(file_path: str) -> str:
     """
@@ -71,10 +72,34 @@ def get_claude_thread_list(file_path: str) -> List[Tuple[str, str]]:
     # 名前でソートして返す
     return sorted(threads, key=lambda x: x[0])
 
-def import_from_claude_export(file_path: str, conversation_uuids: Any, room_name: str, user_display_name: str) -> Optional[str]:
+def _iter_target_conversations(file_path: str, target_ids: List[str], stats: Optional[import_pipeline.ImportStats]):
+    """対象UUIDの会話だけをストリーミングで返す。すべて見つかった時点で読むのをやめる。"""
+    remaining = set(target_ids)
+    if not remaining:
+        return
+    for conversation in import_pipeline.iter_json_items(file_path, 'item', stats):
+        uuid = conversation.get("uuid")
+        if uuid in remaining:
+            remaining.discard(uuid)
+            yield uuid, conversation
+            if not remaining:
+                break
+
+def _convert_conversation(conversation: Dict[str, Any]) -> Dict[str, Any]:
+    """会話1件を [sender, text] のリストに変換する（ワーカー上で実行される）。"""
+    messages = []
+    # 必要ならタイムスタンプでソートするが、Claudeのエクスポートは通常時系列順
+    for message in conversation.get("chat_messages", []) or []:
+        messages.append([message.get("sender"), message.get("text", "").strip()])
+    return {"name": conversation.get("name", "N/A"), "messages": messages}
+
+def import_from_claude_export(file_path: str, conversation_uuids: Any, room_name: str, user_display_name: str,
+                              stats: Optional[import_pipeline.ImportStats] = None) -> Optional[str]:
     """
     Claudeのエクスポートファイルから指定された会話をインポートし、新しいルームを作成する。
     conversation_uuids: インポートする会話のUUID（単一文字列 または 文字列のリスト）
+    stats: 処理量とスループットの記録先（UI表示用、省略可）
+    途中で止まった場合、同じ条件で再実行すると変換済みの会話と作成済みのルームを再利用する（import_pipeline）。
     """
     
     # UUIDをリスト形式に統一
@@ -90,77 +115,71 @@ def import_from_claude_export(file_path: str, conversation_uuids: Any, room_name
     print(f"--- [Claude Importer] Starting import for {len(target_ids)} conversations. ---")
 
     try:
-        resolved_path = resolve_conversations_file_path(file_path)
-        
-        # 1. 指定された会話データをファイルから収集
-        collected_conversations = {}
-        original_name = "N/A"
-        
-        with open(resolved_path, 'rb') as f:
-            for conversation in ijson.items(f, 'item'):
-                uuid = conversation.get("uuid")
-                if uuid in target_ids:
-                    collected_conversations[uuid] = conversation
-                    if original_name == "N/A":
-                        original_name = conversation.get("name", "N/A")
-        
-        if not collected_conversations:
-             print(f"[Claude Importer] ERROR: None of the specified conversations found in '{file_path}'.")
-             return None
+        checkpoint = import_pipeline.ImportCheckpoint("claude", [file_path], target_ids, room_name)
+
+        # 1. 未変換の会話だけを1回のストリーミングで集め、ワーカーで変換する
+        remaining_ids = import_pipeline.count_resumed(checkpoint, list(dict.fromkeys(target_ids)), stats)
+        if remaining_ids:
+            resolved_path = resolve_conversations_file_path(file_path)
+            import_pipeline.run_conversion(
+                checkpoint, _iter_target_conversations(resolved_path, remaining_ids, stats), _convert_conversation, stats
+            )
 
         # 2. メッセージを収集 (ターゲットID順に結合)
         all_messages = []
+        original_name = "N/A"
+        found_any = False
         for uuid in target_ids:
-            if uuid not in collected_conversations:
+            converted = checkpoint.load_unit(uuid)
+            if converted is None:
                 print(f"[Claude Importer] WARNING: Conversation '{uuid}' not found. Skipping.")
                 continue
-                
-            conv_data = collected_conversations[uuid]
-            messages = conv_data.get("chat_messages", [])
-            if messages:
-                # 必要ならタイムスタンプでソートするが、Claudeのエクスポートは通常時系列順
-                all_messages.extend(messages)
+            found_any = True
+            if original_name == "N/A":
+                original_name = converted.get("name", "N/A")
+            all_messages.extend(converted["messages"])
+
+        if not found_any:
+             print(f"[Claude Importer] ERROR: None of the specified conversations found in '{file_path}'.")
+             return None
             
         if not all_messages:
             print(f"[Claude Importer] ERROR: No messages found in any of the specified conversations.")
             return None
 
-        # 3. ルームの骨格を作成
-        safe_folder_name = room_manager.generate_safe_folder_name(room_name)
-        if not room_manager.ensure_room_files(safe_folder_name):
-            print(f"[Claude Importer] ERROR: Failed to create room files for '{safe_folder_name}'.")
-            return None
-        print(f"--- [Claude Importer] Created room skeleton: {safe_folder_name} ---")
+        # 3. ルームの骨格を作成（前回の途中で作成済みならそれを使う）
+        safe_folder_name = checkpoint.get_room_folder()
+        if safe_folder_name is None:
+            safe_folder_name = room_manager.generate_safe_folder_name(room_name)
+            if not room_manager.ensure_room_files(safe_folder_name):
+                print(f"[Claude Importer] ERROR: Failed to create room files for '{safe_folder_name}'.")
+                return None
+            checkpoint.set_room_folder(safe_folder_name)
+            print(f"--- [Claude Importer] Created room skeleton: {safe_folder_name} ---")
         
-        # 4. ログ形式への変換
-        log_entries = []
-        for message in all_messages:
-            sender = message.get("sender")
-            text_content = message.get("text", "").strip()
-            if not text_content:
-                continue
-
-            # (必要であれば) created_at を見て日付行を入れることも検討できるが、
-            # Claude JSONの created_at は "2023-10-27T10:00:00.000000Z" 形式など
-            # 今回はシンプルに結合する
-            
-            if sender == "human":
-                log_entries.append(f"## USER:user\n{text_content}")
-            elif sender == "assistant":
-                log_entries.append(f"## AGENT:{safe_folder_name}\n{text_content}")
-
-        # 5. ファイルへの書き込み
+        # 4. ログ形式への変換とファイルへの書き込み（エントリを順に書き出す）
         log_file_path = os.path.join(constants.ROOMS_DIR, safe_folder_name, "log.txt")
-        full_log_content = "\n\n".join(log_entries)
-        if full_log_content:
-            full_log_content += "\n\n"
+        entry_count = 0
         with open(log_file_path, "w", encoding="utf-8") as f:
-            f.write(full_log_content)
-        print(f"--- [Claude Importer] Wrote {len(log_entries)} entries to log.txt ---")
+            for sender, text_content in all_messages:
+                if not text_content:
+                    continue
+
+                # (必要であれば) created_at を見て日付行を入れることも検討できるが、
+                # Claude JSONの created_at は "2023-10-27T10:00:00.000000Z" 形式など
+                # 今回はシンプルに結合する
+                
+                if sender == "human":
+                    f.write(f"## USER:user\n{text_content}\n\n")
+                    entry_count += 1
+                elif sender == "assistant":
+                    f.write(f"## AGENT:{safe_folder_name}\n{text_content}\n\n")
+                    entry_count += 1
+        print(f"--- [Claude Importer] Wrote {entry_count} entries to log.txt ---")
 
         # SystemPrompt.txt は空のままにする
 
-        # 6. room_config.json の更新
+        # 5. room_config.json の更新
         config_path = os.path.join(constants.ROOMS_DIR, safe_folder_name, "room_config.json")
         with open(config_path, "r+", encoding="utf-8") as f:
             config = json.load(f)
@@ -177,10 +196,13 @@ def import_from_claude_export(file_path: str, conversation_uuids: Any, room_name
             f.truncate()
         print(f"--- [Claude Importer] Updated room_config.json ---")
 
+        checkpoint.discard()
+        if stats:
+            print(f"--- [Claude Importer] {stats.summary()} ---")
         print(f"--- [Claude Importer] Successfully imported {len(target_ids)} conversations to room: {safe_folder_name} ---")
         return safe_folder_name
 
     except Exception as e:
         print(f"[Claude Importer] An unexpected error occurred during import: {e}")
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None
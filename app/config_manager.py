@@ -9,6 +9,7 @@ import shutil
 import datetime 
 
 import constants
+import job_scheduler
 
 # --- グローバル変数 ---
 CONFIG_GLOBAL = {}
@@ -34,6 +35,13 @@ NIM_API_KEY = ""       # [Phase 4] Nvidia NIM 用APIキー
 XAI_API_KEY = ""       # [Phase 4] X.ai (Grok) 用APIキー
 AVAILABLE_ZHIPU_MODELS = constants.ZHIPU_MODELS
 
+# --- 設定スナップショット ---
+# load_config() が完了するたびに CONFIG_GENERATION を進め、読み込んだ config.json の
+# (パス, mtime, サイズ) を記録する。LLMFactory などのホットパスは load_config_if_changed() で
+# ファイルが変わった時だけ再読み込みし、世代番号をキャッシュの無効化キーとして使う。
+CONFIG_GENERATION = 0
+_CONFIG_FILE_SIGNATURE = None
+
 
 SUPPORTED_VOICES = {
     "zephyr": "Zephyr (明るい)", "puck": "Puck (アップビート)", "charon": "Charon (情報が豊富)",
@@ -187,10 +195,37 @@ def load_config_file() -> dict:
     return {}
 
 
+def _get_config_file_signature() -> Optional[Tuple[str, int, int]]:
+    """load_config_file() と同じ探索順で config.json を見つけ、(パス, mtime_ns, サイズ) を返す。"""
+    for p in (constants.CONFIG_FILE, os.path.join("..", constants.CONFIG_FILE)):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        return p, st.st_mtime_ns, st.st_size
+    return None
+
+
+def load_config_if_changed() -> int:
+    """
+    config.json が前回の load_config() 以降に変更されている場合のみ再読み込みする。
+    未読み込み、またはファイルの mtime/サイズが変わっていれば load_config() を実行する。
+
+    Returns:
+        現在の設定世代番号 (CONFIG_GENERATION)
+    """
+    if CONFIG_GENERATION == 0 or _get_config_file_signature() != _CONFIG_FILE_SIGNATURE:
+        load_config()
+    return CONFIG_GENERATION
+
+
 def _save_config_file(config_data: dict):
     """
     設定データを一時ファイルに書き込んでからリネームする、堅牢な保存処理。
     """
+    global _CONFIG_FILE_SIGNATURE
+    # mtime の分解能が粗いファイルシステムでも次回の load_config_if_changed() で確実に再読み込みさせる
+    _CONFIG_FILE_SIGNATURE = None
     # ステップ1: まず現在の設定をバックアップ
     _create_config_backup()
 
@@ -204,6 +239,7 @@ def _save_config_file(config_data: dict):
             with open(temp_file_path, "w", encoding="utf-8") as f:
                 json.dump(config_data, f, indent=2, ensure_ascii=False)
             os.replace(temp_file_path, constants.CONFIG_FILE)
+            job_scheduler.notify("settings_changed")
             return
         except PermissionError as e:
             if attempt < max_retries - 1:
@@ -788,6 +824,7 @@ def load_config():
     global ANTHROPIC_API_KEY, NIM_API_KEY, XAI_API_KEY
     global DISCORD_BOT_ENABLED, DISCORD_BOT_TOKEN, DISCORD_AUTHORIZED_USER_IDS, DISCORD_BOT_LINKED_ROOM
     global LINE_BOT_ENABLED, LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, LINE_AUTHORIZED_USER_IDS, LINE_BOT_LINKED_ROOM
+    global CONFIG_GENERATION, _CONFIG_FILE_SIGNATURE
 
 
     # [2026-02-11 FIX] APIキーの枯渇状態の読み込みは、GEMINI_KEY_STATESの初期化後に行う
@@ -953,6 +990,19 @@ def load_config():
         "backup_rotation_count": 10,
         "log_backup_rotation_count": 30,
         "periodic_backup_interval": 10800,
+        "embedding_cache_persist": False,  # クエリ埋め込みベクトルを temp/embedding_cache に保存して再利用
+        "rag_index_cache_max_mb": 512,  # RAGインデックスのメモリキャッシュ上限（超えたら最近使っていない索引から解放）
+        "sleep_consolidation_workers": 4,  # 睡眠時記憶整理を実行するワーカー数（ルームをまたいで並列に進める）
+        "sleep_consolidation_llm_concurrency": 2,  # 同・LLMプロバイダーごとの同時実行数
+        "sleep_consolidation_embedding_concurrency": 2,  # 同・エンベディングプロバイダーごとの同時実行数
+        "intent_llm_fallback": False,  # 検索クエリの意図をローカルで判定しきれない場合に処理用LLMへ問い合わせる
+        "rag_index_mmap": True,  # 検索専用の索引をメモリマップで読み込む（Windowsでは無効）
+        "embedding_rpm_per_key": 100,  # 索引作成時のAPIキー1本あたりの初期RPM（429を受けると自動で下げる）
+        "embedding_tpm_per_key": 30000,  # 同・初期TPM
+        "embedding_max_concurrency": 4,  # 索引作成で同時にベクトル化するバッチ数の上限（キー数も上限になる）
+        "local_embedding_pool_enabled": True,  # ローカルエンベディングをワーカープロセス群で実行する
+        "local_embedding_workers": 0,  # ワーカー数（0 = CPUコア数から自動決定）
+        "local_embedding_quantized_model_path": "",  # int8 量子化済みモデル（ONNX等）のパス。空なら通常のモデル
         "theme_settings": {
             "active_theme": "nexus_modern", # デフォルトテーマをモダン版に変更
             "custom_themes": {} # config.jsonで管理するカスタムテーマは最初は空
@@ -1201,6 +1251,10 @@ def load_config():
     else:
         initial_api_key_name_global = list(GEMINI_API_KEYS.keys())[0] if GEMINI_API_KEYS else "your_key_name"
 
+    # ステップ9：スナップショット情報を更新（ステップ7の保存後のシグネチャを記録する）
+    _CONFIG_FILE_SIGNATURE = _get_config_file_signature()
+    CONFIG_GENERATION += 1
+
 
 # --- [モデルリスト管理関数] ---
 
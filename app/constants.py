@@ -44,6 +44,8 @@ API_HISTORY_LIMIT_OPTIONS = {
     "all": "最大表示 (400件)"
 }
 DEFAULT_API_HISTORY_LIMIT_OPTION = "50"
+# 応答のトークンストリーミング時に、チャット欄を更新する最小間隔（秒）。これより細かいトークンはまとめて表示する
+STREAM_FRAME_INTERVAL_SECONDS = 0.05
 DEFAULT_ALARM_API_HISTORY_TURNS = 10
 
 # --- 自律行動設定 ---
@@ -70,6 +72,8 @@ INTENT_WEIGHTS = {
     "relational": {"alpha": 0.4, "beta": 0.4, "gamma": 0.2},  # 関係性質問: Arousalやや重視
 }
 DEFAULT_INTENT = "factual"  # Intent分類失敗時のデフォルト
+# ローカル分類（intent_classifier）の確信度がこれ未満の場合のみ、設定 "intent_llm_fallback" が有効ならLLMに問い合わせる
+INTENT_LOCAL_CONFIDENCE_THRESHOLD = 0.2
 TIME_DECAY_RATE = 0.05  # 時間減衰率（約14日で半減）
 
 # --- 自動会話要約設定 ---
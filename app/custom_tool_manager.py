@@ -2,6 +2,7 @@ import os
 import importlib.util
 import inspect
 import asyncio
+import itertools
 from contextlib import asynccontextmanager
 import subprocess
 import sys
@@ -13,6 +14,7 @@ import httpx
 from langchain_core.tools import tool, BaseTool
 
 _MCP_TOOLS_CACHE = None
+_JSONRPC_IDS = itertools.count(1)
 
 DEFAULT_CUSTOM_TOOL_RESULT_PROMPT = (
     "実行結果を踏まえて、必要な場合は相手に自然に報告してください。"
@@ -31,6 +33,18 @@ class CustomToolManager:
         global _MCP_TOOLS_CACHE
         _MCP_TOOLS_CACHE = None
 
+        # 設定から外れた（または無効化された）サーバの常駐セッションだけを閉じる
+        import config_manager
+        import mcp_session_pool
+        settings = config_manager.CONFIG_GLOBAL.get("custom_tools_settings", {})
+        active_servers = []
+        if settings.get("enabled", True):
+            active_servers = [
+                s for s in settings.get("mcp_servers", [])
+                if s.get("enabled", True) and s.get("type") != "simple_http"
+            ]
+        mcp_session_pool.retain(active_servers)
+
     def get_all_custom_tools(self) -> List[Callable]:
         """
         ローカルプラグインとMCPツールを統合して返す。
@@ -234,30 +248,13 @@ class CustomToolManager:
             prompt += " 失敗やエラーが含まれる場合は、成功したように扱わず正直に説明してください。"
         return str(prompt).strip()
 
-    def _run_sync(self, coro):
-        """非同期コルーチンを同期的に実行するヘルパー"""
-        import threading
-        
-        result = [None]
-        error = [None]
-
-        def target():
-            try:
-                # 新しいイベントループを作成して実行
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result[0] = loop.run_until_complete(coro)
-                loop.close()
-            except Exception as e:
-                error[0] = e
-
-        thread = threading.Thread(target=target)
-        thread.start()
-        thread.join()
-
-        if error[0]:
-            raise error[0]
-        return result[0]
+    def _run_sync(self, coro, timeout: Optional[float] = None):
+        """
+        非同期コルーチンを同期的に実行するヘルパー。
+        MCP の常駐セッションと同じバックグラウンドループ上で実行する（呼び出しごとにスレッドやループを作らない）。
+        """
+        import mcp_session_pool
+        return mcp_session_pool.run(coro, timeout=timeout)
 
     @asynccontextmanager
     async def _create_transport_context(self, server_conf: Dict[str, Any]):
@@ -297,51 +294,53 @@ class CustomToolManager:
         """
         特定の MCP サーバに接続し、ツールのリストを取得してラップする。
         """
-        from mcp import ClientSession
+        import mcp_session_pool
         from langchain_core.tools import StructuredTool
 
         tools = []
 
         try:
             if server_conf.get("type") != "simple_http":
-                async with self._create_transport_context(server_conf) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        mcp_tools_resp = await session.list_tools()
-                        
-                        for mcp_tool in mcp_tools_resp.tools:
-                            # MCPツールを同期的な LangChain ツールに変換
-                            
-                            def create_mcp_executor(t_name, s_conf):
-                                def execute(input_args: Dict[str, Any] = None, **kwargs):
-                                    # kwargs と input_args を統合
-                                    merged_args = {}
-                                    if input_args and isinstance(input_args, dict):
-                                        merged_args.update(input_args)
-                                    merged_args.update(kwargs)
-                                    # 実行時に再度接続して呼び出す
-                                    return self._run_sync(self._call_mcp_tool(s_conf, t_name, merged_args))
-                                return execute
-    
-                            # StructuredTool を使用。args_schema は本来 JSON Schema から生成すべきだが、
-                            # ここでは AI が説明文から引数を推測できるように、description を強化する。
-                            desc = mcp_tool.description or ""
-                            if mcp_tool.inputSchema:
-                                import json
-                                desc += f"\nArgs Schema: {json.dumps(mcp_tool.inputSchema.get('properties', {}), ensure_ascii=False)}"
-    
-                            lc_tool = StructuredTool.from_function(
-                                func=create_mcp_executor(mcp_tool.name, server_conf),
-                                name=mcp_tool.name,
-                                description=desc
-                            )
-                            metadata = self._build_mcp_tool_metadata(
-                                server_conf=server_conf,
-                                tool_name=mcp_tool.name,
-                                tool_description=mcp_tool.description or "",
+                # 常駐セッションで一覧を取得する（このとき接続したセッションは以後のツール呼び出しでも使い回す）
+                mcp_tools_resp = await mcp_session_pool.list_tools(
+                    server_conf, lambda: self._create_transport_context(server_conf)
+                )
+                
+                for mcp_tool in mcp_tools_resp.tools:
+                    # MCPツールを同期的な LangChain ツールに変換
+                    
+                    def create_mcp_executor(t_name, s_conf):
+                        def execute(input_args: Dict[str, Any] = None, **kwargs):
+                            # kwargs と input_args を統合
+                            merged_args = {}
+                            if input_args and isinstance(input_args, dict):
+                                merged_args.update(input_args)
+                            merged_args.update(kwargs)
+                            return self._run_sync(
+                                self._call_mcp_tool(s_conf, t_name, merged_args),
+                                timeout=s_conf.get("timeout", mcp_session_pool.DEFAULT_CALL_TIMEOUT)
                             )
-                            object.__setattr__(lc_tool, "nexus_tool_metadata", metadata)
-                            tools.append(lc_tool)
+                        return execute
+
+                    # StructuredTool を使用。args_schema は本来 JSON Schema から生成すべきだが、
+                    # ここでは AI が説明文から引数を推測できるように、description を強化する。
+                    desc = mcp_tool.description or ""
+                    if mcp_tool.inputSchema:
+                        import json
+                        desc += f"\nArgs Schema: {json.dumps(mcp_tool.inputSchema.get('properties', {}), ensure_ascii=False)}"
+
+                    lc_tool = StructuredTool.from_function(
+                        func=create_mcp_executor(mcp_tool.name, server_conf),
+                        name=mcp_tool.name,
+                        description=desc
+                    )
+                    metadata = self._build_mcp_tool_metadata(
+                        server_conf=server_conf,
+                        tool_name=mcp_tool.name,
+                        tool_description=mcp_tool.description or "",
+                    )
+                    object.__setattr__(lc_tool, "nexus_tool_metadata", metadata)
+                    tools.append(lc_tool)
             elif server_conf.get("type") == "simple_http":
                 # シンプルな JSON-RPC over HTTP POST
                 url = server_conf.get("url", "")
@@ -359,7 +358,10 @@ class CustomToolManager:
                                 if input_args and isinstance(input_args, dict):
                                     merged_args.update(input_args)
                                 merged_args.update(kwargs)
-                                return self._run_sync(self._call_mcp_tool(s_conf, t_name, merged_args))
+                                return self._run_sync(
+                                    self._call_mcp_tool(s_conf, t_name, merged_args),
+                                    timeout=s_conf.get("timeout", mcp_session_pool.DEFAULT_CALL_TIMEOUT)
+                                )
                             return execute
                         
                         name = mcp_tool.get("name")
@@ -393,19 +395,18 @@ class CustomToolManager:
 
     async def _call_mcp_tool(self, server_conf: Dict[str, Any], tool_name: str, args: Dict[str, Any]) -> str:
         """
-        ツール実行時に MCP サーバに接続して呼び出しを行う。
+        ツール実行時に、常駐セッション（無ければ接続して作成）を使って呼び出しを行う。
         """
-        from mcp import ClientSession
+        import mcp_session_pool
 
         try:
             if server_conf.get("type") != "simple_http":
-                async with self._create_transport_context(server_conf) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(tool_name, args)
-                        # 結果を文字列として結合
-                        text_parts = [p.text for p in result.content if hasattr(p, 'text')]
-                        return "\n".join(text_parts) if text_parts else str(result)
+                result = await mcp_session_pool.call_tool(
+                    server_conf, lambda: self._create_transport_context(server_conf), tool_name, args
+                )
+                # 結果を文字列として結合
+                text_parts = [p.text for p in result.content if hasattr(p, 'text')]
+                return "\n".join(text_parts) if text_parts else str(result)
             else:
                 url = server_conf.get("url", "")
                 resp = await self._call_simple_http_jsonrpc(url, "tools/call", {"name": tool_name, "arguments": args})
@@ -420,17 +421,18 @@ class CustomToolManager:
             return f"Error calling MCP tool '{tool_name}': {str(e)}"
 
     async def _call_simple_http_jsonrpc(self, url: str, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        """シンプルな JSON-RPC over HTTP POST 呼び出し"""
+        """シンプルな JSON-RPC over HTTP POST 呼び出し（共有クライアントで接続を使い回す）"""
+        import mcp_session_pool
         payload = {
             "jsonrpc": "2.0",
-            "id": 1,
+            "id": next(_JSONRPC_IDS),
             "method": method,
             "params": params
         }
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
-            resp.raise_for_status()
-            return resp.json()
+        client = mcp_session_pool.get_http_client()
+        resp = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
+        resp.raise_for_status()
+        return resp.json()
 
     def _build_stdio_params(self, server_conf: Dict[str, Any]):
         """StdioServerParameters を構築する共通ヘルパー。相対パスを自動解決する。"""
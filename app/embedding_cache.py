@@ -0,0 +1,189 @@
+# embedding_cache.py
+"""
+クエリ埋め込みベクトルのキャッシュ
+
+RAGManager.search や recall_memories / search_memory / retrieval_node は、
+1ターンの中で同じ（または空白違いだけの）クエリを何度もベクトル化することがある。
+ここではテキストのハッシュとエンベディングモデルID（RAGManager._get_embedding_model_id()）を
+キーにしてベクトルを保持し、API往復と429ローテーションを減らす。
+
+- メモリ: プロセス全体で共有する LRU（EMBEDDING_CACHE_MAX_ENTRIES 件）
+- ディスク: config.json の "embedding_cache_persist" が有効な場合のみ
+  temp/embedding_cache/<モデルID>/<ハッシュ>.npy に保存し、再起動後も再利用する。
+  EMBEDDING_DISK_CACHE_MAX_FILES 件を超えた分は最後に使われた（mtime の）古いものから、
+  EMBEDDING_DISK_CACHE_MAX_AGE_DAYS 日使われていないものは件数にかかわらず削除する（整理はバックグラウンドのスレッドで行う）。
+  再起動の前後で同じベクトルを返すよう、メモリ上の値と同じ float64 のまま保存する
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import config_manager
+
+EMBEDDING_CACHE_MAX_ENTRIES = 512
+EMBEDDING_CACHE_DIR = os.path.join("temp", "embedding_cache")
+EMBEDDING_DISK_CACHE_MAX_FILES = 20000
+EMBEDDING_DISK_CACHE_MAX_AGE_DAYS = 30
+# ディスクキャッシュを何件保存するごとに整理するか
+DISK_PRUNE_INTERVAL = 200
+
+_memory_cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+_lock = threading.Lock()
+_prune_lock = threading.Lock()
+# 起動後の最初の保存で一度整理する
+_writes_since_prune = DISK_PRUNE_INTERVAL
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+
+def _normalize(text: str) -> str:
+    """空白の違いだけのクエリを同一視するための正規化。"""
+    return " ".join(str(text).split())
+
+
+def _make_key(model_id: str, text: str) -> Tuple[str, str]:
+    digest = hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+    return model_id, digest
+
+
+def _is_persist_enabled() -> bool:
+    try:
+        return bool(config_manager.CONFIG_GLOBAL.get("embedding_cache_persist", False))
+    except Exception:
+        return False
+
+
+def _disk_path(key: Tuple[str, str]) -> str:
+    model_id, digest = key
+    safe_model = re.sub(r'[^A-Za-z0-9_.-]', '_', model_id)
+    return os.path.join(EMBEDDING_CACHE_DIR, safe_model, f"{digest}.npy")
+
+
+def _remember(key: Tuple[str, str], vector: List[float]):
+    _memory_cache[key] = vector
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > EMBEDDING_CACHE_MAX_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+
+def _prune_disk_cache():
+    """ディスクキャッシュを上限件数と保持期間に収める（別のスレッドが整理中なら何もしない）。"""
+    if not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        expire_before = time.time() - EMBEDDING_DISK_CACHE_MAX_AGE_DAYS * 86400
+        entries = []
+        removed = 0
+        for root, _, files in os.walk(EMBEDDING_CACHE_DIR):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                    if mtime < expire_before:
+                        os.remove(path)
+                        removed += 1
+                        continue
+                except OSError:
+                    continue
+                entries.append((mtime, path))
+
+        excess = len(entries) - EMBEDDING_DISK_CACHE_MAX_FILES
+        if excess > 0:
+            # 上限ちょうどで止めると毎回整理が走るため、1割余分に消して余裕を作る
+            entries.sort()
+            for _, path in entries[:excess + EMBEDDING_DISK_CACHE_MAX_FILES // 10]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"  - [EmbeddingCache] ディスクキャッシュを整理しました（{removed}件削除）")
+    finally:
+        _prune_lock.release()
+
+
+def get(model_id: str, text: str) -> Optional[List[float]]:
+    """キャッシュ済みのベクトルを返す。なければ None。"""
+    key = _make_key(model_id, text)
+    with _lock:
+        vector = _memory_cache.get(key)
+        if vector is not None:
+            _memory_cache.move_to_end(key)
+            _stats["hits"] += 1
+            return vector
+
+    if _is_persist_enabled():
+        path = _disk_path(key)
+        if os.path.exists(path):
+            try:
+                array = np.load(path)
+                # 以前の形式（float32）で保存されたものはメモリ上の値と一致しないため使わず、次の put で上書きする
+                if array.dtype == np.float64:
+                    vector = array.tolist()
+                    # 最後に使われた日時として mtime を更新する（整理のときに新しいものを残すため）
+                    try:
+                        os.utime(path, None)
+                    except OSError:
+                        pass
+                    with _lock:
+                        _remember(key, vector)
+                        _stats["disk_hits"] += 1
+                    return vector
+            except Exception as e:
+                print(f"  - [EmbeddingCache] ディスクキャッシュの読み込みに失敗 ({os.path.basename(path)}): {e}")
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def put(model_id: str, text: str, vector: List[float]):
+    """ベクトルをキャッシュに登録する。ゼロベクトル（失敗時の詰め物）は保存しない。"""
+    global _writes_since_prune
+    if not vector or not any(vector):
+        return
+    key = _make_key(model_id, text)
+    with _lock:
+        _remember(key, list(vector))
+
+    if _is_persist_enabled():
+        path = _disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp.npy"
+            np.save(tmp_path, np.asarray(vector, dtype=np.float64))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"  - [EmbeddingCache] ディスクキャッシュの保存に失敗: {e}")
+            return
+
+        with _lock:
+            _writes_since_prune += 1
+            should_prune = _writes_since_prune >= DISK_PRUNE_INTERVAL
+            if should_prune:
+                _writes_since_prune = 0
+        if should_prune:
+            # 数万件の走査になりうるため、検索中のスレッドを待たせない
+            threading.Thread(target=_prune_disk_cache, name="embedding-cache-prune", daemon=True).start()
+
+
+def clear(model_id: Optional[str] = None):
+    """メモリ上のキャッシュを破棄する（model_id 指定時はそのモデル分のみ）。"""
+    with _lock:
+        if model_id is None:
+            _memory_cache.clear()
+        else:
+            for key in [k for k in _memory_cache if k[0] == model_id]:
+                del _memory_cache[key]
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats, entries=len(_memory_cache))
@@ -0,0 +1,164 @@
+# embedding_rate_limiter.py
+"""
+エンベディングAPIのキー別トークンバケット
+
+索引作成はこれまでバッチごとに固定時間 sleep していたため、クォータに余裕があっても待ち続け、
+複数のAPIキーがあっても1本ずつしか使えなかった。
+ここではAPIキーごとに「リクエスト数/分 (RPM)」と「トークン数/分 (TPM)」のバケットを持ち、
+
+- 空きがあれば待たずに通す
+- 429 を受けたら、そのキーの推定上限を下げてクールダウンさせる（retryDelay があればそれに従う）
+- 成功が続けば推定上限を少しずつ戻す
+
+という加算増加・乗算減少 (AIMD) で、各キーの実際の上限を学習する。
+状態はプロセス全体で共有するため、複数のルームや処理が同じキーを使っても上限を超えにくい。
+
+初期値は config.json の "embedding_rpm_per_key" / "embedding_tpm_per_key"。
+"""
+
+import time
+import threading
+from typing import Dict, List, Optional
+
+import config_manager
+
+DEFAULT_RPM = 100
+DEFAULT_TPM = 30000
+# 学習した上限の下限（これ以上は下げない）
+MIN_RPM = 5
+MIN_TPM = 1000
+# 429 を受けたときに上限へ掛ける係数と、成功1回ごとに戻す割合（初期値に対する比率）
+DECREASE_FACTOR = 0.7
+INCREASE_RATIO = 0.02
+# 初期値の何倍まで上限を引き上げてよいか（有料キー等で実際の上限が高い場合）
+MAX_GROWTH = 4.0
+# 429 の後、この秒数は上限を引き上げない
+INCREASE_HOLD_SECONDS = 60
+# retryDelay が無い 429 のクールダウン秒数
+DEFAULT_COOLDOWN_SECONDS = 30
+
+_lock = threading.Lock()
+
+
+class _KeyBucket:
+    def __init__(self, rpm: float, tpm: float):
+        self.base_rpm = float(rpm)
+        self.base_tpm = float(tpm)
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.request_tokens = self.rpm
+        self.token_tokens = self.tpm
+        self.updated_at = time.monotonic()
+        self.cooldown_until = 0.0
+        self.last_throttled_at = 0.0
+        self.throttle_count = 0
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated_at)
+        self.request_tokens = min(self.rpm, self.request_tokens + elapsed * self.rpm / 60.0)
+        self.token_tokens = min(self.tpm, self.token_tokens + elapsed * self.tpm / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, requests: float, tokens: float, now: float) -> float:
+        self._refill(now)
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        # バケット容量を超える要求は、満杯になった時点で通す
+        requests = min(requests, self.rpm)
+        tokens = min(tokens, self.tpm)
+        need_requests = max(0.0, requests - self.request_tokens) * 60.0 / self.rpm
+        need_tokens = max(0.0, tokens - self.token_tokens) * 60.0 / self.tpm
+        return max(need_requests, need_tokens)
+
+    def consume(self, requests: float, tokens: float):
+        self.request_tokens -= min(requests, self.rpm)
+        self.token_tokens -= min(tokens, self.tpm)
+
+
+_buckets: Dict[str, _KeyBucket] = {}
+
+
+def _get_bucket(key_name: str) -> _KeyBucket:
+    bucket = _buckets.get(key_name)
+    if bucket is None:
+        try:
+            rpm = float(config_manager.CONFIG_GLOBAL.get("embedding_rpm_per_key", DEFAULT_RPM))
+            tpm = float(config_manager.CONFIG_GLOBAL.get("embedding_tpm_per_key", DEFAULT_TPM))
+        except Exception:
+            rpm, tpm = DEFAULT_RPM, DEFAULT_TPM
+        bucket = _KeyBucket(max(rpm, MIN_RPM), max(tpm, MIN_TPM))
+        _buckets[key_name] = bucket
+    return bucket
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """TPM 判定用の概算トークン数（日本語混在を想定して2文字≒1トークンとする）。"""
+    return sum(max(1, len(t) // 2) for t in texts)
+
+
+def get_wait_time(key_name: str, requests: int = 1, tokens: int = 0) -> float:
+    """今この要求を出した場合に必要な待ち時間（秒）。キーの選択に使う。"""
+    with _lock:
+        return _get_bucket(key_name).wait_time(requests, tokens, time.monotonic())
+
+
+def acquire(key_name: str, requests: int = 1, tokens: int = 0, cancel_event: Optional[threading.Event] = None) -> bool:
+    """
+    バケットに空きができるまで待ってから消費する。
+    cancel_event がセットされた場合は消費せずに False を返す。
+    """
+    while True:
+        with _lock:
+            bucket = _get_bucket(key_name)
+            wait = bucket.wait_time(requests, tokens, time.monotonic())
+            if wait <= 0:
+                bucket.consume(requests, tokens)
+                return True
+        # 中断要求に素早く応じられるよう、長い待機は小分けにする
+        if cancel_event is not None:
+            if cancel_event.wait(min(wait, 1.0)):
+                return False
+        else:
+            time.sleep(min(wait, 1.0))
+
+
+def report_success(key_name: str):
+    """成功を記録し、直近で 429 を受けていなければ推定上限を少し引き上げる。"""
+    with _lock:
+        bucket = _get_bucket(key_name)
+        bucket.throttle_count = 0
+        if time.monotonic() - bucket.last_throttled_at < INCREASE_HOLD_SECONDS:
+            return
+        bucket.rpm = min(bucket.base_rpm * MAX_GROWTH, bucket.rpm + bucket.base_rpm * INCREASE_RATIO)
+        bucket.tpm = min(bucket.base_tpm * MAX_GROWTH, bucket.tpm + bucket.base_tpm * INCREASE_RATIO)
+
+
+def report_throttled(key_name: str, retry_delay: Optional[float] = None, token_limited: bool = False) -> int:
+    """
+    429 を記録する。推定上限を下げ、バケットを空にしてクールダウンさせる。
+    戻り値は、成功を挟まずに連続して 429 を受けた回数。
+    """
+    with _lock:
+        bucket = _get_bucket(key_name)
+        now = time.monotonic()
+        bucket._refill(now)
+        if token_limited:
+            bucket.tpm = max(MIN_TPM, bucket.tpm * DECREASE_FACTOR)
+        else:
+            bucket.rpm = max(MIN_RPM, bucket.rpm * DECREASE_FACTOR)
+        bucket.request_tokens = 0.0
+        bucket.token_tokens = 0.0
+        cooldown = retry_delay if retry_delay else DEFAULT_COOLDOWN_SECONDS
+        bucket.cooldown_until = max(bucket.cooldown_until, now + cooldown)
+        bucket.last_throttled_at = now
+        bucket.throttle_count += 1
+        print(f"      [RateLimiter] '{key_name}' throttled: RPM≈{bucket.rpm:.0f}, TPM≈{bucket.tpm:.0f}, cooldown {cooldown:.1f}s")
+        return bucket.throttle_count
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            name: {"rpm": round(b.rpm, 1), "tpm": round(b.tpm, 1), "throttle_count": b.throttle_count}
+            for name, b in _buckets.items()
+        }
@@ -9,12 +9,22 @@ from typing import List, Dict, Optional, Tuple
 import time
 import re
 import glob # <--- 追加
+import copy
+import bisect
+import threading
 
 import constants
 import config_manager
 import utils
 
 class EpisodicMemoryManager:
+    # プロセス全体で共有するエピソードストア（キー: episodic_dir の絶対パス）
+    # 構成ファイルの (パス, mtime, size) が変わった時だけ再構築する
+    _store_cache: Dict[str, Dict] = {}
+    # ファイル単位の読み込みキャッシュ（キー: ファイルパス, 値: ((mtime_ns, size), エピソードのリスト)）
+    _file_cache: Dict[str, Tuple[Tuple[int, int], List[Dict]]] = {}
+    _store_lock = threading.RLock()
+
     def __init__(self, room_name: str):
         self.room_name = room_name
         self.room_dir = Path(constants.ROOMS_DIR) / room_name
@@ -55,8 +65,8 @@ class EpisodicMemoryManager:
         フォーマット: episode_{日付}_{連番}
         例: episode_2026-01-15_001
         """
-        # 既存のエピソードからこの日付の連番を取得
-        existing = self._load_memory()
+        # 既存のエピソードからこの日付の連番を取得（キャッシュ済みストアを参照、コピー不要）
+        existing = self._get_store()["episodes"]
         date_prefix = f"episode_{date_str.split('~')[0].split('～')[0].strip()}_"
         
         max_seq = 0
@@ -71,37 +81,48 @@ class EpisodicMemoryManager:
         
         return f"{date_prefix}{max_seq + 1:03d}"
 
-    def _load_memory(self) -> List[Dict]:
-        """
-        全ての月次ファイル + レガシーファイルからエピソード記憶を読み込む（ロック付き）。
-        後方互換性: episodic_memory.json が存在する場合も読み込む。
-        """
-        from file_lock_utils import safe_json_read
-        
-        all_episodes = []
-        
-        # 1. レガシーファイル（episodic_memory.json）を読み込み
+    @staticmethod
+    def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _list_source_files(self) -> List[Path]:
+        """レガシーファイル + 月次ファイル（episodic/*.json）を読み込み順に返す。"""
+        files = []
         if self.legacy_memory_file.exists():
-            try:
-                data = safe_json_read(str(self.legacy_memory_file), default=[])
-                if isinstance(data, list):
-                    all_episodes.extend(data)
-            except Exception as e:
-                print(f"⚠️ [EpisodicMemory] {self.legacy_memory_file.name} の読み込みに失敗: {e}")
-                utils.backup_and_repair_json(self.legacy_memory_file, [])
-        
-        # 2. 月次ファイル（episodic/*.json）を読み込み
+            files.append(self.legacy_memory_file)
         if self.episodic_dir.exists():
-            for monthly_file in sorted(self.episodic_dir.glob("*.json")):
-                try:
-                    data = safe_json_read(str(monthly_file), default=[])
-                    if isinstance(data, list):
-                        all_episodes.extend(data)
-                except Exception as e:
-                    print(f"⚠️ [EpisodicMemory] {monthly_file.name} の読み込みに失敗: {e}")
-                    utils.backup_and_repair_json(monthly_file, [])
-        
-        # 3. 重複排除 (ID または内容に基づく)
+            files.extend(sorted(self.episodic_dir.glob("*.json")))
+        return files
+
+    def _read_source_file(self, path: Path, signature: Optional[Tuple[int, int]]) -> List[Dict]:
+        """1ファイル分のエピソードを返す。mtime/size が変わっていなければ再読み込みしない。"""
+        from file_lock_utils import safe_json_read
+
+        key = str(path)
+        cached = EpisodicMemoryManager._file_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        episodes = []
+        try:
+            data = safe_json_read(key, default=[])
+            if isinstance(data, list):
+                episodes = data
+        except Exception as e:
+            print(f"⚠️ [EpisodicMemory] {path.name} の読み込みに失敗: {e}")
+            utils.backup_and_repair_json(path, [])
+            return []
+
+        EpisodicMemoryManager._file_cache[key] = (signature, episodes)
+        return episodes
+
+    @staticmethod
+    def _dedupe_episodes(all_episodes: List[Dict]) -> List[Dict]:
+        """重複排除 (ID または内容に基づく)"""
         seen_ids = set()
         unique_episodes = []
         for ep in all_episodes:
@@ -116,13 +137,79 @@ class EpisodicMemoryManager:
                 if key not in seen_ids:
                     seen_ids.add(key)
                     unique_episodes.append(ep)
-        
         return unique_episodes
 
+    @staticmethod
+    def _build_interval_index(episodes: List[Dict]) -> List[Tuple]:
+        """
+        日付区間インデックスを構築する。
+        要素: (開始日, 日付文字列, 終了日, 範囲日数 or None(単独日付), エピソード) を開始日順に並べたもの。
+        """
+        entries = []
+        for item in episodes:
+            try:
+                d_str = item['date']
+                sep = '~' if '~' in d_str else ('～' if '～' in d_str else None)
+                if sep:
+                    parts = d_str.split(sep)
+                    item_start_date = datetime.datetime.strptime(parts[0].strip(), '%Y-%m-%d').date()
+                    item_end_date = datetime.datetime.strptime(parts[1].strip(), '%Y-%m-%d').date()
+                    range_days = (item_end_date - item_start_date).days + 1
+                else:
+                    item_start_date = datetime.datetime.strptime(d_str.strip(), '%Y-%m-%d').date()
+                    item_end_date = item_start_date
+                    range_days = None
+                entries.append((item_start_date, d_str, item_end_date, range_days, item))
+            except Exception:
+                continue
+        entries.sort(key=lambda e: (e[0], e[1]))
+        return entries
+
+    def _get_store(self) -> Dict:
+        """
+        このルームのエピソードストアを返す（プロセス内キャッシュ）。
+        構成ファイルの mtime/size に変化がなければディスクを読まない。
+        変化があった場合も、変更されたファイルだけを読み直す。
+
+        戻り値のエピソードはキャッシュ本体なので、呼び出し側で変更しないこと。
+        """
+        store_key = str(self.episodic_dir.resolve())
+        files = self._list_source_files()
+        signatures = [(str(path), self._file_signature(path)) for path in files]
+
+        with EpisodicMemoryManager._store_lock:
+            store = EpisodicMemoryManager._store_cache.get(store_key)
+            if store and store["signature"] == signatures:
+                return store
+
+            all_episodes = []
+            for path, (_, signature) in zip(files, signatures):
+                all_episodes.extend(self._read_source_file(path, signature))
+
+            episodes = self._dedupe_episodes(all_episodes)
+            interval_entries = self._build_interval_index(episodes)
+            store = {
+                "signature": signatures,
+                "episodes": episodes,
+                "interval_entries": interval_entries,
+                "interval_starts": [e[0] for e in interval_entries],
+            }
+            EpisodicMemoryManager._store_cache[store_key] = store
+            return store
+
+    def _load_memory(self) -> List[Dict]:
+        """
+        全ての月次ファイル + レガシーファイルからエピソード記憶を読み込む（ロック付き）。
+        後方互換性: episodic_memory.json が存在する場合も読み込む。
+        ストアのキャッシュを汚さないよう、呼び出し側には複製を返す。
+        """
+        return copy.deepcopy(self._get_store()["episodes"])
+
     def _save_memory(self, data: List[Dict]):
         """
         エピソード記憶を月次ファイルに振り分けて保存する（ロック付き）。
         各エピソードの日付に応じて適切な月次ファイルに保存。
+        内容が変わらない月のファイルは書き直さない。
         """
         from file_lock_utils import safe_json_write
         
@@ -144,11 +231,19 @@ class EpisodicMemoryManager:
                 monthly_groups[monthly_path] = []
             monthly_groups[monthly_path].append(episode)
         
-        # 各月次ファイルに保存
-        for monthly_path, episodes in monthly_groups.items():
-            safe_json_write(str(monthly_path), episodes)
-        
-        # print(f"  - 記憶を {len(monthly_groups)} 個の月次ファイルに保存しました（計 {len(data)} 件）")
+        # 変更のあった月次ファイルだけを保存
+        written = 0
+        with EpisodicMemoryManager._store_lock:
+            for monthly_path, episodes in monthly_groups.items():
+                key = str(monthly_path)
+                cached = EpisodicMemoryManager._file_cache.get(key)
+                if cached and cached[0] == self._file_signature(monthly_path) and cached[1] == episodes:
+                    continue
+                if safe_json_write(key, episodes):
+                    EpisodicMemoryManager._file_cache[key] = (self._file_signature(monthly_path), copy.deepcopy(episodes))
+                    written += 1
+        
+        # print(f"  - 記憶を {written} 個の月次ファイルに保存しました（計 {len(data)} 件）")
 
 
     def _annotate_logs_with_arousal(self, logs: List[str], date_str: str) -> str:
@@ -748,8 +843,8 @@ class EpisodicMemoryManager:
         if not oldest_log_date_str or lookback_days <= 0:
             return ""
 
-        memory_data = self._load_memory()
-        if not memory_data:
+        store = self._get_store()
+        if not store["episodes"]:
             return ""
 
         try:
@@ -758,31 +853,21 @@ class EpisodicMemoryManager:
         except ValueError:
             return ""
 
+        # 日付区間インデックスから候補を二分探索で切り出す。
+        # ルックバック日数より長い範囲の記憶は除外するため、対象の開始日は
+        # [start_date - lookback_days, cutoff_date) に収まる。
+        interval_entries = store["interval_entries"]
+        lo = bisect.bisect_left(store["interval_starts"], start_date - datetime.timedelta(days=lookback_days))
+        hi = bisect.bisect_left(store["interval_starts"], cutoff_date)
+
         relevant_episodes = []
-        # 日付順にソートされている前提だが、念のためソート
-        memory_data.sort(key=lambda x: x['date'])
-        
-        for item in memory_data:
+        for item_start_date, d_str, item_end_date, range_days, item in interval_entries[lo:hi]:
             try:
-                # 範囲日付 (YYYY-MM-DD~YYYY-MM-DD) または 単独日付 (YYYY-MM-DD)
-                d_str = item['date']
-                sep = '~' if '~' in d_str else ('～' if '～' in d_str else None)
-                
-                if sep:
-                    parts = d_str.split(sep)
-                    item_start_date = datetime.datetime.strptime(parts[0].strip(), '%Y-%m-%d').date()
-                    item_end_date = datetime.datetime.strptime(parts[1].strip(), '%Y-%m-%d').date()
-                    
-                    # 範囲日付の場合、範囲の長さを計算
-                    range_days = (item_end_date - item_start_date).days + 1
-                    # ルックバック日数より長い範囲の記憶は除外
-                    # （例: 2日のルックバックに1週間の要約は不適切）
-                    if range_days > lookback_days:
-                        continue
-                else:
-                    item_start_date = datetime.datetime.strptime(d_str.strip(), '%Y-%m-%d').date()
-                    item_end_date = item_start_date
-                
+                # ルックバック日数より長い範囲の記憶は除外
+                # （例: 2日のルックバックに1週間の要約は不適切）
+                if range_days is not None and range_days > lookback_days:
+                    continue
+
                 # 範囲チェック: (既存エピソードの終端がルックバック開始日以降) かつ (既存エピソードの開始が生ログ開始日より前)
                 if (item_end_date >= start_date) and (item_start_date < cutoff_date):
                     # Phase H: IDを含めて出力（共鳴フィードバック用）
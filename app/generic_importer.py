@@ -6,35 +6,61 @@ import re
 import traceback
 from typing import Optional, Dict, Any, List
 
+import ijson
+
 import room_manager
 import constants
+import import_pipeline
+
+# Markdown/テキストのメタ情報（タイトル行・ユーザー行）は先頭付近にあるため、この範囲だけを読む
+METADATA_SCAN_BYTES = 1024 * 1024
+
+def _json_root_char(file_path: str) -> bytes:
+    """JSON のルートの最初の文字（b"{" / b"[" など）。"""
+    with open(file_path, "rb") as f:
+        return f.read(1024).lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+
+def _first_json_item(file_path: str, prefix: str) -> Any:
+    """JSON の prefix にある値をストリーミングで探して返す（なければ None）。"""
+    with open(file_path, "rb") as f:
+        return next(ijson.items(f, prefix), None)
 
 def parse_metadata_from_file(file_path: str) -> Dict[str, str]:
     """
     アップロードされたファイルから、メタ情報（タイトル、ユーザー名など）を自動抽出する。
-    ChatGPT ExporterのJSON, MD形式に対応。
+    ChatGPT ExporterのJSON, MD形式に対応。JSON はストリーミングで必要な値だけを読む。
     """
     metadata = {"title": os.path.basename(file_path), "user": "ユーザー"}
-    file_content = ""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            file_content = f.read()
-    except Exception:
-        return metadata
 
     if file_path.endswith(".json"):
         try:
-            data = json.loads(file_content)
-            if "metadata" in data and isinstance(data["metadata"], dict):
-                meta = data["metadata"]
+            root_char = _json_root_char(file_path)
+            if root_char == b"[":
+                # ルートが配列ならメタ情報のキーは存在しない
+                return metadata
+            if root_char != b"{":
+                raise ijson.JSONError("not a JSON object")
+            meta = _first_json_item(file_path, "metadata")
+            if isinstance(meta, dict):
                 metadata["title"] = meta.get("title", metadata["title"])
                 if "user" in meta and isinstance(meta["user"], dict) and "name" in meta["user"]:
                     metadata["user"] = meta["user"]["name"]
-            elif "title" in data: # ChatGPT公式エクスポート形式
-                 metadata["title"] = data.get("title", metadata["title"])
+                return metadata
+            title = _first_json_item(file_path, "title")
+            if title is not None: # ChatGPT公式エクスポート形式
+                 metadata["title"] = title
             return metadata
-        except json.JSONDecodeError:
+        except ijson.JSONError:
             pass
+        except Exception:
+            return metadata
+
+    file_content = ""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            file_content = f.read(METADATA_SCAN_BYTES)
+    except Exception:
+        return metadata
 
     title_match = re.search(r"^#\s+(.+)$", file_content, re.MULTILINE)
     user_match = re.search(r"^\*\*User:\*\*\s+(.+?)\s*\(", file_content, re.MULTILINE)
@@ -45,33 +71,66 @@ def parse_metadata_from_file(file_path: str) -> Dict[str, str]:
 
     return metadata
 
-def _import_chatgpt_exporter_json(
-    file_path: str, safe_folder_name: str
-) -> List[str]:
-    """ChatGPT ExporterのJSONファイル形式を特別に処理する。"""
-    log_entries = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    messages = data.get("messages", [])
-    for message in messages:
-        role = message.get("role")
-        content = message.get("say", "").strip()
-        if not content:
-            continue
+def _import_chatgpt_exporter_json(file_path: str) -> List[List[str]]:
+    """ChatGPT ExporterのJSONファイル形式を特別に処理する（messages をストリーミングで読む）。"""
+    records = []
+    with open(file_path, 'rb') as f:
+        for message in ijson.items(f, 'messages.item'):
+            role = message.get("role")
+            content = message.get("say", "").strip()
+            if not content:
+                continue
+            
+            if role == "Prompt":
+                records.append(["user", content])
+            elif role == "Response":
+                records.append(["agent", content])
+    return records
+
+def _import_text_file(file_path: str, user_header: str, agent_header: str) -> List[List[str]]:
+    """話者ヘッダーで区切られたテキストファイルを [話者, 本文] のリストに変換する。"""
+    records = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        # --- [新ロジック] ChatGPT Exporterのフッターを除去 ---
+        exporter_footer = "Powered by ChatGPT Exporter (https://www.chatgptexporter.com)"
+        if exporter_footer in content:
+            content = content.split(exporter_footer)[0].strip()
+
+        user_h = re.escape(user_header)
+        agent_h = re.escape(agent_header)
+        pattern = re.compile(f"(^{user_h}|^{agent_h})", re.MULTILINE)
         
-        if role == "Prompt":
-            log_entries.append(f"## USER:user\n{content}")
-        elif role == "Response":
-            log_entries.append(f"## AGENT:{safe_folder_name}\n{content}")
-    return log_entries
+        parts = pattern.split(content)
+        if len(parts) <= 1:
+            print(f"[Generic Importer] WARNING: No speaker headers found in {os.path.basename(file_path)}. Skipping.")
+            return records
+
+        for i in range(1, len(parts), 2):
+            header = parts[i]
+            text = parts[i+1].strip()
+            if not text: continue
+
+            if header == user_header:
+                records.append(["user", text])
+            elif header == agent_header:
+                records.append(["agent", text])
+                
+    except Exception as e:
+        print(f"[Generic Importer] Error processing file {file_path}: {e}")
+        traceback.print_exc()
+    return records
 
 def import_from_generic_text(
-    file_paths: List[str], room_name: str, user_display_name: str, user_header: str, agent_header: str
+    file_paths: List[str], room_name: str, user_display_name: str, user_header: str, agent_header: str,
+    stats: Optional[import_pipeline.ImportStats] = None
 ) -> Optional[str]:
     """
     任意のテキストファイル群と話者ヘッダー指定から、新しいルームを作成する。
     file_paths: インポートするファイルのパスのリスト
+    stats: 処理量とスループットの記録先（UI表示用、省略可）
     """
     if isinstance(file_paths, str):
         file_paths = [file_paths]
@@ -81,55 +140,48 @@ def import_from_generic_text(
         return "ERROR: MISSING_ARGS"
         
     try:
-        # ルームの骨格を作成
-        safe_folder_name = room_manager.generate_safe_folder_name(room_name)
-        if not room_manager.ensure_room_files(safe_folder_name):
-            return "ERROR: ROOM_CREATION_FAILED"
-        print(f"--- [Generic Importer] Created room skeleton: {safe_folder_name} ---")
+        checkpoint = import_pipeline.ImportCheckpoint("generic", file_paths, [user_header, agent_header], room_name)
 
-        log_entries = []
-        
-        for file_path in file_paths:
+        # ルームの骨格を作成（前回の途中で作成済みならそれを使う）
+        safe_folder_name = checkpoint.get_room_folder()
+        if safe_folder_name is None:
+            safe_folder_name = room_manager.generate_safe_folder_name(room_name)
+            if not room_manager.ensure_room_files(safe_folder_name):
+                return "ERROR: ROOM_CREATION_FAILED"
+            checkpoint.set_room_folder(safe_folder_name)
+            print(f"--- [Generic Importer] Created room skeleton: {safe_folder_name} ---")
+
+        # --- [新ロジック] ChatGPT ExporterのJSON形式を特別扱い ---
+        is_exporter_json = user_header == "role:Prompt" and agent_header == "role:Response"
+
+        def convert_file(file_path: str) -> List[List[str]]:
             print(f"[Generic Importer] Processing file: {os.path.basename(file_path)}")
-            
-            # --- [新ロジック] ChatGPT ExporterのJSON形式を特別扱い ---
-            if file_path.endswith('.json') and user_header == "role:Prompt" and agent_header == "role:Response":
+            if file_path.endswith('.json') and is_exporter_json:
                 print("--- [Generic Importer] Detected ChatGPT Exporter JSON format. ---")
-                log_entries.extend(_import_chatgpt_exporter_json(file_path, safe_folder_name))
-            else:
-                # --- 既存のテキストベースの処理 ---
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    # --- [新ロジック] ChatGPT Exporterのフッターを除去 ---
-                    exporter_footer = "Powered by ChatGPT Exporter (https://www.chatgptexporter.com)"
-                    if exporter_footer in content:
-                        content = content.split(exporter_footer)[0].strip()
-
-                    user_h = re.escape(user_header)
-                    agent_h = re.escape(agent_header)
-                    pattern = re.compile(f"(^{user_h}|^{agent_h})", re.MULTILINE)
-                    
-                    parts = pattern.split(content)
-                    if len(parts) <= 1:
-                        print(f"[Generic Importer] WARNING: No speaker headers found in {os.path.basename(file_path)}. Skipping.")
-                        continue
-
-                    for i in range(1, len(parts), 2):
-                        header = parts[i]
-                        text = parts[i+1].strip()
-                        if not text: continue
-
-                        if header == user_header:
-                            log_entries.append(f"## USER:user\n{text}")
-                        elif header == agent_header:
-                            log_entries.append(f"## AGENT:{safe_folder_name}\n{text}")
-                            
-                except Exception as e:
-                    print(f"[Generic Importer] Error processing file {file_path}: {e}")
-                    traceback.print_exc()
+                return _import_chatgpt_exporter_json(file_path)
+            # --- 既存のテキストベースの処理 ---
+            return _import_text_file(file_path, user_header, agent_header)
+
+        # ファイルごとの変換をワーカーで行う（IDはファイルの並び順を含めて一意にする）
+        unit_ids = [f"{i}:{os.path.basename(path)}" for i, path in enumerate(file_paths)]
+        remaining = set(import_pipeline.count_resumed(checkpoint, unit_ids, stats))
 
+        def iter_files():
+            for unit_id, file_path in zip(unit_ids, file_paths):
+                if unit_id in remaining:
+                    if stats:
+                        stats.bytes_read += os.path.getsize(file_path)
+                    yield unit_id, file_path
+
+        import_pipeline.run_conversion(checkpoint, iter_files(), convert_file, stats)
+
+        log_entries = []
+        for unit_id in unit_ids:
+            for role, text in checkpoint.load_unit(unit_id) or []:
+                if role == "user":
+                    log_entries.append(f"## USER:user\n{text}")
+                else:
+                    log_entries.append(f"## AGENT:{safe_folder_name}\n{text}")
 
         if not log_entries:
             return "ERROR: NO_MESSAGES"
@@ -158,6 +210,10 @@ def import_from_generic_text(
             f.truncate()
         print(f"--- [Generic Importer] Updated room_config.json ---")
 
+        checkpoint.discard()
+        if stats:
+            print(f"--- [Generic Importer] {stats.summary()} ---")
+
         print(f"--- [Generic Importer] Successfully imported file to room: {safe_folder_name} ---")
         return safe_folder_name
 
@@ -0,0 +1,277 @@
+# http_fetcher.py
+"""
+URL 取得の共通レイヤー（read_url_tool / ウォッチリスト用）
+
+- 接続の再利用: スレッドごとに Keep-Alive の requests.Session を持つ
+- 並列取得: map_concurrent で最大 MAX_CONCURRENT_FETCHES 件まで同時に取得する
+- ホストごとの礼儀: 同一ホストへの同時接続数と、リクエスト開始の最小間隔を制限する
+- 条件付きGET: temp/http_cache/ に本文と ETag / Last-Modified を保存し、次回は
+  If-None-Match / If-Modified-Since を付けて問い合わせる。304 なら保存済みの本文を使う
+
+さらに、本文から抽出したテキスト（BeautifulSoup の解析結果や PDF のテキスト）を
+キャッシュエントリに「派生データ」として保存できる。本文が変わっていなければ
+（304、または本文のハッシュが同じなら）派生データも再利用でき、解析をやり直さずに済む。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+HTTP_CACHE_DIR = os.path.join("temp", "http_cache")
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+MAX_CONCURRENT_FETCHES = 4
+# 同一ホストへの同時接続数と、リクエスト開始の最小間隔（秒）
+PER_HOST_MAX_CONCURRENCY = 2
+PER_HOST_MIN_INTERVAL = 1.0
+# これより大きい本文はキャッシュしない
+MAX_CACHE_BODY_BYTES = 20 * 1024 * 1024
+# キャッシュエントリ数の上限（超えたら古いものから削除）
+MAX_CACHE_ENTRIES = 500
+
+_thread_local = threading.local()
+_host_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.Semaphore] = {}
+_host_next_start: Dict[str, float] = {}
+_cache_lock = threading.Lock()
+_cache_writes = 0
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class FetchResult:
+    """取得結果。not_modified が True の場合、content はキャッシュから読んだもの。"""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: Dict[str, str],
+                 encoding: Optional[str], not_modified: bool, cache_key: Optional[str]):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+        self.not_modified = not_modified
+        self._cache_key = cache_key
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def get_derived(self, name: str) -> Optional[Any]:
+        """本文から抽出済みのデータを返す（本文が変わっていれば None）。"""
+        if not self._cache_key:
+            return None
+        meta = _load_meta(self._cache_key)
+        return (meta or {}).get("derived", {}).get(name)
+
+    def set_derived(self, name: str, value: Any):
+        """本文から抽出したデータを保存する（本文が変わるまで get_derived で再利用できる）。"""
+        if not self._cache_key:
+            return
+        with _cache_lock:
+            meta = _load_meta(self._cache_key)
+            if meta is None:
+                return
+            meta.setdefault("derived", {})[name] = value
+            _write_json(_meta_path(self._cache_key), meta)
+
+
+def _get_session():
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=PER_HOST_MAX_CONCURRENCY * 2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["User-Agent"] = DEFAULT_USER_AGENT
+        _thread_local.session = session
+    return session
+
+
+def _cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _meta_path(key: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, f"{key}.json")
+
+
+def _body_path(key: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, f"{key}.body")
+
+
+def _load_meta(key: str) -> Optional[dict]:
+    try:
+        with open(_meta_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _prune_cache():
+    try:
+        metas = [os.path.join(HTTP_CACHE_DIR, f) for f in os.listdir(HTTP_CACHE_DIR) if f.endswith(".json")]
+        if len(metas) <= MAX_CACHE_ENTRIES:
+            return
+        metas.sort(key=os.path.getmtime)
+        for path in metas[:len(metas) - MAX_CACHE_ENTRIES]:
+            for p in (path, path[:-len(".json")] + ".body"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+def _response_encoding(response) -> Optional[str]:
+    """
+    本文のデコードに使うエンコーディング。Content-Type に charset が無い場合、requests の encoding は
+    None（text/* では ISO-8859-1）になるため、本文から推定した apparent_encoding を使う
+    （charset を返さない日本語サイトの Shift_JIS / EUC-JP のページが文字化けしないように）。
+    """
+    content_type = (response.headers.get("Content-Type") or "").lower()
+    if "charset=" in content_type:
+        return response.encoding
+    # 推定は本文全体を走査するため、テキストでない本文（PDF・画像など）では行わない
+    if content_type and not (content_type.startswith("text/") or "html" in content_type or "xml" in content_type):
+        return response.encoding
+    return response.apparent_encoding or response.encoding
+
+
+def _store(key: str, url: str, response, content: bytes, encoding: Optional[str]):
+    global _cache_writes
+    body_hash = hashlib.sha256(content).hexdigest()
+    with _cache_lock:
+        old_meta = _load_meta(key) or {}
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "encoding": encoding,
+            "body_hash": body_hash,
+            # 本文が同じなら、以前の抽出結果はそのまま使える
+            "derived": old_meta.get("derived", {}) if old_meta.get("body_hash") == body_hash else {},
+        }
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            if old_meta.get("body_hash") != body_hash or not os.path.exists(_body_path(key)):
+                tmp_path = _body_path(key) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, _body_path(key))
+            _write_json(_meta_path(key), meta)
+        except OSError as e:
+            print(f"  - [HttpFetcher] キャッシュの保存に失敗: {e}")
+            return False
+        _cache_writes += 1
+        if _cache_writes % 50 == 0:
+            _prune_cache()
+    return True
+
+
+def _wait_for_host(host: str) -> threading.Semaphore:
+    """ホストごとの同時接続数と開始間隔を守って順番を待つ。戻り値のセマフォは呼び出し側で release する。"""
+    with _host_lock:
+        semaphore = _host_semaphores.setdefault(host, threading.Semaphore(PER_HOST_MAX_CONCURRENCY))
+    semaphore.acquire()
+    with _host_lock:
+        now = time.monotonic()
+        start_at = max(now, _host_next_start.get(host, 0.0))
+        _host_next_start[host] = start_at + PER_HOST_MIN_INTERVAL
+    if start_at > now:
+        time.sleep(start_at - now)
+    return semaphore
+
+
+def has_validators(url: str) -> bool:
+    """前回の取得結果がキャッシュにあり、条件付きGET（ETag / Last-Modified）で問い合わせられるか。"""
+    key = _cache_key(url)
+    meta = _load_meta(key)
+    return bool(meta and (meta.get("etag") or meta.get("last_modified")) and os.path.exists(_body_path(key)))
+
+
+def fetch(url: str, timeout: float = 15, headers: Optional[Dict[str, str]] = None, use_cache: bool = True) -> FetchResult:
+    """
+    URL を取得する。キャッシュがあれば条件付きGETを行い、304 ならキャッシュの本文を返す。
+    HTTP エラー（4xx/5xx）は requests.HTTPError として送出する。
+    """
+    key = _cache_key(url) if use_cache else None
+    request_headers = dict(headers or {})
+    meta = _load_meta(key) if key else None
+    if meta and os.path.exists(_body_path(key)):
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+    else:
+        meta = None
+
+    semaphore = _wait_for_host(urlparse(url).netloc.lower())
+    try:
+        response = _get_session().get(url, timeout=timeout, headers=request_headers)
+        if response.status_code == 304 and meta is not None:
+            try:
+                with open(_body_path(key), "rb") as f:
+                    content = f.read()
+                return FetchResult(url, 304, content, dict(response.headers), meta.get("encoding"), True, key)
+            except OSError:
+                # 本文が消えていた場合は、条件なしで取り直す
+                response = _get_session().get(url, timeout=timeout, headers=headers or {})
+        response.raise_for_status()
+        content = response.content
+    finally:
+        semaphore.release()
+
+    encoding = _response_encoding(response)
+    stored = False
+    if key and len(content) <= MAX_CACHE_BODY_BYTES:
+        stored = _store(key, url, response, content, encoding)
+    return FetchResult(url, response.status_code, content, dict(response.headers), encoding, False, key if stored else None)
+
+
+def extract_html_text(result: FetchResult) -> str:
+    """HTML から script/style を除いた本文テキストを返す（本文が変わっていなければ前回の解析結果を使う）。"""
+    cached = result.get_derived("html_text")
+    if cached is not None:
+        return cached
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(result.text, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text(separator='\n', strip=True)
+    result.set_derived("html_text", text)
+    return text
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # ワーカースレッドを使い回すことで、スレッドごとの Session（Keep-Alive 接続）も呼び出しをまたいで再利用される
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES, thread_name_prefix="http-fetch")
+        return _executor
+
+
+def map_concurrent(func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """
+    func を items に並列適用し、入力と同じ順序で結果を返す。
+    同時実行数はプロセス全体で MAX_CONCURRENT_FETCHES まで（ホストごとの制限は fetch 側で守る）。
+    func の中から map_concurrent を呼ばないこと（ワーカーを使い切ると待ち合わせが解けない）。
+    """
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    return list(_get_executor().map(func, items))
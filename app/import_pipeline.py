@@ -0,0 +1,204 @@
+# import_pipeline.py
+"""
+会話エクスポート（ChatGPT / Claude / 汎用テキスト）の段階的インポート
+
+各インポーターは、これまで「ファイル全体（または指定IDごとにファイル全体）を読み、
+スレッドを1つずつ変換し、最後にまとめて書く」流れを1スレッドで行っていたため、
+数百MBのエクスポートでは時間がかかり、途中で止まると最初からやり直しになっていた。
+ここでは処理を次の段に分ける。
+
+1. 読み取り: ijson でファイルを1回だけストリーミングし、対象のスレッドがそろった時点で読むのをやめる
+2. 変換: スレッドごとの変換をワーカープールで行い、結果をチェックポイントに書き出す
+   （読み取りと並行して進む。変換待ちのスレッド数は上限を設けてメモリを抑える）
+3. 組み立て: 変換済みのスレッドを指定順に結合し、ルームのファイルを書く（各インポーター側）
+
+チェックポイントは temp/import_checkpoints/ の下に、元ファイル・対象スレッド・ルーム名の組ごとに作られる。
+同じ条件でインポートをやり直すと、変換済みのスレッドは読み直さずに再利用し、作成済みのルームもそのまま使う。
+成功したらチェックポイントは削除する。
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import ijson
+
+CHECKPOINT_DIR = os.path.join("temp", "import_checkpoints")
+MAX_WORKERS = 4
+# 変換待ち（読み取り済み・未変換）のスレッド数の上限
+MAX_PENDING_UNITS = MAX_WORKERS * 2
+# これより古いチェックポイントは、新しいインポートの開始時に削除する
+CHECKPOINT_MAX_AGE_DAYS = 7
+# 元ファイルの同一性の判定に使う先頭・末尾のバイト数
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+
+class ImportStats:
+    """インポートの進捗とスループット（UI への表示用）。"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.bytes_read = 0
+        self.threads = 0
+        self.resumed_threads = 0
+
+    def summary(self) -> str:
+        elapsed = max(time.time() - self.started, 1e-6)
+        mb = self.bytes_read / (1024 * 1024)
+        text = (f"{self.threads}スレッド / {mb:.1f}MB を {elapsed:.1f}秒で処理 "
+                f"({self.threads / elapsed:.1f}スレッド/秒, {mb / elapsed:.1f}MB/秒)")
+        if self.resumed_threads:
+            text += f"、うち{self.resumed_threads}スレッドは前回の途中結果を再利用"
+        return text
+
+
+def _fingerprint(path: str) -> List[Any]:
+    """ファイルの同一性を表す値（アップロードし直してパスや mtime が変わっても同じになるもの）。"""
+    size = os.path.getsize(path)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if size > FINGERPRINT_SAMPLE_BYTES * 2:
+            f.seek(size - FINGERPRINT_SAMPLE_BYTES)
+            h.update(f.read())
+    return [os.path.basename(path), size, h.hexdigest()]
+
+
+def _write_json_atomic(path: str, data: Any):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _prune_checkpoints():
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return
+    limit = time.time() - CHECKPOINT_MAX_AGE_DAYS * 86400
+    for name in os.listdir(CHECKPOINT_DIR):
+        path = os.path.join(CHECKPOINT_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class ImportCheckpoint:
+    """1回のインポートの途中結果（変換済みスレッドと作成済みルーム）。"""
+
+    def __init__(self, kind: str, source_paths: List[str], unit_ids: List[str], room_name: str):
+        _prune_checkpoints()
+        identity = json.dumps([kind, [_fingerprint(p) for p in source_paths], list(unit_ids), room_name], ensure_ascii=False)
+        self.dir = os.path.join(CHECKPOINT_DIR, f"{kind}_{hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]}")
+        self._state_path = os.path.join(self.dir, "state.json")
+        self._lock = threading.Lock()
+        self._state = None
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(self._state, dict):
+            self._state = {"kind": kind, "room_name": room_name, "room_folder": None, "units": {},
+                           "created_at": datetime.datetime.now().isoformat()}
+        elif self._state.get("units"):
+            print(f"--- [ImportPipeline] 前回の途中結果から再開します: 変換済み {len(self._state['units'])}件 ({self.dir}) ---")
+
+    def _save_state(self):
+        os.makedirs(self.dir, exist_ok=True)
+        _write_json_atomic(self._state_path, self._state)
+
+    def is_done(self, unit_id: str) -> bool:
+        with self._lock:
+            return unit_id in self._state["units"]
+
+    def save_unit(self, unit_id: str, records: Any):
+        part_name = hashlib.sha1(unit_id.encode("utf-8")).hexdigest() + ".json"
+        os.makedirs(self.dir, exist_ok=True)
+        _write_json_atomic(os.path.join(self.dir, part_name), records)
+        with self._lock:
+            self._state["units"][unit_id] = part_name
+            self._save_state()
+
+    def load_unit(self, unit_id: str) -> Optional[Any]:
+        with self._lock:
+            part_name = self._state["units"].get(unit_id)
+        if not part_name:
+            return None
+        try:
+            with open(os.path.join(self.dir, part_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_room_folder(self) -> Optional[str]:
+        """前回のインポートで作成済みのルームのフォルダ名（まだ存在する場合）。"""
+        import constants
+        folder = self._state.get("room_folder")
+        if folder and os.path.isdir(os.path.join(constants.ROOMS_DIR, folder)):
+            return folder
+        return None
+
+    def set_room_folder(self, folder: str):
+        with self._lock:
+            self._state["room_folder"] = folder
+            self._save_state()
+
+    def discard(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def iter_json_items(path: str, prefix: str, stats: Optional[ImportStats] = None) -> Iterator[Any]:
+    """JSON ファイルの prefix 以下の要素をストリーミングで返す（読み進めたバイト数を stats に記録する）。"""
+    base = stats.bytes_read if stats else 0
+    with open(path, "rb") as f:
+        for item in ijson.items(f, prefix):
+            if stats:
+                stats.bytes_read = base + f.tell()
+            yield item
+
+
+def run_conversion(
+    checkpoint: ImportCheckpoint,
+    units: Iterable[Tuple[str, Any]],
+    convert: Callable[[Any], Any],
+    stats: Optional[ImportStats] = None,
+):
+    """
+    units（(ID, 元データ) の列）を convert でワーカープール上で変換し、結果をチェックポイントに保存する。
+    units は読み取りと同時に生成されるイテレータでよい。変換済みの ID はスキップする。
+    """
+    pending = set()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="import-convert") as executor:
+        def _convert_and_save(unit_id, raw):
+            checkpoint.save_unit(unit_id, convert(raw))
+
+        for unit_id, raw in units:
+            if checkpoint.is_done(unit_id):
+                continue
+            if len(pending) >= MAX_PENDING_UNITS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(_convert_and_save, unit_id, raw))
+            if stats:
+                stats.threads += 1
+        for future in pending:
+            future.result()
+
+
+def count_resumed(checkpoint: ImportCheckpoint, unit_ids: List[str], stats: Optional[ImportStats] = None) -> List[str]:
+    """変換が済んでいない ID を返し、済んでいるものは再利用した件数として stats に数える。"""
+    remaining = [uid for uid in unit_ids if not checkpoint.is_done(uid)]
+    if stats:
+        resumed = len(unit_ids) - len(remaining)
+        stats.resumed_threads += resumed
+        stats.threads += resumed
+    return remaining
@@ -0,0 +1,292 @@
+# intent_classifier.py
+"""
+RAG 検索クエリの意図（Intent-Aware Retrieval）のローカル分類
+
+これまで RAGManager.search は、検索のたびに処理用LLMへクエリ分類を問い合わせていた。
+ここでは API を使わずに次の2つの手がかりを合わせて分類する。
+
+- キーワード規則: 意図ごとの正規表現に一致したものを重み付きで数える
+- 最近傍セントロイド: INTENT_EXAMPLES（ラベル付きの例文）をクエリと同じエンベディングでベクトル化し、
+  意図ごとの平均ベクトルとクエリのベクトル（検索用に計算済みのもの）のコサイン類似度を比べる
+
+セントロイドはエンベディングモデルごとに1度だけ計算し、temp/intent_centroids/ に保存する。
+計算はバックグラウンドで行い、できるまではキーワード規則だけで分類する。
+セントロイドを使った結果（と LLM による判定結果）は (モデルID, クエリ) をキーにした LRU に保持する。
+
+classify() は意図名と確信度（1位と2位の差, 0〜1）を返す。確信度の低い場合に LLM へ問い合わせるかどうかは
+呼び出し側（RAGManager.classify_query_intent）が決める。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import constants
+
+CENTROID_CACHE_DIR = os.path.join("temp", "intent_centroids")
+CLASSIFICATION_CACHE_MAX_ENTRIES = 1024
+# セントロイドの計算に失敗した場合、次に試すまでの秒数
+CENTROID_RETRY_SECONDS = 600
+# セントロイドの類似度を確率に直すときの温度（エンベディングの類似度は差が小さいため低めにする）
+CENTROID_TEMPERATURE = 0.02
+# キーワード規則とセントロイドの両方が使える場合の、キーワード側の比重
+KEYWORD_WEIGHT = 0.5
+
+# 意図ごとのラベル付き例文（セントロイドの学習用）
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "emotional": [
+        "あの時どう思った？", "嬉しかったこと", "初めて会った日", "悲しかった出来事を覚えてる？",
+        "一番楽しかった思い出は？", "あの時泣いたよね", "感動したこと", "寂しかった時の話",
+        "怒ってたのはなぜ？", "どんな気持ちだった？", "幸せだと感じた瞬間", "怖かった体験",
+        "告白した日のこと", "ドキドキしたこと", "思い出に残っている会話",
+    ],
+    "factual": [
+        "猫の名前は？", "誕生日いつ？", "好きな食べ物", "住んでいる場所はどこ？",
+        "血液型は？", "好きな色は何？", "趣味は何だっけ", "苦手なもの",
+        "家族構成", "仕事は何をしている？", "好きな本のタイトル", "飼っているペット",
+        "身長はどれくらい？", "出身地", "好きな音楽のジャンル",
+    ],
+    "technical": [
+        "設定方法は？", "どうやって動かす？", "バージョン", "エラーの直し方",
+        "インストール手順", "APIキーの設定", "Pythonのコードの書き方", "モデルの切り替え方",
+        "ログの場所はどこ？", "起動しない時の対処", "アップデートの方法", "設定ファイルの項目",
+        "コマンドの使い方", "プログラムのバグ", "ツールの仕様",
+    ],
+    "temporal": [
+        "最近何した？", "昨日の話", "今週の予定", "先週何があった？",
+        "今日の出来事", "この前話したこと", "先月の旅行", "明日の約束",
+        "去年の今頃", "さっき言ってたこと", "週末の予定", "最近の調子",
+        "来月のイベント", "今朝のこと", "数日前の会話",
+    ],
+    "relational": [
+        "〇〇との関係は？", "誰と仲良い？", "どんな人？", "友達について",
+        "あの人のことどう思ってる？", "家族との関係", "誰が好き？", "仲の悪い人",
+        "知り合いの名前", "恋人について", "先輩との付き合い方", "彼女とはどういう関係？",
+        "一緒にいた人は誰？", "私のことどう思ってる？", "二人の関係",
+    ],
+}
+
+# 意図ごとのキーワード規則 (正規表現, 重み)
+KEYWORD_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "emotional": [
+        (r"気持ち|感じ(た|る)|思った|思い出|嬉し|うれし|悲し|かなし|楽し|寂し|さみし|怖|こわ", 1.0),
+        (r"泣い|怒っ|笑っ|感動|幸せ|ドキドキ|不安|辛|つら|好きになっ|初めて会", 1.0),
+        (r"\b(feel|felt|happy|sad|memor\w*|emotion\w*)\b", 0.8),
+    ],
+    "factual": [
+        (r"名前|誕生日|好きな|嫌いな|苦手|趣味|住所|住んで|出身|血液型|身長|年齢|何歳", 1.0),
+        (r"何(です|だ)っけ|って何|は何|はなに|どこ(に|で)?(ある|いる)", 0.6),
+        (r"\b(name|birthday|favou?rite|age)\b", 0.8),
+    ],
+    "technical": [
+        (r"設定|方法|やり方|手順|使い方|仕方|インストール|バージョン|エラー|バグ|不具合|動かな|起動", 1.0),
+        (r"コード|プログラム|スクリプト|API|モデル|ツール|コマンド|ファイル|フォルダ|アップデート", 0.8),
+        (r"\b(python|json|config|install|error|version|how to)\b", 0.8),
+        (r"どうやって|どうすれば", 0.6),
+    ],
+    "temporal": [
+        (r"最近|昨日|きのう|一昨日|今日|きょう|今朝|今夜|明日|あした|さっき|この前|先日|数日前", 1.0),
+        (r"(今|先|来)(週|月|年)|去年|昨年|週末|予定|いつ頃|何時", 1.0),
+        (r"\b(yesterday|today|tomorrow|recent\w*|last week|schedule)\b", 0.8),
+    ],
+    "relational": [
+        (r"関係|仲良|仲が|友達|友人|知り合い|恋人|彼氏|彼女|家族|両親|兄弟|姉妹|先輩|後輩|同僚", 1.0),
+        (r"どんな人|誰(と|が|の)|だれ(と|が|の)|(の|を)ことどう思", 1.0),
+        (r"\b(relationship|friends?|who is|family)\b", 0.8),
+    ],
+}
+
+_compiled_rules: Dict[str, List[Tuple["re.Pattern", float]]] = {
+    intent: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+    for intent, rules in KEYWORD_RULES.items()
+}
+
+_lock = threading.Lock()
+# (モデルID, 正規化済みクエリ) -> (意図, 確信度, 判定元)
+_classification_cache: "OrderedDict[Tuple[str, str], Tuple[str, float, str]]" = OrderedDict()
+# モデルID -> (意図名のリスト, 正規化済みセントロイドの行列)
+_centroids: Dict[str, Tuple[List[str], np.ndarray]] = {}
+# モデルID -> セントロイド計算を最後に始めた時刻（計算中・失敗後の再試行の間隔に使う）
+_centroid_attempts: Dict[str, float] = {}
+_stats = {"hits": 0, "keyword": 0, "centroid": 0, "combined": 0, "none": 0}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).split()).lower()
+
+
+def _examples_digest() -> str:
+    return hashlib.sha256(json.dumps(INTENT_EXAMPLES, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _centroid_path(model_id: str) -> str:
+    safe_model = re.sub(r'[^A-Za-z0-9_.-]', '_', model_id)
+    return os.path.join(CENTROID_CACHE_DIR, f"{safe_model}.json")
+
+
+def _build_matrix(centroids: Dict[str, List[float]]) -> Tuple[List[str], np.ndarray]:
+    intents = [intent for intent in constants.INTENT_WEIGHTS if intent in centroids]
+    matrix = np.asarray([centroids[intent] for intent in intents], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return intents, matrix / np.maximum(norms, 1e-12)
+
+
+def _load_centroids_from_disk(model_id: str) -> bool:
+    try:
+        with open(_centroid_path(model_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if data.get("examples_sha256") != _examples_digest() or not data.get("centroids"):
+        return False
+    with _lock:
+        _centroids[model_id] = _build_matrix(data["centroids"])
+    return True
+
+
+def _compute_centroids(model_id: str, embed_documents: Callable[[List[str]], List[List[float]]]):
+    """例文をベクトル化して意図ごとの平均を求め、メモリとディスクに保存する。"""
+    started = time.time()
+    try:
+        intents = [intent for intent in constants.INTENT_WEIGHTS if INTENT_EXAMPLES.get(intent)]
+        texts = [text for intent in intents for text in INTENT_EXAMPLES[intent]]
+        vectors = np.asarray(embed_documents(texts), dtype=np.float32)
+        if vectors.shape[0] != len(texts):
+            raise ValueError(f"ベクトル数が例文数と一致しません ({vectors.shape[0]} != {len(texts)})")
+        # 失敗時の詰め物（ゼロベクトル）は平均に含めない
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        valid = norms[:, 0] > 0
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        centroids = {}
+        offset = 0
+        for intent in intents:
+            count = len(INTENT_EXAMPLES[intent])
+            rows = vectors[offset:offset + count][valid[offset:offset + count]]
+            offset += count
+            if len(rows):
+                centroids[intent] = rows.mean(axis=0).tolist()
+        if len(centroids) < 2:
+            raise ValueError("有効なセントロイドが2つ未満です")
+
+        with _lock:
+            _centroids[model_id] = _build_matrix(centroids)
+        os.makedirs(CENTROID_CACHE_DIR, exist_ok=True)
+        path = _centroid_path(model_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model_id": model_id, "examples_sha256": _examples_digest(), "centroids": centroids}, f)
+        os.replace(tmp_path, path)
+        print(f"--- [IntentClassifier] セントロイドを作成しました ({model_id}, 例文{len(texts)}件, {time.time() - started:.2f}s) ---")
+    except Exception as e:
+        print(f"--- [IntentClassifier] セントロイドの作成に失敗しました（キーワード規則のみで分類します）: {e} ---")
+
+
+def ensure_centroids(model_id: str, embed_documents: Callable[[List[str]], List[List[float]]]) -> bool:
+    """
+    セントロイドが使えるなら True。なければディスクから読むか、バックグラウンドで計算を始めて False を返す。
+    """
+    with _lock:
+        if model_id in _centroids:
+            return True
+        last_attempt = _centroid_attempts.get(model_id)
+        if last_attempt is not None and time.time() - last_attempt < CENTROID_RETRY_SECONDS:
+            return False
+        _centroid_attempts[model_id] = time.time()
+    if _load_centroids_from_disk(model_id):
+        return True
+    threading.Thread(target=_compute_centroids, args=(model_id, embed_documents),
+                     daemon=True, name="intent-centroids").start()
+    return False
+
+
+def _keyword_scores(query: str) -> Dict[str, float]:
+    scores = {}
+    for intent, rules in _compiled_rules.items():
+        score = sum(weight * len(pattern.findall(query)) for pattern, weight in rules)
+        if score > 0:
+            scores[intent] = score
+    return scores
+
+
+def _centroid_probabilities(model_id: str, query_embedding: List[float]) -> Dict[str, float]:
+    with _lock:
+        entry = _centroids.get(model_id)
+    if entry is None:
+        return {}
+    intents, matrix = entry
+    vector = np.asarray(query_embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0 or vector.shape[0] != matrix.shape[1]:
+        return {}
+    similarities = matrix @ (vector / norm)
+    exps = np.exp((similarities - similarities.max()) / CENTROID_TEMPERATURE)
+    probabilities = exps / exps.sum()
+    return {intent: float(p) for intent, p in zip(intents, probabilities)}
+
+
+def classify(query: str, model_id: str = "", query_embedding: Optional[List[float]] = None) -> Tuple[str, float, str]:
+    """
+    クエリの意図を分類し、(意図, 確信度, 判定元) を返す。
+    判定元は "keyword" / "centroid" / "combined"、手がかりがなければ "none"（意図は DEFAULT_INTENT、確信度 0）。
+    """
+    key = (model_id, _normalize(query))
+    with _lock:
+        cached = _classification_cache.get(key)
+        if cached is not None:
+            _classification_cache.move_to_end(key)
+            _stats["hits"] += 1
+            return cached
+
+    keyword_scores = _keyword_scores(key[1])
+    keyword_total = sum(keyword_scores.values())
+    keyword_probs = {intent: score / keyword_total for intent, score in keyword_scores.items()}
+    centroid_probs = _centroid_probabilities(model_id, query_embedding) if query_embedding is not None else {}
+
+    if keyword_probs and centroid_probs:
+        source = "combined"
+        probs = {intent: KEYWORD_WEIGHT * keyword_probs.get(intent, 0.0) + (1 - KEYWORD_WEIGHT) * p
+                 for intent, p in centroid_probs.items()}
+    elif keyword_probs:
+        source, probs = "keyword", keyword_probs
+    elif centroid_probs:
+        source, probs = "centroid", centroid_probs
+    else:
+        source, probs = "none", {}
+
+    if probs:
+        ranked = sorted(probs.items(), key=lambda item: item[1], reverse=True)
+        intent = ranked[0][0]
+        confidence = ranked[0][1] - (ranked[1][1] if len(ranked) > 1 else 0.0)
+    else:
+        intent, confidence = constants.DEFAULT_INTENT, 0.0
+
+    result = (intent, round(confidence, 3), source)
+    # キーワード規則だけで出した結果は、ベクトルが渡されたとき（セントロイドの準備後）に出し直せるよう覚えない
+    if centroid_probs:
+        remember(query, model_id, result)
+    with _lock:
+        _stats[source] += 1
+    return result
+
+
+def remember(query: str, model_id: str, result: Tuple[str, float, str]):
+    """分類結果を LRU に登録する（LLM による判定結果の再利用にも使う）。"""
+    key = (model_id, _normalize(query))
+    with _lock:
+        _classification_cache[key] = result
+        _classification_cache.move_to_end(key)
+        while len(_classification_cache) > CLASSIFICATION_CACHE_MAX_ENTRIES:
+            _classification_cache.popitem(last=False)
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats, entries=len(_classification_cache), centroid_models=list(_centroids))
@@ -0,0 +1,165 @@
+# job_scheduler.py
+"""
+期限付きジョブのスケジューラ（優先度付きキュー）と、設定変更などの通知
+
+アラームや自律行動のチェックは、これまで毎分すべてのルームを巡回していた。
+ここでは各ジョブが「次に実行すべき時刻」を返し、スケジューラは最も早い期限まで眠る。
+
+- ジョブ関数は次回の実行時刻（time.time() の値）を返す。None を返すとジョブは登録解除される
+- add() で同じキーを登録し直すと、期限が置き換わる（変更イベントでの再計画に使う）
+- 実行中のジョブを remove() した場合は、ジョブが次回の時刻を返しても再登録しない
+- 実行ごとに「予定時刻からの遅れ」と「実行時間」を記録し、大きい場合はログに出す
+
+notify() / subscribe() は、設定やアラームの保存箇所からスケジューラ側へ変更を伝えるための軽い仕組み。
+保存側はこのモジュールだけを import すればよく、alarm_manager などの重いモジュールに依存しない。
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+# 壁時計の変化（スリープ復帰・時刻合わせ）に追従するため、これより長くは続けて眠らない
+MAX_SLEEP_SECONDS = 300
+# これを超える遅れ・実行時間はログに出す
+LAG_WARN_SECONDS = 5.0
+RUN_TIME_WARN_SECONDS = 1.0
+
+_listeners: Dict[str, List[Callable[..., None]]] = {}
+_listeners_lock = threading.Lock()
+
+
+def subscribe(event: str, callback: Callable[..., None]):
+    """イベントの購読を登録する。callback は notify を呼んだスレッドで実行されるため、軽い処理にすること。"""
+    with _listeners_lock:
+        _listeners.setdefault(event, []).append(callback)
+
+
+def notify(event: str, **payload):
+    """イベントを通知する（購読者がいなければ何もしない）。"""
+    with _listeners_lock:
+        callbacks = list(_listeners.get(event, []))
+    for callback in callbacks:
+        try:
+            callback(**payload)
+        except Exception as e:
+            print(f"--- [Scheduler] イベント '{event}' の処理でエラー: {e} ---")
+
+
+class JobScheduler:
+    """期限順にジョブを実行するスケジューラ。run() を専用スレッドで回す。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._heap = []
+        self._jobs: Dict[str, tuple] = {}  # key -> (func, due_at, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats: Dict[str, dict] = {}
+        # 実行中のジョブのキーと、実行中に remove() されたか
+        self._running_key: Optional[str] = None
+        self._running_removed = False
+
+    def add(self, key: str, func: Callable[[], Optional[float]], due_at: float):
+        """ジョブを登録する（同じキーがあれば置き換える）。"""
+        with self._cond:
+            seq = next(self._seq)
+            self._jobs[key] = (func, due_at, seq)
+            heapq.heappush(self._heap, (due_at, seq, key))
+            if key == self._running_key:
+                self._running_removed = False
+            self._cond.notify()
+
+    def remove(self, key: str):
+        with self._cond:
+            self._jobs.pop(key, None)
+            if key == self._running_key:
+                self._running_removed = True
+
+    def keys(self) -> List[str]:
+        with self._cond:
+            return list(self._jobs)
+
+    def get_due_at(self, key: str) -> Optional[float]:
+        with self._cond:
+            job = self._jobs.get(key)
+            return job[1] if job else None
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _pop_due(self, stop_event: threading.Event):
+        """期限が来たジョブを1件取り出す。止める要求があれば None。"""
+        with self._cond:
+            while not stop_event.is_set():
+                # 置き換え・削除済みの古いエントリを捨てる
+                while self._heap:
+                    due_at, seq, key = self._heap[0]
+                    job = self._jobs.get(key)
+                    if job is not None and job[2] == seq:
+                        break
+                    heapq.heappop(self._heap)
+                if self._heap:
+                    due_at, seq, key = self._heap[0]
+                    wait = due_at - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        func, _, _ = self._jobs.pop(key)
+                        self._running_key = key
+                        self._running_removed = False
+                        return key, func, due_at
+                else:
+                    wait = MAX_SLEEP_SECONDS
+                self._cond.wait(min(wait, MAX_SLEEP_SECONDS))
+            return None
+
+    def _record(self, key: str, lag: float, run_time: float):
+        stats = self._stats.setdefault(key, {"runs": 0, "total_run_sec": 0.0, "max_run_sec": 0.0, "max_lag_sec": 0.0})
+        stats["runs"] += 1
+        stats["last_run_sec"] = round(run_time, 3)
+        stats["last_lag_sec"] = round(lag, 3)
+        stats["total_run_sec"] += run_time
+        stats["max_run_sec"] = max(stats["max_run_sec"], run_time)
+        stats["max_lag_sec"] = max(stats["max_lag_sec"], lag)
+        if lag > LAG_WARN_SECONDS or run_time > RUN_TIME_WARN_SECONDS:
+            print(f"--- [Scheduler:{self.name}] {key}: 実行 {run_time:.2f}s / 予定からの遅れ {lag:.2f}s ---")
+
+    def run(self, stop_event: threading.Event):
+        """stop_event がセットされるまで、期限の来たジョブを順に実行する。"""
+        while True:
+            popped = self._pop_due(stop_event)
+            if popped is None:
+                return
+            key, func, due_at = popped
+            started = time.time()
+            next_due = None
+            try:
+                next_due = func()
+            except Exception as e:
+                print(f"!!! [Scheduler:{self.name}] ジョブ '{key}' の実行エラー: {e}")
+            self._record(key, started - due_at, time.time() - started)
+            # 実行中に add() で置き換えられても remove() されてもいなければ、ジョブが返した時刻で再登録する
+            with self._cond:
+                if next_due is not None and key not in self._jobs and not self._running_removed:
+                    seq = next(self._seq)
+                    self._jobs[key] = (func, next_due, seq)
+                    heapq.heappush(self._heap, (next_due, seq, key))
+                self._running_key = None
+                self._running_removed = False
+
+    def get_stats(self) -> Dict[str, dict]:
+        """ジョブごとの実行回数・実行時間・遅れと、次回予定時刻。"""
+        with self._cond:
+            result = {}
+            for key, stats in self._stats.items():
+                entry = dict(stats)
+                entry["avg_run_sec"] = round(stats["total_run_sec"] / stats["runs"], 3) if stats["runs"] else 0.0
+                entry["total_run_sec"] = round(stats["total_run_sec"], 3)
+                entry["max_run_sec"] = round(stats["max_run_sec"], 3)
+                entry["max_lag_sec"] = round(stats["max_lag_sec"], 3)
+                result[key] = entry
+            for key, (_, due_at, _) in self._jobs.items():
+                result.setdefault(key, {})["next_due"] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(due_at))
+            return result
@@ -1,7 +1,10 @@
 # llm_factory.py
 
 import os
-from typing import Any
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
 from langchain_google_genai import ChatGoogleGenerativeAI, HarmBlockThreshold, HarmCategory
 from langchain_openai import ChatOpenAI
 # from langchain_anthropic import ChatAnthropic # 遅延読み込みに変更
@@ -10,6 +13,44 @@ import utils
 import gemini_api # 既存のGemini設定ロジックを再利用するため
 
 class LLMFactory:
+    # 生成済みチャットモデルのプール {(provider, model, api_key, 生成パラメータ): ChatModel}
+    # 設定世代 (config_manager.CONFIG_GENERATION) が変わったら丸ごと破棄する。
+    _client_pool: "OrderedDict[tuple, Any]" = OrderedDict()
+    _client_pool_generation = 0
+    _client_pool_lock = threading.Lock()
+    CLIENT_POOL_MAX_SIZE = 32
+
+    @classmethod
+    def _get_pooled_client(cls, provider: str, model: str, api_key: str, params: dict, builder: Callable[[], Any]):
+        """
+        (provider, model, api_key, 生成パラメータ) をキーにチャットモデルを再利用する。
+        未登録の場合のみ builder() でインスタンスを生成してプールに追加する。
+        """
+        generation = config_manager.CONFIG_GENERATION
+        key = (provider, model, api_key or "", json.dumps(params, sort_keys=True, ensure_ascii=False, default=str))
+        with cls._client_pool_lock:
+            if cls._client_pool_generation != generation:
+                cls._client_pool.clear()
+                cls._client_pool_generation = generation
+            client = cls._client_pool.get(key)
+            if client is not None:
+                cls._client_pool.move_to_end(key)
+                return client
+
+        client = builder()
+        with cls._client_pool_lock:
+            if cls._client_pool_generation == generation:
+                cls._client_pool[key] = client
+                while len(cls._client_pool) > cls.CLIENT_POOL_MAX_SIZE:
+                    cls._client_pool.popitem(last=False)
+        return client
+
+    @classmethod
+    def clear_client_pool(cls):
+        """プール済みのチャットモデルを破棄する（APIキーやプロファイルの変更時など）。"""
+        with cls._client_pool_lock:
+            cls._client_pool.clear()
+
     @staticmethod
     def create_chat_model(
         model_name: str = None,
@@ -39,7 +80,8 @@ class LLMFactory:
             internal_role: [Phase 2] 内部処理のロール。"processing", "summarization", "supervisor"のいずれか。
                           指定すると、config.jsonの内部モデル設定に基づいてプロバイダとモデルを自動選択。
         """
-        config_manager.load_config() 
+        # config.json が変更されていなければ再読み込みしない（世代番号はクライアントプールのキーになる）
+        config_manager.load_config_if_changed()
         
         # --- [Phase 2] internal_role優先ロジック ---
         if internal_role:
@@ -70,10 +112,13 @@ class LLMFactory:
                     api_key = config_manager.get_active_gemini_api_key(None, model_name=sanitized_model_name)
                 if not api_key:
                     raise ValueError("Google provider requires an API key. No valid key found.")
-                return gemini_api.get_configured_llm(
-                    model_name=sanitized_model_name,
-                    api_key=api_key,
-                    generation_config=generation_config or {}
+                return LLMFactory._get_pooled_client(
+                    "google", sanitized_model_name, api_key, {"generation_config": generation_config or {}},
+                    lambda: gemini_api.get_configured_llm(
+                        model_name=sanitized_model_name,
+                        api_key=api_key,
+                        generation_config=generation_config or {}
+                    )
                 )
             elif active_provider == "local":
                 local_model_path = config_manager.LOCAL_MODEL_PATH
@@ -83,12 +128,15 @@ class LLMFactory:
                     raise ValueError(f"Local LLM requires a valid GGUF model path. Current: '{local_model_path}'")
                 try:
                     from langchain_community.chat_models import ChatLlamaCpp
-                    return ChatLlamaCpp(
-                        model_path=local_model_path,
-                        temperature=temperature,
-                        n_ctx=36000,
-                        n_gpu_layers=-1,
-                        verbose=False
+                    return LLMFactory._get_pooled_client(
+                        "local", local_model_path, None, {"temperature": temperature},
+                        lambda: ChatLlamaCpp(
+                            model_path=local_model_path,
+                            temperature=temperature,
+                            n_ctx=36000,
+                            n_gpu_layers=-1,
+                            verbose=False
+                        )
                     )
                 except ImportError as e:
                     raise ValueError(f"llama-cpp-python is not installed. (Internal) Details: {e}")
@@ -97,11 +145,15 @@ class LLMFactory:
                 if not anthropic_api_key:
                     raise ValueError("Anthropic provider requires an API key.")
                 from langchain_anthropic import ChatAnthropic
-                return ChatAnthropic(
-                    model_name=sanitized_model_name,
-                    anthropic_api_key=anthropic_api_key,
-                    temperature=temperature,
-                    top_p=top_p
+                return LLMFactory._get_pooled_client(
+                    "anthropic", sanitized_model_name, anthropic_api_key,
+                    {"temperature": temperature, "top_p": top_p},
+                    lambda: ChatAnthropic(
+                        model_name=sanitized_model_name,
+                        anthropic_api_key=anthropic_api_key,
+                        temperature=temperature,
+                        top_p=top_p
+                    )
                 )
             elif active_provider == "openai" or active_provider == "openai_official":
                 # 指定されたプロファイルの設定を取得
@@ -118,14 +170,22 @@ class LLMFactory:
                 if active_provider == "openai_official":
                     base_url = "https://api.openai.com/v1"
                 
-                return ChatOpenAI(
-                    base_url=base_url,
-                    api_key=openai_setting.get("api_key") or "dummy",
-                    model=sanitized_model_name,
-                    temperature=openai_setting.get("temperature", temperature),
-                    top_p=openai_setting.get("top_p", top_p),
-                    max_tokens=openai_setting.get("max_tokens"),
-                    streaming=True
+                openai_api_key = openai_setting.get("api_key") or "dummy"
+                target_temp = openai_setting.get("temperature", temperature)
+                target_top_p = openai_setting.get("top_p", top_p)
+                max_tokens = openai_setting.get("max_tokens")
+                return LLMFactory._get_pooled_client(
+                    f"openai:{base_url}", sanitized_model_name, openai_api_key,
+                    {"temperature": target_temp, "top_p": target_top_p, "max_tokens": max_tokens},
+                    lambda: ChatOpenAI(
+                        base_url=base_url,
+                        api_key=openai_api_key,
+                        model=sanitized_model_name,
+                        temperature=target_temp,
+                        top_p=target_top_p,
+                        max_tokens=max_tokens,
+                        streaming=True
+                    )
                 )
             else:
                 # 互換性維持: active_provider がプロファイルの可能性（旧形式）
@@ -161,15 +221,19 @@ class LLMFactory:
                 elif provider_name == "Moonshot AI" or "moonshot" in base_url:
                     if target_temp != 1.0: target_temp = 1.0
 
-                return ChatOpenAI(
-                    base_url=base_url,
-                    api_key=openai_api_key,
-                    model=sanitized_model_name,
-                    temperature=target_temp,
-                    top_p=target_top_p,
-                    max_tokens=max_tokens,
-                    max_retries=max_retries,
-                    streaming=True
+                return LLMFactory._get_pooled_client(
+                    f"openai:{base_url}", sanitized_model_name, openai_api_key,
+                    {"temperature": target_temp, "top_p": target_top_p, "max_tokens": max_tokens, "max_retries": max_retries},
+                    lambda: ChatOpenAI(
+                        base_url=base_url,
+                        api_key=openai_api_key,
+                        model=sanitized_model_name,
+                        temperature=target_temp,
+                        top_p=target_top_p,
+                        max_tokens=max_tokens,
+                        max_retries=max_retries,
+                        streaming=True
+                    )
                 )
         
         # --- 以下は既存ロジック（internal_role未指定時） ---
@@ -220,10 +284,13 @@ class LLMFactory:
             print(f"  - Model: {internal_model_name}")
             print(f"  - API Key: {key_name_for_log} ({masked_key})")
                 
-            return gemini_api.get_configured_llm(
-                model_name=internal_model_name,
-                api_key=api_key,
-                generation_config=generation_config
+            return LLMFactory._get_pooled_client(
+                "google", internal_model_name, api_key, {"generation_config": generation_config},
+                lambda: gemini_api.get_configured_llm(
+                    model_name=internal_model_name,
+                    api_key=api_key,
+                    generation_config=generation_config
+                )
             )
 
         # --- Local GGUF (llama-cpp-python) ---
@@ -240,12 +307,16 @@ class LLMFactory:
             
             try:
                 from langchain_community.chat_models import ChatLlamaCpp
-                return ChatLlamaCpp(
-                    model_path=local_model_path,
-                    temperature=temperature,
-                    n_ctx=36000, # Nexus Arkのプロンプト（30,000トークン超）を収めるため拡張
-                    n_gpu_layers=-1, # GPUをフル活用
-                    verbose=False
+                # GGUFの読み込みは重いため、同じパス・温度であれば生成済みインスタンスを使い回す
+                return LLMFactory._get_pooled_client(
+                    "local", local_model_path, None, {"temperature": temperature},
+                    lambda: ChatLlamaCpp(
+                        model_path=local_model_path,
+                        temperature=temperature,
+                        n_ctx=36000, # Nexus Arkのプロンプト（30,000トークン超）を収めるため拡張
+                        n_gpu_layers=-1, # GPUをフル活用
+                        verbose=False
+                    )
                 )
             except ImportError as e:
                 import traceback
@@ -348,16 +419,21 @@ class LLMFactory:
             print(f"  - Base URL: {base_url}")
             print(f"  - Model: {internal_model_name}")
 
-            return ChatOpenAI(
-                base_url=base_url,
-                api_key=openai_api_key,
-                model=internal_model_name,
-                temperature=target_temp,
-                top_p=target_top_p,
-                max_tokens=max_tokens,
-                max_retries=max_retries,
-                streaming=True,
-                model_kwargs=model_kwargs
+            return LLMFactory._get_pooled_client(
+                f"openai:{base_url}", internal_model_name, openai_api_key,
+                {"temperature": target_temp, "top_p": target_top_p, "max_tokens": max_tokens,
+                 "max_retries": max_retries, "model_kwargs": model_kwargs},
+                lambda: ChatOpenAI(
+                    base_url=base_url,
+                    api_key=openai_api_key,
+                    model=internal_model_name,
+                    temperature=target_temp,
+                    top_p=target_top_p,
+                    max_tokens=max_tokens,
+                    max_retries=max_retries,
+                    streaming=True,
+                    model_kwargs=model_kwargs
+                )
             )
 
         # --- Anthropic ---
@@ -396,15 +472,19 @@ class LLMFactory:
             # Anthropic は temperature と top_p の同時指定を許可しない場合があるため、
             # 優先度の高い temperature のみを指定するように修正。
             # (UIで両方が指定されていても、Anthropicの制約に従い片方のみを送信する)
-            return ChatAnthropic(
-                model_name=internal_model_name,
-                anthropic_api_key=anthropic_api_key,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                # top_p=top_p, # 同時指定不可のためコメントアウト
-                max_retries=max_retries,
-                streaming=True,
-                model_kwargs=model_kwargs
+            return LLMFactory._get_pooled_client(
+                "anthropic", internal_model_name, anthropic_api_key,
+                {"temperature": temperature, "max_tokens": max_tokens, "max_retries": max_retries, "model_kwargs": model_kwargs},
+                lambda: ChatAnthropic(
+                    model_name=internal_model_name,
+                    anthropic_api_key=anthropic_api_key,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    # top_p=top_p, # 同時指定不可のためコメントアウト
+                    max_retries=max_retries,
+                    streaming=True,
+                    model_kwargs=model_kwargs
+                )
             )
 
         else:
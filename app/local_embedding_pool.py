@@ -0,0 +1,247 @@
+# local_embedding_pool.py
+"""
+ローカルエンベディング (embedding_mode="local") 用のプロセスプール
+
+HuggingFaceEmbeddings を UI プロセス内で 10件ずつ呼ぶと、CPU のコアを使い切れないうえ
+GIL を握ったまま Gradio のワーカーを塞いでしまう。ここでは
+
+- ワーカープロセス（local_embedding_worker.py）ごとにモデルを1回だけ読み込む
+- 受け取ったテキストを長さ順に並べ、文字数の上限で区切った大きめのバッチにしてから各ワーカーへ配る
+  （長さの近いテキストをまとめることで、パディングによる無駄な計算を減らす）
+- 結果は元の順序に戻して返す
+
+ことで、索引作成時のベクトル化をプロセス並列にする。
+HuggingFaceEmbeddings と同じく改行を空白に置き換えてから SentenceTransformer.encode に渡すため、
+既存の索引とそのまま混在できる。
+
+config.json:
+- "local_embedding_workers": ワーカー数（0 = CPUコア数から自動決定）
+- "local_embedding_quantized_model_path": int8 量子化済みモデルのパス（任意）。
+  ONNX ファイル、または ONNX ファイルを含むディレクトリなら ONNX バックエンドで、
+  それ以外のディレクトリなら通常の SentenceTransformer モデルとして読み込む。
+"""
+
+import os
+import sys
+import queue
+import atexit
+import threading
+import subprocess
+from typing import List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from local_embedding_worker import read_message, write_message
+
+# 1サブバッチに含める最大件数と最大文字数（長いテキストばかりのバッチでメモリを使い過ぎないように）
+MAX_BATCH_SIZE = 64
+MAX_BATCH_CHARS = 24000
+# 自動決定時のワーカー数の上限（モデルはワーカーごとに読み込まれるため、メモリ消費に比例する）
+MAX_AUTO_WORKERS = 4
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_embedding_worker.py")
+
+_pool_lock = threading.Lock()
+_pool: Optional["LocalEmbeddingPool"] = None
+# 起動に失敗したプールの設定。同じ設定のまま RAGManager を作るたびに起動し直さないよう覚えておく
+_failed_key: Optional[Tuple[str, int, Optional[str]]] = None
+
+
+class WorkerDiedError(RuntimeError):
+    """ワーカープロセスが異常終了した（メモリ不足など）。"""
+
+
+class _Worker:
+    """local_embedding_worker.py を実行する1つのワーカープロセス。"""
+
+    def __init__(self, model_id: str, quantized_model_path: Optional[str], threads_per_worker: int):
+        args = [sys.executable, WORKER_SCRIPT, model_id, str(threads_per_worker)]
+        if quantized_model_path:
+            args.append(quantized_model_path)
+        # 標準エラーは UI プロセスのコンソールにそのまま流す
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def _receive(self):
+        try:
+            message = read_message(self.process.stdout)
+        except (OSError, ValueError) as e:
+            raise WorkerDiedError(f"ワーカープロセスとの通信に失敗しました: {e}") from e
+        if message is None:
+            raise WorkerDiedError(f"ワーカープロセスが終了しました (終了コード: {self.process.poll()})")
+        return message
+
+    def wait_ready(self):
+        status, payload = self._receive()
+        if status != "ready":
+            raise RuntimeError(f"ワーカープロセスでモデルを読み込めませんでした:\n{payload}")
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        try:
+            write_message(self.process.stdin, texts)
+        except (OSError, ValueError) as e:
+            raise WorkerDiedError(f"ワーカープロセスとの通信に失敗しました: {e}") from e
+        status, payload = self._receive()
+        if status != "ok":
+            raise RuntimeError(f"ワーカープロセスでのベクトル化に失敗しました:\n{payload}")
+        return payload
+
+    def close(self):
+        # 標準入力を閉じるとワーカーは終了する。処理中でも待たずに終了させる
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.poll() is None:
+            self.process.terminate()
+
+
+def _make_batches(texts: List[str]) -> List[List[int]]:
+    """テキストを長さ順に並べ、件数と文字数の上限で区切ったインデックスのバッチを返す。"""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batches, current, current_chars = [], [], 0
+    for i in order:
+        length = len(texts[i])
+        if current and (len(current) >= MAX_BATCH_SIZE or current_chars + length > MAX_BATCH_CHARS):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(i)
+        current_chars += length
+    if current:
+        batches.append(current)
+    return batches
+
+
+def get_default_worker_count() -> int:
+    cpu_count = os.cpu_count() or 1
+    return max(1, min(MAX_AUTO_WORKERS, cpu_count // 2))
+
+
+class LocalEmbeddingPool:
+    """モデルを読み込んだワーカープロセス群。"""
+
+    def __init__(self, model_id: str, workers: int, quantized_model_path: Optional[str] = None):
+        self.model_id = model_id
+        self.workers = workers
+        self.quantized_model_path = quantized_model_path
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        self.broken = False
+        # 空いているワーカー。embed の呼び出しが重なった場合も、1つのワーカーを同時に使うことはない
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        # 全ワーカーを先に起動してからモデルの読み込み完了を待つ（読み込みは並行して進む）
+        try:
+            for _ in range(workers):
+                self._workers.append(_Worker(model_id, quantized_model_path, threads_per_worker))
+            for worker in self._workers:
+                worker.wait_ready()
+        except Exception:
+            self.shutdown()
+            raise
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @property
+    def key(self) -> Tuple[str, int, Optional[str]]:
+        return self.model_id, self.workers, self.quantized_model_path
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = _make_batches(texts)
+        pending: "queue.SimpleQueue[List[int]]" = queue.SimpleQueue()
+        for batch in batches:
+            pending.put(batch)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        errors: List[Exception] = []
+
+        def drain():
+            # ワーカーを1つ借り、残りのバッチが無くなるまで処理する
+            worker = self._idle.get()
+            try:
+                while not errors:
+                    try:
+                        batch = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    for i, vector in zip(batch, worker.encode([texts[i] for i in batch])):
+                        results[i] = vector
+            except Exception as e:
+                if isinstance(e, WorkerDiedError):
+                    # 次の get_pool で作り直させる
+                    self.broken = True
+                errors.append(e)
+            finally:
+                self._idle.put(worker)
+
+        threads = [
+            threading.Thread(target=drain, name=f"local-embedding_{i}", daemon=True)
+            for i in range(min(self.workers, len(batches)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.close()
+
+
+class LocalPoolEmbeddings(Embeddings):
+    """
+    HuggingFaceEmbeddings の代わりに RAGManager._get_actual_embeddings が返すラッパー。
+    呼び出しのたびに get_pool を通すため、ワーカーの異常終了や設定変更後は自動で作り直される。
+    HuggingFaceEmbeddings と同じく改行を空白に置き換えてから渡す（既存の索引と同じベクトルになるように）。
+    """
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [text.replace("\n", " ") for text in texts]
+        return get_pool(self.model_id).embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_pool(self.model_id).embed([text.replace("\n", " ")])[0]
+
+
+def get_pool(model_id: str) -> LocalEmbeddingPool:
+    """
+    設定に合ったプールを返す（無ければ起動する）。モデルや設定が変わった場合は作り直す。
+    起動に失敗した場合は例外を送出する（呼び出し側で HuggingFaceEmbeddings にフォールバックする）。
+    """
+    global _pool, _failed_key
+    # ワーカープロセスの import を軽く保つため、設定はここで読む
+    import config_manager
+    workers = int(config_manager.CONFIG_GLOBAL.get("local_embedding_workers", 0) or 0) or get_default_worker_count()
+    quantized_model_path = config_manager.CONFIG_GLOBAL.get("local_embedding_quantized_model_path") or None
+    with _pool_lock:
+        if _pool is not None and not _pool.broken and _pool.key == (model_id, workers, quantized_model_path):
+            return _pool
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+        key = (model_id, workers, quantized_model_path)
+        if _failed_key == key:
+            raise RuntimeError("前回の起動に失敗したため、設定が変わるまでプロセスプールは使用しません")
+        print(f"[LocalEmbeddingPool] 起動中: {model_id} (ワーカー {workers}, 量子化モデル: {quantized_model_path or 'なし'})")
+        try:
+            _pool = LocalEmbeddingPool(model_id, workers, quantized_model_path)
+        except Exception:
+            _failed_key = key
+            raise
+        _failed_key = None
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,103 @@
+# local_embedding_worker.py
+"""
+local_embedding_pool のワーカープロセスのエントリポイント
+
+    python local_embedding_worker.py <model_id> <threads_per_worker> [quantized_model_path]
+
+multiprocessing の spawn は子プロセスで起動元のスクリプト（nexus_ark.py）を読み込み直すため、
+ワーカーはこのモジュールを直接実行する別プロセスとして起動する。
+モデルを1回だけ読み込み、標準入力から受け取ったテキストのリストをベクトル化して標準出力へ返す。
+メッセージは「4バイトの長さ + pickle」の形式で、起動完了時に ("ready", None)、
+以後は要求ごとに ("ok", vectors) または ("error", traceback) を返す。標準入力が閉じられたら終了する。
+
+UI プロセスから読み込まれても重いライブラリを import しないよう、トップレベルでは標準ライブラリのみを使う。
+"""
+
+import os
+import sys
+import pickle
+import struct
+import traceback
+from typing import Optional
+
+
+def read_message(stream):
+    """メッセージを1つ読む。相手が終了していた（EOF）場合は None を返す。"""
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (size,) = struct.unpack("<I", header)
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return pickle.loads(data)
+
+
+def write_message(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(struct.pack("<I", len(data)) + data)
+    stream.flush()
+
+
+def _load_model(model_id: str, quantized_model_path: Optional[str]):
+    from sentence_transformers import SentenceTransformer
+
+    if quantized_model_path:
+        path = os.path.abspath(quantized_model_path)
+        if os.path.isfile(path) and path.endswith(".onnx"):
+            model_dir, file_name = os.path.split(path)
+            # モデルディレクトリ直下の onnx/ に置かれていることが多いため、その場合は親ディレクトリを読む
+            if os.path.basename(model_dir) == "onnx":
+                model_dir, file_name = os.path.dirname(model_dir), f"onnx/{file_name}"
+            return SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": file_name})
+        if os.path.isdir(path):
+            onnx_files = sorted(
+                os.path.relpath(os.path.join(root, f), path).replace(os.sep, "/")
+                for root, _, files in os.walk(path) for f in files if f.endswith(".onnx")
+            )
+            if onnx_files:
+                # 量子化済み (qint8/quantized) のファイルを優先する
+                onnx_files.sort(key=lambda f: ("int8" not in f and "quantized" not in f, f))
+                return SentenceTransformer(path, backend="onnx", model_kwargs={"file_name": onnx_files[0]})
+            return SentenceTransformer(path)
+        print(f"[LocalEmbeddingPool] 量子化モデルが見つかりません ({quantized_model_path})。通常のモデルを使用します。")
+    return SentenceTransformer(model_id)
+
+
+def main():
+    model_id = sys.argv[1]
+    threads_per_worker = int(sys.argv[2])
+    quantized_model_path = sys.argv[3] if len(sys.argv) > 3 else None
+
+    requests_in = sys.stdin.buffer
+    # 応答用にもとの標準出力を確保し、ライブラリの print などはすべて標準エラーへ流す（メッセージが壊れないように）
+    responses_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    try:
+        try:
+            import torch
+            torch.set_num_threads(max(1, threads_per_worker))
+        except Exception:
+            pass
+        model = _load_model(model_id, quantized_model_path)
+    except Exception:
+        write_message(responses_out, ("error", traceback.format_exc()))
+        return
+    write_message(responses_out, ("ready", None))
+
+    while True:
+        texts = read_message(requests_in)
+        if texts is None:
+            break
+        try:
+            vectors = model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+            write_message(responses_out, ("ok", [list(map(float, v)) for v in vectors]))
+        except Exception:
+            write_message(responses_out, ("error", traceback.format_exc()))
+
+
+if __name__ == "__main__":
+    main()
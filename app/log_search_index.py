@@ -0,0 +1,506 @@
+# log_search_index.py
+"""
+会話ログのキーワード検索用 永続転置インデックス
+
+search_past_conversations / retrieval_node のキーワード検索は、これまで
+毎回すべてのログファイルを readlines() して全行を走査していた。
+このモジュールはルームごとに「文字n-gram → メッセージ番号」の転置インデックスを
+ディスク (characters/<room>/cache/log_search_index/) に保持し、
+候補メッセージだけをバイトオフセットで直接読み出して照合する。
+
+【構成】
+- ソースファイル（logs/YYYY-MM.txt 等）1つにつき1つのインデックスJSON
+  - messages: [バイトオフセット, バイト長, ロール, 日付] のリスト
+  - postings: n-gram(1文字/2文字) → メッセージ番号リスト
+- 追記は .journal (JSONL) に1行追加するだけで済ませ、一定件数で本体へ畳み込む
+- 各インデックスはソースの size/mtime を記録し、不一致なら該当ファイルのみ再構築する
+- 読み込んだインデックスはプロセス内に MAX_LOADED_INDICES 件まで保持する（LRU）
+- 読み込み・追記・破棄はルーム単位のロックで直列にする（別のルームの検索は並行して進む）
+- メッセージの区切り（ヘッダー行の判定）と最終的な照合は、以前の線形走査と同じ規則で行う。
+  インデックスは候補の絞り込みにだけ使う
+"""
+
+import os
+import re
+import json
+import glob
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import constants
+
+# 2: ヘッダー行の判定を以前の線形走査と同じ規則にした
+INDEX_VERSION = 2
+INDEX_DIR_NAME = "log_search_index"
+# ジャーナルがこの件数を超えたら本体JSONへ畳み込む
+JOURNAL_COMPACT_THRESHOLD = 200
+# プロセス内に保持するインデックス（ソースファイル単位）の上限
+MAX_LOADED_INDICES = 64
+
+# 以前の線形走査と同じく、strip() した行がこれに一致すればヘッダーとみなす
+_HEADER_PATTERN = re.compile(r'^## (USER|AGENT|SYSTEM):.*$')
+_DATE_PATTERNS = [
+    re.compile(r'(\d{4}-\d{2}-\d{2}) \(...\) \d{2}:\d{2}:\d{2}'),
+    re.compile(r'###\s*(\d{4}-\d{2}-\d{2})')
+]
+_MONTHLY_LOG_PATTERN = re.compile(r"^\d{4}-\d{2}\.txt$")
+
+# プロセス内キャッシュ（LRU）: キー = インデックスJSONのパス, 値 = ソース単位のインデックス辞書
+_loaded_indices: "OrderedDict[str, Dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+# ルームのディレクトリ（絶対パス） -> そのルームのインデックス操作を直列にするロック
+_room_locks: Dict[str, threading.RLock] = {}
+_room_locks_guard = threading.Lock()
+
+
+def _room_lock(room_dir: str) -> threading.RLock:
+    with _room_locks_guard:
+        return _room_locks.setdefault(room_dir, threading.RLock())
+
+
+def _get_cached(index_path: str) -> Optional[Dict]:
+    with _cache_lock:
+        index = _loaded_indices.get(index_path)
+        if index is not None:
+            _loaded_indices.move_to_end(index_path)
+        return index
+
+
+def _put_cached(index_path: str, index: Dict):
+    with _cache_lock:
+        _loaded_indices[index_path] = index
+        _loaded_indices.move_to_end(index_path)
+        while len(_loaded_indices) > MAX_LOADED_INDICES:
+            _loaded_indices.popitem(last=False)
+
+
+def _drop_cached(index_path: str):
+    with _cache_lock:
+        _loaded_indices.pop(index_path, None)
+
+
+# --- n-gram ---
+
+def _grams_of(text: str) -> set:
+    """小文字化したテキストから、空白を含まない1文字・2文字のn-gram集合を作る。"""
+    lowered = text.lower()
+    grams = {ch for ch in lowered if not ch.isspace()}
+    for i in range(len(lowered) - 1):
+        pair = lowered[i:i + 2]
+        if not pair[0].isspace() and not pair[1].isspace():
+            grams.add(pair)
+    return grams
+
+
+def _query_grams(keyword: str) -> List[str]:
+    """キーワードの検索に使う n-gram。2文字以上ならbigram、1文字ならそのまま。"""
+    if len(keyword) == 1:
+        return [keyword]
+    return [keyword[i:i + 2] for i in range(len(keyword) - 1)]
+
+
+def _scan_headers(data: bytes) -> List[Tuple[int, str]]:
+    """
+    ログのバイト列から [(ヘッダー行のオフセット, ロール), ...] を返す。
+    以前の線形走査（readlines() した各行を strip() してヘッダーの形式に一致するか調べる）と同じ規則なので、
+    本文中にヘッダー形式の行があれば、そこでも区切られる。
+    """
+    headers = []
+    pos = 0
+    for line in data.splitlines(keepends=True):
+        if b"## " in line:
+            m = _HEADER_PATTERN.match(line.decode("utf-8", errors="replace").strip())
+            if m:
+                headers.append((pos, m.group(1)))
+        pos += len(line)
+    return headers
+
+
+def _decode_block(raw: bytes) -> str:
+    """テキストモードで読んだ場合と同じく、改行を \\n にそろえて前後の空白を除く。"""
+    return raw.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def _extract_date(block_content: str) -> Optional[str]:
+    for pattern in _DATE_PATTERNS:
+        matches = list(pattern.finditer(block_content))
+        if matches:
+            return matches[-1].group(1)
+    return None
+
+
+# --- パス ---
+
+def _get_index_dir(room_dir: str) -> str:
+    return os.path.join(room_dir, "cache", INDEX_DIR_NAME)
+
+
+def _get_index_path(room_dir: str, source_path: str) -> str:
+    rel = os.path.relpath(source_path, room_dir).replace("\\", "/")
+    key = rel.replace("/", "__")
+    return os.path.join(_get_index_dir(room_dir), f"{key}.json")
+
+
+def _get_journal_path(index_path: str) -> str:
+    return index_path[:-len(".json")] + ".journal"
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+
+def get_live_log_files(room_dir: str) -> List[str]:
+    """現行の会話ログ（logs/YYYY-MM.txt、未移行なら log.txt）を古い順に返す。"""
+    logs_dir = os.path.join(room_dir, constants.LOGS_DIR_NAME)
+    files = []
+    if os.path.isdir(logs_dir):
+        files = sorted(
+            f for f in glob.glob(os.path.join(logs_dir, "*.txt"))
+            if _MONTHLY_LOG_PATTERN.match(os.path.basename(f))
+        )
+    legacy_log = os.path.join(room_dir, "log.txt")
+    if not files and os.path.exists(legacy_log):
+        files = [legacy_log]
+    return files
+
+
+def get_archive_log_files(room_dir: str) -> List[str]:
+    """除外処理の対象外となる過去ログ（アーカイブ・インポート元）を返す。"""
+    files = []
+    files.extend(sorted(glob.glob(os.path.join(room_dir, "log_archives", "*.txt"))))
+    files.extend(sorted(glob.glob(os.path.join(room_dir, "log_import_source", "*.txt"))))
+    return files
+
+
+# --- 構築・読み込み・保存 ---
+
+def _read_block(source_path: str, offset: int, length: int) -> str:
+    with open(source_path, "rb") as f:
+        f.seek(offset)
+        raw = f.read(length)
+    return _decode_block(raw)
+
+
+def _add_message(index: Dict, offset: int, length: int, role: str, block_content: str):
+    msg_id = len(index["messages"])
+    index["messages"].append([offset, length, role, _extract_date(block_content)])
+    postings = index["postings"]
+    for gram in _grams_of(block_content):
+        postings.setdefault(gram, []).append(msg_id)
+
+
+def _build_index(source_path: str) -> Optional[Dict]:
+    """ソースファイルを1回だけ走査し、ヘッダー位置と n-gram を記録する。"""
+    signature = _file_signature(source_path)
+    if signature is None:
+        return None
+    index = {
+        "version": INDEX_VERSION,
+        "size": signature[0],
+        "mtime": signature[1],
+        "messages": [],
+        "postings": {},
+    }
+    try:
+        with open(source_path, "rb") as f:
+            data = f.read()
+    except Exception as e:
+        print(f"警告: [LogSearchIndex] 読み込みエラー ({os.path.basename(source_path)}): {e}")
+        return None
+
+    headers = _scan_headers(data)
+    for i, (offset, role) in enumerate(headers):
+        end = headers[i + 1][0] if i + 1 < len(headers) else len(data)
+        _add_message(index, offset, end - offset, role, _decode_block(data[offset:end]))
+    return index
+
+
+def _save_index(index_path: str, index: Dict):
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
+    journal_path = _get_journal_path(index_path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+def _replay_journal(index: Dict, index_path: str, source_path: str) -> Tuple[bool, int]:
+    """
+    ジャーナルを本体インデックスに適用する。
+    各行の prev_size が直前のサイズと連続していなければ整合性なしとして False を返す。
+    """
+    journal_path = _get_journal_path(index_path)
+    if not os.path.exists(journal_path):
+        return True, 0
+    applied = 0
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get("prev_size") != index["size"]:
+                return False, applied
+            block_content = _read_block(source_path, entry["offset"], entry["length"])
+            _add_message(index, entry["offset"], entry["length"], entry["role"], block_content)
+            index["size"] = entry["size"]
+            index["mtime"] = entry["mtime"]
+            applied += 1
+    return True, applied
+
+
+def _load_source_index(room_dir: str, source_path: str) -> Optional[Dict]:
+    """
+    ソース1ファイル分のインデックスを取得する。
+    プロセス内キャッシュ → ディスク(本体+ジャーナル) → 再構築 の順に試し、
+    いずれの段階でも size/mtime がソースと一致しなければ作り直す。
+    """
+    signature = _file_signature(source_path)
+    if signature is None:
+        return None
+    index_path = _get_index_path(room_dir, source_path)
+
+    cached = _get_cached(index_path)
+    if cached and (cached["size"], cached["mtime"]) == signature:
+        return cached
+
+    index = None
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                index = None
+            else:
+                ok, applied = _replay_journal(index, index_path, source_path)
+                if not ok or (index["size"], index["mtime"]) != signature:
+                    index = None
+                elif applied >= JOURNAL_COMPACT_THRESHOLD:
+                    _save_index(index_path, index)
+        except Exception as e:
+            print(f"警告: [LogSearchIndex] インデックス破損のため再構築します ({os.path.basename(index_path)}): {e}")
+            index = None
+
+    if index is None:
+        index = _build_index(source_path)
+        if index is None:
+            return None
+        try:
+            _save_index(index_path, index)
+        except Exception as e:
+            print(f"警告: [LogSearchIndex] インデックス保存失敗 ({os.path.basename(index_path)}): {e}")
+        print(f"--- [LogSearchIndex] 再構築: {os.path.basename(source_path)} ({len(index['messages'])}件) ---")
+
+    _put_cached(index_path, index)
+    return index
+
+
+# --- 増分更新 (utils のログ書き込み処理から呼ばれる) ---
+
+def notify_message_appended(log_file_path: str, offset: int, header: str, text_content: str):
+    """
+    save_message_to_log による追記をインデックスへ反映する。
+    offset は追記前のファイルサイズ。追記された範囲をファイルから読み直し、構築時と同じ規則でヘッダーを探す
+    （本文にヘッダー形式の行が含まれていれば、再構築した場合と同じく複数のメッセージに分かれる）。
+    本体JSONは書き換えず、ジャーナルへメッセージごとに1行追記するだけにとどめる。
+    インデックスが未作成のソースは何もしない（初回検索時に構築される）。
+    """
+    try:
+        room_dir = _room_dir_of(log_file_path)
+        index_path = _get_index_path(room_dir, log_file_path)
+
+        with _room_lock(room_dir):
+            cached = _get_cached(index_path)
+            if cached is None and not os.path.exists(index_path):
+                return
+            signature = _file_signature(log_file_path)
+            if signature is None:
+                return
+            with open(log_file_path, "rb") as f:
+                f.seek(offset)
+                appended = f.read(signature[0] - offset)
+            headers = _scan_headers(appended)
+            if not headers or headers[0][0] != 0:
+                # 追記分がヘッダーで始まらない（直前のメッセージの続きになる）。作り直させる
+                invalidate_source(log_file_path)
+                return
+
+            entries = []
+            for i, (start, role) in enumerate(headers):
+                end = headers[i + 1][0] if i + 1 < len(headers) else len(appended)
+                entries.append({
+                    "offset": offset + start, "length": end - start, "role": role,
+                    "prev_size": offset + start, "size": offset + end, "mtime": signature[1],
+                    "content": _decode_block(appended[start:end]),
+                })
+
+            if cached is not None:
+                if cached["size"] == offset:
+                    for entry in entries:
+                        _add_message(cached, entry["offset"], entry["length"], entry["role"], entry["content"])
+                    cached["size"], cached["mtime"] = signature
+                else:
+                    # 想定外の外部変更があった場合は次回読み込み時に検証させる
+                    _drop_cached(index_path)
+
+            if not os.path.exists(index_path):
+                return
+            with open(_get_journal_path(index_path), "a", encoding="utf-8") as f:
+                for entry in entries:
+                    entry.pop("content")
+                    f.write(json.dumps(entry) + "\n")
+    except Exception as e:
+        print(f"警告: [LogSearchIndex] 追記の反映に失敗: {e}")
+
+
+def invalidate_source(log_file_path: str):
+    """
+    削除・切り詰め・上書きされたログのインデックスを破棄する。
+    他の月のインデックスには触れず、該当ファイルのみ次回検索時に再構築される。
+    """
+    try:
+        room_dir = _room_dir_of(log_file_path)
+        index_path = _get_index_path(room_dir, log_file_path)
+        with _room_lock(room_dir):
+            _drop_cached(index_path)
+            for p in (index_path, _get_journal_path(index_path)):
+                if os.path.exists(p):
+                    os.remove(p)
+    except Exception as e:
+        print(f"警告: [LogSearchIndex] インデックス破棄に失敗: {e}")
+
+
+def _room_dir_of(log_file_path: str) -> str:
+    parent = os.path.dirname(os.path.abspath(log_file_path))
+    if os.path.basename(parent) in (constants.LOGS_DIR_NAME, "log_archives", "log_import_source"):
+        return os.path.dirname(parent)
+    return parent
+
+
+# --- 検索 ---
+
+def _match_ids(index: Dict, keyword_terms: List[List[str]]) -> Iterable[int]:
+    """
+    いずれかのキーワードについて、その語（空白で区切った各語）の n-gram をすべて含むメッセージ番号（候補）を返す。
+    n-gram は空白をまたがないため、空白を含むキーワードは語ごとの候補の積集合で絞り込む。
+    候補の絞り込みにだけ使い、キーワードそのものを含むかは読み出したブロックで確認する。
+    """
+    postings = index["postings"]
+    candidates = set()
+    for terms in keyword_terms:
+        ids = None
+        for gram in (g for term in terms for g in _query_grams(term)):
+            gram_ids = postings.get(gram)
+            if not gram_ids:
+                ids = set()
+                break
+            ids = set(gram_ids) if ids is None else ids & set(gram_ids)
+            if not ids:
+                break
+        if ids:
+            candidates |= ids
+    return sorted(candidates)
+
+
+def search(
+    room_name: str,
+    keywords: List[str],
+    exclude_recent_count: int = 0,
+    roles: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Optional[str]]]:
+    """
+    会話ログからキーワード（部分一致・OR）を含むメッセージブロックを返す。
+    以前の線形走査と同じく、キーワードはいずれかの行にそのまま（空白も含めて）含まれればマッチする。
+
+    Args:
+        room_name: ルーム名
+        keywords: 検索キーワード
+        exclude_recent_count: 現行ログの末尾から除外するメッセージ数（roles でカウント）
+        roles: 対象とするロール（例: ("USER", "AGENT")）。None なら全ロール。
+               指定した場合、それ以外のロールのヘッダーは区切りとみなさず、直前のメッセージのブロックに含める
+
+    Returns:
+        {"content", "date", "source"} のリスト（ファイル順・ファイル内の出現順）
+    """
+    search_keywords = [k.lower() for k in keywords if k and k.strip()]
+    if not search_keywords or not room_name:
+        return []
+    keyword_terms = [k.split() for k in search_keywords]
+    role_set = {r.upper() for r in roles} if roles else None
+    room_dir = os.path.abspath(os.path.join(constants.ROOMS_DIR, room_name))
+
+    live_files = get_live_log_files(room_dir)
+    sources = [(p, False) for p in get_archive_log_files(room_dir)]
+    sources.extend((p, True) for p in live_files)
+
+    with _room_lock(room_dir):
+        loaded = []
+        for source_path, is_live in sources:
+            index = _load_source_index(room_dir, source_path)
+            if index and index["messages"]:
+                loaded.append((source_path, is_live, index))
+
+        # 現行ログの末尾から exclude_recent_count 件を除外するため、ファイルごとの上限番号を求める
+        cutoff_by_path: Dict[str, int] = {}
+        remaining = exclude_recent_count
+        for source_path, is_live, index in reversed(loaded):
+            if not is_live:
+                continue
+            messages = index["messages"]
+            cutoff = len(messages)
+            while remaining > 0 and cutoff > 0:
+                cutoff -= 1
+                if role_set is None or messages[cutoff][2] in role_set:
+                    remaining -= 1
+            cutoff_by_path[source_path] = cutoff
+
+        found_blocks = []
+        for source_path, is_live, index in loaded:
+            messages = index["messages"]
+            limit = cutoff_by_path.get(source_path, len(messages))
+            if limit <= 0:
+                continue
+            # ブロックの区切りになるメッセージ（対象ロールのヘッダー）の番号
+            boundary_ids = [i for i, m in enumerate(messages) if role_set is None or m[2] in role_set]
+            # 候補を、それを含むブロックの先頭のメッセージ番号にまとめる（最初の区切りより前は対象外）
+            block_ids = sorted({
+                boundary_ids[pos - 1]
+                for pos in (bisect.bisect_right(boundary_ids, msg_id) for msg_id in _match_ids(index, keyword_terms))
+                if pos > 0
+            })
+            processed_blocks_content = set()
+            source_name = os.path.basename(source_path)
+            try:
+                with open(source_path, "rb") as f:
+                    for block_id in block_ids:
+                        if block_id >= limit:
+                            break
+                        offset = messages[block_id][0]
+                        pos = bisect.bisect_right(boundary_ids, block_id)
+                        end = messages[boundary_ids[pos]][0] if pos < len(boundary_ids) else index["size"]
+                        f.seek(offset)
+                        block_content = _decode_block(f.read(end - offset))
+                        # n-gram は候補抽出のみなので、最終的な部分一致はここで行ごとに確認する
+                        if not any(k in line for line in block_content.lower().split("\n") for k in search_keywords):
+                            continue
+                        if block_content in processed_blocks_content:
+                            continue
+                        processed_blocks_content.add(block_content)
+                        found_blocks.append({
+                            "content": block_content,
+                            "date": _extract_date(block_content),
+                            "source": source_name,
+                        })
+            except Exception as e:
+                print(f"警告: [LogSearchIndex] 検索中の読み込みエラー ({source_name}): {e}")
+                continue
+
+    return found_blocks
@@ -0,0 +1,243 @@
+# mcp_session_pool.py
+"""
+MCP サーバとの常駐セッションプール
+
+これまでツール呼び出しのたびに「OSスレッド + イベントループ + トランスポート + ClientSession + initialize()」
+を作り直しており、stdio サーバでは呼び出しごとにサブプロセスを起動していた。
+ここでは
+
+- バックグラウンドの asyncio ループ1本（デーモンスレッド）ですべての MCP 通信を行う
+- サーバごとに ClientSession を張ったまま保持し、複数の呼び出しを同じセッション上で並行させる
+  （MCP は JSON-RPC のリクエストIDで応答を対応付けるため、そのまま多重化できる）
+- 一定間隔で ping してセッションの生存を確認し、切れていれば次の呼び出しで再接続する
+  （呼び出しの再試行は、要求を送る前に失敗した場合だけに限る）
+- 接続に失敗したサーバは指数バックオフで再接続を間引く
+
+ことで、ツール呼び出しの待ち時間をサーバ側の処理時間だけに近づける。
+
+トランスポートやセッションのコンテキスト (anyio のタスクグループ) は、開いたタスクの中で閉じる必要があるため、
+接続ごとに「所有タスク」を立て、その中で開いて、閉じる要求 (または ping 失敗) まで待機させる。
+"""
+
+import time
+import json
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+# ping によるヘルスチェックの間隔（秒）
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_CHECK_TIMEOUT = 10
+# 接続失敗時の再接続バックオフ（秒）
+RECONNECT_BACKOFF_INITIAL = 1.0
+RECONNECT_BACKOFF_MAX = 60.0
+# バックオフの残りがこれ以下なら待ってから再接続し、長ければすぐにエラーを返す（エージェントを長く待たせない）
+RECONNECT_MAX_INLINE_WAIT = 5.0
+# ツール呼び出しの既定タイムアウト（秒）。サーバ設定の "timeout" で上書きできる
+DEFAULT_CALL_TIMEOUT = 120
+CLOSE_TIMEOUT = 10
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+# ループスレッド内でのみ触る状態
+_connections: Dict[str, "_ServerConnection"] = {}
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop_thread is None or not _loop_thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="mcp-session-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run(coro, timeout: Optional[float] = None):
+    """コルーチンを常駐ループで実行し、結果を同期的に返す。"""
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("MCPセッションループ内から同期呼び出しはできません。")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"MCPの呼び出しが {timeout} 秒以内に完了しませんでした。")
+
+
+def server_key(server_conf: Dict[str, Any]) -> str:
+    """接続の同一性を表すキー（接続先に関わる設定だけを使う）。"""
+    fields = {k: server_conf.get(k) for k in ("name", "type", "command", "args", "env", "url")}
+    return json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class _ServerConnection:
+    """1つの MCP サーバとの常駐セッション。"""
+
+    def __init__(self, server_conf: Dict[str, Any], transport_factory: Callable[[], Any]):
+        self.name = server_conf.get("name", "unknown")
+        self._transport_factory = transport_factory
+        self.session = None
+        self._owner_task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._connect_lock = asyncio.Lock()
+        self._failures = 0
+        self._next_retry_at = 0.0
+
+    async def get_session(self):
+        if self.session is not None:
+            return self.session
+        async with self._connect_lock:
+            if self.session is not None:
+                return self.session
+
+            wait = self._next_retry_at - time.monotonic()
+            if wait > 0:
+                if wait > RECONNECT_MAX_INLINE_WAIT:
+                    raise ConnectionError(f"MCPサーバ '{self.name}' は再接続待機中です（残り約{wait:.0f}秒）")
+                await asyncio.sleep(wait)
+
+            ready = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._owner_task = asyncio.create_task(self._own_session(ready, self._closing))
+            try:
+                session = await ready
+            except BaseException:
+                self._failures += 1
+                backoff = min(RECONNECT_BACKOFF_MAX, RECONNECT_BACKOFF_INITIAL * (2 ** (self._failures - 1)))
+                self._next_retry_at = time.monotonic() + backoff
+                print(f"  - [MCP] '{self.name}' への接続に失敗しました（{backoff:.0f}秒後まで再接続を控えます）")
+                raise
+            self._failures = 0
+            self.session = session
+            return session
+
+    async def _own_session(self, ready: asyncio.Future, closing: asyncio.Event):
+        """トランスポートとセッションを開き、閉じる要求か ping 失敗まで保持する（所有タスク）。"""
+        from mcp import ClientSession
+
+        try:
+            async with self._transport_factory() as (read, write):
+                async with ClientSession(read, write) as session:
+                    perf_start = time.time()
+                    await session.initialize()
+                    print(f"  - [MCP] '{self.name}' に接続しました ({time.time() - perf_start:.2f}s)")
+                    ready.set_result(session)
+                    while not closing.is_set():
+                        try:
+                            await asyncio.wait_for(closing.wait(), timeout=HEALTH_CHECK_INTERVAL)
+                        except asyncio.TimeoutError:
+                            try:
+                                await asyncio.wait_for(session.send_ping(), timeout=HEALTH_CHECK_TIMEOUT)
+                            except Exception as e:
+                                print(f"  - [MCP] '{self.name}' のヘルスチェックに失敗しました（次回の呼び出しで再接続）: {e}")
+                                break
+        except BaseException as e:
+            if not ready.done():
+                if isinstance(e, asyncio.CancelledError):
+                    ready.cancel()
+                else:
+                    ready.set_exception(e)
+            elif not closing.is_set():
+                print(f"  - [MCP] '{self.name}' との接続が切れました: {e}")
+        finally:
+            self.session = None
+            if not ready.done():
+                ready.set_exception(ConnectionError(f"MCPサーバ '{self.name}' への接続が確立できませんでした。"))
+
+    async def request(self, operation: Callable[[Any], Any]):
+        """
+        セッション上で operation(session) を実行する。
+        要求をサーバへ送る前の失敗（接続の確立に失敗した・既に閉じていた接続に書き込もうとした）に限り、
+        1度だけ再接続して再試行する。送信後の失敗は、サーバ側で実行済みかもしれない
+        （再試行すると副作用のあるツールが二重に実行されうる）ため、そのまま呼び出し側に送出する。
+        """
+        import anyio
+
+        for attempt in range(2):
+            try:
+                session = await self.get_session()
+            except Exception as e:
+                if attempt > 0:
+                    raise
+                print(f"  - [MCP] '{self.name}' への接続に失敗しました。再試行します: {e}")
+                continue
+            try:
+                return await operation(session)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+                # 書き込み先のストリームが既に閉じており、要求はサーバへ届いていない
+                if attempt > 0:
+                    raise
+                print(f"  - [MCP] '{self.name}' との接続が閉じていました。再接続して再試行します: {e}")
+                await self.close()
+
+    async def close(self):
+        if self._closing is not None:
+            self._closing.set()
+        task = self._owner_task
+        if task is not None and not task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=CLOSE_TIMEOUT)
+            except BaseException:
+                task.cancel()
+        self.session = None
+        self._owner_task = None
+
+
+def _get_connection(server_conf: Dict[str, Any], transport_factory: Callable[[], Any]) -> _ServerConnection:
+    key = server_key(server_conf)
+    connection = _connections.get(key)
+    if connection is None:
+        connection = _ServerConnection(server_conf, transport_factory)
+        _connections[key] = connection
+    return connection
+
+
+async def list_tools(server_conf: Dict[str, Any], transport_factory: Callable[[], Any]):
+    """常駐セッションでツール一覧を取得する（ループスレッド上で await する）。"""
+    return await _get_connection(server_conf, transport_factory).request(lambda s: s.list_tools())
+
+
+async def call_tool(server_conf: Dict[str, Any], transport_factory: Callable[[], Any], tool_name: str, args: Dict[str, Any]):
+    """常駐セッションでツールを呼び出す（ループスレッド上で await する）。"""
+    return await _get_connection(server_conf, transport_factory).request(lambda s: s.call_tool(tool_name, args))
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """simple_http サーバ用の共有クライアント（Keep-Alive で接続を使い回す）。ループスレッド上で使う。"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=30.0)
+    return _http_client
+
+
+async def _retain(keys: List[str]):
+    for key in [k for k in _connections if k not in keys]:
+        connection = _connections.pop(key)
+        await connection.close()
+
+
+def retain(server_confs: List[Dict[str, Any]]):
+    """指定されたサーバ以外の常駐セッションを閉じる（設定変更時に呼ぶ）。"""
+    if _loop is None:
+        return
+    try:
+        run(_retain([server_key(conf) for conf in server_confs]), timeout=CLOSE_TIMEOUT * 2)
+    except Exception as e:
+        print(f"  - [MCP] 不要なセッションの切断に失敗しました: {e}")
+
+
+def close_all():
+    retain([])
+
+
+atexit.register(close_all)
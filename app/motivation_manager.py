@@ -7,17 +7,114 @@ AIペルソナの内発的動機（退屈、好奇心、目標達成欲、関係
 
 import json
 import os
+import copy
 import math
+import time
+import atexit
 import datetime
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import constants
+import job_scheduler
 import room_manager
 import utils
 from goal_manager import GoalManager
 from gemini_api import get_configured_llm
 
+# --- 内部状態の共有と書き込みの集約 ---
+# 同じルームの MotivationManager はプロセス内で1つの状態 dict を共有し、毎回ファイルを読み直さない
+# （ファイルが外部で書き換えられていれば、未保存の変更がない限り読み直す）。
+# _save_state() は「未保存」の印を付けるだけで、書き込みはバックグラウンドでまとめて行う。
+# 退屈度など再計算できる値の更新は、さらに長く待ってから書く。終了時にはすべて書き出す。
+STATE_FLUSH_DELAY_SECONDS = 2.0
+DERIVED_STATE_FLUSH_DELAY_SECONDS = 300.0
+
+# 状態ファイルのパス -> {"state": 状態 dict, "mtime_ns": 最後に読み書きした時の mtime,
+#                       "flush_at": 書き込み予定時刻 or None, "derived_only": 未保存の変更が再計算できる値だけか}
+_shared_states: Dict[str, Dict] = {}
+_shared_states_lock = threading.RLock()
+_flush_cond = threading.Condition(_shared_states_lock)
+_flusher_thread: Optional[threading.Thread] = None
+
+
+def _file_mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _snapshot_state(state: Dict) -> Dict:
+    # 他のスレッドが更新中だと dict のコピーが失敗することがあるため、数回やり直す
+    for _ in range(5):
+        try:
+            return copy.deepcopy(state)
+        except RuntimeError:
+            time.sleep(0.01)
+    return copy.deepcopy(state)
+
+
+def _flush_state_file(path: str):
+    """1ルーム分の未保存の状態をファイルに書く。"""
+    from file_lock_utils import safe_json_write
+
+    with _shared_states_lock:
+        entry = _shared_states.get(path)
+        if entry is None or entry["flush_at"] is None:
+            return
+        entry["flush_at"] = None
+        entry["derived_only"] = True
+        snapshot = _snapshot_state(entry["state"])
+    saved = safe_json_write(path, snapshot)
+    with _shared_states_lock:
+        if saved:
+            entry["mtime_ns"] = _file_mtime_ns(path)
+        else:
+            print(f"[MotivationManager] 状態保存タイムアウト（再試行します）: {path}")
+            if entry["flush_at"] is None:
+                entry["flush_at"] = time.time() + STATE_FLUSH_DELAY_SECONDS
+                _flush_cond.notify()
+
+
+def _flusher_loop():
+    while True:
+        with _flush_cond:
+            while True:
+                now = time.time()
+                scheduled = [(e["flush_at"], path) for path, e in _shared_states.items() if e["flush_at"] is not None]
+                due = [path for flush_at, path in scheduled if flush_at <= now]
+                if due:
+                    break
+                _flush_cond.wait(min(scheduled)[0] - now if scheduled else None)
+        for path in due:
+            try:
+                _flush_state_file(path)
+            except Exception as e:
+                print(f"[MotivationManager] 状態保存エラー ({path}): {e}")
+
+
+def _ensure_flusher():
+    global _flusher_thread
+    if _flusher_thread is None or not _flusher_thread.is_alive():
+        _flusher_thread = threading.Thread(target=_flusher_loop, name="motivation-state-flusher", daemon=True)
+        _flusher_thread.start()
+
+
+def flush_all_states():
+    """未保存の内部状態をすべてファイルに書き出す（終了時に呼ばれる）。"""
+    with _shared_states_lock:
+        paths = [path for path, e in _shared_states.items() if e["flush_at"] is not None]
+    for path in paths:
+        try:
+            _flush_state_file(path)
+        except Exception as e:
+            print(f"[MotivationManager] 状態保存エラー ({path}): {e}")
+
+
+atexit.register(flush_all_states)
+
 
 class MotivationManager:
     """AIの内発的動機を管理するクラス"""
@@ -44,12 +141,36 @@ class MotivationManager:
         self.memory_dir.mkdir(parents=True, exist_ok=True)
         self._init_emotion_log()
         
-        # 内部状態をロード
-        self._state = self._load_state()
+        # 内部状態をロード（同じルームの他のインスタンスと共有）
+        self._state = self._get_shared_state()
     
     def get_internal_state(self) -> Dict:
         """内部状態（Drivesなど）を取得する"""
-        return self._load_state()
+        return _snapshot_state(self._state)
+
+    def _get_shared_state(self) -> Dict:
+        """プロセス内で共有している状態を返す。未読込、または外部で書き換えられていればファイルから読む。"""
+        path = str(self.state_file)
+        mtime_ns = _file_mtime_ns(path)
+        with _shared_states_lock:
+            entry = _shared_states.get(path)
+            # 外部で書き換えられていても、失うと困る未保存の変更があればメモリ上の状態を優先する
+            if entry is not None and (entry["mtime_ns"] == mtime_ns or (entry["flush_at"] is not None and not entry["derived_only"])):
+                return entry["state"]
+
+        state = self._load_state()
+        with _shared_states_lock:
+            entry = _shared_states.get(path)
+            if entry is None:
+                entry = {"state": state, "mtime_ns": mtime_ns, "flush_at": None, "derived_only": True}
+                _shared_states[path] = entry
+            elif entry["flush_at"] is None or entry["derived_only"]:
+                # 既存のインスタンスにも反映されるよう、同じ dict の中身を入れ替える
+                entry["state"].clear()
+                entry["state"].update(state)
+                entry["mtime_ns"] = mtime_ns
+                entry["flush_at"] = None
+            return entry["state"]
 
     def _get_empty_state(self) -> Dict:
         """空の内部状態構造を返す"""
@@ -278,12 +399,28 @@ class MotivationManager:
             self._state = default_state # メモリ上の状態も更新
             return default_state
     
-    def _save_state(self):
-        """内部状態をファイルに保存（ロック付き）"""
-        from file_lock_utils import safe_json_write
-        
-        if not safe_json_write(str(self.state_file), self._state):
-            print(f"[MotivationManager] 状態保存タイムアウト")
+    def _save_state(self, derived: bool = False):
+        """
+        内部状態の保存を予約する（書き込みはバックグラウンドでまとめて行う）。
+        derived=True は再計算できる値だけの更新で、書き込みをさらに遅らせる。
+        """
+        path = str(self.state_file)
+        delay = DERIVED_STATE_FLUSH_DELAY_SECONDS if derived else STATE_FLUSH_DELAY_SECONDS
+        with _flush_cond:
+            entry = _shared_states.get(path)
+            if entry is None or entry["state"] is not self._state:
+                entry = {"state": self._state, "mtime_ns": None, "flush_at": None, "derived_only": True}
+                _shared_states[path] = entry
+            entry["derived_only"] = derived and (entry["flush_at"] is None or entry["derived_only"])
+            flush_at = time.time() + delay
+            if entry["flush_at"] is None or flush_at < entry["flush_at"]:
+                entry["flush_at"] = flush_at
+            _ensure_flusher()
+            _flush_cond.notify()
+
+    def flush(self):
+        """このルームの未保存の内部状態をすぐにファイルへ書く。"""
+        _flush_state_file(str(self.state_file))
     
     # ========================================
     # 各動機の計算
@@ -318,9 +455,9 @@ class MotivationManager:
         # 最大値を1.0に制限
         boredom = min(1.0, 0.15 * math.log(1 + idle_hours))
         
-        # 状態を更新
+        # 状態を更新（再計算できる値なので、保存は遅らせてまとめる）
         self._state["drives"]["boredom"]["level"] = boredom
-        self._save_state()
+        self._save_state(derived=True)
         return boredom
     
     def calculate_curiosity(self) -> float:
@@ -483,9 +620,9 @@ class MotivationManager:
             "generated_at": datetime.datetime.now().isoformat()
         }
         
-        # 状態に保存
+        # 状態に保存（再計算できる値なので、保存は遅らせてまとめる）
         self._state["motivation_log"] = motivation_log
-        self._save_state()
+        self._save_state(derived=True)
         
         return motivation_log
     
@@ -574,6 +711,29 @@ class MotivationManager:
         
         return False, None
     
+    def get_contact_due_time(self) -> Optional[datetime.datetime]:
+        """
+        should_initiate_contact が True になる時刻の見込みを返す（スケジューラが次のチェック時刻を決めるため）。
+        既に閾値を超えていれば現在時刻、見込みが無ければ None。
+        時間とともに上がるのは退屈度だけで、他の動機は状態の変化（対話・目標・問いの追加）でしか上がらないため、
+        それらは現在の値で判定する。
+        """
+        now = datetime.datetime.now()
+        threshold = self._state["drives"]["boredom"].get("threshold", self.DEFAULT_BOREDOM_THRESHOLD)
+        if max(self.calculate_curiosity(), self.calculate_goal_achievement(), self.calculate_devotion()) >= threshold:
+            return now
+
+        last_interaction_str = self._state["drives"]["boredom"].get("last_interaction")
+        if not last_interaction_str:
+            return None
+        try:
+            last_interaction = datetime.datetime.fromisoformat(last_interaction_str)
+        except ValueError:
+            return None
+        # calculate_boredom の逆算: 0.15 * log(1 + hours) >= threshold
+        idle_hours = math.exp(threshold / 0.15) - 1
+        return max(now, last_interaction + datetime.timedelta(hours=idle_hours))
+    
     # ========================================
     # 状態の更新
     # ========================================
@@ -588,6 +748,7 @@ class MotivationManager:
         self.set_last_autonomous_trigger(now)
         
         self._save_state()
+        job_scheduler.notify("room_activity", room_name=self.room_name)
 
     def reset_drives_after_action(self):
         """自律行動実行後のドライブ状態をリセット（退屈度リセット ＆ 自律行動タイマーリセット）"""
@@ -1014,6 +1175,10 @@ class MotivationManager:
     
     def clear_internal_state(self):
         """内部状態を完全にリセット"""
-        self._state = self._get_empty_state()
+        # 他のインスタンスと共有している dict の中身を入れ替える
+        empty_state = self._get_empty_state()
+        self._state.clear()
+        self._state.update(empty_state)
         self._save_state()
+        self.flush()
         print(f"[MotivationManager] {self.room_name} の内部状態をリセットしました")
@@ -165,6 +165,7 @@ import gradio as gr
 import traceback
 import pandas as pd
 import config_manager, room_manager, alarm_manager, ui_handlers, constants, onboarding_manager, timers
+import avatar_assets
 try:
     import discord_manager
 except ImportError:
@@ -836,6 +837,12 @@ try:
         config_manager.CONFIG_GLOBAL.get("theme_settings", {}).get("active_theme", "nexus_ark_theme")
     )
 
+    # アバター素材を内容ハッシュ付きの URL で配信する（ブラウザキャッシュを効かせる）。Blocks の作成前に登録する
+    try:
+        avatar_assets.enable_static_route()
+    except Exception as e:
+        print(f"--- [AvatarAssets] 静的配信の登録に失敗しました（埋め込み表示を使います）: {e} ---")
+
     with gr.Blocks(title=f"Nexus Ark v{constants.APP_VERSION}") as demo:
         # --- [Onboarding Wizard] ---
         initial_status = onboarding_manager.check_status()
@@ -12,6 +12,9 @@ import logging
 import json
 import hashlib
 import math
+import pickle
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 from langchain_core.embeddings import Embeddings
@@ -24,11 +27,64 @@ import constants
 import config_manager
 import utils
 import psutil
+import embedding_cache
+import embedding_rate_limiter
 
 # ロギング設定
 logger = logging.getLogger(__name__)
 
 
+def embed_documents_with_fallback(actual, texts: List[str]) -> List[List[float]]:
+    """
+    一括ベクトル化を行い、件数の不一致や形式エラーの場合は1件ずつの処理に切り替える。
+    （RotatingEmbeddings と、キー別に並列実行する索引作成の両方から使う）
+    """
+    try:
+        embeddings = actual.embed_documents(texts)
+        if len(embeddings) == len(texts):
+            return embeddings
+        
+        # 長さが一致しない場合（API側で一部がフィルタリングされた可能性など）
+        print(f"      [RAG Warning] ベクトル化結果の数が一致しません (Docs:{len(texts)}, Embs:{len(embeddings)})。個別処理に切り替えます。")
+    except Exception as e:
+        # ネットワークエラー等は上位（_create_index_in_batches）のリトライに任せるが、
+        # 明らかな引数/形式エラーや長さ不一致エラーの場合は個別処理を試みる
+        err_msg = str(e)
+        if "equal length" in err_msg or "400" in err_msg:
+            print(f"      [RAG Warning] 一括ベクトル化でエラーが発生しました。個別処理を試みます: {e}")
+        else:
+            raise e
+
+    # 個別処理によるフォールバック
+    results = []
+    for i, t in enumerate(texts):
+        try:
+            # 1件ずつ処理することで、問題のあるチャンクを特定・スキップ可能にする
+            emb = actual.embed_query(t)
+            results.append(emb)
+        except Exception as ee:
+            print(f"      ! チャンク [{i}] のベクトル化に失敗しました (スキップ): {ee}")
+            # 失敗したチャンクには0ベクトルを詰め、インデックス全体の崩壊を防ぐ
+            # 次元数は既存の結果から取得するか、取得できなければ再度試行
+            dim = 768 # Gemini Embedding のデフォルト
+            if results and len(results[0]) > 0:
+                dim = len(results[0])
+            results.append([0.0] * dim)
+    
+    return results
+
+
+def _parse_retry_delay(error_str: str) -> Optional[float]:
+    """429 エラーメッセージから API が提案する retryDelay（秒）を取り出す。"""
+    import re
+    match = re.search(r'retryDelay.*?(\d+(?:\.\d+)?)s', error_str)
+    return float(match.group(1)) if match else None
+
+
+class _EmbeddingQuotaExhausted(Exception):
+    """索引作成中に、使用可能なAPIキーがすべて日次上限に達したことを示す。"""
+
+
 class RotatingEmbeddings(Embeddings):
     """
     APIキーローテーションに対応したエンベディングラッパー。
@@ -41,44 +97,19 @@ class RotatingEmbeddings(Embeddings):
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         # [2026-04-28 安定化] 検索時と索引作成時のベクトル不一致を防ぐため task_type を統一
         actual = self.manager._get_actual_embeddings(task_type="retrieval_document")
-        try:
-            embeddings = actual.embed_documents(texts)
-            if len(embeddings) == len(texts):
-                return embeddings
-            
-            # 長さが一致しない場合（API側で一部がフィルタリングされた可能性など）
-            print(f"      [RAG Warning] ベクトル化結果の数が一致しません (Docs:{len(texts)}, Embs:{len(embeddings)})。個別処理に切り替えます。")
-        except Exception as e:
-            # ネットワークエラー等は上位（_create_index_in_batches）のリトライに任せるが、
-            # 明らかな引数/形式エラーや長さ不一致エラーの場合は個別処理を試みる
-            err_msg = str(e)
-            if "equal length" in err_msg or "400" in err_msg:
-                print(f"      [RAG Warning] 一括ベクトル化でエラーが発生しました。個別処理を試みます: {e}")
-            else:
-                raise e
-
-        # 個別処理によるフォールバック
-        results = []
-        for i, t in enumerate(texts):
-            try:
-                # 1件ずつ処理することで、問題のあるチャンクを特定・スキップ可能にする
-                emb = actual.embed_query(t)
-                results.append(emb)
-            except Exception as ee:
-                print(f"      ! チャンク [{i}] のベクトル化に失敗しました (スキップ): {ee}")
-                # 失敗したチャンクには0ベクトルを詰め、インデックス全体の崩壊を防ぐ
-                # 次元数は既存の結果から取得するか、取得できなければ再度試行
-                dim = 768 # Gemini Embedding のデフォルト
-                if results and len(results[0]) > 0:
-                    dim = len(results[0])
-                results.append([0.0] * dim)
-        
-        return results
+        return embed_documents_with_fallback(actual, texts)
     
     def embed_query(self, text: str) -> List[float]:
         perf_start = time.time()
+        # 同一ターン内で同じクエリを何度もベクトル化しないよう、モデルID単位でキャッシュする
+        model_id = self.manager._get_embedding_model_id()
+        cached = embedding_cache.get(model_id, text)
+        if cached is not None:
+            print(f"--- [PERF] RotatingEmbeddings.embed_query took: {time.time() - perf_start:.4f}s (cache hit) ---")
+            return cached
         # [2026-04-28 安定化] 検索時と索引作成時のベクトル不一致を防ぐため task_type を統一
         result = self.manager._get_actual_embeddings(task_type="retrieval_document").embed_query(text)
+        embedding_cache.put(model_id, text, result)
         print(f"--- [PERF] RotatingEmbeddings.embed_query took: {time.time() - perf_start:.4f}s ---")
         return result
 
@@ -86,8 +117,22 @@ class RotatingEmbeddings(Embeddings):
 
 
 class RAGManager:
-    # インデックスをメモリ上に保持するキャッシュ {str(path): (FAISS_db, timestamp)}
-    _index_cache: Dict[str, Tuple[FAISS, float]] = {}
+    # インデックスをメモリ上に保持するLRUキャッシュ {str(path): (FAISS_db, mtime, 推定バイト数, mmap読み込みか)}
+    # 合計が rag_index_cache_max_mb を超えたら、最近使われていない索引から解放する
+    _index_cache: "OrderedDict[str, Tuple[FAISS, float, int, bool]]" = OrderedDict()
+    _index_cache_lock = threading.RLock()
+    _index_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+    INDEX_CACHE_DEFAULT_MAX_MB = 512
+    # 追記セグメントがこの数に達したら、バックグラウンドで本体索引へ統合する
+    INDEX_SEGMENT_COMPACT_THRESHOLD = 8
+    _compaction_locks: Dict[str, threading.Lock] = {}
+    _compaction_locks_guard = threading.Lock()
+    # 本体索引の置き換え（コンパクション・完全再構築）を直列にするロック {str(本体索引のパス): RLock}
+    _index_write_locks: Dict[str, threading.RLock] = {}
+    # 本体索引の置き換えと、検索時の「本体 + セグメント」の読み込みを排他する（検索が混ざった組み合わせを読まないように）
+    _index_snapshot_locks: Dict[str, threading.Lock] = {}
+    # 本体索引に統合済みのセグメント名を、索引と同じフォルダに記録するファイル
+    COMPACTED_SEGMENTS_FILE = "compacted_segments.json"
 
     @classmethod
     def clear_cache(cls):
@@ -95,11 +140,50 @@ class RAGManager:
         メモリ上のインデックスキャッシュをクリアする。
         OSレベルのファイルロックを解除するために、マイグレーション前などに呼び出す。
         """
-        if cls._index_cache:
-            print(f"[RAGManager] Clearing {len(cls._index_cache)} cached indices from memory.")
-            cls._index_cache.clear()
+        with cls._index_cache_lock:
+            if cls._index_cache:
+                print(f"[RAGManager] Clearing {len(cls._index_cache)} cached indices from memory.")
+                cls._index_cache.clear()
         gc.collect() # メモリ解放とファイルハンドル解放を促す
 
+    @classmethod
+    def get_index_cache_stats(cls) -> dict:
+        """インデックスキャッシュのヒット/ミス/解放回数と現在の使用量を返す。"""
+        with cls._index_cache_lock:
+            return dict(
+                cls._index_cache_stats,
+                entries=len(cls._index_cache),
+                bytes=sum(entry[2] for entry in cls._index_cache.values()),
+                budget_bytes=cls._get_index_cache_budget(),
+            )
+
+    @classmethod
+    def _get_index_cache_budget(cls) -> int:
+        try:
+            max_mb = float(config_manager.CONFIG_GLOBAL.get("rag_index_cache_max_mb", cls.INDEX_CACHE_DEFAULT_MAX_MB))
+        except (TypeError, ValueError):
+            max_mb = cls.INDEX_CACHE_DEFAULT_MAX_MB
+        return int(max_mb * 1024 * 1024)
+
+    @classmethod
+    def _put_index_cache(cls, key: str, db: FAISS, mtime: float, size_bytes: int, is_mmap: bool):
+        """キャッシュに登録し、予算を超えた分を古い順に解放する（登録したばかりの索引は残す）。"""
+        with cls._index_cache_lock:
+            cls._index_cache[key] = (db, mtime, size_bytes, is_mmap)
+            cls._index_cache.move_to_end(key)
+            budget = cls._get_index_cache_budget()
+            total = sum(entry[2] for entry in cls._index_cache.values())
+            while total > budget and len(cls._index_cache) > 1:
+                evicted_key, evicted = cls._index_cache.popitem(last=False)
+                total -= evicted[2]
+                cls._index_cache_stats["evictions"] += 1
+                print(f"--- [Cache Evict] RAGManager: {Path(evicted_key).parent.name}/{Path(evicted_key).name} ({evicted[2] / 1024 / 1024:.1f}MB) ---")
+
+    @classmethod
+    def _invalidate_index_cache(cls, key: str):
+        with cls._index_cache_lock:
+            cls._index_cache.pop(key, None)
+
     def __init__(self, room_name: str, api_key: str):
         self.room_name = room_name
         self.api_key = api_key
@@ -208,8 +292,21 @@ class RAGManager:
                 else:
                     hf_model_id = raw_model_name
                 
-                print(f"[RAGManager] ローカルエンベディングモデルをロード中: {hf_model_id}")
-                self.actual_embeddings[task_type] = HuggingFaceEmbeddings(model_name=hf_model_id)
+                pool_embeddings = None
+                if config_manager.CONFIG_GLOBAL.get("local_embedding_pool_enabled", True):
+                    # モデルを読み込んだワーカープロセス群でベクトル化する（UIプロセスのCPU/GILを塞がない）
+                    try:
+                        import local_embedding_pool
+                        local_embedding_pool.get_pool(hf_model_id)  # ここで起動し、失敗すれば従来の方式に切り替える
+                        pool_embeddings = local_embedding_pool.LocalPoolEmbeddings(hf_model_id)
+                    except Exception as pool_error:
+                        print(f"[RAGManager] ローカルエンベディングのプロセスプールを起動できませんでした（プロセス内で実行します）: {pool_error}")
+
+                if pool_embeddings is not None:
+                    self.actual_embeddings[task_type] = pool_embeddings
+                else:
+                    print(f"[RAGManager] ローカルエンベディングモデルをロード中: {hf_model_id}")
+                    self.actual_embeddings[task_type] = HuggingFaceEmbeddings(model_name=hf_model_id)
                 print(f"[RAGManager] ローカルエンベディング ({self._get_embedding_model_id()}) を初期化しました")
             except Exception as e:
                 # 警告を強調
@@ -277,6 +374,17 @@ class RAGManager:
         return self.actual_embeddings[task_type]
 
         
+    def _is_key_rotation_enabled(self) -> bool:
+        """APIキーローテーションが有効かどうか。"""
+        # [2026-03-20 FIX] RAG操作はシステム全体の設定を優先すべきため、グローバル設定を第一参照とする
+        rotation_enabled = config_manager.CONFIG_GLOBAL.get("enable_api_key_rotation")
+        
+        # もしグローバル設定が明示的に設定されていない場合のみ、ルーム設定やデフォルト(True)を参照
+        if rotation_enabled is None:
+            effective_settings = config_manager.get_effective_settings(self.room_name)
+            rotation_enabled = effective_settings.get("enable_api_key_rotation", True)
+        return bool(rotation_enabled)
+
     def _rotate_api_key(self, error_str: str) -> Union[str, bool]:
         """
         429エラー時にAPIキーをローテーションする。
@@ -332,16 +440,7 @@ class RAGManager:
             # 有料キーは mark_key_as_exhausted 内でスキップされるが、ここでのtried_keys追加は続行
             print(f"      [RAG Rotation] Key '{key_name}' marked as exhausted for model '{clean_model_name}'.")
         
-        # ローテーション設定確認
-        # [2026-03-20 FIX] RAG操作はシステム全体の設定を優先すべきため、グローバル設定を第一参照とする
-        rotation_enabled = config_manager.CONFIG_GLOBAL.get("enable_api_key_rotation")
-        
-        # もしグローバル設定が明示的に設定されていない場合のみ、ルーム設定やデフォルト(True)を参照
-        if rotation_enabled is None:
-            effective_settings = config_manager.get_effective_settings(self.room_name)
-            rotation_enabled = effective_settings.get("enable_api_key_rotation", True)
-            
-        if rotation_enabled:
+        if self._is_key_rotation_enabled():
             # [2026-04-28 fix] model_name を渡し、このEmbeddingモデルでの枚渇のみをチェックさせる
             next_key_name = config_manager.get_next_available_gemini_key(
                 current_exhausted_key=key_name,
@@ -412,10 +511,14 @@ class RAGManager:
         
         return filtered
 
-    def classify_query_intent(self, query: str) -> dict:
+    def classify_query_intent(self, query: str, query_embedding: Optional[List[float]] = None) -> dict:
         """
         クエリの意図を分類し、Intent-Aware Retrievalの重みを返す。
         
+        キーワード規則と、クエリのベクトル（query_embedding, 検索用に計算済みのもの）による
+        最近傍セントロイドでローカルに分類する（intent_classifier）。APIは使わない。
+        確信度が INTENT_LOCAL_CONFIDENCE_THRESHOLD 未満で、設定 "intent_llm_fallback" が有効な場合のみLLMに問い合わせる。
+        
         Returns:
             {
                 "intent": "emotional" | "factual" | "technical" | "temporal" | "relational",
@@ -429,6 +532,25 @@ class RAGManager:
                 "weights": constants.INTENT_WEIGHTS[constants.DEFAULT_INTENT]
             }
 
+        import intent_classifier
+        model_id = self._get_embedding_model_id()
+        if query_embedding is not None:
+            intent_classifier.ensure_centroids(model_id, self.wrapper_embeddings.embed_documents)
+        intent, confidence, source = intent_classifier.classify(query, model_id, query_embedding)
+
+        if confidence < constants.INTENT_LOCAL_CONFIDENCE_THRESHOLD and self.api_key \
+                and config_manager.CONFIG_GLOBAL.get("intent_llm_fallback", False):
+            result = self._classify_query_intent_llm(query)
+            if result is not None:
+                intent_classifier.remember(query, model_id, (result["intent"], 1.0, "llm"))
+                return result
+
+        weights = constants.INTENT_WEIGHTS.get(intent, constants.INTENT_WEIGHTS[constants.DEFAULT_INTENT])
+        print(f"  - [Intent] Query: '{query[:30]}...' -> {intent} [{source}, 確信度 {confidence:.2f}] (α={weights['alpha']}, β={weights['beta']}, γ={weights['gamma']})")
+        return {"intent": intent, "weights": weights}
+
+    def _classify_query_intent_llm(self, query: str) -> Optional[dict]:
+        """処理用LLMでクエリの意図を分類する（ローカル分類の確信度が低い場合の補助）。失敗時は None。"""
         # [2026-02-11 FIX] 試行済みキーをリセットして全キーを試行可能にする
         self.tried_keys.clear()
         
@@ -469,7 +591,7 @@ class RAGManager:
                         break
                 
                 weights = constants.INTENT_WEIGHTS.get(intent, constants.INTENT_WEIGHTS[constants.DEFAULT_INTENT])
-                print(f"  - [Intent] Query: '{query[:30]}...' -> {intent} (α={weights['alpha']}, β={weights['beta']}, γ={weights['gamma']})")
+                print(f"  - [Intent] Query: '{query[:30]}...' -> {intent} [llm] (α={weights['alpha']}, β={weights['beta']}, γ={weights['gamma']})")
                 
                 return {"intent": intent, "weights": weights}
                 
@@ -487,13 +609,11 @@ class RAGManager:
                         continue
                 
                 if attempt >= max_retries - 1:
-                    print(f"  - [Intent] 分類エラー、デフォルト使用: {e}")
-                    return {
-                        "intent": constants.DEFAULT_INTENT,
-                        "weights": constants.INTENT_WEIGHTS[constants.DEFAULT_INTENT]
-                    }
+                    print(f"  - [Intent] LLM分類エラー、ローカル分類の結果を使用: {e}")
+                    return None
                 time.sleep(2)
                 attempt += 1
+        return None
 
     def calculate_time_decay(self, metadata: dict) -> float:
         """
@@ -537,8 +657,11 @@ class RAGManager:
             # パースエラー時は中立
             return 0.5
 
-    def _safe_save_index(self, db: FAISS, target_path: Path):
-        """インデックスを安全に保存する（リネーム退避方式、同一ディレクトリ内一時保存）"""
+    def _safe_save_index(self, db: FAISS, target_path: Path, compacted_segments: Optional[List[str]] = None):
+        """
+        インデックスを安全に保存する（リネーム退避方式、同一ディレクトリ内一時保存）
+        compacted_segments を渡すと、統合済みのセグメント名を索引と同じ一時フォルダに書き、索引と一緒に置き換える。
+        """
         target_path = Path(target_path)
         parent_dir = target_path.parent
         
@@ -567,6 +690,9 @@ class RAGManager:
         with tempfile.TemporaryDirectory(prefix=".tmp_index_", dir=(str(tmp_base_dir) if tmp_base_dir else None)) as temp_dir:
             temp_path = Path(temp_dir)
             db.save_local(str(temp_path))
+            if compacted_segments is not None:
+                with open(temp_path / RAGManager.COMPACTED_SEGMENTS_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(compacted_segments, f, ensure_ascii=False)
             
             # Windows/WSLでのファイルロック・競合に対応するためのリトライループ
             max_retries = 3
@@ -601,9 +727,7 @@ class RAGManager:
                         print(f"  - [RAG Warning] モデル情報の保存に失敗: {e}")
 
                     # キャッシュをクリア
-                    cache_key = str(target_path.absolute())
-                    if cache_key in RAGManager._index_cache:
-                        del RAGManager._index_cache[cache_key]
+                    RAGManager._invalidate_index_cache(str(target_path.resolve()))
 
                     # 成功
                     self._cleanup_old_indices(parent_dir, target_path.name)
@@ -634,8 +758,201 @@ class RAGManager:
         except Exception:
             pass
 
-    def _safe_load_index(self, target_path: Path) -> Optional[FAISS]:
-        """インデックスを安全に読み込む（キャッシュ対応）"""
+    # --- 追記セグメント ---
+    # 差分更新のたびに本体索引全体を書き直さないよう、追加分は
+    # <索引名>.segments/seg_<時刻>/ に小さな FAISS 索引として保存し、検索時に本体と併せて参照する。
+    # セグメントが溜まったらバックグラウンドで本体へ統合（コンパクション）する。
+
+    @staticmethod
+    def _get_segments_dir(target_path: Path) -> Path:
+        return Path(target_path).parent / f"{Path(target_path).name}.segments"
+
+    @staticmethod
+    def _read_compacted_segments(target_path: Path) -> List[str]:
+        """本体索引に統合済みとして記録されているセグメント名を返す。"""
+        manifest_path = Path(target_path) / RAGManager.COMPACTED_SEGMENTS_FILE
+        if not manifest_path.exists():
+            return []
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return list(json.load(f))
+        except Exception as e:
+            print(f"  - [RAG Warning] 統合済みセグメントの記録を読めません ({manifest_path}): {e}")
+            return []
+
+    def _list_index_segments(self, target_path: Path) -> List[Path]:
+        """
+        保存済みのセグメントを古い順に返す。退避中の .old_* と、本体索引に統合済みとして記録されたもの
+        （統合後の削除が中断された・Windows で削除できなかったもの）は除く。
+        """
+        segments_dir = self._get_segments_dir(target_path)
+        if not segments_dir.exists():
+            return []
+        compacted = set(self._read_compacted_segments(target_path))
+        return sorted(
+            p for p in segments_dir.iterdir()
+            if p.is_dir() and p.name.startswith("seg_") and ".old_" not in p.name and p.name not in compacted
+            and (p / "index.faiss").exists()
+        )
+
+    def _get_index_append_path(self, target_path: Path) -> Path:
+        """
+        追記先のパスを返す。本体索引がまだ無ければ本体そのものに、あれば新しいセグメントに書く。
+        """
+        if not Path(target_path).exists():
+            return Path(target_path)
+        segments_dir = self._get_segments_dir(target_path)
+        segments_dir.mkdir(parents=True, exist_ok=True)
+        return segments_dir / f"seg_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+
+    def _load_index_segments(self, target_path: Path) -> List[FAISS]:
+        """検索用にセグメントを読み込む（各セグメントは小さく、通常のキャッシュに載る）。"""
+        segment_dbs = []
+        for segment_path in self._list_index_segments(target_path):
+            segment_db = self._safe_load_index(segment_path)
+            if segment_db:
+                segment_dbs.append(segment_db)
+        return segment_dbs
+
+    def _load_index_snapshot(self, target_path: Path) -> Tuple[Optional[FAISS], List[FAISS]]:
+        """
+        本体索引とそのセグメントを、統合による置き換えを挟まずに読み込む。
+        本体だけ古い（統合前）まま統合済みのセグメントが消える、といった組み合わせを検索が読まないようにする。
+        """
+        with self._get_index_snapshot_lock(target_path):
+            return self._safe_load_index(target_path), self._load_index_segments(target_path)
+
+    def _schedule_segment_compaction(self, target_path: Path):
+        """セグメント数が閾値に達していれば、バックグラウンドで本体索引へ統合する。"""
+        if len(self._list_index_segments(target_path)) < RAGManager.INDEX_SEGMENT_COMPACT_THRESHOLD:
+            return
+        threading.Thread(target=self._compact_index_segments, args=(Path(target_path),), daemon=True).start()
+
+    @staticmethod
+    def _get_index_write_lock(target_path: Path) -> threading.RLock:
+        lock_key = str(Path(target_path).resolve())
+        with RAGManager._compaction_locks_guard:
+            return RAGManager._index_write_locks.setdefault(lock_key, threading.RLock())
+
+    @staticmethod
+    def _get_index_snapshot_lock(target_path: Path) -> threading.Lock:
+        lock_key = str(Path(target_path).resolve())
+        with RAGManager._compaction_locks_guard:
+            return RAGManager._index_snapshot_locks.setdefault(lock_key, threading.Lock())
+
+    def _load_index_private(self, target_path: Path) -> Optional[FAISS]:
+        """
+        キャッシュを通さずに索引をディスクから読み込む（書き換えても検索中のキャッシュに影響しない複製）。
+        """
+        if not target_path.exists():
+            return None
+        embeddings = self._get_embeddings()
+        if os.name == 'nt' and any(ord(c) > 127 for c in str(target_path.resolve())):
+            # FAISS(C++) が非ASCIIパスを開けないため、一時フォルダにコピーしてから読み込む
+            with tempfile.TemporaryDirectory(prefix="faiss_sacred_") as temp_dir:
+                shutil.copytree(str(target_path), temp_dir, dirs_exist_ok=True)
+                return FAISS.load_local(temp_dir, embeddings, allow_dangerous_deserialization=True)
+        return FAISS.load_local(str(target_path), embeddings, allow_dangerous_deserialization=True)
+
+    def _compact_index_segments(self, target_path: Path):
+        """
+        セグメントを本体索引へ統合し、統合済みのセグメントを削除する。
+        検索が参照しているキャッシュ上の索引は書き換えず、ディスクから読んだ複製に統合して
+        一時フォルダ経由で置き換える（_safe_save_index）。統合処理全体は完全再構築と同じ書き込みロックの下で行う。
+        統合したセグメント名は本体索引と一緒に保存するため、置き換え後にセグメントの削除が
+        中断・失敗しても、そのセグメントが検索や次回の統合で二重に使われることはない。
+        """
+        lock_key = str(Path(target_path).resolve())
+        with RAGManager._compaction_locks_guard:
+            lock = RAGManager._compaction_locks.setdefault(lock_key, threading.Lock())
+        if not lock.acquire(blocking=False):
+            return  # 他のスレッドが統合中
+
+        try:
+            with self._get_index_write_lock(target_path):
+                segments = self._list_index_segments(target_path)
+                if not segments:
+                    return  # 待っている間に再構築された
+                perf_start = time.time()
+                base_db = self._load_index_private(target_path)
+                merged_segments = []
+                for segment_path in segments:
+                    segment_db = self._load_index_private(segment_path)
+                    if segment_db is None:
+                        continue
+                    if base_db is None:
+                        base_db = segment_db
+                    else:
+                        base_db.merge_from(segment_db)
+                    merged_segments.append(segment_path)
+
+                if base_db is None or not merged_segments:
+                    return
+
+                # 前回までに統合済みで、まだ削除できずに残っているセグメントも記録に残す
+                segments_dir = self._get_segments_dir(target_path)
+                leftover_names = [
+                    name for name in self._read_compacted_segments(target_path)
+                    if (segments_dir / name).exists()
+                ]
+                compacted_names = leftover_names + [p.name for p in merged_segments]
+                with self._get_index_snapshot_lock(target_path):
+                    self._safe_save_index(base_db, target_path, compacted_segments=compacted_names)
+                    for segment_path in merged_segments:
+                        RAGManager._invalidate_index_cache(str(segment_path.resolve()))
+                for name in compacted_names:
+                    # 削除できなかったものは記録により検索から除外されたまま、次回の統合で再び削除を試みる
+                    shutil.rmtree(str(segments_dir / name), ignore_errors=True)
+            print(f"--- [RAG Compaction] {target_path.name}: {len(merged_segments)}個のセグメントを統合 ({time.time() - perf_start:.2f}s) ---")
+        except Exception as e:
+            print(f"  - [RAG Warning] セグメント統合に失敗 ({target_path.name}): {e}")
+            traceback.print_exc()
+        finally:
+            lock.release()
+
+    @staticmethod
+    def _load_faiss_mmap(target_path: Path, embeddings) -> Optional[FAISS]:
+        """
+        ベクトル本体 (index.faiss) をメモリマップで読み込む。
+        ページはOSのページキャッシュから必要な分だけ読まれるため、使われていない索引はほぼメモリを消費しない。
+        フラット索引のメモリマップに対応していない faiss の場合は None を返す。
+        """
+        try:
+            import faiss
+        except ImportError:
+            return None
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if mmap_flag is None:
+            return None
+        try:
+            index = faiss.read_index(str(target_path / "index.faiss"), mmap_flag)
+            # index.pkl は FAISS.load_local と同じく自前で保存したファイルのみを読む
+            with open(target_path / "index.pkl", "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            return FAISS(embeddings, index, docstore, index_to_docstore_id)
+        except Exception as e:
+            print(f"  - [RAG] メモリマップ読み込みに失敗したため通常読み込みに切り替えます ({target_path.name}): {e}")
+            return None
+
+    @staticmethod
+    def _estimate_index_bytes(target_path: Path, is_mmap: bool) -> int:
+        """キャッシュ予算計算用のメモリ使用量の見積もり（mmap時はベクトル本体を含めない）。"""
+        names = ["index.pkl"] if is_mmap else ["index.pkl", "index.faiss"]
+        total = 0
+        for name in names:
+            try:
+                total += (target_path / name).stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _safe_load_index(self, target_path: Path, writable: bool = False) -> Optional[FAISS]:
+        """
+        インデックスを安全に読み込む（キャッシュ対応）
+
+        writable=False（検索専用）の場合は、可能ならベクトル本体をメモリマップで読み込む。
+        add_documents 等で追記する呼び出し元は writable=True を指定すること。
+        """
         perf_start = time.time()
         if not target_path or not target_path.exists():
             return None
@@ -644,12 +961,15 @@ class RAGManager:
         target_abs_path = str(target_path.resolve())
         mtime = target_path.stat().st_mtime
         
-        # キャッシュの有効性チェック
-        if target_abs_path in RAGManager._index_cache:
-            cache_db, cache_mtime = RAGManager._index_cache[target_abs_path]
-            if cache_mtime == mtime:
+        # キャッシュの有効性チェック（書き込み用途ではメモリマップ版を使わない）
+        with RAGManager._index_cache_lock:
+            cached = RAGManager._index_cache.get(target_abs_path)
+            if cached and cached[1] == mtime and not (writable and cached[3]):
+                RAGManager._index_cache.move_to_end(target_abs_path)
+                RAGManager._index_cache_stats["hits"] += 1
                 print(f"--- [Cache Hit] RAGManager._safe_load_index: {target_path.name} ---")
-                return cache_db
+                return cached[0]
+            RAGManager._index_cache_stats["misses"] += 1
         
         print(f"--- [Cache Miss] RAGManager._safe_load_index: Loading from disk: {target_path.name} ---")
         
@@ -699,7 +1019,8 @@ class RAGManager:
                     # インデックスフォルダの中身を一時フォルダに複製
                     shutil.copytree(str(target_path), str(temp_path), dirs_exist_ok=True)
                     
-                    # 聖域からロード
+                    # 聖域からロード（一時フォルダは直後に消えるためメモリマップは使わない）
+                    is_mmap = False
                     db = FAISS.load_local(
                         str(temp_path),
                         embeddings,
@@ -707,14 +1028,20 @@ class RAGManager:
                     )
             else:
                 # 崇高なる直接ロード (Linux/Mac または英数字パスのWindows)
-                db = FAISS.load_local(
-                    str(target_path),
-                    embeddings,
-                    allow_dangerous_deserialization=True
-                )
+                # 検索専用ならメモリマップを優先（Windowsでは保存時のリネームを妨げるため使わない）
+                use_mmap = (not writable and os.name != 'nt'
+                            and config_manager.CONFIG_GLOBAL.get("rag_index_mmap", True))
+                db = self._load_faiss_mmap(target_path, embeddings) if use_mmap else None
+                is_mmap = db is not None
+                if db is None:
+                    db = FAISS.load_local(
+                        str(target_path),
+                        embeddings,
+                        allow_dangerous_deserialization=True
+                    )
             
-            # キャッシュに保存（この時点で db はメモリ上に展開されている）
-            RAGManager._index_cache[target_abs_path] = (db, mtime)
+            # キャッシュに保存（予算超過時は古い索引から解放）
+            RAGManager._put_index_cache(target_abs_path, db, mtime, self._estimate_index_bytes(target_path, is_mmap), is_mmap)
             print(f"--- [PERF] RAGManager._safe_load_index({target_path.name}) took: {time.time() - perf_start:.4f}s ---")
             return db
                 
@@ -748,116 +1075,275 @@ class RAGManager:
             
             return None
 
+    def _get_embedding_key_pool(self) -> List[Tuple[str, Optional[str]]]:
+        """
+        索引作成で並列に使う (キー名, キー値) のリストを返す。先頭は現在のキー。
+        Gemini API かつキーローテーション有効時のみ、枯渇していない無料キーを追加する
+        （有料キーは課金を避けるため、現在のキーである場合だけ使う）。
+        ローカル/OpenAI の場合は現在のエンベディング1本 ("__default__", None) のみ。
+        """
+        model_id = self._get_embedding_model_id()
+        provider, _, model_name = model_id.partition(":")
+        if self.embedding_mode != "api" or provider != "google":
+            return [("__default__", None)]
+
+        current_name = config_manager.get_key_name_by_value(self.api_key)
+        pool = [(current_name, self.api_key)]
+        if current_name == "Unknown" or not self._is_key_rotation_enabled():
+            return pool
+
+        paid_keys = set(config_manager.CONFIG_GLOBAL.get("paid_api_key_names", []))
+        for key_name, key_value in config_manager.GEMINI_API_KEYS.items():
+            if key_name == current_name or key_name in paid_keys:
+                continue
+            if not key_value or not isinstance(key_value, str) or key_value.startswith("YOUR_API_KEY"):
+                continue
+            if config_manager.is_key_exhausted(key_name, model_name=model_name):
+                continue
+            pool.append((key_name, key_value))
+        return pool
+
+    def _get_pool_embeddings(self, key_value: Optional[str], instances: dict, instances_lock: threading.Lock):
+        """キーごとのエンベディングインスタンスを返す（並列実行中に self.api_key を書き換えないため）。"""
+        if key_value is None:
+            return self._get_actual_embeddings(task_type="retrieval_document")
+        with instances_lock:
+            actual = instances.get(key_value)
+            if actual is None:
+                from langchain_google_genai import GoogleGenerativeAIEmbeddings
+                model_name = self._get_embedding_model_id().partition(":")[2]
+                actual = GoogleGenerativeAIEmbeddings(
+                    model=model_name,
+                    google_api_key=key_value,
+                    task_type="retrieval_document"
+                )
+                instances[key_value] = actual
+            return actual
+
+    def _embed_batch_with_pool(self, texts: List[str], pool: dict, stop_event: threading.Event) -> Optional[List[List[float]]]:
+        """
+        1バッチ分をベクトル化する（ワーカースレッドで実行）。
+        空きのあるキーをレートリミッタで選び、429 ならそのキーをクールダウンさせて別のキーで再試行する。
+        日次上限のキーはプールから外し、使えるキーが無くなったら _EmbeddingQuotaExhausted を送出する。
+        スキップすべき失敗（リトライ上限）の場合は None を返す。
+        """
+        max_retries = 3
+        attempt = 0
+        tokens = embedding_rate_limiter.estimate_tokens(texts)
+        use_limiter = self.embedding_mode == "api"
+        model_name = self._get_embedding_model_id().partition(":")[2]
+        paid_keys = set(config_manager.CONFIG_GLOBAL.get("paid_api_key_names", []))
+
+        while not stop_event.is_set():
+            with pool["lock"]:
+                active_keys = list(pool["keys"])
+            if not active_keys:
+                raise _EmbeddingQuotaExhausted()
+
+            if use_limiter:
+                # 待ち時間が最も短いキーを選ぶ（Gemini の一括埋め込みは1テキスト=1リクエストとして数える）
+                key_name, key_value = min(
+                    active_keys,
+                    key=lambda k: embedding_rate_limiter.get_wait_time(k[0], len(texts), tokens)
+                )
+                if not embedding_rate_limiter.acquire(key_name, len(texts), tokens, cancel_event=stop_event):
+                    return None
+            else:
+                key_name, key_value = active_keys[0]
+
+            try:
+                actual = self._get_pool_embeddings(key_value, pool["instances"], pool["lock"])
+                vectors = embed_documents_with_fallback(actual, texts)
+                if use_limiter:
+                    embedding_rate_limiter.report_success(key_name)
+                return vectors
+            except Exception as e:
+                error_str = str(e)
+                if "429" in error_str or "ResourceExhausted" in error_str:
+                    if not use_limiter:
+                        return None
+                    is_daily_limit = "PerDay" in error_str or "Daily" in error_str
+                    throttle_count = embedding_rate_limiter.report_throttled(
+                        key_name, retry_delay=_parse_retry_delay(error_str), token_limited="Token" in error_str
+                    )
+                    # 分間制限が3回続いた場合は、従来のローテーションと同様に日次上限として扱う
+                    if (is_daily_limit or throttle_count >= 3) and key_name not in paid_keys:
+                        with pool["lock"]:
+                            if (key_name, key_value) in pool["keys"]:
+                                pool["keys"].remove((key_name, key_value))
+                                if key_value is not None:
+                                    config_manager.mark_key_as_exhausted(key_name, model_name=model_name)
+                                print(f"      [RAG Rotation] Key '{key_name}' removed from the embedding pool ({len(pool['keys'])} left).")
+                    continue  # attempt は増やさず、別のキー（またはクールダウン後の同じキー）でリトライ
+
+                attempt += 1
+                print(f"      ! ベクトル化エラー (試行 {attempt}/{max_retries}, Key: {key_name}): {e}")
+                if attempt >= max_retries:
+                    print(f"      ! このバッチをスキップします。最終エラー: {e}")
+                    traceback.print_exc()
+                    return None
+                stop_event.wait(5 * attempt)
+        return None
+
+    def _get_rate_limit_key(self) -> str:
+        """レートリミッタ上で現在のキーを識別する名前（ローカル/OpenAI は "__default__"）。"""
+        if self._get_embedding_model_id().startswith("google:"):
+            return config_manager.get_key_name_by_value(self.api_key)
+        return "__default__"
+
+    def _acquire_embedding_quota(self, texts: List[str]):
+        """逐次処理のバッチ用: 現在のキーのバケットに空きができるまで待つ。"""
+        if self.embedding_mode != "api":
+            return
+        embedding_rate_limiter.acquire(self._get_rate_limit_key(), len(texts), embedding_rate_limiter.estimate_tokens(texts))
+
+    def _report_embedding_result(self, error_str: Optional[str] = None):
+        """逐次処理のバッチ用: 成功/429 をレートリミッタに学習させる。"""
+        if self.embedding_mode != "api":
+            return
+        if error_str is None:
+            embedding_rate_limiter.report_success(self._get_rate_limit_key())
+            return
+        embedding_rate_limiter.report_throttled(
+            self._get_rate_limit_key(),
+            retry_delay=_parse_retry_delay(error_str),
+            token_limited="Token" in error_str
+        )
+
+    @staticmethod
+    def _format_eta(seconds: float) -> str:
+        if seconds < 60:
+            return f"{int(seconds)}秒"
+        if seconds < 3600:
+            return f"{int(seconds // 60)}分"
+        return f"{int(seconds // 3600)}時間{int(seconds % 3600 // 60)}分"
+
     def _create_index_in_batches(self, splits: List[Document], existing_db: Optional[FAISS] = None, 
                                    progress_callback=None, save_callback=None, status_callback=None) -> FAISS:
         """
         大量のドキュメントをバッチ分割し、レート制限を回避しながらインデックスを作成/追記する。
+        API モードでは、キー別のトークンバケット（embedding_rate_limiter）で流量を制御しつつ、
+        使えるAPIキーの数（最大 embedding_max_concurrency）だけバッチを並列にベクトル化する。
+        FAISS への追加はメインスレッドでバッチ順に行う。
         progress_callback: 進捗を報告するコールバック関数 (batch_num, total_batches) -> None
         save_callback: 途中保存用コールバック関数 (db) -> None（定期的に呼び出される）
         status_callback: UIへ進捗メッセージを送信するコールバック関数 (message) -> None
         """
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+
         # [2026-04-28] Free Tierの100 RPM制限を考慮し、バッチサイズを縮小 (20->10)
         BATCH_SIZE = 10
         SAVE_INTERVAL_BATCHES = 20  # 20バッチごと（約200チャンクごと）に途中保存
+        if self.embedding_mode == "local":
+            # ローカルはレート制限が無いため、大きなバッチで渡してプロセスプール側で長さ順に分割させる
+            BATCH_SIZE = 256
+            SAVE_INTERVAL_BATCHES = 4
+        STATUS_INTERVAL_SECONDS = 10  # スループット/残り時間の報告間隔
         db = existing_db
         total_splits = len(splits)
         total_batches = (total_splits + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        print(f"    [BATCH] 開始: {total_splits} チャンク, {total_batches} バッチ (途中保存: {SAVE_INTERVAL_BATCHES}バッチごと)")
+
+        key_pool = self._get_embedding_key_pool()
+        max_concurrency = int(config_manager.CONFIG_GLOBAL.get("embedding_max_concurrency", 4) or 1)
+        workers = 1 if self.embedding_mode == "local" else max(1, min(max_concurrency, len(key_pool)))
+        pool = {"keys": list(key_pool), "instances": {}, "lock": threading.Lock()}
+        stop_event = threading.Event()
+
+        print(f"    [BATCH] 開始: {total_splits} チャンク, {total_batches} バッチ, 並列数 {workers} (途中保存: {SAVE_INTERVAL_BATCHES}バッチごと)")
         if status_callback:
-            status_callback(f"索引処理開始: {total_splits}チャンク, {total_batches}バッチ")
+            status_callback(f"索引処理開始: {total_splits}チャンク, {total_batches}バッチ (並列数 {workers})")
         if progress_callback:
             progress_callback(0, total_batches)
 
-        for i in range(0, total_splits, BATCH_SIZE):
-            # --- [MEMORY MONITORING] ---
-            # 512MB以下の空きメモリしかない場合は中断検討
-            available_mem_mb = psutil.virtual_memory().available / (1024 * 1024)
-            if available_mem_mb < 512:
-                print(f"    [WARNING] 低メモリ状態検知 ({available_mem_mb:.1f}MB)。GC実行...")
-                gc.collect()
-                time.sleep(2)
-                available_mem_mb = psutil.virtual_memory().available / (1024 * 1024)
-                if available_mem_mb < 300:
-                    print(f"    [CRITICAL] メモリ不足のためインデックス作成を中断します。")
-                    if status_callback: status_callback("メモリ不足のため中断")
-                    return db
-
-            batch = splits[i : i + BATCH_SIZE]
-            batch_num = (i // BATCH_SIZE) + 1
-            
-            # リトライループ
-            max_retries = 3
-            attempt = 0
-            while attempt < max_retries:
-                try:
-                    if db is None:
-                        db = FAISS.from_documents(batch, self._get_embeddings())
-                    else:
-                        db.add_documents(batch)
-                    
+        perf_start = time.time()
+        last_status_at = perf_start
+        embedded_chunks = 0
+        batch_num = 0
+        next_start = 0
+        in_flight = deque()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-embed") as executor:
+            try:
+                while next_start < total_splits or in_flight:
+                    # 実行中のバッチを並列数の2倍まで先行投入する
+                    while next_start < total_splits and len(in_flight) < workers * 2:
+                        # --- [MEMORY MONITORING] ---
+                        # 512MB以下の空きメモリしかない場合は中断検討
+                        available_mem_mb = psutil.virtual_memory().available / (1024 * 1024)
+                        if available_mem_mb < 512:
+                            print(f"    [WARNING] 低メモリ状態検知 ({available_mem_mb:.1f}MB)。GC実行...")
+                            gc.collect()
+                            time.sleep(2)
+                            available_mem_mb = psutil.virtual_memory().available / (1024 * 1024)
+                            if available_mem_mb < 300:
+                                print(f"    [CRITICAL] メモリ不足のためインデックス作成を中断します。")
+                                if status_callback: status_callback("メモリ不足のため中断")
+                                return db
+
+                        batch = splits[next_start : next_start + BATCH_SIZE]
+                        texts = [doc.page_content for doc in batch]
+                        in_flight.append((batch, executor.submit(self._embed_batch_with_pool, texts, pool, stop_event)))
+                        next_start += BATCH_SIZE
+
+                    batch, future = in_flight.popleft()
+                    batch_num += 1
+                    try:
+                        vectors = future.result()
+                    except _EmbeddingQuotaExhausted:
+                        print(f"      ! 日次上限到達（使用可能なキーなし）。処理を中断します。")
+                        if status_callback:
+                            status_callback("APIの日次上限に達したため処理を中断しました")
+                        return db  # 現在までのdbを返して中断
+
+                    if vectors is not None:
+                        text_embeddings = list(zip([doc.page_content for doc in batch], vectors))
+                        metadatas = [doc.metadata for doc in batch]
+                        if db is None:
+                            db = FAISS.from_embeddings(text_embeddings, self._get_embeddings(), metadatas=metadatas)
+                        else:
+                            db.add_embeddings(text_embeddings, metadatas=metadatas)
+                        embedded_chunks += len(batch)
+
                     # 進捗を報告
                     if progress_callback:
                         progress_callback(batch_num, total_batches)
-                    
-                    if self.embedding_mode == "api":
-                        # [2026-04-28] 待機時間を延長 (2s->5s) してRPMを抑制
-                        time.sleep(5) 
-                    break 
-                
-                except Exception as e:
-                    error_str = str(e)
-                    print(f"      ! ベクトル化エラー (試行 {attempt+1}/{max_retries}): {e}")
-                    if "429" in error_str or "ResourceExhausted" in error_str:
-                        # --- [API Key Rotation] ---
-                        res = self._rotate_api_key(error_str)
-                        if res == "waited":
-                            if status_callback:
-                                status_callback(f"API制限(分間) - 待機して同じキーでリトライ...")
-                            continue # attempt は増やさずリトライ
-                        elif res == "switched":
-                            if status_callback:
-                                status_callback(f"API制限(日間) - キーを切り替えてリトライします...")
-                            attempt = 0 # リセット
-                            continue
-
-                        # ローテーション不可の場合
-                        is_daily = "PerDay" in error_str or "Daily" in error_str
-                        if is_daily:
-                            print(f"      ! 日次上限到達（ローテーション不可）。処理を中断します。")
-                            if status_callback:
-                                status_callback("APIの日次上限に達したため処理を中断しました")
-                            return db  # 現在までのdbを返して中断
+
+                    now = time.time()
+                    if status_callback and now - last_status_at >= STATUS_INTERVAL_SECONDS and batch_num < total_batches:
+                        last_status_at = now
+                        rate = embedded_chunks / max(now - perf_start, 1e-6)
+                        remaining = total_splits - min(total_splits, batch_num * BATCH_SIZE)
+                        eta = self._format_eta(remaining / rate) if rate > 0 else "不明"
+                        progress_pct = int((batch_num / total_batches) * 100)
+                        status_callback(f"索引処理中: {batch_num}/{total_batches} ({progress_pct}%) - {rate:.1f}チャンク/秒, 残り約{eta}")
+
+                    # 定期進捗報告と途中保存
+                    if batch_num % SAVE_INTERVAL_BATCHES == 0:
+                        progress_pct = int((batch_num / total_batches) * 100)
+                        rate = embedded_chunks / max(time.time() - perf_start, 1e-6)
+                        print(f"    [PROGRESS] {batch_num}/{total_batches} バッチ完了 ({progress_pct}%, {rate:.1f} chunks/s)")
+                        # 途中保存
+                        if save_callback and db:
+                            print(f"    [SAVE] 途中保存実行...")
+                            save_callback(db)
                         
-                        wait_time = 10 * (attempt + 1)
-                        print(f"      ! API制限検知（ローテーション不可）。{wait_time}秒待機してリトライ...")
-                        if status_callback:
-                            status_callback(f"API制限 - {wait_time}秒待機中...")
-                        time.sleep(wait_time)
-                    else:
-                        if attempt >= max_retries - 1:
-                            print(f"      ! このバッチをスキップします。最終エラー: {e}")
-                            traceback.print_exc()
-                        if self.embedding_mode == "api":
-                            time.sleep(5)
-                        break
-                    
-                    attempt += 1            
-            # 定期進捗報告と途中保存（100バッチごと）
-            if batch_num % SAVE_INTERVAL_BATCHES == 0:
-                progress_pct = int((batch_num / total_batches) * 100)
-                print(f"    [PROGRESS] {batch_num}/{total_batches} バッチ完了 ({progress_pct}%)")
-                if status_callback:
-                    status_callback(f"索引処理中: {batch_num}/{total_batches} ({progress_pct}%)")
-                # 途中保存
-                if save_callback and db:
-                    print(f"    [SAVE] 途中保存実行...")
-                    save_callback(db)
-                
-                # 20バッチごとにGC
-                gc.collect()
-        
-        print(f"    [BATCH] 全バッチ処理完了")
+                        # 20バッチごとにGC
+                        gc.collect()
+            finally:
+                # 中断時は待機中のワーカーを速やかに終了させる
+                stop_event.set()
+                for _, future in in_flight:
+                    future.cancel()
+
+        # 日次上限で現在のキーがプールから外れた場合は、残っているキーに切り替えておく
+        remaining_keys = [k for k in pool["keys"] if k[1] is not None]
+        if remaining_keys and (config_manager.get_key_name_by_value(self.api_key), self.api_key) not in pool["keys"]:
+            self.api_key = remaining_keys[0][1]
+            self.actual_embeddings = {}
+
+        elapsed = time.time() - perf_start
+        print(f"    [BATCH] 全バッチ処理完了 ({embedded_chunks}チャンク, {elapsed:.1f}s, {embedded_chunks / max(elapsed, 1e-6):.1f} chunks/s)")
         return db
 
 
@@ -1024,15 +1510,10 @@ class RAGManager:
             total_pending = len(pending_items)
             report(f"新規追加アイテム: {total_pending}件。処理中...")
             
-            static_db = self._safe_load_index(self.static_index_path)
             SAVE_INTERVAL = 5 
             text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
             processed_count = 0
             
-            # 途中保存用コールバック
-            def interim_save(db):
-                self._safe_save_index(db, self.static_index_path)
-            
             for i in range(0, total_pending, SAVE_INTERVAL):
                 batch_items = pending_items[i : i + SAVE_INTERVAL]
                 batch_docs = [item[1] for item in batch_items]
@@ -1041,21 +1522,37 @@ class RAGManager:
                 print(f"  - グループ処理中 ({i+1}〜{min(i+SAVE_INTERVAL, total_pending)} / {total_pending})...")
                 splits = text_splitter.split_documents(batch_docs)
                 splits = self._filter_meaningful_chunks(splits)  # [2026-01-09] 無意味なチャンクを除外
-                static_db = self._create_index_in_batches(
+                if not splits:
+                    # 索引化すべきチャンクが無いアイテムは処理済みとして記録する
+                    processed_records.update(batch_ids)
+                    self._save_processed_record(processed_records)
+                    processed_count += len(batch_items)
+                    continue
+
+                # 本体索引は書き直さず、このグループ分だけを追記セグメントとして保存する
+                segment_path = self._get_index_append_path(self.static_index_path)
+
+                # 途中保存用コールバック
+                def interim_save(db, segment_path=segment_path):
+                    self._safe_save_index(db, segment_path)
+
+                segment_db = self._create_index_in_batches(
                     splits, 
-                    existing_db=static_db,
+                    existing_db=None,
                     save_callback=interim_save,
                     status_callback=status_callback
                 )
                 
-                if static_db:
-                    self._safe_save_index(static_db, self.static_index_path)
+                if segment_db:
+                    self._safe_save_index(segment_db, segment_path)
                     processed_records.update(batch_ids)
                     self._save_processed_record(processed_records)
                     processed_count += len(batch_items)
                 else:
                     print(f"    ! グループ処理失敗。")
 
+            self._schedule_segment_compaction(self.static_index_path)
+
             result_msg = f"記憶索引: {processed_count}件を追加保存"
         else:
             result_msg = "記憶索引: 差分なし"
@@ -1208,7 +1705,6 @@ class RAGManager:
         total_pending = len(pending_items)
         yield (0, total_pending, f"新規追加アイテム: {total_pending}件。処理中...")
         
-        static_db = self._safe_load_index(self.static_index_path)
         SAVE_INTERVAL = 5
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
         processed_count = 0
@@ -1225,6 +1721,16 @@ class RAGManager:
             
             splits = text_splitter.split_documents(batch_docs)
             splits = self._filter_meaningful_chunks(splits)
+            if not splits:
+                # 索引化すべきチャンクが無いアイテムは処理済みとして記録する
+                processed_records.update(batch_ids)
+                self._save_processed_record(processed_records)
+                processed_count += len(batch_items)
+                continue
+
+            # 本体索引は書き直さず、このグループ分だけを追記セグメントとして保存する
+            segment_path = self._get_index_append_path(self.static_index_path)
+            segment_db = None
             
             # バッチ処理（途中保存付き）
             BATCH_SIZE = 20
@@ -1238,19 +1744,20 @@ class RAGManager:
                 attempt = 0
                 while attempt < max_retries:
                     try:
-                        if static_db is None:
-                            static_db = FAISS.from_documents(batch, self._get_embeddings())
+                        # 固定の sleep ではなく、キー別のトークンバケットに空きができるまで待つ
+                        self._acquire_embedding_quota([doc.page_content for doc in batch])
+                        if segment_db is None:
+                            segment_db = FAISS.from_documents(batch, self._get_embeddings())
                         else:
-                            static_db.add_documents(batch)
-                        
-                        if self.embedding_mode == "api":
-                            time.sleep(2)
+                            segment_db.add_documents(batch)
+                        self._report_embedding_result()
                         break
                     except Exception as e:
                         error_str = str(e)
                         print(f"      ! ベクトル化エラー (試行 {attempt+1}/{max_retries}): {e}")
 
                         if "429" in error_str or "ResourceExhausted" in error_str:
+                            self._report_embedding_result(error_str)
                             # --- [API Key Rotation] ---
                             res = self._rotate_api_key(error_str)
                             if res == "waited":
@@ -1266,11 +1773,11 @@ class RAGManager:
                                 if is_daily:
                                     print(f"      ! 日次上限到達（ローテーション不可）。処理を中断します。")
                                     yield (group_num, total_groups, "APIの日次上限に達したため処理を中断しました")
-                                    if static_db:
-                                        self._safe_save_index(static_db, self.static_index_path)
-                                        # 失敗した現在の batch_ids は追加せず、これまでの成功分だけを保存
-                                        self._save_processed_record(processed_records)
-                                        yield (group_num, total_groups, f"⚠️ 日次上限のため途中保存 (グループ{group_num}/{total_groups})")
+                                    # 完了済みグループはセグメントとして保存済み。
+                                    # 失敗した現在のグループは保存せず、次回の更新で再処理する
+                                    self._save_processed_record(processed_records)
+                                    yield (group_num, total_groups, f"⚠️ 日次上限のため中断 (グループ{group_num - 1}/{total_groups}まで保存済み)")
+                                    self._schedule_segment_compaction(self.static_index_path)
                                     return
 
                         is_retryable = any(code in error_str for code in ["429", "ResourceExhausted", "503", "504", "502", "UNAVAILABLE", "ConnectError", "name resolution"])
@@ -1295,15 +1802,14 @@ class RAGManager:
                             break
                 
                 # 20バッチごとに途中保存と進捗報告
-                if static_db and batch_num % 20 == 0:
+                if segment_db and batch_num % 20 == 0:
                     progress_pct = int((batch_num / total_batches) * 100)
                     yield (group_num, total_groups, f"グループ {group_num}/{total_groups}: {batch_num}/{total_batches} バッチ ({progress_pct}%)")
-                    if static_db:
-                        self._safe_save_index(static_db, self.static_index_path)
+                    self._safe_save_index(segment_db, segment_path)
             
             # グループ完了時に保存
-            if static_db:
-                self._safe_save_index(static_db, self.static_index_path)
+            if segment_db:
+                self._safe_save_index(segment_db, segment_path)
                 # 完了したレコードのみ記録を更新
                 processed_records.update(batch_ids)
                 self._save_processed_record(processed_records)
@@ -1312,6 +1818,8 @@ class RAGManager:
                 # 低頻度でGCを実行
                 gc.collect()
         
+        self._schedule_segment_compaction(self.static_index_path)
+
         result_msg = f"記憶索引: {processed_count}件を追加保存"
         print(f"--- [RAG Memory] 完了: {result_msg} ---")
         yield (total_pending, total_pending, result_msg)
@@ -1439,7 +1947,7 @@ class RAGManager:
             # 既存のインデックスがあればロードして追記モードにする
             db = None
             if current_index_dir.exists():
-                db = self._safe_load_index(current_index_dir)
+                db = self._safe_load_index(current_index_dir, writable=True)
             
             for i in range(0, len(splits), BATCH_SIZE):
                 batch = splits[i : i + BATCH_SIZE]
@@ -1449,20 +1957,21 @@ class RAGManager:
                 attempt = 0
                 while attempt < max_retries:
                     try:
+                        # 固定の sleep ではなく、キー別のトークンバケットに空きができるまで待つ
+                        self._acquire_embedding_quota([doc.page_content for doc in batch])
                         if db is None:
                             db = FAISS.from_documents(batch, self._get_embeddings())
                         else:
                             db.add_documents(batch)
+                        self._report_embedding_result()
                         
                         yield (batch_num, total_batches, f"処理中: {batch_num}/{total_batches} バッチ完了")
-                        if self.embedding_mode == "api":
-                            # [2026-04-28] 待機時間を延長 (2s->5s)
-                            time.sleep(5)
                         break
                     except Exception as e:
                         error_str = str(e)
                         print(f"      ! [CurrentLog] ベクトル化エラー (試行 {attempt+1}/{max_retries}): {e}")
                         if "429" in error_str or "ResourceExhausted" in error_str:
+                            self._report_embedding_result(error_str)
                             # --- [API Key Rotation] ---
                             res = self._rotate_api_key(error_str)
                             if res == "waited":
@@ -1559,7 +2068,7 @@ class RAGManager:
         
         Args:
             intent: 外部から渡されたIntent（retrieval_nodeで事前分類済みの場合）。
-                    指定時はLLM分類をスキップしてAPIコストを削減。
+                    指定時はローカル分類をスキップする。
         """
         # [2026-02-11 FIX] 試行済みキーをリセット
         self.tried_keys.clear()
@@ -1571,15 +2080,48 @@ class RAGManager:
          
         results_with_scores = []
         
+        load_start = time.time()
+        dynamic_db = self._safe_load_index(self.dynamic_index_path)
+        static_db, static_segment_dbs = self._load_index_snapshot(self.static_index_path)
+        print(f"--- [PERF] RAGManager.search: safe_load_index (both) took: {time.time() - load_start:.4f}s ---")
+
+        # [2026-02-03 Fix] 429エラー時のリトライ & ローテーションロジック
+        # クエリのベクトル化は1回だけ行い、動的・静的の両インデックスで同じベクトルを使い回す
+        query_embedding = None
+        if dynamic_db or static_db or static_segment_dbs:
+            max_retries = 5
+            attempt = 0
+            while attempt < max_retries:
+                try:
+                    embed_start = time.time()
+                    query_embedding = self.wrapper_embeddings.embed_query(query)
+                    print(f"--- [PERF] RAGManager.search: embed_query took: {time.time() - embed_start:.4f}s ---")
+                    break
+                except Exception as e:
+                    err_str = str(e)
+                    if "429" in err_str or "ResourceExhausted" in err_str:
+                        res = self._rotate_api_key(err_str)
+                        if res == "waited":
+                            print(f"  - [RAG Rotation] Query embedding hit 429. Waited and retrying (Same key)...")
+                        elif res == "switched":
+                            print(f"  - [RAG Rotation] Query embedding hit 429. Rotating and retrying (New key)...")
+                            attempt = 0
+                        else:
+                            print(f"  - [RAG Warning] Query embedding hit 429 but rotation failed: {e}")
+                            attempt += 1
+                    else:
+                        print(f"  - [RAG Warning] Query embedding failed: {e}")
+                        break
+
         # [Intent-Aware] クエリ意図の決定
-        # 1. intentが外部から渡された場合はそれを使用（APIコスト削減）
-        # 2. それ以外はLLMで分類
+        # 1. intentが外部から渡された場合はそれを使用
+        # 2. それ以外はローカルで分類（上で計算したクエリのベクトルを再利用する）
         if intent and intent in constants.INTENT_WEIGHTS:
             weights = constants.INTENT_WEIGHTS[intent]
             print(f"--- [RAG Search Debug] Query: '{query}' (Intent: {intent} [pre-classified], Threshold: {score_threshold}) ---")
-        elif enable_intent_aware and self.api_key:
+        elif enable_intent_aware:
             intent_start = time.time()
-            intent_info = self.classify_query_intent(query)
+            intent_info = self.classify_query_intent(query, query_embedding=query_embedding)
             print(f"--- [PERF] RAGManager.search: classify_query_intent took: {time.time() - intent_start:.4f}s ---")
             intent = intent_info["intent"]
             weights = intent_info["weights"]
@@ -1589,74 +2131,33 @@ class RAGManager:
             weights = constants.INTENT_WEIGHTS[constants.DEFAULT_INTENT]
             print(f"--- [RAG Search Debug] Query: '{query}' (Intent: disabled, Threshold: {score_threshold}) ---")
 
-        load_start = time.time()
-        dynamic_db = self._safe_load_index(self.dynamic_index_path)
-        static_db = self._safe_load_index(self.static_index_path)
-        print(f"--- [PERF] RAGManager.search: safe_load_index (both) took: {time.time() - load_start:.4f}s ---")
-
-        # [2026-02-03 Fix] 429エラー時のリトライ & ローテーションロジック
-        max_retries = 5
-        attempt = 0
-        while attempt < max_retries:
-            results_with_scores = []
-            error_429_detected = False
-            
+        if query_embedding is not None:
             # 1. 動的インデックス検索
             if dynamic_db:
                 try:
                     search_start = time.time()
-                    dynamic_results = dynamic_db.similarity_search_with_score(query, k=k)
+                    dynamic_results = dynamic_db.similarity_search_with_score_by_vector(query_embedding, k=k)
                     print(f"--- [PERF] RAGManager.search: dynamic similarity_search took: {time.time() - search_start:.4f}s ---")
                     results_with_scores.extend(dynamic_results)
                 except Exception as e:
-                    err_str = str(e)
-                    if "429" in err_str or "ResourceExhausted" in err_str:
-                        res = self._rotate_api_key(err_str)
-                        if res == "waited":
-                            print(f"  - [RAG Rotation] Dynamic search hit 429. Waited and retrying (Same key)...")
-                            error_429_detected = True
-                        elif res == "switched":
-                            print(f"  - [RAG Rotation] Dynamic search hit 429. Rotating and retrying (New key)...")
-                            error_429_detected = True
-                            attempt = 0
-                        else:
-                            print(f"  - [RAG Warning] Dynamic search hit 429 but rotation failed: {e}")
-                            attempt += 1
-                    else:
-                        print(f"  - [RAG Warning] Dynamic index search failed: {e}")
-
-            if error_429_detected:
-                continue
+                    print(f"  - [RAG Warning] Dynamic index search failed: {e}")
 
             # 2. 静的インデックス検索
             if static_db:
                 try:
                     search_start = time.time()
-                    static_results = static_db.similarity_search_with_score(query, k=k)
+                    static_results = static_db.similarity_search_with_score_by_vector(query_embedding, k=k)
                     print(f"--- [PERF] RAGManager.search: static similarity_search took: {time.time() - search_start:.4f}s ---")
                     results_with_scores.extend(static_results)
                 except Exception as e:
-                    err_str = str(e)
-                    if "429" in err_str or "ResourceExhausted" in err_str:
-                        res = self._rotate_api_key(err_str)
-                        if res == "waited":
-                            print(f"  - [RAG Rotation] Static search hit 429. Waited and retrying (Same key)...")
-                            error_429_detected = True
-                        elif res == "switched":
-                            print(f"  - [RAG Rotation] Static search hit 429. Rotating and retrying (New key)...")
-                            error_429_detected = True
-                            attempt = 0
-                        else:
-                            print(f"  - [RAG Warning] Static search hit 429 but rotation failed: {e}")
-                            attempt += 1
-                    else:
-                        print(f"  - [RAG Warning] Static index search failed: {e}")
-            
-            if error_429_detected:
-                continue
-                
-            # エラーなく完了したらループを抜ける
-            break
+                    print(f"  - [RAG Warning] Static index search failed: {e}")
+
+            # 3. 静的インデックスの追記セグメント検索（未統合の差分）
+            for segment_db in static_segment_dbs:
+                try:
+                    results_with_scores.extend(segment_db.similarity_search_with_score_by_vector(query_embedding, k=k))
+                except Exception as e:
+                    print(f"  - [RAG Warning] Static index segment search failed: {e}")
 
         # [Intent-Aware] 3項式複合スコアリング:
         # Score = α × similarity + β × (1 - arousal) + γ × (1 - decay) × (1 - arousal)
@@ -1734,45 +2235,48 @@ class RAGManager:
         既存のすべてのインデックスを破棄し、ゼロから再構築する。
         モデル変更時や索引が破損した時に使用。
         """
-        # [2026-02-11 FIX] 試行済みキーをリセット
-        self.tried_keys.clear()
-        
-        def report(message):
-            print(f"--- [RAG Rebuild] {message}")
-            if status_callback: status_callback(message)
-
-        report("インデックスの完全再構築を開始します...")
-        
-        # 1. 既存のディレクトリとファイルを削除
-        paths_to_delete = [
-            self.static_index_path,
-            self.dynamic_index_path,
-            self.processed_files_record,
-            self.room_dir / "rag_data" / "current_log_index",
-            self.room_dir / "rag_data" / "current_log_meta.json"
-        ]
-        
-        for p in paths_to_delete:
-            if p.exists():
-                try:
-                    if p.is_dir():
-                        shutil.rmtree(str(p))
-                    else:
-                        p.unlink()
-                    report(f"削除完了: {p.name}")
-                except Exception as e:
-                    report(f"警告: {p.name} の削除に失敗: {e}")
+        # バックグラウンドのセグメント統合が、再構築した本体索引を古い内容で上書きしないようにする
+        with self._get_index_write_lock(self.static_index_path):
+            # [2026-02-11 FIX] 試行済みキーをリセット
+            self.tried_keys.clear()
+        
+            def report(message):
+                print(f"--- [RAG Rebuild] {message}")
+                if status_callback: status_callback(message)
+
+            report("インデックスの完全再構築を開始します...")
+        
+            # 1. 既存のディレクトリとファイルを削除
+            paths_to_delete = [
+                self.static_index_path,
+                self._get_segments_dir(self.static_index_path),
+                self.dynamic_index_path,
+                self.processed_files_record,
+                self.room_dir / "rag_data" / "current_log_index",
+                self.room_dir / "rag_data" / "current_log_meta.json"
+            ]
+        
+            for p in paths_to_delete:
+                if p.exists():
+                    try:
+                        if p.is_dir():
+                            shutil.rmtree(str(p))
+                        else:
+                            p.unlink()
+                        report(f"削除完了: {p.name}")
+                    except Exception as e:
+                        report(f"警告: {p.name} の削除に失敗: {e}")
 
-        # キャッシュもクリア
-        RAGManager._index_cache.clear()
+            # キャッシュもクリア
+            RAGManager.clear_cache()
 
-        # 2. 再構築（通常の更新メソッドを呼ぶが、ファイルがないので全件処理になる）
-        report("記憶索引の再構築を開始...")
-        memory_result = self.update_memory_index(status_callback)
+            # 2. 再構築（通常の更新メソッドを呼ぶが、ファイルがないので全件処理になる）
+            report("記憶索引の再構築を開始...")
+            memory_result = self.update_memory_index(status_callback)
         
-        report("知識索引の再構築を開始...")
-        knowledge_result = self.update_knowledge_index(status_callback)
+            report("知識索引の再構築を開始...")
+            knowledge_result = self.update_knowledge_index(status_callback)
         
-        final_msg = f"再構築完了: {memory_result} / {knowledge_result}"
-        report(final_msg)
-        return final_msg
+            final_msg = f"再構築完了: {memory_result} / {knowledge_result}"
+            report(final_msg)
+            return final_msg
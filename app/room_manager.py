@@ -12,13 +12,18 @@ import time
 from typing import Any, Dict, Optional, List, Tuple
 from send2trash import send2trash
 import constants
+import job_scheduler
 
 # スレッドセーフなファイル操作のためのロック
 _room_config_lock = threading.Lock()
 
 def _infer_month_from_log_backup(backup_path: str) -> Optional[str]:
     """バックアップファイル名または本文の日付から対象月(YYYY-MM)を推定する。"""
+    import backup_store
     basename = os.path.basename(backup_path)
+    if backup_store.is_manifest(backup_path):
+        # 世代のマニフェストには元のファイル名（YYYY-MM.txt）が記録されている
+        basename = backup_store.get_source_name(backup_path) or ""
     filename_match = re.search(r"(\d{4}-\d{2})\.txt", basename)
     if filename_match:
         return filename_match.group(1)
@@ -54,6 +59,7 @@ def restore_missing_monthly_logs_from_backups(room_name: str) -> List[str]:
     return _restore_missing_monthly_logs_from_backups(base_path)
 
 def _restore_missing_monthly_logs_from_backups(abs_base: str) -> List[str]:
+    import backup_store
     logs_dir = os.path.join(abs_base, constants.LOGS_DIR_NAME)
     backup_logs_dir = os.path.join(abs_base, "backups", "logs")
     restored: List[str] = []
@@ -64,11 +70,11 @@ def _restore_missing_monthly_logs_from_backups(abs_base: str) -> List[str]:
     os.makedirs(logs_dir, exist_ok=True)
     latest_backup_by_month: Dict[str, str] = {}
 
-    for name in os.listdir(backup_logs_dir):
-        backup_path = os.path.join(backup_logs_dir, name)
-        if not os.path.isfile(backup_path) or os.path.getsize(backup_path) == 0:
+    for backup_path in _list_log_backup_candidates(backup_logs_dir):
+        name = os.path.basename(backup_path)
+        if os.path.getsize(backup_path) == 0:
             continue
-        if not (name.endswith(".bak") or name.endswith(".txt")):
+        if not (name.endswith(".bak") or name.endswith(".txt") or backup_store.is_manifest(backup_path)):
             continue
 
         month = _infer_month_from_log_backup(backup_path)
@@ -92,7 +98,7 @@ def _restore_missing_monthly_logs_from_backups(abs_base: str) -> List[str]:
             except Exception:
                 pass
 
-        shutil.copy2(backup_path, target_path)
+        _copy_log_backup(backup_path, target_path)
         restored.append(target_path)
         print(f"--- [REPAIR_LOG] 月次ログをバックアップから自動復元: {os.path.basename(backup_path)} -> {target_path} ---")
 
@@ -253,17 +259,17 @@ def ensure_room_files(room_name: str) -> bool:
                 if not c_logs and not has_legacy_log and not has_migrating_log:
                     print(f"--- [REPAIR_LOG] ログ消失を検知。バックアップをスキャンします... ---")
                     
-                    b_files = [f for f in os.listdir(backup_logs_dir) if os.path.isfile(os.path.join(backup_logs_dir, f))]
+                    b_files = _list_log_backup_candidates(backup_logs_dir)
                     print(f"--- [REPAIR_LOG] バックアップ候補: {len(b_files)} 件 ---")
                     
-                    backups = sorted(
-                        [os.path.join(backup_logs_dir, f) for f in b_files], 
-                        key=os.path.getmtime
-                    )
+                    backups = sorted(b_files, key=os.path.getmtime)
                     
                     if backups:
+                        import backup_store
                         latest = backups[-1]
                         fname = os.path.basename(latest)
+                        if backup_store.is_manifest(latest):
+                            fname = backup_store.get_source_name(latest) or fname
                         
                         target_name = "log.txt"
                         # 月次形式 (YYYY-MM.txt) を優先
@@ -275,7 +281,7 @@ def ensure_room_files(room_name: str) -> bool:
                         
                         target_path = os.path.join(logs_dir if target_name != "log.txt" else abs_base, target_name)
                         print(f"--- [REPAIR_LOG] 復元実行: {fname} -> {target_path} ---")
-                        shutil.copy2(latest, target_path)
+                        _copy_log_backup(latest, target_path)
                         if target_name == "log.txt":
                             try:
                                 import utils
@@ -738,6 +744,10 @@ def create_backup(room_name: str, file_type: str) -> Optional[str]:
             print(f"情報: バックアップ対象ファイルが見つかりません（初回作成時など）: {source_path}")
             return None
 
+        # 会話ログはチャンク単位で重複排除するストアに保存する（大きな月次ログを丸ごと複製しない）
+        if file_type == 'log':
+            return _create_log_backup(backup_dir, source_path, original_filename)
+
         # 変更検知: 最新のバックアップと内容が同一ならスキップ
         existing_backups = sorted(
             [f for f in os.listdir(backup_dir) if f.endswith(".bak")],
@@ -759,11 +769,8 @@ def create_backup(room_name: str, file_type: str) -> Optional[str]:
         # バックアップの実行
         shutil.copy2(source_path, backup_path)
 
-        # ローテーション処理（ログは専用の世代数を使用）
-        if file_type == 'log':
-            rotation_count = config_manager.CONFIG_GLOBAL.get("log_backup_rotation_count", 30)
-        else:
-            rotation_count = config_manager.CONFIG_GLOBAL.get("backup_rotation_count", 10)
+        # ローテーション処理
+        rotation_count = config_manager.CONFIG_GLOBAL.get("backup_rotation_count", 10)
 
         # バックアップ一覧を再取得（新規作成分を含む）
         existing_backups = sorted(
@@ -784,6 +791,59 @@ def create_backup(room_name: str, file_type: str) -> Optional[str]:
         traceback.print_exc()
         raise IOError(error_msg) from e
 
+def _create_log_backup(backup_dir: str, source_path: str, original_filename: str) -> Optional[str]:
+    """
+    会話ログの新しい世代を backup_store に保存し、マニフェストのパスを返す（変更がなければ None）。
+    ストア導入前の .bak も世代数に含めてローテーションする。
+    """
+    import config_manager
+    import backup_store
+
+    legacy_backups = sorted(
+        [os.path.join(backup_dir, f) for f in os.listdir(backup_dir) if f.endswith(".bak")],
+        key=os.path.getmtime
+    )
+    # ストアにまだ世代がない場合は、従来どおり最新の .bak と比較する
+    if legacy_backups and not backup_store.list_generations(backup_dir):
+        try:
+            if filecmp.cmp(source_path, legacy_backups[-1], shallow=False):
+                return None
+        except OSError:
+            pass
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest_path = backup_store.save_generation(backup_dir, source_path, f"{timestamp}_{original_filename}")
+    if not manifest_path:
+        return None  # 変更なし → スキップ
+
+    rotation_count = config_manager.CONFIG_GLOBAL.get("log_backup_rotation_count", 30)
+    all_backups = sorted(legacy_backups + backup_store.list_generations(backup_dir), key=os.path.getmtime)
+    if len(all_backups) > rotation_count:
+        expired = all_backups[:len(all_backups) - rotation_count]
+        for path in expired:
+            if not backup_store.is_manifest(path):
+                os.remove(path)
+        backup_store.delete_generations([path for path in expired if backup_store.is_manifest(path)])
+
+    return manifest_path
+
+def _list_log_backup_candidates(backup_logs_dir: str) -> List[str]:
+    """backups/logs 内の復元候補（従来のバックアップファイルと、backup_store の世代）を返す。"""
+    import backup_store
+    files = [
+        os.path.join(backup_logs_dir, f) for f in os.listdir(backup_logs_dir)
+        if os.path.isfile(os.path.join(backup_logs_dir, f))
+    ]
+    return files + backup_store.list_generations(backup_logs_dir)
+
+def _copy_log_backup(backup_path: str, target_path: str):
+    """ログのバックアップ（ファイルまたは backup_store の世代）を target_path に書き出す。"""
+    import backup_store
+    if backup_store.is_manifest(backup_path):
+        backup_store.restore_generation(backup_path, target_path)
+    else:
+        shutil.copy2(backup_path, target_path)
+
 def update_room_config(room_name: str, updates: dict) -> bool:
     """
     ルーム設定ファイル(room_config.json)を安全に更新する。
@@ -863,6 +923,7 @@ def update_room_config(room_name: str, updates: dict) -> bool:
                     json.dump(config, f, indent=2, ensure_ascii=False)
                 os.replace(temp_file, config_file)
                 # print(f"ルーム '{room_name}' の設定を更新しました。")
+                job_scheduler.notify("settings_changed", room_name=room_name)
                 return True
             except PermissionError:
                 if attempt < max_retries - 1:
@@ -1155,12 +1216,16 @@ def list_log_backups(room_name: str) -> List[Tuple[str, str]]:
     if not os.path.exists(backup_dir):
         return []
 
+    import backup_store
+    # 従来の .bak と、backup_store の世代（マニフェスト）の両方を一覧にする
+    candidates = [os.path.join(backup_dir, f) for f in os.listdir(backup_dir)] + backup_store.list_generations(backup_dir)
+
     backups = []
-    for f in os.listdir(backup_dir):
-        if f.endswith("_log.txt.bak"):
-            filepath = os.path.join(backup_dir, f)
+    for filepath in candidates:
+        f = os.path.basename(filepath)
+        if f.endswith("_log.txt.bak") or (f.endswith("_log.txt.json") and backup_store.is_manifest(filepath)):
             # ファイル名からタイムスタンプを抽出 (YYYYMMDD_HHMMSS)
-            match = re.match(r"^(\d{8}_\d{6})_log\.txt\.bak$", f)
+            match = re.match(r"^(\d{8}_\d{6})_log\.txt\.(?:bak|json)$", f)
             if match:
                 dt_str = match.group(1)
                 try:
@@ -1196,7 +1261,7 @@ def restore_log_from_backup(room_name: str, backup_path: str) -> bool:
             print(f"--- 復元前の安全バックアップを作成しました: {pre_restore_backup} ---")
 
         # 復元の実行
-        shutil.copy2(backup_path, log_path_current)
+        _copy_log_backup(backup_path, log_path_current)
         print(f"--- ログをバックアップから復元しました: {backup_path} -> {log_path_current} ---")
         return True
     except Exception as e:
@@ -0,0 +1,99 @@
+# scripts/benchmark_local_embedding.py
+"""
+ローカルエンベディングのベンチマーク
+
+従来方式（UIプロセス内の SentenceTransformer に10件ずつ渡す）と、
+local_embedding_pool のワーカー数を変えた場合の chunks/sec を比較する。
+
+使い方:
+    python scripts/benchmark_local_embedding.py [--model intfloat/multilingual-e5-small] [--chunks 2000]
+                                                [--workers 1,2,4] [--quantized PATH] [--room ROOM]
+
+--room を指定すると、そのルームのログ (characters/<ROOM>/logs/*.txt) から 300文字前後のチャンクを作って使う。
+指定しない場合は長さのばらついた合成テキストを使う。
+"""
+
+import os
+import glob
+import time
+import random
+import sys
+import argparse
+
+# app/ から実行する前提で、app/ 直下のモジュールを読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import local_embedding_pool
+
+
+def _load_room_chunks(room_name: str, limit: int) -> list:
+    chunks = []
+    for path in sorted(glob.glob(os.path.join("characters", room_name, "logs", "*.txt"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        chunks.extend(text[i:i + 300] for i in range(0, len(text), 250))
+        if len(chunks) >= limit:
+            break
+    return chunks[:limit]
+
+
+def _make_synthetic_chunks(count: int) -> list:
+    random.seed(0)
+    words = ["今日は", "記憶", "会話", "ユーザー", "天気", "散歩した", "夢を見た", "思い出", "約束", "memory", "search", "index"]
+    return [" ".join(random.choice(words) for _ in range(random.randint(5, 120))) for _ in range(count)]
+
+
+def _bench_in_process(model_id: str, texts: list) -> float:
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_id)
+    model.encode(texts[:10], show_progress_bar=False)  # ウォームアップ
+    start = time.time()
+    for i in range(0, len(texts), 10):
+        model.encode(texts[i:i + 10], show_progress_bar=False)
+    return len(texts) / (time.time() - start)
+
+
+def _bench_pool(model_id: str, texts: list, workers: int, quantized_model_path: str = None) -> float:
+    pool = local_embedding_pool.LocalEmbeddingPool(model_id, workers, quantized_model_path)
+    try:
+        start = time.time()
+        # 索引作成と同じく 256件ずつ渡す
+        for i in range(0, len(texts), 256):
+            pool.embed(texts[i:i + 256])
+        return len(texts) / (time.time() - start)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルエンベディングのスループット計測")
+    parser.add_argument("--model", default="intfloat/multilingual-e5-small")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--workers", default=None, help="カンマ区切りのワーカー数 (既定: 1,2,4,... CPUコア数まで)")
+    parser.add_argument("--quantized", default=None, help="int8 量子化済みモデルのパス")
+    parser.add_argument("--room", default=None)
+    args = parser.parse_args()
+
+    texts = _load_room_chunks(args.room, args.chunks) if args.room else _make_synthetic_chunks(args.chunks)
+    cpu_count = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts, w = [], 1
+        while w <= cpu_count:
+            worker_counts.append(w)
+            w *= 2
+
+    print(f"モデル: {args.model} / チャンク数: {len(texts)} / CPUコア数: {cpu_count}")
+    baseline = _bench_in_process(args.model, texts)
+    print(f"  従来方式 (プロセス内, 10件ずつ): {baseline:8.1f} chunks/sec")
+    for workers in worker_counts:
+        rate = _bench_pool(args.model, texts, workers)
+        print(f"  プール (ワーカー {workers:2d}):          {rate:8.1f} chunks/sec  (x{rate / baseline:.2f})")
+        if args.quantized:
+            rate_q = _bench_pool(args.model, texts, workers, args.quantized)
+            print(f"  プール (ワーカー {workers:2d}, int8):    {rate_q:8.1f} chunks/sec  (x{rate_q / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+# sleep_consolidation.py
+"""
+睡眠時記憶整理（夢想・エピソード記憶・索引の更新・圧縮）のジョブ実行
+
+これまで通知禁止時間帯の記憶整理は、alarm_manager のスケジューラスレッドの中で
+ルームごと・段階ごとに順番に実行していたため、1つのルームが遅いと他のルームもアラームも待たされていた。
+ここでは
+
+- 1ルーム分の整理を、依存関係を宣言した段階（STAGES）のグラフとして表す
+- 依存が済んだ段階からワーカープールで実行する（ルームをまたいで並列に進む）
+- LLM / エンベディングのプロバイダーごとに同時実行数の上限を設ける
+- 段階ごとの結果をその日のチェックポイント（temp/sleep_consolidation/<ルーム>.json）に記録し、
+  途中で止まったり失敗したりした場合は、次の呼び出しで済んでいない段階だけを実行する。
+  失敗した段階は間隔を倍々に空けて再試行し、MAX_STAGE_ATTEMPTS 回失敗したらその日は諦める
+- 段階ごとの待ち時間・実行時間をレポートとして room_config.json の
+  last_sleep_consolidation_report に保存する（last_episodic_update と同じ場所）
+
+段階の予算（budget_sec）は目安で、超えても処理は止めない（途中で止めると保存前の進捗が失われるため）。
+超えた段階はログに出し、レポートに over_budget として残す。
+"""
+
+import os
+import json
+import time
+import queue
+import datetime
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional
+
+import config_manager
+import room_manager
+
+CHECKPOINT_DIR = os.path.join("temp", "sleep_consolidation")
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_LLM_CONCURRENCY = 2
+DEFAULT_EMBEDDING_CONCURRENCY = 2
+# 同じ日に失敗した段階を実行する回数の上限（これに達したらその日は再試行しない）
+MAX_STAGE_ATTEMPTS = 3
+# 失敗した段階を再試行するまでの間隔（秒）。失敗するたびに倍にする
+STAGE_RETRY_BACKOFF_SEC = 600
+RESULT_PREVIEW_CHARS = 200
+
+
+class StageFailed(Exception):
+    """段階の処理は戻ったが、結果が失敗を示している。"""
+
+
+def _run_dream(room_folder: str, api_key: str) -> str:
+    import dreaming_manager
+    result = dreaming_manager.DreamingManager(room_folder, api_key).dream_with_auto_level()
+    if result and ("エラー" in result or "失敗" in result):
+        raise StageFailed(result)
+    return result or "完了"
+
+
+def _run_episodic(room_folder: str, api_key: str) -> str:
+    from episodic_memory_manager import EpisodicMemoryManager
+    # 日次要約でエピソード記憶を生成
+    result = EpisodicMemoryManager(room_folder).update_memory(api_key)
+    # 更新日時をroom_config.jsonに保存
+    status_text = f"最終更新: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    room_manager.update_room_config(room_folder, {"last_episodic_update": status_text})
+    return result
+
+
+def _run_compress(room_folder: str, api_key: str) -> str:
+    from episodic_memory_manager import EpisodicMemoryManager
+    emm = EpisodicMemoryManager(room_folder)
+    # 週次圧縮 → 月次圧縮
+    compress_result = emm.compress_old_episodes(api_key)
+    monthly_result = emm.compress_weekly_to_monthly(api_key)
+    result = f"{compress_result} / {monthly_result}"
+    room_manager.update_room_config(room_folder, {"last_compression_result": result})
+    return result
+
+
+def _run_memory_index(room_folder: str, api_key: str) -> str:
+    import rag_manager
+    return rag_manager.RAGManager(room_folder, api_key).update_memory_index()
+
+
+def _run_current_log_index(room_folder: str, api_key: str) -> str:
+    import rag_manager
+    rm = rag_manager.RAGManager(room_folder, api_key)
+    result = None
+    for batch_num, total_batches, status in rm.update_current_log_index_with_progress():
+        if batch_num == total_batches:
+            result = status
+    return result or "完了"
+
+
+class Stage:
+    """記憶整理の1段階。deps の段階が終わってから（成否によらず）実行する。"""
+
+    def __init__(self, name: str, label: str, deps: List[str], resource: str, budget_sec: float,
+                 setting_key: Optional[str], func: Callable[[str, str], str]):
+        self.name = name
+        self.label = label
+        self.deps = deps
+        self.resource = resource  # "llm" / "embedding"
+        self.budget_sec = budget_sec
+        self.setting_key = setting_key  # sleep_consolidation 設定のキー（None なら常に実行）
+        self.func = func
+
+
+# 夢想はエンティティ記憶の統合とエピソード記憶の書き込み（Arousal正規化・発見エピソード）も行うため、
+# エピソード記憶の更新はその後にする。記憶索引はエピソード記憶と夢日記を取り込むためその後で、
+# 古いエピソードの圧縮は従来どおり記憶索引の更新の後に行う。
+# 現行ログ索引は他の段階と読み書きする対象が重ならないので並行して進める。
+STAGES: List[Stage] = [
+    Stage("dream", "夢想", [], "llm", 900, None, _run_dream),
+    Stage("episodic", "エピソード記憶の更新", ["dream"], "llm", 900, "update_episodic_memory", _run_episodic),
+    Stage("memory_index", "記憶索引の更新", ["dream", "episodic"], "embedding", 1200, "update_memory_index", _run_memory_index),
+    Stage("compress", "古いエピソード記憶の圧縮", ["memory_index"], "llm", 600, "compress_old_episodes", _run_compress),
+    Stage("current_log_index", "現行ログ索引の更新", [], "embedding", 600, "update_current_log_index", _run_current_log_index),
+]
+
+class _DaemonWorkerPool:
+    """
+    デーモンスレッドのワーカープール。
+    ThreadPoolExecutor のワーカーはインタプリタの終了時に join されるため、数十分かかる段階の実行中は
+    アプリを終了できなくなる。ここでは終了時に実行中の段階をそのまま打ち切り、次回チェックポイントから再開させる。
+    """
+
+    def __init__(self, max_workers: int):
+        self._tasks: "queue.SimpleQueue" = queue.SimpleQueue()
+        for i in range(max_workers):
+            threading.Thread(target=self._worker, name=f"sleep-consolidation_{i}", daemon=True).start()
+
+    def submit(self, func: Callable, *args):
+        self._tasks.put((func, args))
+
+    def _worker(self):
+        while True:
+            func, args = self._tasks.get()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+
+
+_lock = threading.Lock()
+_executor: Optional[_DaemonWorkerPool] = None
+_resource_semaphores: Dict[str, threading.Semaphore] = {}
+_running: Dict[str, "_RoomRun"] = {}
+
+
+def _get_executor() -> _DaemonWorkerPool:
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = int(config_manager.CONFIG_GLOBAL.get("sleep_consolidation_workers", DEFAULT_MAX_WORKERS))
+            _executor = _DaemonWorkerPool(max(1, workers))
+        return _executor
+
+
+def _resource_key(resource: str) -> str:
+    """同時実行数の上限をかける単位（プロバイダー）。"""
+    settings = config_manager.get_internal_model_settings()
+    if resource == "embedding":
+        provider = settings.get("embedding_provider", "google")
+        return f"embedding:{'google' if provider == 'gemini' else provider}"
+    return f"llm:{settings.get('processing_provider_cat', 'google')}"
+
+
+def _get_semaphore(key: str) -> threading.Semaphore:
+    with _lock:
+        semaphore = _resource_semaphores.get(key)
+        if semaphore is None:
+            if key.startswith("embedding:"):
+                limit = config_manager.CONFIG_GLOBAL.get("sleep_consolidation_embedding_concurrency", DEFAULT_EMBEDDING_CONCURRENCY)
+            else:
+                limit = config_manager.CONFIG_GLOBAL.get("sleep_consolidation_llm_concurrency", DEFAULT_LLM_CONCURRENCY)
+            semaphore = _resource_semaphores[key] = threading.Semaphore(max(1, int(limit)))
+        return semaphore
+
+
+def _checkpoint_path(room_folder: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{room_folder}.json")
+
+
+def _load_checkpoint(room_folder: str, date_str: str) -> dict:
+    """その日のチェックポイント。日付が違う（前日以前の）ものは使わない。"""
+    try:
+        with open(_checkpoint_path(room_folder), "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if isinstance(checkpoint, dict) and checkpoint.get("date") == date_str:
+            return checkpoint
+    except (OSError, ValueError):
+        pass
+    return {"date": date_str, "stages": {}}
+
+
+def _save_checkpoint(room_folder: str, checkpoint: dict):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint_path(room_folder)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _is_settled(entry: Optional[dict]) -> bool:
+    """その日はもう実行しない段階か（成功・無効、または失敗が上限回数に達した）。"""
+    if not entry:
+        return False
+    if entry.get("status") in ("done", "disabled"):
+        return True
+    return entry.get("attempts", 0) >= MAX_STAGE_ATTEMPTS
+
+
+def _retry_at(checkpoint: dict) -> float:
+    """失敗した段階の再試行を待っている場合、その時刻（待っていなければ 0）。"""
+    stages = checkpoint.get("stages", {})
+    return max(
+        [entry.get("retry_at", 0) for entry in stages.values() if entry and not _is_settled(entry)] or [0]
+    )
+
+
+def has_pending_stages(room_folder: str, date: datetime.date) -> bool:
+    """
+    その日の記憶整理が途中まで進んでいて、今すぐ実行すべき段階が残っているか
+    （失敗した段階の再試行待ちの間は False）。
+    """
+    checkpoint = _load_checkpoint(room_folder, date.isoformat())
+    stages = checkpoint.get("stages", {})
+    if not stages or all(_is_settled(stages.get(stage.name)) for stage in STAGES):
+        return False
+    return _retry_at(checkpoint) <= time.time()
+
+
+def is_running(room_folder: str) -> bool:
+    with _lock:
+        return room_folder in _running
+
+
+class _RoomRun:
+    """1ルーム分の記憶整理の進行状況。段階の完了ごとに、依存が済んだ段階をワーカープールへ投入する。"""
+
+    def __init__(self, room_folder: str, api_key: str, settings: dict, date_str: str,
+                 on_complete: Optional[Callable[[dict], None]], already_done: List[str]):
+        self.room_folder = room_folder
+        self.api_key = api_key
+        self.settings = settings
+        self.on_complete = on_complete
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._checkpoint = _load_checkpoint(room_folder, date_str)
+        self._report: Dict[str, dict] = {}
+        self._finished = set()
+        self._submitted = set()
+        self._completed = False
+        for stage in STAGES:
+            entry = self._checkpoint["stages"].get(stage.name)
+            if stage.name in already_done and not _is_settled(entry):
+                entry = self._checkpoint["stages"][stage.name] = {"label": stage.label, "status": "done", "result": "本日は実行済み"}
+            if _is_settled(entry):
+                # 前回までに済んだ段階は実行しない（レポートには前回の結果を残す）
+                self._report[stage.name] = dict(entry, resumed=True)
+                self._finished.add(stage.name)
+
+    def is_settled(self) -> bool:
+        """その日に実行すべき段階が残っていないか。"""
+        return len(self._finished) == len(STAGES)
+
+    def start(self):
+        resumed = [stage.name for stage in STAGES if stage.name in self._finished and self._report[stage.name].get("status") == "done"]
+        if resumed:
+            print(f"  🌙 {self.room_folder}: 記憶整理を再開します（済み: {', '.join(resumed)}）")
+        self._submit_ready()
+
+    def _submit_ready(self):
+        ready = []
+        with self._lock:
+            for stage in STAGES:
+                if stage.name in self._submitted or stage.name in self._finished:
+                    continue
+                if all(dep in self._finished for dep in stage.deps):
+                    self._submitted.add(stage.name)
+                    ready.append(stage)
+            done = len(self._finished) == len(STAGES) and not self._completed
+            if done:
+                self._completed = True
+        for stage in ready:
+            _get_executor().submit(self._run_stage, stage, time.time())
+        if done:
+            self._complete()
+
+    def _run_stage(self, stage: Stage, ready_at: float):
+        entry = {"label": stage.label, "budget_sec": stage.budget_sec}
+        previous = self._checkpoint["stages"].get(stage.name) or {}
+        try:
+            if stage.setting_key and not self.settings.get(stage.setting_key, True):
+                entry.update(status="disabled", wait_sec=0.0, run_sec=0.0)
+            else:
+                semaphore = _get_semaphore(_resource_key(stage.resource))
+                with semaphore:
+                    started = time.time()
+                    print(f"  🌙 {self.room_folder}: {stage.label}を開始...")
+                    try:
+                        result = stage.func(self.room_folder, self.api_key)
+                        entry["status"] = "done"
+                        print(f"  ✅ {self.room_folder}: {stage.label}: {result}")
+                    except Exception as e:
+                        result = str(e)
+                        entry["status"] = "failed"
+                        print(f"  ❌ {self.room_folder}: {stage.label}でエラー - {e}")
+                        if not isinstance(e, StageFailed):
+                            traceback.print_exc()
+                    run_sec = time.time() - started
+                entry.update(
+                    wait_sec=round(started - ready_at, 2),
+                    run_sec=round(run_sec, 2),
+                    over_budget=run_sec > stage.budget_sec,
+                    result=str(result)[:RESULT_PREVIEW_CHARS],
+                    attempts=previous.get("attempts", 0) + 1,
+                )
+                self._schedule_retry(stage, entry)
+                if run_sec > stage.budget_sec:
+                    print(f"  ⚠️ {self.room_folder}: {stage.label}が予算 {stage.budget_sec}秒を超えました（{run_sec:.0f}秒）")
+            entry["finished_at"] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        except Exception as e:
+            entry.update(status="failed", result=str(e)[:RESULT_PREVIEW_CHARS], attempts=previous.get("attempts", 0) + 1)
+            print(f"  ❌ {self.room_folder}: {stage.label}の実行準備でエラー - {e}")
+            self._schedule_retry(stage, entry)
+
+        with self._lock:
+            self._report[stage.name] = entry
+            self._checkpoint["stages"][stage.name] = {k: v for k, v in entry.items() if k != "resumed"}
+            self._finished.add(stage.name)
+            try:
+                _save_checkpoint(self.room_folder, self._checkpoint)
+            except OSError as e:
+                print(f"  - [SleepConsolidation] チェックポイントの保存に失敗 ({self.room_folder}): {e}")
+        self._submit_ready()
+
+    def _schedule_retry(self, stage: Stage, entry: dict):
+        """失敗した段階に、次に再試行してよい時刻を記録する（上限回数に達したらその日は諦める）。"""
+        if entry.get("status") != "failed":
+            return
+        attempts = entry.get("attempts", 1)
+        if attempts >= MAX_STAGE_ATTEMPTS:
+            print(f"  ❌ {self.room_folder}: {stage.label}が{attempts}回失敗したため、本日は再試行しません")
+            return
+        backoff = STAGE_RETRY_BACKOFF_SEC * (2 ** (attempts - 1))
+        entry["retry_at"] = time.time() + backoff
+        print(f"  - [SleepConsolidation] {self.room_folder}: {stage.label}は{backoff // 60:.0f}分後以降に再試行します")
+
+    def _complete(self):
+        total_sec = time.time() - self.started
+        report = {
+            "date": self._checkpoint["date"],
+            "finished_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "total_sec": round(total_sec, 2),
+            # 依存関係で並行に進んだ段階があるため、段階の実行時間の合計は total_sec より大きくなりうる
+            "stages": {stage.name: self._report.get(stage.name, {}) for stage in STAGES},
+        }
+        timings = ", ".join(
+            f"{stage.name}={self._report[stage.name].get('run_sec', 0):.0f}s" for stage in STAGES
+            if not self._report[stage.name].get("resumed") and self._report[stage.name].get("status") != "disabled"
+        )
+        print(f"🛌 {self.room_folder}: 睡眠時記憶整理が完了しました（{total_sec:.0f}秒: {timings}）")
+        try:
+            room_manager.update_room_config(self.room_folder, {"last_sleep_consolidation_report": report})
+        except Exception as e:
+            print(f"  - [SleepConsolidation] レポートの保存に失敗 ({self.room_folder}): {e}")
+        with _lock:
+            _running.pop(self.room_folder, None)
+        if self.on_complete:
+            try:
+                self.on_complete(report)
+            except Exception as e:
+                print(f"  - [SleepConsolidation] 完了後の処理でエラー ({self.room_folder}): {e}")
+                traceback.print_exc()
+
+
+def submit(room_folder: str, api_key: str, settings: dict, date: datetime.date,
+           on_complete: Optional[Callable[[dict], None]] = None, already_done: Optional[List[str]] = None) -> bool:
+    """
+    ルームの記憶整理をワーカープールで開始する（呼び出し元は待たない）。
+    settings は有効設定の "sleep_consolidation"。その日のチェックポイントで済んでいる段階と、
+    already_done に挙げた段階（手動で夢を見た場合の "dream" など）は実行しない。
+    on_complete(report) は全段階の終了後にワーカースレッドで呼ばれる。
+    既に実行中、その日に実行すべき段階が残っていない（すべて済んだか、失敗の上限に達した）、
+    または失敗した段階の再試行待ちの場合は、何もせず False を返す。
+    """
+    with _lock:
+        if room_folder in _running:
+            return False
+        run = _RoomRun(room_folder, api_key, settings, date.isoformat(), on_complete, already_done or [])
+        if run.is_settled() or _retry_at(run._checkpoint) > time.time():
+            return False
+        _running[room_folder] = run
+    run.start()
+    return True
+
+
+def is_stage_done(report: dict, stage_name: str) -> bool:
+    return (report.get("stages", {}).get(stage_name) or {}).get("status") == "done"
+
+
+def get_running_rooms() -> List[str]:
+    with _lock:
+        return list(_running)
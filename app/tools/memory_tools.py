@@ -124,75 +124,13 @@ def search_past_conversations(query: str, room_name: str, api_key: str, exclude_
 
     print(f"--- 過去ログ検索実行 (ルーム: {room_name}, クエリ: '{query}') ---")
     try:
-        base_path = Path(constants.ROOMS_DIR) / room_name
-        search_paths = [str(base_path / "log.txt")]
-        search_paths.extend(glob.glob(str(base_path / "log_archives" / "*.txt")))
-        search_paths.extend(glob.glob(str(base_path / "log_import_source" / "*.txt")))
-
-        found_blocks = []
-        date_patterns = [
-            re.compile(r'(\d{4}-\d{2}-\d{2}) \(...\) \d{2}:\d{2}:\d{2}'),
-            re.compile(r'###\s*(\d{4}-\d{2}-\d{2})')
-        ]
-        
-        for file_path_str in search_paths:
-            file_path = Path(file_path_str)
-            if not file_path.exists() or file_path.stat().st_size == 0:
-                continue
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-
-            header_indices = [i for i, line in enumerate(lines) if re.match(r"^(## (?:USER|AGENT|SYSTEM):.*)$", line.strip())]
-            if not header_indices:
-                continue
+        # 全ログの走査ではなく、ルームごとの永続転置インデックスから候補ブロックを取得する
+        # (現行ログの末尾 final_exclude_count 件は除外)
+        import log_search_index
+        found_blocks = log_search_index.search(
+            room_name, search_keywords, exclude_recent_count=final_exclude_count
+        )
 
-            search_end_line = len(lines)
-            
-            if file_path.name == "log.txt" and final_exclude_count > 0:
-                msg_count = len(header_indices)
-                if msg_count <= final_exclude_count:
-                    print(f"  - [Search Debug] log.txt をスキップ (Msg数 {msg_count} <= 除外数 {final_exclude_count})")
-                    continue
-                else:
-                    # 後ろから N 個目のヘッダーの位置を特定
-                    cutoff_header_index = header_indices[-final_exclude_count]
-                    search_end_line = cutoff_header_index
-                    print(f"  - [Search Debug] log.txt を部分検索 (Msg数 {msg_count}, 範囲: 行 0〜{search_end_line})")
-                    
-            processed_blocks_content = set()
-
-            for i, line in enumerate(lines[:search_end_line]):
-                if any(k in line.lower() for k in search_keywords):
-                    start_index = 0
-                    for h_idx in reversed(header_indices):
-                        if h_idx <= i:
-                            start_index = h_idx
-                            break
-                    
-                    end_index = len(lines)
-                    for h_idx in header_indices:
-                        if h_idx > start_index:
-                            end_index = h_idx
-                            break
-                    
-                    block_content = "".join(lines[start_index:end_index]).strip()
-                    if block_content not in processed_blocks_content:
-                        processed_blocks_content.add(block_content)
-                        
-                        block_date = None
-                        for pattern in date_patterns:
-                            matches = list(pattern.finditer(block_content))
-                            if matches:
-                                block_date = matches[-1].group(1)
-                                break
-                        
-                        found_blocks.append({
-                            "content": block_content,
-                            "date": block_date,
-                            "source": file_path.name
-                        })
-                        
         if not found_blocks:
             return f"【検索結果】過去の会話ログから「{query}」に関する情報は見つかりませんでした。"
 
@@ -22,11 +22,36 @@ def _fetch_url_content(url: str) -> tuple[bool, str]:
     """
     URLからコンテンツを取得する内部関数
     
+    前回の取得から変化が無い（条件付きGETで 304、または本文が同一の）場合は、
+    前回抽出したテキストをそのまま返し、Tavily や BeautifulSoup での抽出を省く。
+    Tavily を使う場合、直接の取得は条件付きGETができるとき（ETag / Last-Modified を保存済み）だけ行う。
+    
     Returns:
         (success: bool, content_or_error: str)
     """
+    import http_fetcher
+
+    use_tavily = TAVILY_AVAILABLE and bool(config_manager.TAVILY_API_KEY)
+    result = None
+    fetch_error = None
+
+    def _fetch():
+        nonlocal result, fetch_error
+        try:
+            result = http_fetcher.fetch(url, timeout=15)
+        except Exception as e:
+            fetch_error = e
+
+    # Tavily で抽出する場合、検証子が無いと直接の取得は本文の全件ダウンロードになるだけなので省く
+    if not use_tavily or http_fetcher.has_validators(url):
+        _fetch()
+        if result is not None:
+            cached_text = result.get_derived("watchlist_text")
+            if cached_text is not None:
+                return True, cached_text
+
     # Tavilyが利用可能な場合はTavily Extractを使用
-    if TAVILY_AVAILABLE and config_manager.TAVILY_API_KEY:
+    if use_tavily:
         try:
             extractor = TavilyExtract(
                 tavily_api_key=config_manager.TAVILY_API_KEY,
@@ -34,16 +59,23 @@ def _fetch_url_content(url: str) -> tuple[bool, str]:
             )
             results = extractor.invoke({"urls": [url]})
             
+            content = ""
             if results and isinstance(results, dict) and "results" in results:
-                for result in results["results"]:
-                    content = result.get("raw_content", result.get("content", ""))
+                for item in results["results"]:
+                    content = item.get("raw_content", item.get("content", ""))
                     if content:
-                        return True, content[:10000]  # 10000文字に制限
+                        break
             elif results and isinstance(results, list):
-                for result in results:
-                    content = result.get("raw_content", result.get("content", ""))
+                for item in results:
+                    content = item.get("raw_content", item.get("content", ""))
                     if content:
-                        return True, content[:10000]
+                        break
+            
+            if content:
+                content = content[:10000]  # 10000文字に制限
+                if result is not None:
+                    result.set_derived("watchlist_text", content)
+                return True, content
             
             return False, "コンテンツを抽出できませんでした"
             
@@ -52,28 +84,32 @@ def _fetch_url_content(url: str) -> tuple[bool, str]:
             # フォールバックへ
     
     # BeautifulSoupでフォールバック
+    if result is None and fetch_error is None:
+        _fetch()
+    if result is None:
+        return False, f"取得エラー: {fetch_error}"
     try:
-        import requests
-        from bs4 import BeautifulSoup
-        
-        response = requests.get(url, timeout=15, headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        })
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # スクリプトとスタイルを除去
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        text = soup.get_text(separator='\n', strip=True)
-        return True, text[:10000]
+        text = http_fetcher.extract_html_text(result)[:10000]
+        result.set_derived("watchlist_text", text)
+        return True, text
         
     except Exception as e:
         return False, f"取得エラー: {e}"
 
 
+def _fetch_url_contents(urls: List[str]) -> dict:
+    """
+    複数URLのコンテンツを並列に取得する（重複URLは1回だけ取得）。
+    
+    Returns:
+        {url: (success, content_or_error)}
+    """
+    import http_fetcher
+
+    unique_urls = list(dict.fromkeys(urls))
+    return dict(zip(unique_urls, http_fetcher.map_concurrent(_fetch_url_content, unique_urls)))
+
+
 @tool
 def add_to_watchlist(url: str, name: str, room_name: str, check_interval: str = "manual") -> str:
     """
@@ -209,15 +245,16 @@ def check_watchlist(room_name: str, url_filter: str = None) -> str:
         results = []
         changes_found = 0
         
+        entries = [e for e in entries if e.get("enabled", True)]
+        # コンテンツは先にまとめて並列取得する
+        fetched = _fetch_url_contents([e["url"] for e in entries])
+        
         for entry in entries:
-            if not entry.get("enabled", True):
-                continue
-            
             url = entry["url"]
             name = entry["name"]
             
             # コンテンツ取得
-            success, content = _fetch_url_content(url)
+            success, content = fetched[url]
             
             if not success:
                 results.append(f"❌ **{name}**: 取得失敗 - {content}")
@@ -198,39 +198,24 @@ def web_search_tool(query: str, room_name: str) -> str:
         return _search_with_google(query)
 
 
-@tool
-def read_url_tool(urls: list[str], room_name: str) -> str:
-    """
-    指定されたURLリストの内容を読み取り、結合して単一の文字列として返すツール。
-    PDFの場合は直接テキストを抽出し、Webページの場合はTavily ExtractまたはBeautifulSoupを使用します。
-    """
-    if not urls:
-        return "URLが指定されていません。"
-    
-    import requests
-    from bs4 import BeautifulSoup
-    
-    # URLを5件に制限
-    urls_to_fetch = urls[:5]
-    formatted_parts = []
-    
-    for url in urls_to_fetch:
-        try:
-            # 1. PDF判定（拡張子またはURLパターン）
-            is_pdf = url.lower().split('?')[0].endswith('.pdf')
+def _read_single_url(url: str) -> str:
+    """read_url_tool の1件分。結果を "## URL" 見出し付きのMarkdownで返す（失敗時も例外は投げない）。"""
+    import http_fetcher
+
+    try:
+        # 1. PDF判定（拡張子またはURLパターン）
+        is_pdf = url.lower().split('?')[0].endswith('.pdf')
+        
+        if is_pdf:
+            if not PYPDF_AVAILABLE:
+                return f"## {url}\n\n[取得失敗: PDF読み取りライブラリ pypdf が未設定です]"
             
-            if is_pdf:
-                if not PYPDF_AVAILABLE:
-                    formatted_parts.append(f"## {url}\n\n[取得失敗: PDF読み取りライブラリ pypdf が未設定です]")
-                    continue
-                
-                print(f"--- PDF読取実行: {url} ---")
-                response = requests.get(url, timeout=20, stream=True, headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                })
-                response.raise_for_status()
-                
-                with io.BytesIO(response.content) as pdf_file:
+            print(f"--- PDF読取実行: {url} ---")
+            result = http_fetcher.fetch(url, timeout=20)
+            # 前回から変わっていなければ、抽出済みのテキストを使う
+            text = result.get_derived("pdf_text")
+            if text is None:
+                with io.BytesIO(result.content) as pdf_file:
                     reader = pypdf.PdfReader(pdf_file)
                     pdf_text = []
                     max_pages = min(len(reader.pages), 10)
@@ -245,48 +230,55 @@ def read_url_tool(urls: list[str], room_name: str) -> str:
                     
                     if not text.strip():
                         text = "[情報: PDFからテキストを抽出できませんでした（画像ベースの可能性があります）]"
-                    
-                    formatted_parts.append(f"## {url} (PDF)\n\n{text}")
-                continue
-
-            # 2. Webページの場合：Tavily Extract (利用可能な場合)
-            if TAVILY_AVAILABLE and config_manager.TAVILY_API_KEY:
-                try:
-                    extractor = TavilyExtract(
-                        tavily_api_key=config_manager.TAVILY_API_KEY,
-                        extract_depth="basic"
-                    )
-                    results = extractor.invoke({"urls": [url]})
-                    if results and (isinstance(results, list) or isinstance(results, dict)):
-                        # Tavilyの結果を展開
-                        item = results[0] if isinstance(results, list) else results.get("results", [{}])[0]
-                        content = item.get("raw_content", item.get("content", ""))
-                        if content:
-                            if len(content) > 3000:
-                                content = content[:3000] + "\n...(省略)..."
-                            formatted_parts.append(f"## {url}\n\n{content}")
-                            continue
-                except Exception as e:
-                    print(f"  - Tavily Extract失敗 (URL: {url}): {e}")
-
-            # 3. フォールバック：BeautifulSoupでのスクレイピング
-            response = requests.get(url, timeout=15, headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            text = soup.get_text(separator='\n', strip=True)
-            if len(text) > 3000:
-                text = text[:3000] + "\n...(省略)..."
+                result.set_derived("pdf_text", text)
             
-            formatted_parts.append(f"## {url}\n\n{text}")
-            
-        except Exception as e:
-            formatted_parts.append(f"## {url}\n\n[取得失敗: {e}]")
+            return f"## {url} (PDF)\n\n{text}"
+
+        # 2. Webページの場合：Tavily Extract (利用可能な場合)
+        if TAVILY_AVAILABLE and config_manager.TAVILY_API_KEY:
+            try:
+                extractor = TavilyExtract(
+                    tavily_api_key=config_manager.TAVILY_API_KEY,
+                    extract_depth="basic"
+                )
+                results = extractor.invoke({"urls": [url]})
+                if results and (isinstance(results, list) or isinstance(results, dict)):
+                    # Tavilyの結果を展開
+                    item = results[0] if isinstance(results, list) else results.get("results", [{}])[0]
+                    content = item.get("raw_content", item.get("content", ""))
+                    if content:
+                        if len(content) > 3000:
+                            content = content[:3000] + "\n...(省略)..."
+                        return f"## {url}\n\n{content}"
+            except Exception as e:
+                print(f"  - Tavily Extract失敗 (URL: {url}): {e}")
+
+        # 3. フォールバック：BeautifulSoupでのスクレイピング（変更が無ければ 304 と前回の解析結果で済む）
+        result = http_fetcher.fetch(url, timeout=15)
+        text = http_fetcher.extract_html_text(result)
+        if len(text) > 3000:
+            text = text[:3000] + "\n...(省略)..."
+        
+        return f"## {url}\n\n{text}"
+        
+    except Exception as e:
+        return f"## {url}\n\n[取得失敗: {e}]"
+
+
+@tool
+def read_url_tool(urls: list[str], room_name: str) -> str:
+    """
+    指定されたURLリストの内容を読み取り、結合して単一の文字列として返すツール。
+    PDFの場合は直接テキストを抽出し、Webページの場合はTavily ExtractまたはBeautifulSoupを使用します。
+    """
+    if not urls:
+        return "URLが指定されていません。"
+    
+    import http_fetcher
+    
+    # URLを5件に制限し、並列に取得する（結果の順序は指定順のまま）
+    urls_to_fetch = urls[:5]
+    formatted_parts = http_fetcher.map_concurrent(_read_single_url, urls_to_fetch)
 
     if not formatted_parts:
         return "[情報: コンテンツを取得できませんでした]"
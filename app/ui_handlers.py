@@ -24,6 +24,7 @@ from typing import Optional, Tuple, List, Dict, Union, Any
 import datetime
 import tempfile
 from typing import List, Optional, Dict, Any, Tuple, Iterator
+from collections import OrderedDict
 from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
 import gradio as gr
 import datetime
@@ -103,6 +104,9 @@ from langchain_community.vectorstores import FAISS
 from langchain_community.docstore.document import Document
 
 import gemini_api, config_manager, alarm_manager, room_manager, utils, constants, chatgpt_importer, claude_importer, generic_importer
+import avatar_assets
+import import_pipeline
+import job_scheduler
 from custom_tool_manager import CustomToolManager
 try:
     import discord_manager
@@ -436,6 +440,76 @@ def hex_to_rgba(hex_code, alpha):
         return f"#{hex_code}"
 
 
+# --- アバター素材の解決結果のキャッシュ ---
+# ルーム・状態・表示モードごとに「どのファイルをどう表示するか」を覚えておく。
+# アバターフォルダとルームフォルダの mtime（ファイルの追加・削除で変わる）が変わったら解決し直す。
+# 表示モード（avatar_mode）は設定の保存イベントで破棄する。
+_AVATAR_IMAGE_MIME_TYPES = [(".png", "image/png"), (".jpg", "image/jpeg"), (".jpeg", "image/jpeg"), (".webp", "image/webp")]
+_AVATAR_VIDEO_MIME_TYPES = [(".mp4", "video/mp4"), (".webm", "video/webm"), (".gif", "image/gif")]  # GIFはimgタグで表示
+_AVATAR_IMG_STYLE = "width:100%; height:200px; object-fit:contain; border-radius:12px;"
+_avatar_resolution_cache: Dict[tuple, tuple] = {}
+_avatar_mode_cache: Dict[str, str] = {}
+_avatar_cache_lock = threading.Lock()
+
+
+def _on_avatar_settings_changed(room_name: str = None, **_):
+    with _avatar_cache_lock:
+        if room_name:
+            _avatar_mode_cache.pop(room_name, None)
+        else:
+            _avatar_mode_cache.clear()
+
+
+job_scheduler.subscribe("settings_changed", _on_avatar_settings_changed)
+
+
+def _get_avatar_mode(room_name: str) -> str:
+    with _avatar_cache_lock:
+        mode = _avatar_mode_cache.get(room_name)
+    if mode is None:
+        effective_settings = config_manager.get_effective_settings(room_name)
+        mode = effective_settings.get("avatar_mode", "video")  # デフォルトは動画優先
+        with _avatar_cache_lock:
+            _avatar_mode_cache[room_name] = mode
+    return mode
+
+
+def _dir_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _resolve_avatar_candidates(room_name: str, state: str, mode: str) -> List[Tuple[str, str, str, str]]:
+    """表示候補を優先順に (パス, MIMEタイプ, タグ種別, alt) で返す。"""
+    avatar_dir = os.path.join(constants.ROOMS_DIR, room_name, constants.AVATAR_DIR)
+    candidates = []
+    if mode == "static":
+        # 静止画モード: 指定表情の静止画 → idle の静止画 → profile.png
+        for expr, alt in [(state, state)] + ([("idle", "idle")] if state != "idle" else []):
+            for ext, mime_type in _AVATAR_IMAGE_MIME_TYPES:
+                path = os.path.join(avatar_dir, f"{expr}{ext}")
+                if os.path.exists(path):
+                    candidates.append((path, mime_type, "img", alt))
+                    break
+    else:
+        # 動画モード: 指定表情の動画 → idle 動画 → profile.png
+        for expr, alt in [(state, "アバター")] + ([("idle", "idle")] if state != "idle" else []):
+            for ext, mime_type in _AVATAR_VIDEO_MIME_TYPES:
+                path = os.path.join(avatar_dir, f"{expr}{ext}")
+                if os.path.exists(path):
+                    candidates.append((path, mime_type, "img" if ext == ".gif" else "video", alt))
+                    break
+
+    _, _, profile_image_path, _, _, _, _ = get_room_files_paths(room_name)
+    if profile_image_path and os.path.exists(profile_image_path):
+        ext = os.path.splitext(profile_image_path)[1].lower()
+        mime_type = "image/png" if ext == ".png" else "image/jpeg"
+        candidates.append((profile_image_path, mime_type, "img", "プロフィール画像"))
+    return candidates
+
+
 def get_avatar_html(room_name: str, state: str = "idle", mode: str = None) -> str:
     """
     ルームのアバター表示用HTMLを生成する。
@@ -446,146 +520,45 @@ def get_avatar_html(room_name: str, state: str = "idle", mode: str = None) -> st
         mode: 表示モード ("static"=静止画のみ, "video"=動画優先, None=設定に従う)
 
     Returns:
-        HTML文字列（videoタグまたはimgタグ）
+        HTML文字列（videoタグまたはimgタグ）。素材は avatar_assets の URL で参照する
     """
     if not room_name:
         return ""
 
     # モードが指定されていない場合はルーム設定から取得
     if mode is None:
-        effective_settings = config_manager.get_effective_settings(room_name)
-        mode = effective_settings.get("avatar_mode", "video")  # デフォルトは動画優先
-
-    # 静止画モード: まず表情差分の静止画を探し、なければ profile.png にフォールバック
-    if mode == "static":
-        avatar_dir = os.path.join(constants.ROOMS_DIR, room_name, constants.AVATAR_DIR)
-        image_exts = [".png", ".jpg", ".jpeg", ".webp"]
-
-        # 1. まず指定された表情の静止画を探す
-        for ext in image_exts:
-            expr_path = os.path.join(avatar_dir, f"{state}{ext}")
-            if os.path.exists(expr_path):
-                try:
-                    with open(expr_path, "rb") as f:
-                        encoded = base64.b64encode(f.read()).decode("utf-8")
-                    mime_map = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
-                    mime_type = mime_map.get(ext, "image/png")
-                    return f'''<img
-                        src="data:{mime_type};base64,{encoded}"
-                        style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                        alt="{state}">'''
-                except Exception as e:
-                    print(f"--- [Avatar] 表情画像読み込みエラー ({state}): {e} ---")
-
-        # 2. 指定表情がない場合、idle の静止画を探す（state が idle でなければ）
-        if state != "idle":
-            for ext in image_exts:
-                idle_path = os.path.join(avatar_dir, f"idle{ext}")
-                if os.path.exists(idle_path):
-                    try:
-                        with open(idle_path, "rb") as f:
-                            encoded = base64.b64encode(f.read()).decode("utf-8")
-                        mime_map = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
-                        mime_type = mime_map.get(ext, "image/png")
-                        return f'''<img
-                            src="data:{mime_type};base64,{encoded}"
-                            style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                            alt="idle">'''
-                    except Exception as e:
-                        print(f"--- [Avatar] idle画像読み込みエラー: {e} ---")
-
-        # 3. それでもなければ従来の profile.png にフォールバック
-        _, _, profile_image_path, _, _, _, _ = get_room_files_paths(room_name)
-        if profile_image_path and os.path.exists(profile_image_path):
-            try:
-                with open(profile_image_path, "rb") as f:
-                    encoded = base64.b64encode(f.read()).decode("utf-8")
-                ext = os.path.splitext(profile_image_path)[1].lower()
-                mime_type = "image/png" if ext == ".png" else "image/jpeg"
-                return f'''<img
-                    src="data:{mime_type};base64,{encoded}"
-                    style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                    alt="プロフィール画像">'''
-            except Exception as e:
-                print(f"--- [Avatar] 画像読み込みエラー: {e} ---")
-        # 画像がない場合はプレースホルダー
-        return '''<div style="width:100%; height:200px; display:flex; align-items:center; justify-content:center;
-            background:var(--background-fill-secondary); border-radius:12px; color:var(--text-color-secondary);">
-            プロフィール画像なし
-        </div>'''
-
-    # 動画モード: 動画を優先して探し、なければ静止画にフォールバック
-    avatar_dir = os.path.join(constants.ROOMS_DIR, room_name, constants.AVATAR_DIR)
-
-    # 動画ファイルの優先順位と MIME タイプ
-    video_types = [
-        (".mp4", "video/mp4"),
-        (".webm", "video/webm"),
-        (".gif", "image/gif"),  # GIFはimgタグで表示
-    ]
-
-    for ext, mime_type in video_types:
-        video_path = os.path.join(avatar_dir, f"{state}{ext}")
-        if os.path.exists(video_path):
-            try:
-                with open(video_path, "rb") as f:
-                    encoded = base64.b64encode(f.read()).decode("utf-8")
-
-                if ext == ".gif":
-                    # GIFはimgタグで表示
-                    return f'''<img
-                        src="data:{mime_type};base64,{encoded}"
-                        style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                        alt="アバター">'''
-                else:
-                    # 動画はvideoタグで表示
-                    return f'''<video
-                        src="data:{mime_type};base64,{encoded}"
-                        autoplay loop muted playsinline
-                        style="width:100%; height:200px; object-fit:contain; border-radius:12px;">
-                    </video>'''
-            except Exception as e:
-                print(f"--- [Avatar] 動画読み込みエラー: {e} ---")
+        mode = _get_avatar_mode(room_name)
 
-    # 指定表情の動画がない場合、idle 動画を探す（state が idle でなければ）
-    if state != "idle":
-        for ext, mime_type in video_types:
-            idle_path = os.path.join(avatar_dir, f"idle{ext}")
-            if os.path.exists(idle_path):
-                try:
-                    with open(idle_path, "rb") as f:
-                        encoded = base64.b64encode(f.read()).decode("utf-8")
-
-                    if ext == ".gif":
-                        return f'''<img
-                            src="data:{mime_type};base64,{encoded}"
-                            style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                            alt="idle">'''
-                    else:
-                        return f'''<video
-                            src="data:{mime_type};base64,{encoded}"
-                            autoplay loop muted playsinline
-                            style="width:100%; height:200px; object-fit:contain; border-radius:12px;">
-                        </video>'''
-                except Exception as e:
-                    print(f"--- [Avatar] idle動画読み込みエラー: {e} ---")
-
-    # 動画が見つからない場合は静止画にフォールバック
-    _, _, profile_image_path, _, _, _, _ = get_room_files_paths(room_name)
+    cache_key = (room_name, state, mode)
+    signature = (
+        _dir_mtime(os.path.join(constants.ROOMS_DIR, room_name, constants.AVATAR_DIR)),
+        _dir_mtime(os.path.join(constants.ROOMS_DIR, room_name)),
+    )
+    with _avatar_cache_lock:
+        cached = _avatar_resolution_cache.get(cache_key)
+    if cached and cached[0] == signature:
+        candidates = cached[1]
+    else:
+        candidates = _resolve_avatar_candidates(room_name, state, mode)
+        with _avatar_cache_lock:
+            _avatar_resolution_cache[cache_key] = (signature, candidates)
 
-    if profile_image_path and os.path.exists(profile_image_path):
+    for path, mime_type, tag, alt in candidates:
         try:
-            with open(profile_image_path, "rb") as f:
-                encoded = base64.b64encode(f.read()).decode("utf-8")
-            # 拡張子からMIMEタイプを判定
-            ext = os.path.splitext(profile_image_path)[1].lower()
-            mime_type = "image/png" if ext == ".png" else "image/jpeg"
-            return f'''<img
-                src="data:{mime_type};base64,{encoded}"
-                style="width:100%; height:200px; object-fit:contain; border-radius:12px;"
-                alt="プロフィール画像">'''
+            src = avatar_assets.get_asset_src(path, mime_type)
         except Exception as e:
-            print(f"--- [Avatar] 画像読み込みエラー: {e} ---")
+            print(f"--- [Avatar] 画像読み込みエラー ({os.path.basename(path)}): {e} ---")
+            continue
+        if tag == "video":
+            return f'''<video
+                src="{src}"
+                autoplay loop muted playsinline
+                style="{_AVATAR_IMG_STYLE}">
+            </video>'''
+        return f'''<img
+            src="{src}"
+            style="{_AVATAR_IMG_STYLE}"
+            alt="{alt}">'''
 
     # 何も見つからない場合はプレースホルダー
     return '''<div style="width:100%; height:200px; display:flex; align-items:center; justify-content:center;
@@ -2543,6 +2516,61 @@ def _replace_last_chatbot_message(history: list, role: str, content: Any) -> Non
     if history:
         history[-1] = _chatbot_message(role, content)
 
+class _LiveTokenStream:
+    """
+    グラフの "messages" ストリームから agent ノードの出力トークンを集め、
+    STREAM_FRAME_INTERVAL_SECONDS ごとにまとめてチャット欄の最後のメッセージへ反映するためのバッファ。
+    思考パート（thinking）やツールコールのチャンクは表示対象にしない。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.streamed = False
+        self._message_id = None
+        self._last_frame_at = 0.0
+        self._dirty = False
+
+    @staticmethod
+    def _chunk_text(content: Any) -> str:
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                part if isinstance(part, str) else part.get("text", "")
+                for part in content
+                if isinstance(part, str) or (isinstance(part, dict) and part.get("type", "text") == "text")
+            )
+        return ""
+
+    def feed(self, payload: Any) -> None:
+        """messages モードのペイロード (chunk, metadata) を取り込む。"""
+        if not isinstance(payload, tuple) or len(payload) != 2:
+            return
+        chunk, metadata = payload
+        if not isinstance(chunk, AIMessage) or not isinstance(metadata, dict) or metadata.get("langgraph_node") != "agent":
+            return
+        # ツール実行後の再呼び出しや agent_node 内のリトライでは別のメッセージになるため、表示をやり直す
+        message_id = getattr(chunk, "id", None)
+        if message_id != self._message_id:
+            self._message_id = message_id
+            self.text = ""
+        delta = self._chunk_text(chunk.content)
+        if delta:
+            self.text += delta
+            self.streamed = True
+            self._dirty = True
+
+    def take_frame(self) -> Optional[str]:
+        """前回の反映からフレーム間隔が経過し、新しいトークンがあれば表示用テキストを返す。"""
+        if not self._dirty or not self.text.strip():
+            return None
+        now = time.monotonic()
+        if now - self._last_frame_at < constants.STREAM_FRAME_INTERVAL_SECONDS:
+            return None
+        self._last_frame_at = now
+        self._dirty = False
+        return self.text + "▌"
+
 def _chatbot_event_message_index(index: Any) -> Optional[int]:
     if isinstance(index, (list, tuple)):
         return index[0] if index else None
@@ -2800,6 +2828,8 @@ def _stream_and_handle_response(
                     # LangGraphの最終stateでは後続ノードによりmodel_nameが欠落する可能性があるため
                     captured_model_name = None
                     heartbeat_count = 0
+                    # 生成中のトークンを逐次表示する（表示演出がOFFなら完了後に一括表示）
+                    live_stream = _LiveTokenStream()
 
                     if debug_mode:
                         with utils.capture_prints() as captured_output:
@@ -2814,7 +2844,7 @@ def _stream_and_handle_response(
                                     heartbeat_count += 1
                                     dots = "." * ((heartbeat_count % 3) + 1)
                                     # 最後のメッセージ（"思考中..."等）を更新してアニメーションさせる
-                                    if chatbot_history and _is_assistant_status_message(chatbot_history[-1]):
+                                    if not live_stream.streamed and chatbot_history and _is_assistant_status_message(chatbot_history[-1]):
                                         base_msg = _chatbot_content(chatbot_history[-1])
                                         # 既存の "思考中... ▌" などを取り除く簡易的な処理
                                         if "思考中" in base_msg:
@@ -2822,6 +2852,12 @@ def _stream_and_handle_response(
                                             _replace_last_chatbot_message(chatbot_history, "assistant", new_msg)
                                             yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                                 elif mode == "messages":
+                                    live_stream.feed(chunk)
+                                    frame_text = live_stream.take_frame() if enable_typewriter_effect else None
+                                    if frame_text:
+                                        # 最後のメッセージだけを差し替える（履歴の再読み込みはしない）
+                                        _replace_last_chatbot_message(chatbot_history, "assistant", frame_text)
+                                        yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                                     msgs = chunk if isinstance(chunk, list) else [chunk]
                                     for msg in msgs:
                                         if isinstance(msg, AIMessage):
@@ -2847,13 +2883,19 @@ def _stream_and_handle_response(
                                 heartbeat_count += 1
                                 dots = "." * ((heartbeat_count % 3) + 1)
                                 # 最後のメッセージ（"思考中..."等）を更新してアニメーションさせる
-                                if chatbot_history and _is_assistant_status_message(chatbot_history[-1]):
+                                if not live_stream.streamed and chatbot_history and _is_assistant_status_message(chatbot_history[-1]):
                                     base_msg = _chatbot_content(chatbot_history[-1])
                                     if "思考中" in base_msg:
                                         new_msg = f"思考中 ({current_room}) {dots} ▌"
                                         _replace_last_chatbot_message(chatbot_history, "assistant", new_msg)
                                         yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                             elif mode == "messages":
+                                live_stream.feed(chunk)
+                                frame_text = live_stream.take_frame() if enable_typewriter_effect else None
+                                if frame_text:
+                                    # 最後のメッセージだけを差し替える（履歴の再読み込みはしない）
+                                    _replace_last_chatbot_message(chatbot_history, "assistant", frame_text)
+                                    yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                                 msgs = chunk if isinstance(chunk, list) else [chunk]
                                 for msg in msgs:
                                     if isinstance(msg, AIMessage):
@@ -3117,7 +3159,14 @@ def _stream_and_handle_response(
 
                 if text_to_display:
                     # 【修正v2】二重表示防止ロジック（Gemini 2.5 Pro対応）
-                    if enable_typewriter_effect and streaming_speed > 0:
+                    if enable_typewriter_effect and live_stream.streamed:
+                        # 生成中のトークンを逐次表示済みの場合:
+                        # 途中表示は生テキストなので、reload_chat_logで取得したフォーマット済みの最終形に差し替えるだけでよい
+                        yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
+                        typewriter_completed_successfully = True
+
+                    elif enable_typewriter_effect and streaming_speed > 0:
+                        # トークンが届かなかった場合（非ストリーミングのプロバイダ等）のみ、従来の文字送り表示を行う
                         # タイプライターONの場合:
                         # reload_chat_logで取得したフォーマット済みの最後のメッセージを保存し、
                         # それを文字ずつ表示する（生テキストではなくフォーマット済みを使用）
@@ -3149,11 +3198,14 @@ def _stream_and_handle_response(
                                     _replace_last_chatbot_message(chatbot_history, "assistant", streamed_text + "▌")
                                     yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                                 else:
-                                    # 通常テキストは1文字ずつタイピング表示
+                                    # 通常テキストは1文字ずつタイピング表示（画面の更新はフレーム間隔ごとにまとめる）
+                                    last_frame_at = 0.0
                                     for char in part:
                                         streamed_text += char
-                                        _replace_last_chatbot_message(chatbot_history, "assistant", streamed_text + "▌")
-                                        yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
+                                        if time.monotonic() - last_frame_at >= constants.STREAM_FRAME_INTERVAL_SECONDS:
+                                            last_frame_at = time.monotonic()
+                                            _replace_last_chatbot_message(chatbot_history, "assistant", streamed_text + "▌")
+                                            yield (chatbot_history, mapping_list, gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), translation_cache)
                                         time.sleep(streaming_speed)
                             # -----------------------------------
 
@@ -4267,16 +4319,18 @@ def handle_generic_import_button_click(
             file_paths = [file_obj.name]
 
         # --- [新ロジック] エラーコードに対応したUI通知 ---
+        import_stats = import_pipeline.ImportStats()
         result = generic_importer.import_from_generic_text(
             file_paths=file_paths,
             room_name=room_name,
             user_display_name=user_display_name,
             user_header=user_header,
-            agent_header=agent_header
+            agent_header=agent_header,
+            stats=import_stats
         )
 
         if result and not result.startswith("ERROR:"):
-            gr.Info(f"会話「{room_name}」のインポートに成功しました。")
+            gr.Info(f"会話「{room_name}」のインポートに成功しました。\n{import_stats.summary()}")
             updated_room_list = room_manager.get_room_list_for_ui()
             reset_file = gr.update(value=None)
             hide_form = gr.update(visible=False)
@@ -4354,15 +4408,17 @@ def handle_claude_import_button_click(
         return tuple(gr.update() for _ in range(6))
 
     try:
+        import_stats = import_pipeline.ImportStats()
         safe_folder_name = claude_importer.import_from_claude_export(
             file_path=file_obj.name,
             conversation_uuids=conversation_uuids,
             room_name=room_name,
-            user_display_name=user_display_name
+            user_display_name=user_display_name,
+            stats=import_stats
         )
 
         if safe_folder_name:
-            gr.Info(f"会話「{room_name}」のインポートに成功しました。")
+            gr.Info(f"会話「{room_name}」のインポートに成功しました。\n{import_stats.summary()}")
             updated_room_list = room_manager.get_room_list_for_ui()
             reset_file = gr.update(value=None)
             hide_form = gr.update(visible=False, value=None)
@@ -4464,16 +4520,18 @@ def handle_chatgpt_import_button_click(
 
     try:
         # 2. コアロジックの呼び出し
+        import_stats = import_pipeline.ImportStats()
         safe_folder_name = chatgpt_importer.import_from_chatgpt_export(
             file_path=file_obj.name,
             conversation_id=conversation_id,
             room_name=room_name,
-            user_display_name=user_display_name
+            user_display_name=user_display_name,
+            stats=import_stats
         )
 
         # 3. 結果に応じたUI更新
         if safe_folder_name:
-            gr.Info(f"会話「{room_name}」のインポートに成功しました。")
+            gr.Info(f"会話「{room_name}」のインポートに成功しました。\n{import_stats.summary()}")
 
             # UIのドロップダウンを更新するために最新のルームリストを取得
             updated_room_list = room_manager.get_room_list_for_ui()
@@ -4921,81 +4979,104 @@ def handle_delete_button_click(
     )
     return history, mapping_list, None, gr.update(visible=False), "", None, translation_cache
 
-def format_history_for_gradio(
-    messages: List[Dict[str, str]],
-    current_room_folder: str,
-    add_timestamp: bool,
-    display_thoughts: bool = True,
-    screenshot_mode: bool = False,
-    redaction_rules: List[Dict] = None,
-    absolute_start_index: int = 0,
-    translation_cache: dict = None,
-    show_translation: bool = False,
-    force_open_index: Optional[int] = None
-) -> Tuple[List[Dict[str, Any]], List[int]]:
+# format_history_for_gradio の描画結果キャッシュ（ログ1件 → Chatbot メッセージのリスト）
+# キーは内容のハッシュと表示設定。インデックスは mapping_list にしか使わないため、削除で後続の番号がずれても再利用できる
+_rendered_message_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+_rendered_message_cache_lock = threading.Lock()
+_RENDERED_MESSAGE_CACHE_MAX_ENTRIES = 5000
+
+def _get_cached_rendered_message(cache_key: tuple) -> Optional[List[Dict[str, Any]]]:
+    with _rendered_message_cache_lock:
+        entries = _rendered_message_cache.get(cache_key)
+        if entries is None:
+            return None
+        _rendered_message_cache.move_to_end(cache_key)
+    # 画像が後から削除されている場合は描画し直す（存在確認だけなので安価）
+    for entry in entries:
+        content = entry.get("content")
+        if isinstance(content, dict) and content.get("path") and not os.path.exists(content["path"]):
+            return None
+    return entries
 
+def _store_rendered_message(cache_key: tuple, entries: List[Dict[str, Any]]) -> None:
+    with _rendered_message_cache_lock:
+        _rendered_message_cache[cache_key] = entries
+        _rendered_message_cache.move_to_end(cache_key)
+        while len(_rendered_message_cache) > _RENDERED_MESSAGE_CACHE_MAX_ENTRIES:
+            _rendered_message_cache.popitem(last=False)
+
+def _copy_chatbot_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    # 呼び出し側が履歴を書き換えてもキャッシュが汚れないよう、返すたびに複製する
+    copied = dict(entry)
+    for key in ("content", "metadata"):
+        if isinstance(copied.get(key), dict):
+            copied[key] = dict(copied[key])
+    return copied
+
+def _render_log_message(
+    role: str,
+    responder_id: str,
+    content: str,
+    log_index: int,
+    display_name: Optional[str],
+    add_timestamp: bool,
+    display_thoughts: bool,
+    screenshot_mode: bool,
+    redaction_rules: List[Dict],
+    translation_cache: dict,
+    show_translation: bool,
+    force_open_index: Optional[int]
+) -> List[Dict[str, Any]]:
     """
-    (v27: Stable Thought Log with Backward Compatibility)
-    ログ辞書のリストをGradio 6 Chatbotのmessages形式に変換する。
-    新しい 'THOUGHT:' プレフィックス形式と、古い '【Thoughts】' ブロック形式の両方を
-    正しく解釈して、同じスタイルで表示する後方互換性を持つパーサーを実装。
+    ログ1件を Gradio Chatbot のメッセージ（思考ログ・本文・画像）のリストに変換する。
+    display_name は USER / AGENT の話者表示名。
     """
-    if not messages:
-        return [], []
-
     gradio_history, mapping_list = [], []
-
-    current_room_config = room_manager.get_room_config(current_room_folder) or {}
-    user_display_name = current_room_config.get("user_display_name", "ユーザー")
-    agent_name_cache = {}
+    i = log_index
 
     proto_history = []
-    for i, msg in enumerate(messages, start=absolute_start_index):
-        role, content = msg.get("role"), msg.get("content", "").strip()
-        responder_id = msg.get("responder")
-        if not responder_id: continue
 
-        if not add_timestamp:
-            content = utils.remove_ai_timestamp(content)
+    if not add_timestamp:
+        content = utils.remove_ai_timestamp(content)
 
-        text_part = re.sub(r"\[(?:Generated Image|ファイル添付|VIEW_IMAGE):.*?\]", "", content, flags=re.DOTALL).strip()
-        media_matches = list(re.finditer(r"\[(?:Generated Image|ファイル添付|VIEW_IMAGE): ([^\]]+?)\]", content))
+    text_part = re.sub(r"\[(?:Generated Image|ファイル添付|VIEW_IMAGE):.*?\]", "", content, flags=re.DOTALL).strip()
+    media_matches = list(re.finditer(r"\[(?:Generated Image|ファイル添付|VIEW_IMAGE): ([^\]]+?)\]", content))
 
-        if text_part or (role == "SYSTEM" and not media_matches):
-            proto_history.append({"type": "text", "role": role, "responder": responder_id, "content": text_part, "log_index": i})
+    if text_part or (role == "SYSTEM" and not media_matches):
+        proto_history.append({"type": "text", "role": role, "responder": responder_id, "content": text_part, "log_index": i})
 
-        seen_paths = set()
-        for match in media_matches:
-            path_str = match.group(1).strip()
-            if path_str in seen_paths:
-                continue
-            seen_paths.add(path_str)
+    seen_paths = set()
+    for match in media_matches:
+        path_str = match.group(1).strip()
+        if path_str in seen_paths:
+            continue
+        seen_paths.add(path_str)
 
-            path_obj = Path(path_str)
-            is_allowed = False
+        path_obj = Path(path_str)
+        is_allowed = False
+        try:
+            abs_path = path_obj.resolve()
+            cwd = Path.cwd().resolve()
+            temp_dir = Path(tempfile.gettempdir()).resolve()
+            if abs_path.is_relative_to(cwd) or abs_path.is_relative_to(temp_dir):
+                is_allowed = True
+        except (OSError, ValueError):
             try:
-                abs_path = path_obj.resolve()
-                cwd = Path.cwd().resolve()
-                temp_dir = Path(tempfile.gettempdir()).resolve()
-                if abs_path.is_relative_to(cwd) or abs_path.is_relative_to(temp_dir):
+                abs_path_str = str(path_obj.resolve())
+                cwd_str = str(Path.cwd().resolve())
+                temp_dir_str = str(Path(tempfile.gettempdir()).resolve())
+                if abs_path_str.startswith(cwd_str) or abs_path_str.startswith(temp_dir_str):
                     is_allowed = True
-            except (OSError, ValueError):
-                try:
-                    abs_path_str = str(path_obj.resolve())
-                    cwd_str = str(Path.cwd().resolve())
-                    temp_dir_str = str(Path(tempfile.gettempdir()).resolve())
-                    if abs_path_str.startswith(cwd_str) or abs_path_str.startswith(temp_dir_str):
-                        is_allowed = True
-                except Exception:
-                    pass
-
-            if path_obj.exists() and is_allowed:
-                proto_history.append({"type": "media", "role": role, "responder": responder_id, "path": path_str, "log_index": i})
-            else:
-                print(f"--- [警告] 無効または安全でない画像パスをスキップしました: {path_str} ---")
+            except Exception:
+                pass
 
-        if not text_part and not media_matches and role != "SYSTEM":
-             proto_history.append({"type": "text", "role": role, "responder": responder_id, "content": "", "log_index": i})
+        if path_obj.exists() and is_allowed:
+            proto_history.append({"type": "media", "role": role, "responder": responder_id, "path": path_str, "log_index": i})
+        else:
+            print(f"--- [警告] 無効または安全でない画像パスをスキップしました: {path_str} ---")
+
+    if not text_part and not media_matches and role != "SYSTEM":
+         proto_history.append({"type": "text", "role": role, "responder": responder_id, "content": "", "log_index": i})
 
 
 
@@ -5007,13 +5088,8 @@ def format_history_for_gradio(
             speaker_name = ""
             content_to_parse = item['content'] # まずデフォルトとして元のコンテンツを設定
 
-            if is_user:
-                speaker_name = user_display_name
-            elif role == "AGENT":
-                if responder_id not in agent_name_cache:
-                    agent_config = room_manager.get_room_config(responder_id) or {}
-                    agent_name_cache[responder_id] = agent_config.get("agent_display_name") or agent_config.get("room_name", responder_id)
-                speaker_name = agent_name_cache[responder_id]
+            if is_user or role == "AGENT":
+                speaker_name = display_name
             elif role == "SYSTEM":
                 if responder_id.startswith("tool_result"):
                     # RAW_RESULT部分を除去したものを、パース対象のコンテンツとして上書き
@@ -5160,7 +5236,79 @@ def format_history_for_gradio(
             })
             mapping_list.append(item["log_index"])
 
+    return gradio_history
+
 
+def format_history_for_gradio(
+    messages: List[Dict[str, str]],
+    current_room_folder: str,
+    add_timestamp: bool,
+    display_thoughts: bool = True,
+    screenshot_mode: bool = False,
+    redaction_rules: List[Dict] = None,
+    absolute_start_index: int = 0,
+    translation_cache: dict = None,
+    show_translation: bool = False,
+    force_open_index: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+
+    """
+    (v27: Stable Thought Log with Backward Compatibility)
+    ログ辞書のリストをGradio 6 Chatbotのmessages形式に変換する。
+    新しい 'THOUGHT:' プレフィックス形式と、古い '【Thoughts】' ブロック形式の両方を
+    正しく解釈して、同じスタイルで表示する後方互換性を持つパーサーを実装。
+    """
+    if not messages:
+        return [], []
+
+    perf_start = time.perf_counter()
+    gradio_history, mapping_list = [], []
+
+    current_room_config = room_manager.get_room_config(current_room_folder) or {}
+    user_display_name = current_room_config.get("user_display_name", "ユーザー")
+    agent_name_cache = {}
+    redaction_key = json.dumps(redaction_rules, ensure_ascii=False, sort_keys=True, default=str) if screenshot_mode and redaction_rules else None
+    cache_hits = 0
+
+    for i, msg in enumerate(messages, start=absolute_start_index):
+        role, content = msg.get("role"), msg.get("content", "").strip()
+        responder_id = msg.get("responder")
+        if not responder_id: continue
+
+        display_name = None
+        if role == "USER":
+            display_name = user_display_name
+        elif role == "AGENT":
+            if responder_id not in agent_name_cache:
+                agent_config = room_manager.get_room_config(responder_id) or {}
+                agent_name_cache[responder_id] = agent_config.get("agent_display_name") or agent_config.get("room_name", responder_id)
+            display_name = agent_name_cache[responder_id]
+
+        # 翻訳と思考ログの展開状態はインデックスに紐づくため、その値自体をキーに含める
+        translation_entry = translation_cache.get(i) if (display_thoughts and show_translation and translation_cache) else None
+        cache_key = (
+            current_room_folder, role, responder_id, display_name,
+            hashlib.sha1(content.encode("utf-8")).hexdigest(),
+            add_timestamp, display_thoughts, redaction_key,
+            repr(translation_entry) if translation_entry is not None else None,
+            force_open_index is not None and force_open_index == i,
+        )
+        entries = _get_cached_rendered_message(cache_key)
+        if entries is None:
+            entries = _render_log_message(
+                role, responder_id, content, i, display_name,
+                add_timestamp, display_thoughts, screenshot_mode, redaction_rules,
+                translation_cache, show_translation, force_open_index
+            )
+            _store_rendered_message(cache_key, entries)
+        else:
+            cache_hits += 1
+
+        for entry in entries:
+            gradio_history.append(_copy_chatbot_entry(entry))
+            mapping_list.append(i)
+
+    _perf_log(f"format_history_for_gradio: {len(messages)}件 (キャッシュ再利用 {cache_hits}件)", perf_start)
     return gradio_history, mapping_list
 
 
@@ -9185,19 +9333,17 @@ def refresh_expressions_ui(room_name: str) -> str:
 
         if file_path and os.path.exists(file_path):
             try:
-                # Base64で埋め込み（get_avatar_htmlと同様）
-                with open(file_path, "rb") as f:
-                    encoded = base64.b64encode(f.read()).decode("utf-8")
-
+                # get_avatar_htmlと同様に avatar_assets 経由で参照（静的配信が無効なら Base64 埋め込み）
                 ext = os.path.splitext(file_path)[1].lower()
                 if ext in [".mp4", ".webm"]:
-                    mime = f"video/{ext[1:]}"
-                    preview_html = f'<video src="data:{mime};base64,{encoded}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" muted loop autoplay playsinline></video>'
+                    src = avatar_assets.get_asset_src(file_path, f"video/{ext[1:]}")
+                    preview_html = f'<video src="{src}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" muted loop autoplay playsinline></video>'
                 elif ext == ".gif":
-                    preview_html = f'<img src="data:image/gif;base64,{encoded}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" />'
+                    src = avatar_assets.get_asset_src(file_path, "image/gif")
+                    preview_html = f'<img src="{src}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" />'
                 else:
-                    mime = "image/png" if ext == ".png" else "image/jpeg"
-                    preview_html = f'<img src="data:{mime};base64,{encoded}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" />'
+                    src = avatar_assets.get_asset_src(file_path, "image/png" if ext == ".png" else "image/jpeg")
+                    preview_html = f'<img src="{src}" style="width:100%; height:110px; object-fit:cover; border-radius:6px; background:#000;" />'
             except Exception as e:
                 preview_html = f'<div style="width:100%; height:110px; background:#333; border-radius:6px; display:flex; align-items:center; justify-content:center; color:#f66; font-size:10px;">エラー: {str(e)[:20]}</div>'
         else:
@@ -9978,8 +10124,11 @@ def _get_rag_index_last_updated(room_name: str, index_type: str = "memory") -> s
         return "未作成"
 
     try:
-        # フォルダの最終更新時刻を取得
+        # フォルダの最終更新時刻を取得（未統合の追記セグメントがあればその更新も含める）
         mtime = index_path.stat().st_mtime
+        segments_dir = index_path.parent / f"{index_path.name}.segments"
+        if segments_dir.exists():
+            mtime = max([mtime] + [p.stat().st_mtime for p in segments_dir.iterdir() if p.is_dir()])
         dt = datetime.datetime.fromtimestamp(mtime)
         return dt.strftime("%Y-%m-%d %H:%M")
     except Exception:
@@ -14394,7 +14543,7 @@ def handle_watchlist_check_all(room_name: str, api_key_name: str):
 
     try:
         from watchlist_manager import WatchlistManager
-        from tools.watchlist_tools import _fetch_url_content
+        from tools.watchlist_tools import _fetch_url_contents
         from alarm_manager import _summarize_watchlist_content, trigger_research_analysis
 
         manager = WatchlistManager(room_name)
@@ -14406,15 +14555,16 @@ def handle_watchlist_check_all(room_name: str, api_key_name: str):
         results = []
         changes_found = []  # 詳細情報を含む辞書のリスト
 
-        for entry in entries:
-            if not entry.get("enabled", True):
-                continue
+        entries = [e for e in entries if e.get("enabled", True)]
+        # コンテンツは先にまとめて並列取得する
+        fetched = _fetch_url_contents([e["url"] for e in entries])
 
+        for entry in entries:
             url = entry["url"]
             name = entry["name"]
 
             # コンテンツ取得
-            success, content = _fetch_url_content(url)
+            success, content = fetched[url]
 
             if not success:
                 results.append(f"❌ {name}: 取得失敗")
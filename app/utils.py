@@ -376,6 +376,22 @@ def load_chat_log(file_path: str, single_file_only: bool = False) -> List[Dict[s
 
     return messages
 
+def _iter_log_messages_reverse(f_path: str):
+    """
+    1つの月次ファイルのメッセージを新しい順に返すジェネレータ。
+    ファイル単位キャッシュが有効ならそれを逆順に辿り、なければ末尾からブロック単位で読む。
+    """
+    try:
+        mtime = os.path.getmtime(f_path)
+    except OSError:
+        return
+    cached = _file_log_cache.get(f_path)
+    if cached and cached[0] == mtime:
+        yield from reversed(cached[1])
+        return
+    import chat_log_index
+    yield from chat_log_index.iter_messages_reverse(f_path)
+
 def load_chat_log_lazy(
     room_dir: str, 
     limit: Optional[int] = None, 
@@ -432,81 +448,54 @@ def load_chat_log_lazy(
         # 移行が成功すれば all_files が更新される必要があるため、再度 glob する
         all_files = sorted(glob.glob(os.path.join(logs_dir, "*.txt")))
 
-    # 絶対インデックス計算のためのオフセット
-    # [v2] cutoff_date による「ファイル単位のスキップ」を廃止し、全てのファイルを逆順にチェックする。
-    # これにより、min_turns を満たすまで月を遡ってスキャンが可能になる。
-    files_to_scan = all_files
-    offset_from_skipped_files = 0
+    # [v3] 新しい順にメッセージを1件ずつ取り出し、limit / cutoff_date を満たした時点で打ち切る。
+    # 月次ファイル全体を解析せず、末尾から必要な件数分だけを読む（巨大な月でも O(limit)）。
+    # min_turns を満たすまで月を遡るスキャンは従来通り。
+    import chat_log_index
+    date_pattern = re.compile(r'(\d{4}-\d{2}-\d{2})')
 
-    # --- [True Lazy Loading] 新しい順にファイルをロードして limit に達したら停止 ---
-    full_log_buffer = []
-    slice_start_index = 0
-    has_more = False
-    
-    intra_file_skipped_count = 0
+    collected = []  # 新しい順
+    valid_count = 0
     has_more = False
-    
-    # 日付フィルタを適用したファイル群
-    current_f_idx = -1
-    for f_idx, f_path in enumerate(reversed(files_to_scan)):
-        current_f_idx = f_idx
-        current_file_msgs = load_chat_log(f_path, single_file_only=True)
-        original_file_len = len(current_file_msgs)
-        
-        # cutoff_date によるフィルタリングをファイル単位で実施
-        if cutoff_date:
-            filtered = []
-            # 元の修正案(d30424c)に合わせ、メッセージ末尾の日付を確実に捉える
-            date_pattern = re.compile(r'(\d{4}-\d{2}-\d{2})')
-            
-            # ファイル内のメッセージを逆順にチェック
-            for msg in reversed(current_file_msgs):
-                content = msg.get('content', '')
-                matches = date_pattern.findall(content)
+    oldest_position = None  # 最後に採用したメッセージの (ファイル番号, ファイル末尾からの順位)
+
+    for f_idx in range(len(all_files) - 1, -1, -1):
+        stopped = False
+        for rank, msg in enumerate(_iter_log_messages_reverse(all_files[f_idx])):
+            if cutoff_date:
+                # 元の修正案(d30424c)に合わせ、メッセージ末尾の日付を確実に捉える
+                matches = date_pattern.findall(msg.get('content', ''))
                 msg_date = matches[-1] if matches else "9999-12-31" # 日付なしは一旦残す
-                
-                if msg_date < cutoff_date:
-                    if min_turns > 0 and (len(full_log_buffer) + len(filtered)) < min_turns:
-                        # まだ最低維持件数に満たないので、日付を無視して含める
-                        pass
-                    else:
-                        has_more = True
-                        break
-                filtered.insert(0, msg)
-            
-            # このファイル内でスキップされた件数を記録
-            intra_file_skipped_count = original_file_len - len(filtered)
-            current_file_msgs = filtered
+                if msg_date < cutoff_date and not (min_turns > 0 and len(collected) < min_turns):
+                    # まだ最低維持件数に満たない場合のみ、日付を無視して含める
+                    has_more = True
+                    stopped = True
+                    break
 
-        # バッファの先頭に追加
-        full_log_buffer = current_file_msgs + full_log_buffer
-        
-        # limit チェック
-        valid_count = len(full_log_buffer)
-        if limit_validator:
-            valid_count = sum(1 for m in full_log_buffer if limit_validator(m))
-        
-        if limit and valid_count >= limit:
-            if f_idx < len(files_to_scan) - 1:
-                has_more = True
-            break
-        
-        if has_more:
+            collected.append(msg)
+            oldest_position = (f_idx, rank)
+
+            # limit チェック (limit_validator 指定時は対象メッセージのみを数える)
+            if not limit_validator or limit_validator(msg):
+                valid_count += 1
+            if limit and valid_count >= limit:
+                # 同じファイル内、または過去のファイルにさらに古いログが残っているか
+                has_more = f_idx > 0 or rank < chat_log_index.get_message_count(all_files[f_idx]) - 1
+                stopped = True
+                break
+        if stopped:
             break
 
-    # 未読み込みの古いファイルがある場合、オフセットに加算
-    real_f_idx = len(files_to_scan) - 1 - current_f_idx
-    remaining_files = files_to_scan[:real_f_idx]
-    for f_rem in remaining_files:
-        msgs = load_chat_log(f_rem, single_file_only=True)
-        offset_from_skipped_files += len(msgs)
+    loaded_messages = collected[::-1]
 
-    # スライス処理
-    loaded_messages, slice_has_more, slice_start_index = _slice_messages(full_log_buffer, limit, limit_validator)
-    has_more = has_more or slice_has_more
-    
-    # 最終的な絶対開始インデックス = (スキップした過去ファイル全件) + (最後に読み込んだファイル内のスキップ分) + (スライス開始位置)
-    absolute_start_index = offset_from_skipped_files + intra_file_skipped_count + slice_start_index
+    # 絶対開始インデックス = (採用した最古メッセージより前のファイルの全件) + (そのファイル内の位置)
+    # (件数のみ必要なので、ファイル本体ではなくオフセット索引から取得する)
+    if oldest_position is None:
+        absolute_start_index = sum(chat_log_index.get_message_count(f) for f in all_files)
+    else:
+        start_f_idx, rank = oldest_position
+        absolute_start_index = sum(chat_log_index.get_message_count(f) for f in all_files[:start_f_idx])
+        absolute_start_index += chat_log_index.get_message_count(all_files[start_f_idx]) - 1 - rank
 
     # perf_end = time.time()
     # print(f"--- [PERF] load_chat_log_lazy: total={perf_end - perf_start:.4f}s (room_dir={room_dir}, limit={limit}, cutoff={cutoff_date}) ---")
@@ -516,33 +505,6 @@ def load_chat_log_lazy(
     else:
         return loaded_messages, has_more
 
-def _slice_messages(messages: List[Dict], limit: Optional[int], limit_validator: Optional[Callable]) -> Tuple[List[Dict], bool, int]:
-    """メッセージリストを制限に従ってスライスし、(切り出されたリスト, has_more, リスト内開始位置) を返す。"""
-    if not limit or len(messages) == 0:
-        return messages, False, 0
-    if limit_validator:
-        valid_count = 0
-        slice_index = 0
-        found_limit = False
-        for idx in range(len(messages) - 1, -1, -1):
-            if limit_validator(messages[idx]):
-                valid_count += 1
-            if valid_count >= limit:
-                slice_index = idx
-                found_limit = True
-                break
-        if found_limit:
-            return messages[slice_index:], (slice_index > 0), slice_index
-        else:
-            return messages, False, 0
-    else:
-        if limit and len(messages) > limit:
-            slice_index = len(messages) - limit
-            return messages[slice_index:], True, slice_index
-        else:
-            return messages, False, 0
-
-
 def get_message_by_absolute_index(room_dir: str, target_index: int) -> Optional[Dict[str, Any]]:
     """
     指定された絶対インデックス(target_index)に対応するメッセージを、
@@ -566,22 +528,14 @@ def get_message_by_absolute_index(room_dir: str, target_index: int) -> Optional[
 
     # 全ファイルを古い順に取得
     target_files = sorted(glob.glob(os.path.join(logs_dir, "*.txt")))
-    
-    current_base_index = 0
-    for f_path in target_files:
-        # load_chat_log(f_path, single_file_only=True) はキャッシュを最大限活用する
-        # (内部で _file_log_cache を参照し、mtimeに変更がなければディスクI/Oをスキップする)
-        file_msgs = load_chat_log(f_path, single_file_only=True)
-        file_len = len(file_msgs)
-        
-        if current_base_index <= target_index < current_base_index + file_len:
-            # このファイルの中に目的のメッセージがある
-            relative_index = target_index - current_base_index
-            return file_msgs[relative_index]
-        
-        current_base_index += file_len
-        
-    return None
+
+    # オフセット索引の件数だけで対象ファイルを特定し、該当メッセージだけをシークして読む
+    import chat_log_index
+    located = chat_log_index.locate(target_files, target_index)
+    if not located:
+        return None
+    f_path, relative_index = located
+    return chat_log_index.read_message(f_path, relative_index)
 
 
 def _get_room_dir_from_path(file_path: str) -> str:
@@ -903,7 +857,8 @@ def save_message_to_log(log_file_path: str, header: str, text_content: str) -> O
         
         content_to_append = f"{header.strip()}\n{text_content.strip()}\n\n"
         # ファイルが新規作成される場合は、先頭の改行を削除
-        if not os.path.exists(target_log_file) or os.path.getsize(target_log_file) == 0:
+        append_offset = os.path.getsize(target_log_file) if os.path.exists(target_log_file) else 0
+        if append_offset == 0:
              content_to_append = content_to_append.lstrip()
              
         with open(target_log_file, "a", encoding="utf-8") as f: 
@@ -913,6 +868,15 @@ def save_message_to_log(log_file_path: str, header: str, text_content: str) -> O
         # 引数として渡されたパスと、実際に書き込んだパスの両方を無効化する
         invalidate_chat_log_cache(log_file_path)
         invalidate_chat_log_cache(target_log_file)
+
+        # キーワード検索インデックスへ追記分のみを反映
+        import log_search_index
+        log_search_index.notify_message_appended(target_log_file, append_offset, header, text_content)
+        import chat_log_index
+        chat_log_index.notify_message_appended(target_log_file, append_offset, header, text_content)
+        # 自律行動の無操作時間の起点が変わったことをスケジューラへ伝える
+        import job_scheduler
+        job_scheduler.notify("log_appended", room_name=os.path.basename(os.path.normpath(room_dir)))
         
         return None
     except Exception as e:
@@ -945,47 +909,29 @@ def delete_message_from_log(log_file_path: str, message_to_delete: Dict[str, str
             print("警告: ログファイルが見つかりませんでした。")
             return None
 
-        header_pattern = re.compile(r'^## (USER|AGENT|SYSTEM):(.+?)$', re.MULTILINE)
+        import chat_log_index
 
-        current_base_index = 0
-        for f_path in log_files:
-            try:
-                with open(f_path, "r", encoding="utf-8") as f:
-                    raw_content = f.read()
-            except Exception as e:
-                print(f"警告: ファイル読み込みエラー ({os.path.basename(f_path)}): {e}")
-                continue
-
-            if not raw_content.strip():
-                continue
+        def _matches(msg: Optional[Dict[str, str]]) -> bool:
+            return bool(msg) and msg["content"] == target_content and msg["responder"] == target_responder
 
-            # このファイル内のメッセージを解析
-            matches = list(header_pattern.finditer(raw_content))
-            found_index = -1  # 削除対象のメッセージインデックス (finditer結果内)
-
-            for i, match in enumerate(matches):
-                role = match.group(1).upper()
-                responder = match.group(2).strip()
-                if role == "USER":
-                    responder = "user"
-                start_of_content = match.end()
-                end_of_content = matches[i + 1].start() if i + 1 < len(matches) else len(raw_content)
-                message_content = raw_content[start_of_content:end_of_content].strip()
-
-                if message_content == target_content and responder == target_responder:
-                    if abs_index is not None:
-                        if current_base_index + i == abs_index:
-                            found_index = i
-                            break
-                    else:
-                        found_index = i
+        # オフセット索引で対象メッセージの (ファイル, ファイル内位置) を特定する
+        found = None
+        if abs_index is not None:
+            # 絶対インデックス指定時は、件数だけで該当ファイルを特定し1件だけ読んで照合する
+            located = chat_log_index.locate(log_files, abs_index)
+            if located and _matches(chat_log_index.read_message(*located)):
+                found = located
+        else:
+            for f_path in log_files:
+                for i, msg in enumerate(chat_log_index.read_messages(f_path)):
+                    if _matches(msg):
+                        found = (f_path, i)
                         break
-            
-            current_base_index += len(matches)
-
-            if found_index < 0:
-                continue  # このファイルには対象メッセージがない → 次のファイルへ
+                if found:
+                    break
 
+        if found:
+            f_path, found_index = found
             # --- 対象メッセージを発見！このファイルのみを修正する ---
             print(f"--- [Log Delete] 対象メッセージを {os.path.basename(f_path)} で発見 ---")
 
@@ -1007,15 +953,11 @@ def delete_message_from_log(log_file_path: str, message_to_delete: Dict[str, str
             except Exception as e:
                 print(f"警告: バックアップ作成失敗 ({os.path.basename(f_path)}): {e}")
 
-            # 対象メッセージをテキストから除去して書き戻す
-            target_match = matches[found_index]
-            delete_start = target_match.start()
-            if found_index + 1 < len(matches):
-                delete_end = matches[found_index + 1].start()
-            else:
-                delete_end = len(raw_content)
-
-            new_content = raw_content[:delete_start] + raw_content[delete_end:]
+            # 対象メッセージのバイト範囲をファイルから除去して書き戻す
+            delete_start, delete_end = chat_log_index.get_message_span(f_path, found_index)
+            with open(f_path, "rb") as f:
+                raw_bytes = f.read()
+            new_content = (raw_bytes[:delete_start] + raw_bytes[delete_end:]).decode("utf-8").replace("\r\n", "\n")
             # 先頭・末尾の余分な空行を整理
             new_content = new_content.strip() + "\n\n" if new_content.strip() else ""
 
@@ -1024,6 +966,9 @@ def delete_message_from_log(log_file_path: str, message_to_delete: Dict[str, str
             
             # ログ書き換え後にキャッシュを無効化
             invalidate_chat_log_cache(f_path)
+            import log_search_index
+            log_search_index.invalidate_source(f_path)
+            chat_log_index.invalidate(f_path)
 
             print(f"--- [Log Delete] {os.path.basename(f_path)} からメッセージを削除しました ---")
             return deleted_timestamp or "00:00:00"
@@ -1893,6 +1838,10 @@ def _overwrite_log_file(file_path: str, messages: List[Dict]):
                 f.write("\n\n")
 
         invalidate_chat_log_cache(target_file)
+        import log_search_index
+        log_search_index.invalidate_source(target_file)
+        import chat_log_index
+        chat_log_index.invalidate(target_file)
 
 def truncate_chat_logs(room_dir: str, target_index: int):
     """
@@ -1913,66 +1862,43 @@ def truncate_chat_logs(room_dir: str, target_index: int):
     if not log_files:
         return
 
-    current_msg_count = 0
-    header_pattern = re.compile(r'^## (USER|AGENT|SYSTEM):(.+?)$', re.MULTILINE)
-    
-    file_to_truncate = None
-    truncate_at_msg_idx = -1
+    # 1. オフセット索引の件数だけで、どのファイルで target_index に達するかを特定
+    #    (前半の月次ファイルは本文を読み込まない)
+    import chat_log_index
+    located = chat_log_index.locate(log_files, target_index)
+    if not located:
+        print(f"警告: ログ切り詰め対象インデックスが見つかりませんでした: {target_index}")
+        return
 
-    # 1. どのファイルで target_index に達するかを特定
-    for f_path in log_files:
-        try:
-            with open(f_path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except Exception as e:
-            print(f"警告: ログ切り詰め中の読み込みエラー ({f_path}): {e}")
-            continue
+    file_to_truncate, truncate_at_msg_idx = located
+    print(f"--- [Truncate] '{os.path.basename(file_to_truncate)}' のメッセージIdx:{truncate_at_msg_idx} 以降を切り詰めます ---")
 
-        matches = list(header_pattern.finditer(content))
-        file_msg_count = len(matches)
-        
-        if file_to_truncate is None:
-            # まだ target_index が見つかっていない
-            if current_msg_count + file_msg_count > target_index:
-                # このファイル内に切り詰め位置がある
-                file_to_truncate = f_path
-                truncate_at_msg_idx = target_index - current_msg_count
-                print(f"--- [Truncate] '{os.path.basename(f_path)}' のメッセージIdx:{truncate_at_msg_idx} 以降を切り詰めます ---")
-                break
-            else:
-                # このファイルは丸ごと「過去」なので維持
-                current_msg_count += file_msg_count
+    # 2. 対象ファイルだけを、索引のバイトオフセット位置で切り詰める
+    try:
+        span = chat_log_index.get_message_span(file_to_truncate, truncate_at_msg_idx)
+        if span:
+            # バックアップ(bak)作成
+            bak_path = file_to_truncate + ".bak"
+            import shutil
+            shutil.copy2(file_to_truncate, bak_path)
 
-    if not file_to_truncate:
-        print(f"警告: ログ切り詰め対象インデックスが見つかりませんでした: {target_index}")
-        return
+            # 切り詰め
+            with open(file_to_truncate, "rb") as f:
+                raw_bytes = f.read(span[0])
+            new_content = raw_bytes.decode("utf-8").replace("\r\n", "\n").strip()
+            if new_content:
+                new_content += "\n\n"
 
-    # 2. 対象ファイルだけを切り詰める
-    if file_to_truncate:
-        try:
-            with open(file_to_truncate, "r", encoding="utf-8") as f:
-                raw_content = f.read()
-            
-            matches = list(header_pattern.finditer(raw_content))
-            if 0 <= truncate_at_msg_idx < len(matches):
-                # バックアップ(bak)作成
-                bak_path = file_to_truncate + ".bak"
-                import shutil
-                shutil.copy2(file_to_truncate, bak_path)
-                
-                # 切り詰め
-                cut_pos = matches[truncate_at_msg_idx].start()
-                new_content = raw_content[:cut_pos].strip()
-                if new_content:
-                    new_content += "\n\n"
-                    
-                with open(file_to_truncate, "w", encoding="utf-8") as f:
-                    f.write(new_content)
-                
-                # キャッシュ無効化
-                invalidate_chat_log_cache(file_to_truncate)
-        except Exception as e:
-            print(f"エラー: ログファイルの切り詰め実行中に失敗 ({file_to_truncate}): {e}")
+            with open(file_to_truncate, "w", encoding="utf-8") as f:
+                f.write(new_content)
+
+            # キャッシュ無効化
+            invalidate_chat_log_cache(file_to_truncate)
+            import log_search_index
+            log_search_index.invalidate_source(file_to_truncate)
+            chat_log_index.invalidate(file_to_truncate)
+    except Exception as e:
+        print(f"エラー: ログファイルの切り詰め実行中に失敗 ({file_to_truncate}): {e}")
 
 # ▲▲▲【追加はここまで】▲▲▲
 